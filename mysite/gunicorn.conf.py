@@ -0,0 +1,53 @@
+"""
+Настройки gunicorn: gunicorn читает ./gunicorn.conf.py из рабочего каталога (в контейнере — /app).
+
+Приложение загружается и прогревается один раз в мастере (preload_app + mysite.warmup), воркеры
+получают готовые маршруты, шаблоны, переводы и метаданные моделей через fork (copy-on-write),
+а не собирают их на первых запросах после каждого деплоя.
+
+Сборщик мусора в мастере выключен до fork, а перед fork объекты замораживаются (gc.freeze):
+иначе сборки мусора в воркерах трогают счётчики всех унаследованных объектов и копируют
+их страницы памяти — общая память воркеров тает, а первые сборки замедляют запросы.
+После заморозки сборщик снова включается: и мастер, и воркеры обходят только новые объекты.
+
+Приложение и класс воркеров выбираются здесь же: по умолчанию WSGI (mysite.wsgi, синхронные воркеры),
+GUNICORN_ASGI=1 — ASGI (mysite.asgi, воркеры uvicorn). ASGI пока включается только явно: на замерах
+bench_asgi (1 CPU, 2 воркера, 200 клиентов) он медленнее — ~78-95 req/s и p50 ~3.3 с против
+~140-154 req/s и p50 ~1.4 с у WSGI. Перепроверять там же, на боевом железе.
+
+Запуск и замер времени старта в логе мастера:
+    gunicorn --bind 0.0.0.0:8000
+    GUNICORN_ASGI=1 gunicorn --bind 0.0.0.0:8000
+"""
+import gc
+import os
+from timeit import default_timer
+
+config_loaded = default_timer()  # конфиг читается до импорта приложения: отсюда считаем время старта
+
+if os.getenv("GUNICORN_ASGI", "0") == "1":
+    wsgi_app = "mysite.asgi:application"
+    worker_class = "uvicorn_worker.UvicornWorker"  # event loop: async-представления не держат воркер на ожидании
+else:
+    wsgi_app = "mysite.wsgi:application"  # синхронные воркеры
+
+preload_app = os.getenv("GUNICORN_PRELOAD", "1") == "1"  # GUNICORN_PRELOAD=0 — загрузка в каждом воркере, как раньше
+
+if preload_app:
+    gc.disable()  # до импорта приложения: без сборок в мастере в памяти не остаётся "дыр" от освобождённых объектов
+
+
+def when_ready(server):
+    """Мастер загрузил приложение и слушает порт; воркеров ещё нет — прогреваем и замораживаем."""
+    if not server.cfg.preload_app:
+        return
+    from mysite.warmup import warm_up
+
+    app_loaded = default_timer()
+    report = warm_up()
+    server.log.info("Startup: application loaded in %.3fs", app_loaded - config_loaded)
+    for step in report:
+        server.log.info("Startup: warm-up %-12s %5d items in %.3fs", step.name, step.items, step.seconds)
+    server.log.info("Startup: master ready in %.3fs", default_timer() - config_loaded)
+    gc.freeze()  # всё, что создано до этого места, сборщик мусора в воркерах больше не обходит
+    gc.enable()
@@ -0,0 +1,31 @@
+from django.contrib import admin
+from django.db.models import QuerySet
+from django.http import HttpRequest
+from django.utils import timezone
+
+from .models import Job
+
+
+@admin.action(description="Повторить задачи")
+def retry_jobs(modeladmin: admin.ModelAdmin, request: HttpRequest, queryset: QuerySet):
+    """Завершённые с ошибкой задачи — снова в очередь, с новым запасом попыток."""
+    queryset.filter(status=Job.FAILED).update(
+        status=Job.QUEUED, attempts=0, run_after=timezone.now(), finished_at=None, locked_by="",
+    )
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    """Фоновые задачи: статус, результат и ошибки. Задачи создают представления, а не админка."""
+    actions = [retry_jobs]
+    list_display = "pk", "task", "status", "priority", "attempts", "created_by", "created_at", "finished_at"
+    list_filter = "status", "task"
+    list_select_related = "created_by",
+    ordering = "-pk",
+    readonly_fields = [field.name for field in Job._meta.fields]
+
+    def has_add_permission(self, request: HttpRequest) -> bool:
+        return False
+
+    def has_change_permission(self, request: HttpRequest, obj=None) -> bool:
+        return False
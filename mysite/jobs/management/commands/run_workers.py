@@ -0,0 +1,111 @@
+import os
+import signal
+import time
+from multiprocessing import get_context
+from multiprocessing.connection import wait
+from threading import Event
+
+from django.core.management import BaseCommand
+
+RESPAWN_DELAY = 1  # пауза перед перезапуском упавшего воркера, секунд (без горячего цикла падений)
+
+
+def run_worker(burst: bool) -> int:
+    """
+    Процесс-воркер: собственный Django и соединение с БД, цикл jobs.queue.work.
+
+    Процессы запускаются через "spawn" (не наследуют соединение с БД родителя), поэтому
+    настраивают Django сами; модели импортируются только после django.setup().
+    SIGTERM/SIGINT не прерывают задачу: воркер доделывает текущую и выходит.
+    """
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "mysite.settings")
+    import django
+
+    django.setup()
+    from jobs.queue import work, worker_name
+
+    stop = Event()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, lambda *args: stop.set())
+    return work(worker_name(), stop, burst=burst)
+
+
+class Command(BaseCommand):
+    """
+    Запускает воркеры фоновых задач (jobs.queue): N процессов забирают задачи из таблицы jobs_job.
+
+    Каждый процесс выполняет по одной задаче: импорт CSV и обработка картинок упираются в CPU
+    и GIL, поэтому параллельность — процессами. Запись в SQLite при этом идёт через общую
+    очередь записи (mysite.sqlite.serialized_writes), как у воркеров gunicorn.
+
+    Остановка (SIGTERM от docker/systemd, Ctrl+C): воркеры доделывают текущие задачи и выходят.
+    Задача воркера, убитого без шанса доделать (SIGKILL, падение), через timeout задачи
+    достанется другому воркеру, а сам упавший процесс родитель запускает заново —
+    число воркеров не убывает незаметно (в --burst упавший не перезапускается).
+
+    Примеры:
+        python manage.py run_workers --workers 4
+        python manage.py run_workers --burst   # выполнить всё, что в очереди, и выйти (cron)
+    """
+    help = "Runs background job worker processes backed by the jobs_job table"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers", type=int, default=2, help="Сколько процессов-воркеров запустить (1 — в текущем процессе)",
+        )
+        parser.add_argument("--burst", action="store_true", help="Выйти, когда очередь опустеет")
+
+    def handle(self, *args, **options):
+        workers, burst = options["workers"], options["burst"]
+        self.stdout.write(f"Starting {workers} job workers" + (" (burst)" if burst else ""))
+        if workers <= 1:
+            from jobs.queue import work, worker_name
+
+            stop = Event()
+            previous = {signum: signal.signal(signum, lambda *args: stop.set())
+                        for signum in (signal.SIGTERM, signal.SIGINT)}
+            try:
+                processed = work(worker_name(), stop, burst=burst)
+            finally:
+                for signum, handler in previous.items():
+                    signal.signal(signum, handler)
+            self.stdout.write(self.style.SUCCESS(f"Processed {processed} jobs"))
+            return
+
+        context = get_context("spawn")
+        stopping = Event()
+
+        def start():
+            process = context.Process(target=run_worker, args=(burst,), daemon=False)
+            process.start()
+            return process
+
+        processes = [start() for _ in range(workers)]
+
+        def forward(signum, frame):
+            """SIGTERM родителю (docker stop) — передаём воркерам; Ctrl+C группа процессов получает и так."""
+            stopping.set()
+            for process in processes:
+                if process.is_alive():
+                    os.kill(process.pid, signal.SIGTERM)
+
+        signal.signal(signal.SIGTERM, forward)
+        signal.signal(signal.SIGINT, forward)
+        failed = 0
+        while processes:
+            wait([process.sentinel for process in processes])  # ждём завершения любого из воркеров
+            for process in [process for process in processes if not process.is_alive()]:
+                process.join()
+                processes.remove(process)
+                if process.exitcode == 0:
+                    continue
+                failed += 1
+                self.stderr.write(self.style.ERROR(f"Worker {process.pid} exited with code {process.exitcode}"))
+                if not burst and not stopping.is_set():
+                    time.sleep(RESPAWN_DELAY)
+                    if not stopping.is_set():  # SIGTERM мог прийти во время паузы
+                        processes.append(start())
+        if failed:
+            self.stderr.write(self.style.ERROR(f"{failed} workers exited with an error"))
+        else:
+            self.stdout.write(self.style.SUCCESS("Workers stopped"))
@@ -0,0 +1,53 @@
+from django.contrib.auth.models import User
+from django.db import models
+from django.utils import timezone
+
+
+class Job(models.Model):
+    """
+    Фоновая задача в очереди. Брокер — сама БД: воркеры (команда run_workers) забирают задачи
+    условным UPDATE (jobs.queue.claim) и записывают результат в эту же строку.
+
+    Жизненный цикл: queued -> running -> succeeded / failed. Задача с ошибкой возвращается в queued
+    с отложенным run_after, пока не исчерпаны max_attempts. Задача в running с истёкшим locked_until
+    (воркер упал или завис) снова доступна другим воркерам.
+    """
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+    STATUSES = [
+        (QUEUED, "В очереди"),
+        (RUNNING, "Выполняется"),
+        (SUCCEEDED, "Выполнена"),
+        (FAILED, "Ошибка"),
+    ]
+
+    class Meta:
+        ordering = ["-pk"]
+        verbose_name = "Фоновая задача"
+        verbose_name_plural = "Фоновые задачи"
+        indexes = [
+            # выбор следующей задачи: WHERE status ... ORDER BY priority DESC, run_after
+            models.Index(fields=["status", "-priority", "run_after"], name="jobs_job_claim_idx"),
+        ]
+
+    task = models.CharField(max_length=100)  # имя задачи из jobs.registry.TASKS
+    payload = models.JSONField(default=dict, blank=True)  # аргументы задачи
+    status = models.CharField(max_length=10, choices=STATUSES, default=QUEUED)
+    priority = models.SmallIntegerField(default=0)  # больше — раньше
+    attempts = models.PositiveSmallIntegerField(default=0)  # сколько раз задачу забирал воркер
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    timeout = models.PositiveIntegerField(default=300)  # visibility timeout, секунд
+    run_after = models.DateTimeField(default=timezone.now)  # раньше этого времени не запускать (повтор с паузой)
+    locked_by = models.CharField(max_length=100, blank=True)  # воркер, который выполняет задачу
+    locked_until = models.DateTimeField(null=True, blank=True)  # до какого времени задача за ним
+    result = models.JSONField(null=True, blank=True)  # что вернула функция задачи
+    error = models.TextField(blank=True)  # traceback последней ошибки
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name="jobs")
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)  # начало последней попытки
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self) -> str:
+        return f"Job(pk={self.pk}, task={self.task!r}, status={self.status!r})"
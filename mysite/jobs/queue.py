@@ -0,0 +1,288 @@
+"""
+Очередь фоновых задач поверх основной БД.
+
+Запросы раньше сами выполняли долгую работу (импорт CSV и файлов заказов, массовую архивацию,
+обработку картинок) — в воркере gunicorn, с его таймаутом. Теперь запрос ставит задачу
+(enqueue) и сразу отвечает, а выполняют её процессы команды run_workers; клиент узнаёт статус
+через API /<язык>/jobs/api/<id>/ (jobs.views.JobViewSet) или в админке.
+
+Как воркер забирает задачу (claim), без SELECT ... FOR UPDATE SKIP LOCKED, которого нет в SQLite:
+    1. читает несколько доступных задач в порядке priority DESC, run_after, pk;
+    2. для каждой выполняет UPDATE ... SET status='running' WHERE pk=<id> AND <задача всё ещё доступна>;
+    3. обновлена одна строка — задача его, ноль — её забрал другой воркер, пробуем следующую.
+Доступна задача в queued с наступившим run_after или в running с истёкшим locked_until:
+воркер, который её выполнял, упал или завис дольше timeout задачи (visibility timeout).
+
+Ошибка в задаче: если попытки не исчерпаны, задача возвращается в очередь с паузой
+JOBS_RETRY_DELAY * 2^(попытка - 1), иначе — failed с traceback в error и сигнал jobs.signals.job_failed.
+Результат записывает только воркер, за которым задача числится (locked_by): если задачу уже
+забрал другой, опоздавший результат отбрасывается.
+
+Пока задача выполняется, отдельный поток воркера продлевает её аренду (heartbeat) каждые timeout / 3 секунд:
+долгий импорт не отдаётся другому воркеру, пока жив выполняющий его процесс. timeout задачи — это
+время, за которое пропажу воркера заметят, а не предел длительности самой задачи.
+
+Ошибка БД в самом цикле воркера (захват, запись результата — например, "database is locked")
+не завершает процесс: воркер пишет её в лог и повторяет с паузой JOBS_POLL_INTERVAL * 2^(ошибок подряд - 1).
+
+settings.JOBS_EAGER = True выполняет задачу сразу внутри enqueue (разработка без run_workers, тесты).
+"""
+import logging
+import os
+import socket
+import traceback
+import uuid
+from contextlib import contextmanager
+from datetime import timedelta
+from threading import Event, Thread
+from timeit import default_timer
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.db import DatabaseError, close_old_connections, connections
+from django.db.models import F, Q
+from django.utils import timezone
+
+from mysite.sqlite import serialized_writes
+
+from .models import Job
+from .registry import get_task, TASKS
+from .signals import housekeeping, job_failed
+
+log = logging.getLogger(__name__)
+
+CLAIM_CANDIDATES = 5  # сколько доступных задач пробует забрать воркер за один проход
+MAX_ERROR_DELAY = 60  # предел паузы воркера после ошибок БД подряд, секунд
+HOUSEKEEPING_INTERVAL = 60 * 60  # как часто воркер чистит старые задачи и рассылает housekeeping, секунд
+
+
+def job_files() -> FileSystemStorage:
+    """
+    Хранилище входных файлов задач (загруженные CSV и т.д.): settings.JOBS_FILES_ROOT.
+    Не MEDIA_ROOT — загруженные пользователями файлы импорта не должны раздаваться по /media/.
+    """
+    return FileSystemStorage(location=settings.JOBS_FILES_ROOT)
+
+
+def stage_file(file) -> str:
+    """Сохраняет загруженный файл для задачи (в отдельный каталог — имена не конфликтуют) и возвращает путь."""
+    return job_files().save(f"{uuid.uuid4().hex}/{file.name}", file)
+
+
+def discard_file(path: str) -> None:
+    """Удаляет входной файл задачи вместе с его каталогом."""
+    storage = job_files()
+    storage.delete(path)
+    try:
+        os.rmdir(storage.path(os.path.dirname(path)))
+    except OSError:  # каталог не пуст или уже удалён
+        pass
+
+
+def worker_name() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def enqueue(task_name: str, payload: dict | None = None, *, user=None, priority: int | None = None,
+            delay: float = 0) -> Job:
+    """
+    Ставит задачу task_name в очередь и возвращает её строку.
+
+    priority, timeout и max_attempts по умолчанию берутся из регистрации задачи (jobs.registry.task).
+    Внутри транзакции задача становится видна воркерам только после её фиксации —
+    вместе с данными, которые ей нужны.
+    """
+    spec = get_task(task_name)
+    with serialized_writes():
+        job = Job.objects.create(
+            task=task_name,
+            payload=payload or {},
+            priority=spec.priority if priority is None else priority,
+            max_attempts=spec.max_attempts,
+            timeout=spec.timeout,
+            run_after=timezone.now() + timedelta(seconds=delay),
+            created_by=user if user is not None and user.is_authenticated else None,
+        )
+    if settings.JOBS_EAGER:
+        run_now(job)
+    return job
+
+
+def available(now) -> Q:
+    """Условие "задачу можно забрать" — и для выбора кандидатов, и в WHERE условного UPDATE."""
+    return Q(status=Job.QUEUED, run_after__lte=now) | Q(status=Job.RUNNING, locked_until__lt=now)
+
+
+def claim(worker: str) -> Job | None:
+    """Забирает следующую доступную задачу для воркера worker или возвращает None, если очередь пуста."""
+    now = timezone.now()
+    candidates = (
+        Job.objects.filter(available(now))
+        .order_by("-priority", "run_after", "pk")
+        .values_list("pk", "timeout")[:CLAIM_CANDIDATES]
+    )
+    for pk, timeout in candidates:
+        with serialized_writes():
+            claimed = Job.objects.filter(available(now), pk=pk).update(
+                status=Job.RUNNING,
+                locked_by=worker,
+                locked_until=now + timedelta(seconds=timeout),
+                attempts=F("attempts") + 1,
+                started_at=now,
+            )
+        if claimed:
+            return Job.objects.get(pk=pk)
+    return None
+
+
+def finish(job: Job, worker: str, **values) -> bool:
+    """Записывает итог попытки, если задача всё ещё за этим воркером; иначе итог отбрасывается."""
+    with serialized_writes():
+        updated = Job.objects.filter(pk=job.pk, status=Job.RUNNING, locked_by=worker).update(
+            locked_until=None, **values,
+        )
+    if not updated:
+        log.warning("Job %s was taken over by another worker, result of %s is discarded", job.pk, worker)
+    return bool(updated)
+
+
+def extend_lease(job: Job, worker: str) -> bool:
+    """Продлевает аренду выполняемой задачи ещё на timeout; False — задача уже не за этим воркером."""
+    with serialized_writes():
+        return bool(Job.objects.filter(pk=job.pk, status=Job.RUNNING, locked_by=worker).update(
+            locked_until=timezone.now() + timedelta(seconds=job.timeout),
+        ))
+
+
+@contextmanager
+def heartbeat(job: Job, worker: str):
+    """Пока выполняется блок, фоновый поток продлевает аренду задачи каждые timeout / 3 секунд."""
+    stop = Event()
+
+    def beat():
+        try:
+            while not stop.wait(job.timeout / 3):
+                try:
+                    if not extend_lease(job, worker):
+                        return  # задачу забрали (аренда успела истечь) — продлевать нечего
+                except DatabaseError:
+                    log.warning("Could not extend the lease of job %s", job.pk, exc_info=True)
+        finally:
+            connections.close_all()  # соединения этого потока
+
+    thread = Thread(target=beat, name=f"job-{job.pk}-heartbeat", daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+
+
+def fail(job: Job, worker: str, error: str) -> str:
+    """Окончательная ошибка задачи: статус failed и сигнал job_failed (если итог записан этим воркером)."""
+    if finish(job, worker, status=Job.FAILED, error=error, finished_at=timezone.now()):
+        job.status, job.error = Job.FAILED, error
+        job_failed.send(sender=Job, job=job)
+    return Job.FAILED
+
+
+def execute(job: Job, worker: str) -> str:
+    """Выполняет забранную задачу и записывает результат; возвращает итоговый статус."""
+    spec = TASKS.get(job.task)
+    if spec is None:
+        return fail(job, worker, f"Unknown task {job.task!r}")
+    if job.attempts > job.max_attempts:  # прошлая попытка не закончилась за timeout (воркер упал или завис)
+        return fail(job, worker, f"Visibility timeout expired, {job.max_attempts} attempts exhausted")
+
+    started = default_timer()
+    try:
+        with heartbeat(job, worker):
+            result = spec.func(job)
+    except Exception:
+        error = traceback.format_exc()
+        if job.attempts < job.max_attempts:
+            delay = settings.JOBS_RETRY_DELAY * 2 ** (job.attempts - 1)
+            log.warning("Job %s (%s) failed, attempt %s of %s, retry in %ss",
+                        job.pk, job.task, job.attempts, job.max_attempts, delay, exc_info=True)
+            finish(job, worker, status=Job.QUEUED, error=error,
+                   run_after=timezone.now() + timedelta(seconds=delay))
+            return Job.QUEUED
+        log.error("Job %s (%s) failed after %s attempts", job.pk, job.task, job.attempts, exc_info=True)
+        return fail(job, worker, error)
+
+    log.info("Job %s (%s) succeeded in %.2fs", job.pk, job.task, default_timer() - started)
+    finish(job, worker, status=Job.SUCCEEDED, result=result, error="", finished_at=timezone.now())
+    return Job.SUCCEEDED
+
+
+def run_now(job: Job) -> None:
+    """JOBS_EAGER: одна попытка задачи прямо в текущем процессе (с записью статуса, как у воркера)."""
+    worker = f"eager:{worker_name()}"
+    with serialized_writes():
+        Job.objects.filter(pk=job.pk).update(
+            status=Job.RUNNING, locked_by=worker, attempts=F("attempts") + 1, started_at=timezone.now(),
+            locked_until=timezone.now() + timedelta(seconds=job.timeout),
+        )
+    job.refresh_from_db()
+    execute(job, worker)
+    job.refresh_from_db()
+
+
+def purge_finished() -> int:
+    """Удаляет завершённые задачи старше settings.JOBS_KEEP_DAYS дней."""
+    cutoff = timezone.now() - timedelta(days=settings.JOBS_KEEP_DAYS)
+    with serialized_writes():
+        deleted, _ = Job.objects.filter(status__in=[Job.SUCCEEDED, Job.FAILED], finished_at__lt=cutoff).delete()
+    return deleted
+
+
+def run_housekeeping() -> None:
+    """Удаляет старые задачи и рассылает housekeeping: ошибка уборки одного приложения не останавливает воркер."""
+    purge_finished()
+    for receiver, response in housekeeping.send_robust(sender=Job):  # устаревшие файлы выгрузок и т.п.
+        if isinstance(response, Exception):
+            log.error("Housekeeping receiver %r failed", receiver, exc_info=response)
+
+
+def work(worker: str, stop: Event, burst: bool = False) -> int:
+    """
+    Цикл воркера: забирает и выполняет задачи, пока не выставлен stop.
+
+    Пустая очередь: burst=True — выход (cron, тесты), иначе ожидание JOBS_POLL_INTERVAL секунд
+    (stop прерывает ожидание сразу). Раз в HOUSEKEEPING_INTERVAL (кроме burst) — уборка run_housekeeping.
+    Между задачами соединения с БД проверяются так же, как между запросами: воркер живёт долго,
+    а CONN_MAX_AGE ограничивает возраст соединения.
+    Ошибка БД при захвате задачи или записи результата — пауза и новая попытка; задачу, итог которой
+    не удалось записать, по истечении аренды выполнит снова этот или другой воркер.
+    Возвращает, сколько задач выполнено.
+    """
+    processed = 0
+    purged_at = 0.0
+    errors = 0  # ошибок БД подряд
+    while not stop.is_set():
+        close_old_connections()
+        try:
+            # уборка — раз в час по времени, а не когда очередь пуста: при постоянной нагрузке
+            # устаревшие задачи и файлы выгрузок иначе не удалялись бы никогда
+            if not burst and default_timer() - purged_at > HOUSEKEEPING_INTERVAL:
+                purged_at = default_timer()
+                run_housekeeping()
+            job = claim(worker)
+            if job is None:
+                if burst:
+                    break
+            else:
+                execute(job, worker)
+                processed += 1
+        except DatabaseError:
+            errors += 1
+            delay = min(settings.JOBS_POLL_INTERVAL * 2 ** (errors - 1), MAX_ERROR_DELAY)
+            log.exception("Worker %s: database error, retry in %.1fs", worker, delay)
+            stop.wait(delay)  # транзакцию откатил serialized_writes, соединение проверит close_old_connections
+            continue
+        errors = 0
+        if job is None:
+            stop.wait(settings.JOBS_POLL_INTERVAL)
+    close_old_connections()
+    return processed
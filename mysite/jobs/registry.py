@@ -0,0 +1,41 @@
+"""
+Реестр фоновых задач: имя задачи -> функция и её параметры по умолчанию.
+
+Задачи объявляются в модуле tasks.py приложения (JobsConfig.ready импортирует их при старте):
+
+    @task("shopapp.import_products_csv", timeout=30 * 60, max_attempts=1)
+    def import_products_csv(job: Job) -> dict:
+        ...  # job.payload — аргументы, возвращаемое значение (JSON) попадает в job.result
+
+В очередь ставится имя задачи и payload (jobs.queue.enqueue), а не функция: воркер — другой процесс.
+"""
+from collections.abc import Callable
+from typing import NamedTuple
+
+
+class Task(NamedTuple):
+    name: str
+    func: Callable
+    timeout: int  # секунд на выполнение (visibility timeout): потом задачу может забрать другой воркер
+    max_attempts: int  # сколько раз запускать при ошибках; неидемпотентным задачам (импорт) — 1
+    priority: int  # больше — раньше
+
+
+TASKS: dict[str, Task] = {}
+
+
+def task(name: str, *, timeout: int = 5 * 60, max_attempts: int = 3, priority: int = 0) -> Callable:
+    """Декоратор: регистрирует функцию как фоновую задачу с именем name."""
+    def register(func: Callable) -> Callable:
+        if name in TASKS and TASKS[name].func is not func:
+            raise ValueError(f"Task {name!r} is already registered")
+        TASKS[name] = Task(name, func, timeout, max_attempts, priority)
+        return func
+    return register
+
+
+def get_task(name: str) -> Task:
+    try:
+        return TASKS[name]
+    except KeyError:
+        raise ValueError(f"Unknown task {name!r}") from None
@@ -0,0 +1,27 @@
+from rest_framework import serializers
+
+from .models import Job
+
+
+class JobSerializer(serializers.ModelSerializer):
+    """
+    Статус фоновой задачи для опроса клиентом: status, результат (result) или ошибка.
+    Аргументы задачи (payload) не отдаются — в них пути к загруженным файлам.
+    """
+    class Meta:
+        model = Job
+        fields = [
+            "pk",
+            "task",
+            "status",
+            "priority",
+            "attempts",
+            "max_attempts",
+            "result",
+            "error",
+            "created_at",
+            "run_after",
+            "started_at",
+            "finished_at",
+        ]
+        read_only_fields = fields
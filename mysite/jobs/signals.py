@@ -0,0 +1,14 @@
+"""
+Сигналы очереди задач для приложений, которые строят на ней свои процессы.
+
+job_failed — задача окончательно завершилась ошибкой (попытки исчерпаны или задача неизвестна):
+    job_failed.send(sender=Job, job=job)
+Например, экспорт из нескольких задач (shopapp.exports) помечает себя failed.
+
+housekeeping — раз в час (по времени, и под нагрузкой тоже), вместе с очисткой старых задач (jobs.queue.work).
+Обработчики удаляют то, что устарело: файлы экспортов с истёкшим сроком хранения и т.п.
+"""
+from django.dispatch import Signal
+
+job_failed = Signal()  # аргументы: job — строка Job со статусом failed
+housekeeping = Signal()  # без аргументов
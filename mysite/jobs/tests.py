@@ -0,0 +1,190 @@
+import io
+import time
+from datetime import timedelta
+from threading import Event
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import OperationalError
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone, translation
+
+from .models import Job
+from .queue import claim, enqueue, execute, extend_lease, finish, work
+from .registry import task
+from .signals import housekeeping, job_failed
+
+CALLS = []  # аргументы вызовов тестовых задач
+
+
+@task("tests.echo", priority=1)
+def echo(job: Job) -> dict:
+    CALLS.append(job.payload)
+    return {"echo": job.payload}
+
+
+@task("tests.slow", timeout=1)
+def slow(job: Job) -> None:
+    time.sleep(0.5)
+
+
+@task("tests.flaky", max_attempts=2)
+def flaky(job: Job) -> None:
+    raise RuntimeError("temporary failure")
+
+
+@override_settings(JOBS_EAGER=False, JOBS_RETRY_DELAY=10)
+class JobQueueTestCase(TestCase):
+    """Очередь задач в БД: приоритеты, условный захват, повторы и visibility timeout."""
+
+    def setUp(self):
+        CALLS.clear()
+
+    def test_work_runs_jobs_by_priority(self):
+        """Воркер выполняет задачи в порядке priority DESC, затем по времени постановки."""
+        low = enqueue("tests.echo", {"n": 1}, priority=0)
+        high = enqueue("tests.echo", {"n": 2}, priority=5)
+        default = enqueue("tests.echo", {"n": 3})  # приоритет из регистрации задачи — 1
+        self.assertEqual(work("test", Event(), burst=True), 3)
+        self.assertEqual(CALLS, [{"n": 2}, {"n": 3}, {"n": 1}])
+        for job in (low, high, default):
+            job.refresh_from_db()
+            self.assertEqual(job.status, Job.SUCCEEDED)
+            self.assertEqual(job.attempts, 1)
+            self.assertEqual(job.result, {"echo": job.payload})
+            self.assertIsNotNone(job.finished_at)
+
+    def test_claim_is_exclusive(self):
+        """Забранную задачу другой воркер не получает, пока не истёк её timeout."""
+        job = enqueue("tests.echo")
+        self.assertEqual(claim("first").pk, job.pk)
+        self.assertIsNone(claim("second"))
+
+        Job.objects.filter(pk=job.pk).update(locked_until=timezone.now() - timedelta(seconds=1))
+        reclaimed = claim("second")  # первый воркер "упал": задача снова доступна
+        self.assertEqual((reclaimed.locked_by, reclaimed.attempts), ("second", 2))
+        # опоздавший результат первого воркера не затирает работу второго
+        self.assertFalse(finish(job, "first", status=Job.SUCCEEDED))
+        self.assertEqual(execute(reclaimed, "second"), Job.SUCCEEDED)
+
+    def test_delayed_job_waits(self):
+        enqueue("tests.echo", delay=60)
+        self.assertIsNone(claim("worker"))
+
+    def test_retry_with_backoff_then_fail(self):
+        """Ошибка — повтор с паузой, после max_attempts — failed с traceback."""
+        job = enqueue("tests.flaky")
+        self.assertEqual(execute(claim("worker"), "worker"), Job.QUEUED)
+        job.refresh_from_db()
+        self.assertGreater(job.run_after, timezone.now() + timedelta(seconds=5))
+        self.assertIn("temporary failure", job.error)
+        self.assertIsNone(claim("worker"))  # пауза перед повтором
+
+        failed = []
+        job_failed.connect(lambda sender, job, **kwargs: failed.append(job.pk), weak=False, dispatch_uid="test")
+        self.addCleanup(job_failed.disconnect, dispatch_uid="test")
+        Job.objects.filter(pk=job.pk).update(run_after=timezone.now())
+        self.assertEqual(execute(claim("worker"), "worker"), Job.FAILED)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 2))
+        self.assertIn("RuntimeError", job.error)
+        self.assertEqual(failed, [job.pk])  # сигнал только об окончательной ошибке, не о повторе
+
+    def test_expired_last_attempt_fails(self):
+        """Воркер пропал на последней попытке — задача завершается ошибкой, а не крутится вечно."""
+        job = enqueue("tests.echo")
+        Job.objects.filter(pk=job.pk).update(
+            status=Job.RUNNING, attempts=job.max_attempts, locked_until=timezone.now() - timedelta(seconds=1),
+        )
+        self.assertEqual(execute(claim("worker"), "worker"), Job.FAILED)
+        self.assertEqual(CALLS, [])
+        job.refresh_from_db()
+        self.assertIn("Visibility timeout", job.error)
+
+    def test_lease_extended_while_running(self):
+        """Долгая задача продлевает аренду (heartbeat): её не заберёт другой воркер, пока она выполняется."""
+        job = enqueue("tests.slow")
+        claimed = claim("worker")
+        self.assertTrue(extend_lease(claimed, "worker"))
+        self.assertFalse(extend_lease(claimed, "other"))  # продлевает только тот, за кем задача
+
+        with patch("jobs.queue.extend_lease", return_value=True) as extend:
+            self.assertEqual(execute(claimed, "worker"), Job.SUCCEEDED)
+        self.assertGreaterEqual(extend.call_count, 1)  # timeout=1 — продление каждые 1/3 секунды
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.SUCCEEDED)
+
+    @override_settings(JOBS_POLL_INTERVAL=0.01)
+    def test_worker_survives_database_errors(self):
+        """"database is locked" при захвате задачи не завершает воркер: пауза и новая попытка."""
+        enqueue("tests.echo", {"n": 1})
+        errors = [OperationalError("database is locked")] * 2
+        real_claim = claim
+
+        def flaky_claim(worker):
+            if errors:
+                raise errors.pop()
+            return real_claim(worker)
+
+        with patch("jobs.queue.claim", side_effect=flaky_claim), self.assertLogs("jobs.queue", "ERROR"):
+            self.assertEqual(work("test", Event(), burst=True), 1)
+        self.assertEqual(CALLS, [{"n": 1}])
+
+    @override_settings(JOBS_POLL_INTERVAL=0.01)
+    def test_housekeeping_runs_under_load(self):
+        """Уборка идёт по времени, а не только в простое: очередь ещё не пуста, а housekeeping уже разослан."""
+        enqueue("tests.echo", {"n": 1})
+        stop = Event()
+        queued = []
+
+        def receiver(sender, **kwargs):
+            queued.append(Job.objects.filter(task="tests.echo", status=Job.QUEUED).count())
+            stop.set()  # после уборки воркер доделывает текущий проход и выходит
+            raise RuntimeError("broken receiver")  # ошибка обработчика не останавливает воркер
+
+        housekeeping.connect(receiver, weak=False, dispatch_uid="test")
+        self.addCleanup(housekeeping.disconnect, dispatch_uid="test")
+        with self.assertLogs("jobs.queue", "ERROR"):
+            self.assertEqual(work("test", stop), 1)
+        self.assertEqual(queued, [1])
+
+    @override_settings(JOBS_EAGER=True)
+    def test_eager(self):
+        job = enqueue("tests.echo", {"n": 1})
+        self.assertEqual((job.status, job.result), (Job.SUCCEEDED, {"echo": {"n": 1}}))
+
+    def test_run_workers_command(self):
+        enqueue("tests.echo")
+        out = io.StringIO()
+        call_command("run_workers", workers=1, burst=True, stdout=out)
+        self.assertIn("Processed 1 jobs", out.getvalue())
+
+
+@override_settings(JOBS_EAGER=False)
+class JobStatusAPITestCase(TestCase):
+    """Статус задачи видят её автор и сотрудники."""
+
+    def setUp(self):
+        self.owner = User.objects.create_user(username="owner", password="password")
+        self.job = enqueue("tests.echo", {"secret": "path"}, user=self.owner)
+        with translation.override("en"):
+            self.url = reverse("jobs:job-detail", kwargs={"pk": self.job.pk})
+
+    def test_owner_polls_status(self):
+        self.client.force_login(self.owner)
+        data = self.client.get(self.url).json()
+        self.assertEqual((data["pk"], data["status"]), (self.job.pk, Job.QUEUED))
+        self.assertNotIn("payload", data)
+
+        work("test", Event(), burst=True)
+        data = self.client.get(self.url).json()
+        self.assertEqual((data["status"], data["result"]), (Job.SUCCEEDED, {"echo": {"secret": "path"}}))
+
+    def test_access(self):
+        self.assertIn(self.client.get(self.url).status_code, (401, 403))
+        self.client.force_login(User.objects.create_user(username="other", password="password"))
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+        self.client.force_login(User.objects.create_user(username="staff", password="password", is_staff=True))
+        self.assertEqual(self.client.get(self.url).status_code, 200)
@@ -0,0 +1,10 @@
+from rest_framework.routers import SimpleRouter  # Роутер для ViewSet (без корневой страницы API)
+
+from .views import JobViewSet
+
+app_name = "jobs"  # Имя приложения для namespace в URL
+
+routers = SimpleRouter()
+routers.register("api", JobViewSet, basename="job")  # Статус задач: /api/ и /api/<id>/
+
+urlpatterns = routers.urls
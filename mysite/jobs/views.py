@@ -0,0 +1,27 @@
+from drf_spectacular.utils import extend_schema
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.viewsets import ReadOnlyModelViewSet
+
+from .models import Job
+from .serializers import JobSerializer
+
+
+@extend_schema(tags=["jobs"])
+class JobViewSet(ReadOnlyModelViewSet):
+    """
+    Статус фоновых задач: GET /<язык>/jobs/api/ — список, GET /<язык>/jobs/api/<id>/ — одна задача.
+
+    Пользователь видит задачи, которые поставил сам, сотрудники — все.
+    Клиент, получивший от представления 202 Accepted со ссылкой на задачу, опрашивает её,
+    пока status не станет succeeded или failed.
+    """
+    serializer_class = JobSerializer
+    permission_classes = [IsAuthenticated]
+    filterset_fields = ["status", "task"]
+    replica_actions = ()  # статус меняется каждую секунду — реплика его бы не успевала показать
+
+    def get_queryset(self):
+        queryset = Job.objects.all()
+        if not self.request.user.is_staff:
+            queryset = queryset.filter(created_by=self.request.user)
+        return queryset
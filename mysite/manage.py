@@ -3,10 +3,21 @@
 import os
 import sys
 
+# команды разработки: не отправляют ошибки в Sentry и не платят за его импорт при старте
+DEV_COMMANDS = {
+    'test', 'runserver', 'shell', 'dbshell', 'check', 'makemigrations', 'showmigrations', 'profile_startup',
+}
+
 
 def main():
     """Run administrative tasks."""
     os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mysite.settings')
+    # тесты, runserver и замеры (bench_*) — без Sentry; остальные команды работают на проде
+    # (run_workers, refresh_replica, sqlite_maintenance из cron) и, как воркеры gunicorn,
+    # отправляют ошибки в Sentry по умолчанию (settings.SENTRY_ENABLED)
+    command = sys.argv[1] if len(sys.argv) > 1 else ''
+    if command in DEV_COMMANDS or command.startswith('bench_'):
+        os.environ.setdefault('DJANGO_SENTRY', '0')
     try:
         from django.core.management import execute_from_command_line
     except ImportError as exc:
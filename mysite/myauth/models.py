@@ -25,4 +25,6 @@ class Profile(models.Model):
         blank=True, # blank=True → форма будет принимать пустое значение (не обязательна для заполнения)
         upload_to=profile_avatar_upload_to_path # upload_to=profile_avatar_upload_to_path → функция,
         # которая возвращает путь для сохранения файла
-    )
\ No newline at end of file
+    )
+    # уменьшенные копии аватара (WebP/JPEG нескольких ширин) — строит mysite.thumbnails после загрузки
+    avatar_variants = models.JSONField(default=dict, blank=True, editable=False)
@@ -0,0 +1,19 @@
+"""
+Сигналы приложения myauth и их обработчики.
+"""
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from jobs.queue import enqueue
+from mysite.thumbnails import needs_refresh
+
+from .models import Profile
+
+
+@receiver(post_save, sender=Profile)
+def build_avatar_variants(sender, instance: Profile, raw=False, update_fields=None, **kwargs):
+    """Загруженный аватар (AboutMeView, ProfileUpdateView, админка) — задача построить его уменьшенные копии."""
+    if raw or (update_fields is not None and "avatar" not in update_fields):
+        return
+    if needs_refresh(instance, "avatar"):
+        enqueue("thumbnails.refresh_variants", {"model": "myauth.profile", "pk": instance.pk, "field": "avatar"})
@@ -3,6 +3,7 @@ from django.test import Client  # Импорт тестового клиента
 import json  # Модуль для работы с JSON (чтобы декодировать ответ)
 from django.test import TestCase  # Базовый класс для тестов с БД
 from django.urls import reverse  # Позволяет получить URL по имени маршрута
+from django.contrib.auth.models import User
 
 class GetCookieView(TestCase):
     """
@@ -31,3 +32,19 @@ class FooBarViewTest(TestCase):
         # received_data = json.loads(response.content)  # Преобразуем тело ответа (JSON-строку) в Python-словарь
         # self.assertEqual(received_data, expected_data)  # Проверяем, что полученные данные совпадают с ожидаемыми
         self.assertJSONEqual(response.content, expected_data) # Проверка вернувшегося json ответа, аналогично 2 строкам выше
+
+
+class RegisterViewTest(TestCase):
+    """
+    Тест RegisterView —
+    регистрация создаёт пользователя с профилем и сразу логинит его
+    """
+    def test_register(self):
+        response = self.client.post(reverse('myauth:register'), {  # Регистрируемся через форму
+            "username": "new-user", "password1": "Very-long-pass-42", "password2": "Very-long-pass-42",
+        })
+        self.assertRedirects(response, reverse('myauth:about-my'), fetch_redirect_response=False)
+        user = User.objects.get(username="new-user")
+        self.assertTrue(user.check_password("Very-long-pass-42"))  # Пароль захеширован до сохранения
+        self.assertTrue(hasattr(user, "profile"))  # Профиль создан в той же транзакции
+        self.assertEqual(int(self.client.session["_auth_user_id"]), user.pk)  # Пользователь залогинен
@@ -31,6 +31,7 @@ from django.utils.translation import gettext_lazy as _  # ленивый пер
 from django.utils.translation import ngettext # множественные формы
 
 
+from mysite.sqlite import serialized_writes  # запись в БД через очередь записи SQLite
 from .models import Profile  # Импортируем модель профиля пользователя (расширение стандартного User)
 from .forms import ProfileForm
 
@@ -72,22 +73,16 @@ class RegisterView(CreateView):
 
     def form_valid(self, form):
         # Этот метод вызывается, если форма прошла валидацию (все поля корректны)
-        response = super().form_valid(form)
-        # Вызываем родительский form_valid:
-        # 1) сохраняет объект пользователя в базу (self.object = form.save())
-        # 2) возвращает редирект на success_url
-        Profile.objects.create(user=self.object)  # После регистрации создаем профиль текущему пользователю
-        username = form.cleaned_data.get('username')
-        # Из формы получаем валидированный username, который ввёл пользователь
-        password = form.cleaned_data.get('password2')
-        # Из формы получаем второй пароль (подтверждение), потому что UserCreationForm использует password2 для проверки
-        user = authenticate(  # Получаем обьект User если успех иначе None
-            self.request,  # Передаём объект запроса, чтобы Django мог работать с сессией и бекэндом аутентификации
-            username=username,  # Имя пользователя, введённое и валидированное из формы
-            password=password  # пароль пользователя, введённый и проверенный в форме
-        )
-        login(request=self.request, user=user)  # Логиним пользователя в текущую сессию
-        return response
+        user = form.save(commit=False)
+        # Хешируем пароль (set_password внутри save(commit=False)) до очереди записи:
+        # хеширование — самая долгая часть регистрации, держать на нём блокировку записи SQLite незачем
+        with serialized_writes():  # создание пользователя, профиля и сессии — одна транзакция в очереди записи
+            user.save()
+            Profile.objects.create(user=user)  # После регистрации создаем профиль текущему пользователю
+            login(request=self.request, user=user)  # Логиним пользователя в текущую сессию
+            # authenticate() не нужен: пароль только что задан формой, повторная проверка хеша — лишняя работа
+        self.object = user
+        return redirect(self.get_success_url())
 
 
 class AboutMeView(FormView):
@@ -123,7 +118,7 @@ class ProfileUpdateView(UserPassesTestMixin, UpdateView):
     класс представление для редактирования профиля
     """
     form_class = ProfileForm
-    model = Profile
+    queryset = Profile.objects.select_related("user")  # test_func и get_success_url обращаются к profile.user
     template_name = 'myauth/profile-update.html'
     context_object_name = "profile"
 
@@ -143,7 +138,7 @@ class UserDetailView(DetailView):
     Класс-представление для страницы деталей юзера
     """
     template_name = 'myauth/user-detail.html'
-    model = User
+    queryset = User.objects.select_related("profile")  # шаблон показывает аватар и bio из профиля
     context_object_name = "user"
 
 
@@ -152,7 +147,7 @@ class UsersListView(ListView):
     клас представление для вывода списка пользователей
     """
     template_name = "myauth/users-list.html"  # путь к шаблону, который будет рендериться
-    model = User  # модель, из которой берём данные (все пользователи)
+    queryset = User.objects.select_related("profile")  # все пользователи вместе с профилем (аватар в шаблоне), без запроса на каждого
     context_object_name = 'users'  # имя переменной в шаблоне (будет доступна как users)
 
 
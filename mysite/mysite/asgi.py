@@ -5,6 +5,11 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
+
+Запуск в контейнере — gunicorn с воркерами uvicorn (см. Dockerfile):
+    gunicorn mysite.asgi:application --worker-class uvicorn_worker.UvicornWorker --bind 0.0.0.0:8000
+Синхронные представления Django выполняет в пуле потоков, async-представления — прямо в event loop.
+WSGI-вход (mysite.wsgi) остаётся для runserver и сравнения: python manage.py bench_asgi.
 """
 
 import os
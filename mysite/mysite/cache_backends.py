@@ -0,0 +1,251 @@
+"""
+Двухуровневый кеш: LRU в памяти процесса перед файловым кешем Django.
+
+Каждый cache.get у FileBasedCache — это открытие файла, чтение, zlib и unpickle,
+а очистка (cull) перечисляет весь каталог кеша. TwoTierFileBasedCache держит
+в памяти воркера ограниченный LRU последних значений и обращается к диску только при промахе.
+
+Подключение в settings.CACHES:
+    "BACKEND": "mysite.cache_backends.TwoTierFileBasedCache",
+    "LOCATION": "/var/tmp/django_cache",
+    "OPTIONS": {
+        "LOCAL_MAX_ENTRIES": 1000,       # максимум записей в памяти воркера
+        "LOCAL_MAX_BYTES": 16 * 2**20,   # максимум байт (по размеру pickle) в памяти воркера
+        "LOCAL_TIMEOUT": 5,              # сколько секунд копия в памяти считается свежей
+        "SHARD_DEPTH": 2,                # файлы раскладываются по подкаталогам ab/cd/...
+        "LOCAL_SKIP_PREFIXES": ["generation:"],  # ключи, которые всегда читаются и пишутся только на диске
+    }
+
+LOCAL_TIMEOUT ограничивает расхождение между воркерами: запись, сделанная в другом
+процессе gunicorn, станет видна не позже чем через LOCAL_TIMEOUT секунд.
+Для счётчиков поколений (shopapp.cache_versioning) такое расхождение недопустимо: воркер
+увеличил бы устаревшее значение или закешировал страницы под уже сменённым поколением —
+такие ключи (LOCAL_SKIP_PREFIXES) в память не попадают.
+"""
+import os
+import pickle
+import random
+import tempfile
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from hashlib import md5
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.files.move import file_move_safe
+from django.utils._os import safe_makedirs
+
+
+class LocalTier:
+    """
+    LRU-хранилище в памяти процесса.
+
+    Хранит значения в виде pickle-байт (как LocMemCache): вызывающий код получает
+    свою копию объекта и не может случайно изменить закешированное значение.
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries: OrderedDict[str, tuple[float | None, bytes]] = OrderedDict()
+        self.size = 0  # суммарный размер хранимых pickle-байт
+        self.lock = threading.Lock()
+        self.hits = self.misses = self.evictions = 0
+
+    def get(self, fname: str) -> bytes | None:
+        with self.lock:
+            entry = self.entries.get(fname)
+            if entry is not None:
+                expires_at, pickled = entry
+                if expires_at is None or expires_at > time.time():
+                    self.entries.move_to_end(fname)  # самый свежий по использованию — в конец
+                    self.hits += 1
+                    return pickled
+                self._pop(fname)  # истёк TTL — удаляем
+            self.misses += 1
+            return None
+
+    def set(self, fname: str, pickled: bytes, expires_at: float | None) -> None:
+        if len(pickled) > self.max_bytes:
+            self.delete(fname)  # слишком большое значение в память не кладём
+            return
+        with self.lock:
+            self._pop(fname)
+            self.entries[fname] = (expires_at, pickled)
+            self.size += len(pickled)
+            # вытеснение по количеству и по размеру, начиная с давно не использованных
+            while len(self.entries) > self.max_entries or self.size > self.max_bytes:
+                self._pop(next(iter(self.entries)))
+                self.evictions += 1
+
+    def delete(self, fname: str) -> None:
+        with self.lock:
+            self._pop(fname)
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+    def _pop(self, fname: str) -> None:
+        entry = self.entries.pop(fname, None)
+        if entry is not None:
+            self.size -= len(entry[1])
+
+
+_local_tiers: dict[str, LocalTier] = {}  # одно LRU на LOCATION на процесс (Django создаёт backend на поток)
+_local_tiers_lock = threading.Lock()
+
+
+class TwoTierFileBasedCache(FileBasedCache):
+    """
+    FileBasedCache с LRU-уровнем в памяти воркера и (опционально) шардированием файлов.
+
+    При SHARD_DEPTH > 0 файлы лежат в подкаталогах по первым байтам md5 ключа,
+    а очистка при переполнении (cull) просматривает только подкаталог записываемого ключа,
+    с лимитом MAX_ENTRIES / число_подкаталогов.
+    """
+
+    def __init__(self, dir, params):
+        super().__init__(dir, params)
+        options = params.get("OPTIONS", {})
+        self._local_timeout = options.get("LOCAL_TIMEOUT", 5)
+        self._shard_depth = int(options.get("SHARD_DEPTH", 0))
+        self._local_skip_prefixes = tuple(options.get("LOCAL_SKIP_PREFIXES", ()))
+        with _local_tiers_lock:
+            self._local = _local_tiers.setdefault(
+                self._dir,
+                LocalTier(
+                    max_entries=int(options.get("LOCAL_MAX_ENTRIES", 1000)),
+                    max_bytes=int(options.get("LOCAL_MAX_BYTES", 16 * 2**20)),
+                ),
+            )
+
+    def stats(self) -> dict:
+        """Счётчики LRU-уровня текущего процесса: попадания, промахи, вытеснения, размер."""
+        local = self._local
+        return {
+            "hits": local.hits,
+            "misses": local.misses,
+            "evictions": local.evictions,
+            "entries": len(local.entries),
+            "bytes": local.size,
+        }
+
+    def _local_expiry(self, file_expiry: float | None) -> float:
+        # копия в памяти живёт не дольше записи на диске и не дольше LOCAL_TIMEOUT
+        local_expiry = time.time() + self._local_timeout
+        return local_expiry if file_expiry is None else min(file_expiry, local_expiry)
+
+    def _uses_local(self, key) -> bool:
+        """Ключ можно держать в памяти воркера (не из LOCAL_SKIP_PREFIXES)."""
+        return not str(key).startswith(self._local_skip_prefixes)
+
+    def get(self, key, default=None, version=None):
+        fname = self._key_to_file(key, version)
+        local = self._uses_local(key)
+        pickled = self._local.get(fname) if local else None
+        if pickled is not None:
+            return pickle.loads(pickled)
+        try:
+            with open(fname, "rb") as f:
+                try:
+                    expiry = pickle.load(f)
+                except EOFError:
+                    expiry = 0  # пустой файл считаем истёкшим
+                if expiry is not None and expiry < time.time():
+                    f.close()
+                    self._delete(fname)
+                    return default
+                pickled = zlib.decompress(f.read())
+        except FileNotFoundError:
+            return default
+        if local:
+            self._local.set(fname, pickled, self._local_expiry(expiry))
+        return pickle.loads(pickled)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        fname = self._key_to_file(key, version)
+        directory = os.path.dirname(fname)
+        safe_makedirs(directory, mode=0o700, exist_ok=True)  # каталог кеша могли удалить
+        self._cull_directory(directory)
+        expiry = self.get_backend_timeout(timeout)
+        pickled = pickle.dumps(value, self.pickle_protocol)  # сериализуем один раз для обоих уровней
+        fd, tmp_path = tempfile.mkstemp(dir=directory)
+        renamed = False
+        try:
+            with open(fd, "wb") as f:
+                f.write(pickle.dumps(expiry, self.pickle_protocol))
+                f.write(zlib.compress(pickled))
+            file_move_safe(tmp_path, fname, allow_overwrite=True)
+            renamed = True
+        finally:
+            if not renamed:
+                os.remove(tmp_path)
+        if self._uses_local(key):
+            self._local.set(fname, pickled, self._local_expiry(expiry))
+
+    def has_key(self, key, version=None):
+        if self._uses_local(key) and self._local.get(self._key_to_file(key, version)) is not None:
+            return True
+        return super().has_key(key, version)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        self._local.delete(self._key_to_file(key, version))  # новый TTL знает только файл
+        return super().touch(key, timeout, version)
+
+    def delete(self, key, version=None):
+        fname = self._key_to_file(key, version)
+        self._local.delete(fname)
+        return self._delete(fname)
+
+    def clear(self):
+        self._local.clear()
+        super().clear()
+
+    def _key_to_file(self, key, version=None):
+        """Путь к файлу ключа: при SHARD_DEPTH=2 — <dir>/ab/cd/abcd....djcache."""
+        key = self.make_and_validate_key(key, version=version)
+        digest = md5(key.encode(), usedforsecurity=False).hexdigest()
+        shards = [digest[i * 2:i * 2 + 2] for i in range(self._shard_depth)]
+        return os.path.join(self._dir, *shards, digest + self.cache_suffix)
+
+    def _list_cache_files(self):
+        if not self._shard_depth:
+            return super()._list_cache_files()
+        return [
+            os.path.join(root, fname)
+            for root, _, files in os.walk(self._dir)
+            for fname in files
+            if fname.endswith(self.cache_suffix)
+        ]
+
+    def _cull(self):
+        # Стандартный _cull (перечисление всего каталога) при шардировании не используется
+        if not self._shard_depth:
+            super()._cull()
+
+    def _cull_directory(self, directory: str):
+        """Освобождает место в одном подкаталоге, не перечисляя весь кеш."""
+        if not self._shard_depth:
+            return super()._cull()
+        max_entries = max(1, self._max_entries // 256 ** self._shard_depth)
+        try:
+            filelist = [
+                os.path.join(directory, fname)
+                for fname in os.listdir(directory)
+                if fname.endswith(self.cache_suffix)
+            ]
+        except FileNotFoundError:
+            return
+        if len(filelist) < max_entries:
+            return
+        if self._cull_frequency == 0:
+            doomed = filelist
+        else:
+            doomed = random.sample(filelist, max(1, len(filelist) // self._cull_frequency))
+        for fname in doomed:
+            self._local.delete(fname)
+            self._delete(fname)
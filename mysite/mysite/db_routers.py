@@ -0,0 +1,175 @@
+"""
+Чтение из реплики SQLite для представлений, которые только читают.
+
+Все запросы (списки товаров, ленты, карта сайта, выгрузки, списки API) читали тот же файл db.sqlite3,
+в который пишут оформления заказов. Реплика — второй файл SQLite, который команда refresh_replica
+обновляет через online backup API; чтения идут в неё и не делят с писателями основной файл.
+
+Подключение (settings):
+    DATABASES["replica"] = {...}              # появляется, если задан DJANGO_DB_REPLICA
+    DATABASE_REPLICA = "replica"               # псевдоним реплики или None — тогда всё идёт в default
+    DATABASE_ROUTERS = ["mysite.db_routers.ReplicaRouter"]
+    MIDDLEWARE += ["mysite.db_routers.ReplicaRoutingMiddleware"]
+
+Какие запросы читают из реплики (решает ReplicaRoutingMiddleware, только GET и HEAD):
+    - представление помечено replica_reads = True (атрибут класса или функции, декоратор replica_reads);
+    - ViewSet DRF: действия из replica_actions класса, по умолчанию list и retrieve;
+    - иначе — ListView и DetailView Django (кроме представлений с формами).
+replica_reads = False явно оставляет представление на основной БД.
+
+Ответы, которые кешируются по поколениям данных (shopapp.cache_versioning), читают только из default:
+реплика отстаёт до интервала refresh_replica, и после записи (нового поколения) запрос другого
+пользователя закешировал бы из неё старые данные под новым поколением на весь TTL — "липкий" cookie
+защищает только браузер того, кто записал. generation_tag переключает такой запрос на default (use_primary).
+
+"Липкий" основной файл: если запрос что-то записал (вызывался db_for_write), браузер получает cookie
+на DATABASE_REPLICA_STICKY_SECONDS секунд, и в это время все его запросы читают из default —
+пользователь сразу видит свой заказ или товар, даже если реплика ещё не обновилась.
+"""
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.views.generic.detail import BaseDetailView
+from django.views.generic.edit import FormMixin
+from django.views.generic.list import BaseListView
+
+STICKY_COOKIE = "db_primary_until"  # время (unix), до которого запросы браузера читают из default
+REPLICA_ACTIONS = ("list", "retrieve")  # действия ViewSet, которые по умолчанию читают из реплики
+
+
+@dataclass
+class RoutingState:
+    """Состояние маршрутизации текущего запроса."""
+    use_replica: bool = False  # чтения запроса идут в реплику
+    wrote: bool = False  # запрос что-то записал — включить "липкий" default
+
+
+# Не сбрасывается в конце запроса: StreamingHttpResponse (выгрузки) читает из БД уже после
+# возврата из middleware. Следующий запрос потока (или задача ASGI) начинает с нового состояния.
+_routing_state: ContextVar[RoutingState | None] = ContextVar("db_routing_state", default=None)
+
+
+def replica_reads(view):
+    """Декоратор для функций-представлений (в т.ч. чужих, как sitemap): читать из реплики."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        return view(*args, **kwargs)
+
+    wrapper.replica_reads = True
+    return wrapper
+
+
+def use_primary() -> None:
+    """Дальнейшие чтения текущего запроса — из default (ответ будет закеширован по поколению данных)."""
+    state = _routing_state.get()
+    if state is not None:
+        state.use_replica = False
+
+
+def reads_from_replica(request, view_func) -> bool:
+    """Может ли запрос к view_func читать из реплики (без учёта "липкого" cookie)."""
+    if request.method not in ("GET", "HEAD"):
+        return False
+    view_class = getattr(view_func, "view_class", None) or getattr(view_func, "cls", None)
+    marker = getattr(view_func, "replica_reads", None)  # функция или экземпляр Feed
+    if marker is None and view_class is not None:
+        marker = getattr(view_class, "replica_reads", None)
+    if marker is not None:
+        return bool(marker)
+    actions = getattr(view_func, "actions", None)  # ViewSet DRF: {"get": "list", ...}
+    if actions is not None:
+        action = actions.get("get" if request.method == "HEAD" else request.method.lower())
+        return action in getattr(view_class, "replica_actions", REPLICA_ACTIONS)
+    return (
+        view_class is not None
+        and issubclass(view_class, (BaseListView, BaseDetailView))
+        and not issubclass(view_class, FormMixin)  # DeleteView: страница подтверждения перед записью
+    )
+
+
+class ReplicaRouter:
+    """
+    Роутер: чтения — в реплику, если её разрешил ReplicaRoutingMiddleware; запись — всегда в default.
+
+    Вне запроса (команды, shell, тесты без middleware) и внутри транзакции на default
+    всё идёт в default: транзакция должна видеть собственные записи.
+    """
+
+    def db_for_read(self, model, **hints):
+        state = _routing_state.get()
+        if (
+            state is None or not state.use_replica or not settings.DATABASE_REPLICA
+            or model._meta.app_label == "sessions"  # сессия только что созданного входа ещё не в реплике
+            or connections[DEFAULT_DB_ALIAS].in_atomic_block
+        ):
+            return None
+        return settings.DATABASE_REPLICA
+
+    def db_for_write(self, model, **hints):
+        state = _routing_state.get()
+        if state is not None:
+            state.wrote = True
+        # явно default: иначе Django пишет в БД, из которой объект был прочитан, то есть в реплику
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True  # реплика — копия default, объекты из обеих БД можно связывать
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # схему реплика получает вместе с данными из refresh_replica
+        return db != settings.DATABASE_REPLICA
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Включает чтение из реплики для подходящих представлений и ставит "липкий" cookie после записи.
+
+    Работает и в синхронном, и в асинхронном стеке (ASGI): лишний переход между потоком
+    и event loop на каждый запрос не нужен.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        state = RoutingState()
+        _routing_state.set(state)
+        return self.set_sticky_cookie(state, self.get_response(request))
+
+    async def __acall__(self, request):
+        state = RoutingState()
+        _routing_state.set(state)
+        return self.set_sticky_cookie(state, await self.get_response(request))
+
+    @staticmethod
+    def set_sticky_cookie(state: RoutingState, response):
+        if state.wrote and settings.DATABASE_REPLICA:
+            seconds = settings.DATABASE_REPLICA_STICKY_SECONDS
+            response.set_cookie(
+                STICKY_COOKIE, str(int(time.time() + seconds)), max_age=seconds, httponly=True, samesite="Lax",
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        state = _routing_state.get()
+        if state is not None and settings.DATABASE_REPLICA and not self.is_sticky(request):
+            state.use_replica = reads_from_replica(request, view_func)
+
+    @staticmethod
+    def is_sticky(request) -> bool:
+        try:
+            return int(request.COOKIES.get(STICKY_COOKIE, 0)) > time.time()
+        except ValueError:
+            return False
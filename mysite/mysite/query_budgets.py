@@ -0,0 +1,176 @@
+"""
+Бюджеты SQL-запросов для страниц проекта.
+
+Каждому именованному маршруту из shopapp.urls, myauth.urls, blogapp.urls и new_blogapp_rss.urls
+сопоставлен максимум запросов, которые страница может выполнить при GET от сотрудника.
+Бюджет один и тот же для N=1 и N=100 строк в каждой таблице: число запросов не должно расти
+вместе с данными (рост означает N+1 — запрос на каждый объект в цикле шаблона или сериализатора).
+
+Проверка — QueryBudgetTestCase в shopapp/tests.py: seed_budget_data(n) создаёт по n объектов
+каждого вида, затем каждая страница запрашивается при n=1 и n=100.
+Новый маршрут в этих приложениях без записи в QUERY_BUDGETS роняет тест — бюджет нужно объявить.
+"""
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+from django.contrib.auth.models import Group, Permission, User
+
+from blogapp.models import Article as BlogArticle, Author, Category, Tag
+from myauth.models import Profile
+from new_blogapp_rss.models import Article
+from shopapp.models import DailyProductSales, MonthlyProductSales, Order, Product
+
+BUDGET_NAMESPACES = ("shopapp", "myauth", "blogapp", "new_blogapp_rss")  # приложения под контролем бюджетов
+BUDGET_SIZES = (1, 100)  # сколько строк каждого вида создаётся при замерах
+
+
+@dataclass(frozen=True)
+class QueryBudget:
+    """
+    Бюджет одного маршрута.
+
+    max_queries — максимум запросов за один GET (включая сессию и пользователя запроса);
+    kwargs — параметры маршрута: имя параметра -> ключ объекта из seed_budget_data ("product", "order", ...);
+    skip — причина, по которой маршрут не замеряется (пустая строка — замеряется).
+    """
+    max_queries: int
+    kwargs: dict[str, str] = field(default_factory=dict)
+    skip: str = ""
+
+
+QUERY_BUDGETS: dict[str, QueryBudget] = {
+    # shopapp
+    "shopapp:shop_index": QueryBudget(0),
+    "shopapp:store_services": QueryBudget(0, skip="шаблон использует фильтр length_is, удалённый в Django 5.1"),
+    "shopapp:group_list": QueryBudget(2),
+    "shopapp:products_list": QueryBudget(4),  # + COUNT пагинатора
+    "shopapp:product-feed": QueryBudget(1),
+    "shopapp:product_create": QueryBudget(2),
+    "shopapp:products_details": QueryBudget(2, {"pk": "product"}),
+    "shopapp:product_update": QueryBudget(4, {"pk": "product"}),
+    "shopapp:product_delete": QueryBudget(1, {"pk": "product"}),
+    "shopapp:products-export": QueryBudget(1),
+    "shopapp:order_list": QueryBudget(4),
+    "shopapp:order_create": QueryBudget(2),
+    "shopapp:order_details": QueryBudget(4, {"pk": "order"}),
+    "shopapp:order_update": QueryBudget(4, {"pk": "order"}),
+    "shopapp:order_delete": QueryBudget(1, {"pk": "order"}),
+    "shopapp:orders-export": QueryBudget(4),
+    "shopapp:user_orders": QueryBudget(5, {"user_id": "user"}),
+    "shopapp:users_orders_export": QueryBudget(2, {"user_id": "user"}),
+    "shopapp:api-root": QueryBudget(2),
+    "shopapp:product-list": QueryBudget(4),
+    "shopapp:product-detail": QueryBudget(3, {"pk": "product"}),
+    "shopapp:product-download-csv": QueryBudget(3),
+    "shopapp:product-upload-csv": QueryBudget(0, skip="только POST (загрузка файла)"),
+    "shopapp:export-list": QueryBudget(4),
+    "shopapp:export-detail": QueryBudget(0, skip="выгрузки создают фоновые задачи, seed_budget_data их не создаёт"),
+    "shopapp:export-download": QueryBudget(0, skip="отдаёт файл готовой выгрузки (ExportJobsTestCase)"),
+    "shopapp:order-list": QueryBudget(5),
+    "shopapp:order-detail": QueryBudget(4, {"pk": "order"}),
+    "shopapp:dailyproductsales-list": QueryBudget(4),
+    "shopapp:dailyproductsales-detail": QueryBudget(3, {"pk": "daily_sales"}),
+    "shopapp:monthlyproductsales-list": QueryBudget(4),
+    "shopapp:monthlyproductsales-detail": QueryBudget(3, {"pk": "monthly_sales"}),
+    # myauth
+    "myauth:login": QueryBudget(2),
+    "myauth:register": QueryBudget(0),
+    "myauth:logout": QueryBudget(4),
+    "myauth:about-my": QueryBudget(3),
+    "myauth:users-page": QueryBudget(1),
+    "myauth:user-detail": QueryBudget(3, {"pk": "user"}),
+    "myauth:profile-update": QueryBudget(4, {"pk": "profile"}),
+    "myauth:cookie-get": QueryBudget(0),
+    "myauth:cookie-set": QueryBudget(2),
+    "myauth:session-set": QueryBudget(5),
+    "myauth:session-get": QueryBudget(2),
+    "myauth:foo-bar": QueryBudget(0),
+    "myauth:hello": QueryBudget(0),
+    # blogapp
+    "blogapp:articles": QueryBudget(2),
+    # new_blogapp_rss
+    "new_blogapp_rss:articles": QueryBudget(1),
+    "new_blogapp_rss:article": QueryBudget(1, {"pk": "article"}),
+    "new_blogapp_rss:articles-feed": QueryBudget(1),
+}
+
+
+def seed_budget_data(n: int, fake=None) -> dict:
+    """
+    Создаёт по n объектов каждого вида и возвращает словарь объектов для параметров маршрутов.
+
+    Заказы содержат по два товара, статьи блога — по два тега, у каждого пользователя есть профиль:
+    любая связь, которую шаблон или сериализатор обходит в цикле, при n=100 даст 100 лишних запросов.
+    fake — экземпляр Faker (бенчмарк bench_shop): правдоподобные имена и тексты вместо "Product 0".
+    Без него данные детерминированы и коротки — для тестов этого достаточно.
+    """
+    def text(kind: str, i: int) -> str:
+        if fake is None:
+            return f"{kind} {i}"
+        generate = {
+            "First": fake.first_name,
+            "Last": fake.last_name,
+            "Product": fake.catch_phrase,
+            "Street": fake.address,
+            "Article": fake.sentence,
+            "Text": fake.paragraph,
+        }[kind]
+        return generate()[:100]  # самое короткое ограничение длины среди заполняемых полей
+
+    staff = User.objects.create_superuser(username="budget-staff", password="qwerty")
+    users = User.objects.bulk_create(
+        User(username=f"budget-user-{i}", first_name=text("First", i), last_name=text("Last", i)) for i in range(n)
+    )
+    profiles = Profile.objects.bulk_create([Profile(user=staff), *(Profile(user=user) for user in users)])
+
+    products = Product.objects.bulk_create(
+        Product(name=text("Product", i), price=Decimal(10 + i), created_by=users[i]) for i in range(n)
+    )
+    orders = Order.objects.bulk_create(
+        Order(user=users[i], delivery_address=text("Street", i), promocode="SALE") for i in range(n)
+    )
+    Order.products.through.objects.bulk_create(
+        Order.products.through(order_id=order.pk, product_id=product.pk)
+        for i, order in enumerate(orders)
+        for product in {products[i], products[(i + 1) % n]}
+    )
+    daily_sales = DailyProductSales.objects.bulk_create(
+        DailyProductSales(product=product, day=date(2026, 1, 1), orders_count=1, revenue=product.price)
+        for product in products
+    )
+    monthly_sales = MonthlyProductSales.objects.bulk_create(
+        MonthlyProductSales(product=product, month=date(2026, 1, 1), orders_count=1, revenue=product.price)
+        for product in products
+    )
+
+    group = Group.objects.create(name="budget-group")
+    group.permissions.set(Permission.objects.filter(content_type__app_label="shopapp")[:n])
+
+    author = Author.objects.create(name="Author", bio="Bio")
+    category = Category.objects.create(name="Category")
+    tags = Tag.objects.bulk_create(Tag(name=f"Tag {i}") for i in range(2))
+    blog_articles = BlogArticle.objects.bulk_create(
+        BlogArticle(title=text("Article", i), content=text("Text", i),
+                    pub_date=datetime(2026, 1, 1, tzinfo=dt_timezone.utc), author=author, category=category)
+        for i in range(n)
+    )
+    BlogArticle.tags.through.objects.bulk_create(
+        BlogArticle.tags.through(article_id=article.pk, tag_id=tag.pk) for article in blog_articles for tag in tags
+    )
+    articles = Article.objects.bulk_create(
+        Article(title=text("Article", i), body=text("Text", i),
+                published_at=datetime(2026, 1, 1, tzinfo=dt_timezone.utc) + timedelta(hours=i))
+        for i in range(n)
+    )
+
+    return {
+        "staff": staff,
+        "user": users[0],
+        "profile": profiles[1],
+        "product": products[0],
+        "order": orders[0],
+        "daily_sales": daily_sales[0],
+        "monthly_sales": monthly_sales[0],
+        "article": articles[0],
+    }
@@ -0,0 +1,21 @@
+"""
+Сессии в БД, запись которых идёт через общую очередь записи SQLite (mysite.sqlite.write_lock).
+
+Сессия сохраняется почти на каждом запросе залогиненного пользователя (вход, продление, messages),
+поэтому под нагрузкой это самый частый писатель. Транзакцию save() открывает сам,
+поэтому здесь берётся только блокировка. Подключение: SESSION_ENGINE = "mysite.sessions".
+"""
+from django.contrib.sessions.backends.db import SessionStore as DatabaseSessionStore
+from django.db import router
+
+from .sqlite import write_lock
+
+
+class SessionStore(DatabaseSessionStore):
+    def save(self, must_create=False):
+        with write_lock(using=router.db_for_write(self.model)):
+            return super().save(must_create)
+
+    def delete(self, session_key=None):
+        with write_lock(using=router.db_for_write(self.model)):
+            return super().delete(session_key)
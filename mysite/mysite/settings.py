@@ -22,17 +22,6 @@ from rest_framework.reverse import reverse_lazy
 
 from django.utils.translation import gettext_lazy as _
 
-import sentry_sdk
-
-
-
-sentry_sdk.init(
-    dsn="https://6bb6c8d5202cc5adb8a03dc95fe1a3bb@o4509162051534848.ingest.de.sentry.io/4510589292118097",
-    # Add data like request headers and IP for users,
-    # see https://docs.sentry.io/platforms/python/data-management/data-collected/ for more info
-    send_default_pii=True,
-)
-
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -66,7 +55,27 @@ INTERNAL_IPS = [
 
 ]
 
-if DEBUG:
+# Необязательные подсистемы: каждая импортируется и подключается, только если включён её флаг.
+# Сколько каждая стоит при старте воркера, команды или тестов — python manage.py profile_startup
+SENTRY_ENABLED = getenv("DJANGO_SENTRY", "1") == "1"  # manage.py выключает для тестов и runserver (см. manage.py)
+SENTRY_DSN = getenv(
+    "SENTRY_DSN",
+    "https://6bb6c8d5202cc5adb8a03dc95fe1a3bb@o4509162051534848.ingest.de.sentry.io/4510589292118097",
+)
+DEBUG_TOOLBAR = getenv("DJANGO_DEBUG_TOOLBAR", "1" if DEBUG else "0") == "1"  # по умолчанию — вместе с DEBUG
+API_DOCS = getenv("DJANGO_API_DOCS", "1") == "1"  # OpenAPI-схема, Swagger и ReDoc (drf-spectacular)
+
+if SENTRY_ENABLED and SENTRY_DSN:
+    import sentry_sdk  # вместе с интеграциями и транспортом — самый дорогой импорт при старте
+
+    sentry_sdk.init(
+        dsn=SENTRY_DSN,
+        # Add data like request headers and IP for users,
+        # see https://docs.sentry.io/platforms/python/data-management/data-collected/ for more info
+        send_default_pii=True,
+    )
+
+if DEBUG_TOOLBAR:  # адреса нужны только debug toolbar: без него не тратим время на разрешение имени хоста
     import socket   # импортируем модуль для работы с сетевыми именами и IP
     hostname, __, ips = socket.gethostbyname_ex(socket.gethostname())
     # получаем имя текущей машины (hostname) и список её IP-адресов (ips)
@@ -89,14 +98,11 @@ INSTALLED_APPS = [
     'rest_framework', # Django REST Framework — позволяет создавать API (эндпоинты, сериализация, JSON-ответы)
     'django_filters', # приложение для фильтрации данных в Django и DRF
 
-    'drf_spectacular', # Генерация OpenAPI-спецификации и документации для DRF (Swagger / Redoc)
-
-    'debug_toolbar',  # Профилирование и отладка прямо в браузере
-
     'shopapp.apps.ShopappConfig', # Приложение интернет-магазина
     'myauth.apps.MyauthConfig',   # Приложение для аутентификации
     'blogapp.apps.BlogappConfig',  # Приложение - Блог
     'new_blogapp_rss.apps.NewBlogappRssConfig', # приложение - новый блог rss https://ru.wikipedia.org/wiki/RSS
+    'jobs.apps.JobsConfig', # Фоновые задачи: очередь в БД, воркеры — команда run_workers
     'django.contrib.sitemaps', # приложение для генерации карты сайта
 
 ]
@@ -104,6 +110,7 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     # 'django.middleware.cache.UpdateCacheMiddleware', # Сохраняет готовый HTTP-ответ в кеш (per-site cache)-(пишет в кеш)
     'django.middleware.security.SecurityMiddleware', # Обеспечивает базовую безопасность (например, HTTPS и заголовки безопасности)
+    'mysite.db_routers.ReplicaRoutingMiddleware', # Чтение из реплики БД для читающих представлений (до сессий: их запись тоже учитывается)
     'django.contrib.sessions.middleware.SessionMiddleware', # Включает поддержку сессий для пользователей
     'django.middleware.locale.LocaleMiddleware', # Выбирает язык для пользователя по cookie, URL или браузеру
     'django.middleware.common.CommonMiddleware', # Общие вещи: редиректы с /, обработка ETag и прочее
@@ -112,10 +119,16 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware', # Поддержка flash-сообщений (django.contrib.messages)
     'django.middleware.clickjacking.XFrameOptionsMiddleware', # Защита от clickjacking (запрет встраивания в iframe)
     'django.contrib.admindocs.middleware.XViewMiddleware', # поддержка admindocs, добавляет X-View заголовок
-    'debug_toolbar.middleware.DebugToolbarMiddleware', # Middleware Debug Toolbar для профилирования и отладки
     # 'django.middleware.cache.FetchFromCacheMiddleware', # Пытается взять готовый HTTP-ответ из кеша до обработки запроса
 ]
 
+if API_DOCS:
+    INSTALLED_APPS.append('drf_spectacular')  # Генерация OpenAPI-спецификации и документации для DRF (Swagger / Redoc)
+
+if DEBUG_TOOLBAR:
+    INSTALLED_APPS.append('debug_toolbar')  # Профилирование и отладка прямо в браузере
+    MIDDLEWARE.append('debug_toolbar.middleware.DebugToolbarMiddleware')  # Middleware Debug Toolbar (последним)
+
 ROOT_URLCONF = 'mysite.urls'
 
 TEMPLATES = [
@@ -144,17 +157,74 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': DATABASE_DIR / 'db.sqlite3',
+        # постоянное соединение на воркер: PRAGMA (mysite.sqlite) и открытие файла — один раз, а не на запрос
+        'CONN_MAX_AGE': int(getenv("DJANGO_CONN_MAX_AGE", "600")),
+        'CONN_HEALTH_CHECKS': True,  # соединение проверяется перед повторным использованием в новом запросе
+        'OPTIONS': {
+            # пишущая транзакция сразу берёт блокировку записи (BEGIN IMMEDIATE): при DEFERRED
+            # транзакция, начавшая с чтения, не может дождаться блокировки и сразу падает с "database is locked"
+            'transaction_mode': 'IMMEDIATE',
+        },
     }
 }
 
+# Реплика для чтения: копия db.sqlite3, которую обновляет команда refresh_replica (mysite.db_routers).
+# Без DJANGO_DB_REPLICA реплики нет, все запросы идут в default.
+DATABASE_REPLICA = None
+if getenv("DJANGO_DB_REPLICA"):
+    DATABASE_REPLICA = "replica"
+    DATABASES[DATABASE_REPLICA] = {
+        **DATABASES["default"],
+        'NAME': Path(getenv("DJANGO_DB_REPLICA")),
+        # реплика только читает: query_only страхует от случайной записи, транзакции — обычные DEFERRED
+        'OPTIONS': {'init_command': 'PRAGMA query_only = ON'},
+        'TEST': {'MIRROR': 'default'},  # в тестах реплика — та же тестовая БД
+    }
+DATABASE_ROUTERS = ["mysite.db_routers.ReplicaRouter"]
+# сколько секунд после записи браузер читает из default (должно быть больше интервала refresh_replica)
+DATABASE_REPLICA_STICKY_SECONDS = int(getenv("DJANGO_DB_REPLICA_STICKY_SECONDS", "60"))
+
+# файл межпроцессной блокировки: пишущие пути (создание заказов и товаров, регистрация, сессии)
+# выполняются по очереди (mysite.sqlite.serialized_writes); пустое значение — без очереди
+SQLITE_WRITE_LOCK = getenv("DJANGO_SQLITE_WRITE_LOCK", str(DATABASE_DIR / "db.sqlite3.write-lock"))
+
+# Фоновые задачи (jobs.queue): очередь — таблица jobs_job в этой же БД, выполняют процессы run_workers
+JOBS_POLL_INTERVAL = float(getenv("DJANGO_JOBS_POLL_INTERVAL", "1"))  # пауза воркера при пустой очереди, секунд
+JOBS_RETRY_DELAY = 10  # пауза перед повтором задачи после ошибки, секунд (удваивается с каждой попыткой)
+JOBS_KEEP_DAYS = 7  # завершённые задачи хранятся столько дней
+# входные файлы задач (загруженные CSV и файлы заказов): не в MEDIA_ROOT, чтобы не раздавались по /media/
+JOBS_FILES_ROOT = getenv("DJANGO_JOBS_FILES_ROOT", str(DATABASE_DIR / "jobs"))
+# DJANGO_JOBS_EAGER=1 — задачи выполняются сразу при постановке, без run_workers (локальная разработка)
+JOBS_EAGER = getenv("DJANGO_JOBS_EAGER", "0") == "1"
+
+SESSION_ENGINE = "mysite.sessions"  # сессии в БД, сохранение через очередь записи SQLite
+
+SQLITE_PRAGMAS = {  # выполняются при каждом новом соединении (mysite.sqlite)
+    "journal_mode": "wal",  # читатели не блокируются писателем
+    "synchronous": "normal",  # в WAL-режиме fsync только при checkpoint, фиксация не теряет согласованность
+    "busy_timeout": 5000,  # мс ожидания занятой блокировки вместо немедленной ошибки
+    "cache_size": -64000,  # кеш страниц соединения, отрицательное значение — в КиБ (64 МБ)
+    "mmap_size": 256 * 1024 * 1024,  # чтение файла БД через mmap (256 МБ)
+    "temp_store": "memory",  # временные B-деревья сортировок и группировок — в памяти
+}
+
 
 CACHES = {  # Основная настройка системы кеширования Django
     "default": {  # Кеш по умолчанию, который будет использоваться Django
-        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
-        # Тип кеша: файловый (данные кеша хранятся в файлах)
+        "BACKEND": "mysite.cache_backends.TwoTierFileBasedCache",
+        # Тип кеша: файловый (данные кеша хранятся в файлах) + LRU в памяти каждого воркера перед ним
+        # Старый вариант без LRU: "django.core.cache.backends.filebased.FileBasedCache"
 
         "LOCATION": "/var/tmp/django_cache",
         # Путь к директории, где Django будет хранить файлы кеша
+        "OPTIONS": {
+            "MAX_ENTRIES": 50000,  # максимум файлов на диске (по ~195 на каждый из 256 подкаталогов)
+            "SHARD_DEPTH": 1,  # файлы раскладываются по 256 подкаталогам, очистка смотрит только один из них
+            "LOCAL_MAX_ENTRIES": 1000,  # максимум записей в памяти воркера
+            "LOCAL_MAX_BYTES": 16 * 1024 * 1024,  # максимум памяти воркера под кеш (16 МБ)
+            "LOCAL_TIMEOUT": 5,  # через сколько секунд воркер перечитает значение с диска (видит записи других воркеров)
+            "LOCAL_SKIP_PREFIXES": ["generation:"],  # поколения кеша (shopapp.cache_versioning) — всегда с диска
+        },
         # "BACKEND": "django.core.cache.backends.dummy.DummyCache", # Фековый кэш для отладки
     },
 }
@@ -225,6 +295,27 @@ MEDIA_URL = "/media/"
 # То есть полный путь на диске: /home/user/.../PythonProjectDjango/Files/uploads
 MEDIA_ROOT = BASE_DIR / 'uploads'
 
+# Миниатюры загруженных картинок (mysite/thumbnails.py): превью и изображения товаров, аватары.
+# Ширины вариантов в пикселях — под размеры на страницах (150) и экраны с плотностью 2x и 3x
+THUMBNAIL_WIDTHS = [150, 300, 600]
+# Форматы: WebP (в 1.5-2 раза меньше JPEG) и JPEG для браузеров без WebP — <picture> выбирает сам
+THUMBNAIL_FORMATS = ["webp", "jpeg"]
+THUMBNAIL_QUALITY = 80  # качество кодирования WebP/JPEG, 0-100
+THUMBNAIL_DIR = "derivatives"  # каталог вариантов внутри MEDIA_ROOT; варианты не редактируются — хеш в пути
+
+# Карта сайта из файлов (mysite.sitemap_files): строит команда build_sitemaps, отдаются без запросов к БД
+SITEMAP_ROOT = getenv("DJANGO_SITEMAP_ROOT", str(DATABASE_DIR / "sitemaps"))  # рядом с БД: том docker-compose
+# схема и домен адресов в карте; в продакшене обязателен (без него сборка падает), локально — runserver
+SITEMAP_BASE_URL = getenv("DJANGO_SITEMAP_BASE_URL", "http://127.0.0.1:8000" if DEBUG else "")
+SITEMAP_LANGUAGE = "en"  # префикс языка в адресах страниц под i18n_patterns (/en/shop/products/1/)
+SITEMAP_REBUILD_DELAY = 5 * 60  # через сколько секунд после изменения товаров пересобирать карту (правки копятся)
+
+# Выгрузки фоновыми задачами (shopapp.exports): файлы в MEDIA_ROOT/EXPORTS_DIR/<случайный каталог>/
+EXPORTS_DIR = "exports"
+EXPORTS_KEEP_HOURS = int(getenv("DJANGO_EXPORTS_KEEP_HOURS", "24"))  # сколько хранится готовый файл
+EXPORT_SHARDS = int(getenv("DJANGO_EXPORT_SHARDS", "4"))  # на сколько задач (процессов) делить большую выгрузку
+EXPORT_SHARD_MIN_ROWS = 20000  # меньше строк на часть не делим: задача и склейка стоят дороже
+
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
@@ -0,0 +1,250 @@
+"""
+Карта сайта из заранее построенных файлов.
+
+django.contrib.sitemaps.views.sitemap строил весь XML на каждый запрос краулера: все неархивные товары
+и все статьи — запросами к БД и рендерингом шаблона. Теперь файлы строит команда build_sitemaps,
+а /sitemap.xml и секции отдаются с диска без единого запроса к БД, с Last-Modified (и 304 на If-Modified-Since).
+
+Файлы в settings.SITEMAP_ROOT:
+    sitemap.xml                   — индекс (sitemapindex) со ссылками на секции и их lastmod;
+    sitemap-<карта>-<N>.xml.gz    — секции: до Sitemap.limit (50 000, предел протокола) URL, gzip;
+    manifest.json                 — границы и отпечатки секций для инкрементальной пересборки.
+
+Секция — диапазон pk строк карты (карты — mysite.sitemaps.sitemaps), а не страница по OFFSET:
+новые товары дописываются в последнюю секцию и не сдвигают остальные. Границы секций хранятся
+в манифесте; секция, дошедшая до limit строк, закрывается, следующие строки начинают новую.
+Отпечаток секции — sha1 по (pk, lastmod) её строк: сборка читает две колонки по индексу pk и перерисовывает
+только секции, у которых отпечаток изменился (добавили, архивировали, удалили строку, сменилась дата).
+Смена SITEMAP_BASE_URL или SITEMAP_LANGUAGE пересобирает всё.
+
+Когда пересобирается: команда build_sitemaps (деплой), задача shopapp.build_sitemaps — через
+SITEMAP_REBUILD_DELAY секунд после изменения товаров, и уборка воркеров (jobs.signals.housekeeping) раз в час.
+Сборки в разных процессах (команда, воркер, первый запрос) не пересекаются: файловая блокировка
+SITEMAP_ROOT/.build.lock (fcntl.flock).
+"""
+import gzip
+import hashlib
+import json
+import logging
+import os
+from collections import deque
+from contextlib import contextmanager
+from collections.abc import Iterator
+from datetime import datetime, timezone as dt_timezone
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.sitemaps import Sitemap
+from django.core.exceptions import ImproperlyConfigured
+from django.http import Http404, HttpRequest, HttpResponse, HttpResponseNotModified
+from django.template.loader import render_to_string
+from django.utils import translation
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+from .sitemaps import sitemaps
+
+try:
+    import fcntl
+except ImportError:  # Windows: межпроцессной блокировки нет (как в mysite.sqlite)
+    fcntl = None
+
+log = logging.getLogger(__name__)
+
+INDEX_NAME = "sitemap.xml"
+MANIFEST_NAME = "manifest.json"
+LOCK_NAME = ".build.lock"
+ROWS_CHUNK_SIZE = 5000  # строк (pk, lastmod) за один запрос курсора при расчёте отпечатков
+
+
+def section_name(name: str, page: int) -> str:
+    return f"sitemap-{name}-{page}.xml.gz"
+
+
+def build_params() -> dict:
+    """
+    Параметры, от которых зависит содержимое всех секций.
+
+    Адреса в файлах строятся без запроса, поэтому домен задаётся явно: без SITEMAP_BASE_URL
+    (DJANGO_SITEMAP_BASE_URL) сборка падает, а не публикует карту с адресами 127.0.0.1.
+    """
+    if not settings.SITEMAP_BASE_URL:
+        raise ImproperlyConfigured("SITEMAP_BASE_URL (DJANGO_SITEMAP_BASE_URL) is required to build the sitemap")
+    return {"base_url": settings.SITEMAP_BASE_URL.rstrip("/"), "language": settings.SITEMAP_LANGUAGE}
+
+
+@contextmanager
+def build_lock(root: Path):
+    """Межпроцессная блокировка сборки: вторая сборка ждёт, пока закончит первая."""
+    if fcntl is None:
+        yield
+        return
+    with open(root / LOCK_NAME, "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)  # снимается и при падении процесса
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def sitemap_value(sitemap: Sitemap, name: str, item):
+    """Атрибут карты (changefreq, priority, lastmod): значение или метод от объекта, как у Django Sitemap."""
+    value = getattr(sitemap, name, None)
+    return value(item) if callable(value) else value
+
+
+def iter_pages(sitemap: Sitemap, starts: list[int]) -> Iterator[dict]:
+    """
+    Делит строки карты на секции по возрастанию pk: {"start": первый pk, "count", "digest"}.
+
+    starts — начала секций с прошлой сборки: строки остаются в своих секциях. Последняя секция
+    закрывается на sitemap.limit строках; пустые секции (все строки удалены) пропускаются.
+    Первая секция всегда начинается с 0 — строки с меньшими pk, вернувшиеся из архива, не теряются.
+    """
+    rows = (
+        sitemap.items()
+        .order_by("pk")
+        .values_list("pk", sitemap.lastmod_field)
+        .iterator(chunk_size=ROWS_CHUNK_SIZE)
+    )
+    boundaries = deque(starts[1:])
+    start, count, digest = 0, 0, hashlib.sha1()
+    yielded = False
+    for pk, lastmod in rows:
+        next_start = None
+        while boundaries and pk >= boundaries[0]:  # строка за границей секции с прошлой сборки
+            next_start = boundaries.popleft()
+        if next_start is None and count == sitemap.limit:  # секция заполнена — новая начинается с этой строки
+            next_start = pk
+        if next_start is not None:
+            if count:
+                yield {"start": start if yielded else 0, "count": count, "digest": digest.hexdigest()}
+                yielded = True
+            start, count, digest = next_start, 0, hashlib.sha1()
+        count += 1
+        digest.update(f"{pk}:{lastmod.isoformat() if lastmod else ''}\n".encode())
+    if count:
+        yield {"start": start if yielded else 0, "count": count, "digest": digest.hexdigest()}
+
+
+def render_section(sitemap: Sitemap, start: int, end: int | None) -> bytes:
+    """XML секции (шаблон sitemap.xml из django.contrib.sitemaps), сжатый gzip."""
+    items = sitemap.items().order_by("pk").only("pk", sitemap.lastmod_field).filter(pk__gte=start)
+    if end is not None:
+        items = items.filter(pk__lt=end)
+    base_url = build_params()["base_url"]
+    urlset = [
+        {
+            "location": base_url + sitemap.location(item),
+            "lastmod": sitemap_value(sitemap, "lastmod", item),
+            "changefreq": sitemap_value(sitemap, "changefreq", item),
+            "priority": sitemap_value(sitemap, "priority", item),
+        }
+        for item in items.iterator(chunk_size=ROWS_CHUNK_SIZE)
+    ]
+    # mtime=0: одинаковое содержимое — одинаковые байты файла
+    return gzip.compress(render_to_string("sitemap.xml", {"urlset": urlset}).encode(), mtime=0)
+
+
+def write_file(root: Path, name: str, content: bytes) -> None:
+    """Пишет файл через временный (свой у каждого процесса) и переименование: читатель не увидит недописанный."""
+    tmp_path = root / f"{name}.{os.getpid()}.tmp"
+    tmp_path.write_bytes(content)
+    os.replace(tmp_path, root / name)
+
+
+def build_sitemaps(force: bool = False) -> dict:
+    """
+    Строит (пересобирает изменившиеся) секции карты сайта и индекс.
+
+    force=True — пересобрать все секции. Возвращает счётчики: sections, built, removed, urls.
+    """
+    build_params()  # без SITEMAP_BASE_URL — ошибка до создания каталога и блокировки
+    root = Path(settings.SITEMAP_ROOT)
+    root.mkdir(parents=True, exist_ok=True)
+    with build_lock(root):
+        return _build(root, force)
+
+
+def _build(root: Path, force: bool) -> dict:
+    try:
+        manifest = json.loads((root / MANIFEST_NAME).read_text())
+    except (FileNotFoundError, ValueError):
+        manifest = {}
+    params = build_params()
+    previous = manifest.get("sections", {}) if manifest.get("params") == params and not force else {}
+
+    sections, built = {}, 0
+    now = datetime.now(dt_timezone.utc).isoformat(timespec="seconds")
+    with translation.override(params["language"]):  # URL товаров — с префиксом языка (i18n_patterns)
+        for name, sitemap_class in sitemaps.items():
+            sitemap = sitemap_class()
+            starts = [section["start"] for section in previous.values() if section["sitemap"] == name]
+            pages = list(iter_pages(sitemap, sorted(starts)))
+            for number, page in enumerate(pages, start=1):
+                file_name = section_name(name, number)
+                end = pages[number]["start"] if number < len(pages) else None
+                old = previous.get(file_name)
+                # содержимое секции определяют только её строки (pk, lastmod) — их и сравнивает отпечаток
+                if old and old["digest"] == page["digest"] and (root / file_name).exists():
+                    sections[file_name] = {**old, **page, "end": end}
+                    continue
+                write_file(root, file_name, render_section(sitemap, page["start"], end))
+                sections[file_name] = {"sitemap": name, **page, "end": end, "built_at": now}
+                built += 1
+
+    removed = 0
+    for file_name in manifest.get("sections", {}).keys() - sections.keys():
+        (root / file_name).unlink(missing_ok=True)
+        removed += 1
+
+    if built or removed or not (root / INDEX_NAME).exists():
+        index = render_to_string("sitemap_index.xml", {"sitemaps": [
+            {"location": f"{params['base_url']}/{file_name}", "last_mod": datetime.fromisoformat(section["built_at"])}
+            for file_name, section in sections.items()
+        ]})
+        write_file(root, INDEX_NAME, index.encode())
+    write_file(root, MANIFEST_NAME, json.dumps({"params": params, "sections": sections}, indent=1).encode())
+
+    stats = {
+        "sections": len(sections), "built": built, "removed": removed,
+        "urls": sum(section["count"] for section in sections.values()),
+    }
+    log.info("Sitemap built: %s", stats)
+    return stats
+
+
+def file_response(request: HttpRequest, name: str, content_type: str) -> HttpResponse:
+    """Файл карты с диска: Last-Modified — время его последней пересборки, If-Modified-Since — 304."""
+    path = Path(settings.SITEMAP_ROOT) / name
+    try:
+        mtime = path.stat().st_mtime
+    except FileNotFoundError:
+        raise Http404(f"{name} is not built") from None
+    if not was_modified_since(request.META.get("HTTP_IF_MODIFIED_SINCE"), mtime):
+        return HttpResponseNotModified()
+    response = HttpResponse(path.read_bytes(), content_type=content_type)
+    response["Last-Modified"] = http_date(mtime)
+    return response
+
+
+def sitemap_index(request: HttpRequest) -> HttpResponse:
+    """
+    /sitemap.xml — индекс карты сайта.
+
+    Файлы строят команда build_sitemaps и задача shopapp.build_sitemaps. Если индекса ещё нет (первый запуск),
+    его один раз строит первый запрос — дальше карта отдаётся только с диска.
+    """
+    root = Path(settings.SITEMAP_ROOT)
+    if not (root / INDEX_NAME).exists():
+        root.mkdir(parents=True, exist_ok=True)
+        with build_lock(root):  # параллельные запросы (и другие воркеры) ждут первую сборку
+            if not (root / INDEX_NAME).exists():
+                log.warning("Sitemap index is missing, building it in request; run manage.py build_sitemaps")
+                _build(root, force=False)
+    return file_response(request, INDEX_NAME, "application/xml")
+
+
+def sitemap_section(request: HttpRequest, section: str, page: int) -> HttpResponse:
+    """/sitemap-<карта>-<N>.xml.gz — секция карты сайта (gzip-файл, как есть)."""
+    return file_response(request, section_name(section, page), "application/gzip")
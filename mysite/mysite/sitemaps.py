@@ -2,7 +2,7 @@ from new_blogapp_rss.sitemap import BlogSitemap
 # Импортируем класс sitemap для блога
 from shopapp.sitemap import ShopappSitemap
 
-# Django использует этот словарь для генерации sitemap.xml
+# Карты сайта: по этому словарю команда build_sitemaps строит файлы sitemap.xml и секций (mysite.sitemap_files)
 sitemaps = {
     "new_blogapp": BlogSitemap, # Регистрируем sitemap под именем new_blogapp
     "shop": ShopappSitemap, # Регистрируем sitemap под именем shopapp
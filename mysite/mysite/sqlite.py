@@ -0,0 +1,138 @@
+"""
+Настройка соединений SQLite для работы под несколькими воркерами gunicorn.
+
+По умолчанию SQLite открывается в режиме rollback journal с synchronous=FULL и кешем страниц ~2 МБ:
+пишущая транзакция блокирует читателей, каждая фиксация — несколько fsync, а конкурирующие
+записи из разных воркеров быстро получают "database is locked".
+
+При каждом новом соединении (сигнал connection_created) выполняются PRAGMA из settings.SQLITE_PRAGMAS:
+    "journal_mode": "wal",       # читатели не блокируются писателем, запись — дописывание в WAL
+    "synchronous": "normal",     # в WAL-режиме безопасно: fsync только при checkpoint
+    "busy_timeout": 5000,        # сколько мс ждать освобождения блокировки, прежде чем ошибка
+    "cache_size": -64000,        # кеш страниц соединения: отрицательное значение — в КиБ (64 МБ)
+    "mmap_size": 268435456,      # чтение файла БД через mmap (256 МБ) без копирования в кеш страниц
+    "temp_store": "memory",      # временные таблицы и индексы сортировок — в памяти
+
+Вместе с постоянными соединениями (CONN_MAX_AGE) PRAGMA выполняются один раз на воркер, а не на запрос.
+WAL-файл периодически сбрасывается в основной файл командой sqlite_maintenance.
+
+Запись в SQLite всегда одна на весь файл. Чтобы пишущие запросы разных воркеров не соревновались
+за блокировку (и не получали "database is locked", когда ожидание превышает busy_timeout),
+пишущие пути выполняются через serialized_writes(): межпроцессная блокировка файла
+settings.SQLITE_WRITE_LOCK (fcntl.flock, write_lock()) + одна транзакция. Ожидающие воркеры встают в очередь ядра
+на блокировке файла, а не опрашивают SQLite; результат вызывающий код получает как обычно.
+"""
+import re
+import threading
+from collections.abc import Iterator, Mapping
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+try:
+    import fcntl
+except ImportError:  # Windows: межпроцессной блокировки нет, остаются busy_timeout и BEGIN IMMEDIATE
+    fcntl = None
+
+_pragma_name = re.compile(r"^[a-z_]+$")
+_pragma_value = re.compile(r"^-?\w+$")
+
+
+def pragma_statements(pragmas: Mapping[str, str | int]) -> list[str]:
+    """
+    Превращает словарь PRAGMA в SQL-команды.
+
+    PRAGMA не поддерживает параметры запроса, поэтому имена и значения проверяются по шаблону:
+    опечатка в настройках должна падать при старте, а не выполнять произвольный SQL.
+    """
+    statements = []
+    for name, value in pragmas.items():
+        if not _pragma_name.match(name) or not _pragma_value.match(str(value)):
+            raise ValueError(f"Invalid SQLite pragma: {name}={value!r}")
+        statements.append(f"PRAGMA {name} = {value}")
+    return statements
+
+
+@receiver(connection_created)
+def configure_sqlite_connection(sender, connection, **kwargs):
+    """Применяет settings.SQLITE_PRAGMAS к каждому новому соединению SQLite."""
+    if connection.vendor != "sqlite":
+        return
+    with connection.cursor() as cursor:
+        for statement in pragma_statements(getattr(settings, "SQLITE_PRAGMAS", {})):
+            cursor.execute(statement)
+
+
+_write_lock_state = threading.local()  # глубина вложенности write_lock в текущем потоке
+
+
+@contextmanager
+def write_lock(using: str = DEFAULT_DB_ALIAS) -> Iterator[None]:
+    """
+    Межпроцессная блокировка записи без собственной транзакции.
+
+    Нужна коду, который уже сам открывает транзакцию внутри (например, SessionStore.save):
+    лишняя точка сохранения вокруг него — два лишних запроса.
+
+    Блокировка не берётся, если SQLITE_WRITE_LOCK не задан, БД не SQLite, нет fcntl,
+    она уже взята выше по стеку или блок уже внутри транзакции (её BEGIN IMMEDIATE уже держит
+    запись в SQLite, ожидание файловой блокировки после него привело бы к взаимной блокировке).
+    """
+    lock_path = getattr(settings, "SQLITE_WRITE_LOCK", None)
+    depth = getattr(_write_lock_state, "depth", 0)
+    if (
+        depth or not lock_path or fcntl is None
+        or connections[using].vendor != "sqlite" or connections[using].in_atomic_block
+    ):
+        _write_lock_state.depth = depth + 1
+        try:
+            yield
+        finally:
+            _write_lock_state.depth = depth
+        return
+
+    with open(lock_path, "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)  # ждём своей очереди (блокировка снимается и при падении процесса)
+        _write_lock_state.depth = 1
+        try:
+            yield
+        finally:
+            _write_lock_state.depth = 0
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+@contextmanager
+def serialized_writes(using: str = DEFAULT_DB_ALIAS) -> Iterator[None]:
+    """
+    Выполняет блок как одну транзакцию под межпроцессной блокировкой записи.
+
+    Блокировка берётся до BEGIN: транзакция начинается, только когда остальные писатели закончили,
+    поэтому в SQLite она не ждёт и не получает "database is locked".
+    Вложенные вызовы (например, регистрация внутри уже идущей записи) только открывают точку сохранения.
+    """
+    with write_lock(using), transaction.atomic(using=using):
+        yield
+
+
+class SerializedWriteMixin:
+    """
+    Миксин для CreateView/UpdateView: запись валидной формы (form_valid) — через serialized_writes().
+
+    Валидация и повторный показ формы с ошибками идут без блокировки: они ничего не пишут,
+    а блокировка общая для всех писателей. Оборачивается form_valid всего представления целиком,
+    а не form_valid миксина (его представление вызывает через super() и дописывает своё после него):
+    так в одну транзакцию попадают и записи после super() (например, картинки товара).
+    """
+
+    def post(self, request, *args, **kwargs):
+        form_valid = self.form_valid
+
+        def serialized_form_valid(form):
+            with serialized_writes():
+                return form_valid(form)
+
+        self.form_valid = serialized_form_valid  # ProcessFormView.post вызывает self.form_valid(form)
+        return super().post(request, *args, **kwargs)
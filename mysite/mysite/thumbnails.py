@@ -0,0 +1,172 @@
+"""
+Производные изображения (миниатюры): уменьшенные и перекодированные копии загруженных картинок.
+
+Страницы показывали оригиналы (фото с телефона — несколько МБ) в <img width="150">. Теперь для
+каждого изображения (Product.preview, ProductImages.image, Profile.avatar) при загрузке строятся
+варианты по ширинам settings.THUMBNAIL_WIDTHS в форматах settings.THUMBNAIL_FORMATS (WebP и JPEG),
+а шаблонный тег {% responsive_image %} (shopapp/templatetags/thumbnails.py) выводит <picture> с srcset —
+браузер сам берёт ширину под размер на экране и плотность пикселей.
+
+Где лежат варианты:
+    MEDIA_ROOT/derivatives/<хеш[:2]>/<хеш[2:]>/<ширина>w.<webp|jpg>
+Хеш — sha256 содержимого оригинала вместе с параметрами обработки: одинаковые файлы делят варианты,
+а смена ширин или качества даёт новые пути (браузер и CDN не покажут старые копии, кеш — навсегда).
+После смены параметров варианты пересобирает команда generate_thumbnails.
+
+Что построено, модель хранит рядом с полем картинки в JSON-поле "<поле>_variants" (preview_variants, ...):
+    {"source": "products/.../photo.jpg", "params": "3f2a...", "width": 4000, "height": 3000,
+     "variants": {"webp": [[150, "derivatives/.../150w.webp"], ...], "jpeg": [...]}}
+Шаблону не нужны запросы к БД и чтение файлов: всё есть в строке модели. "source" — имя оригинала,
+для которого построены варианты: после замены картинки устаревшие варианты не используются;
+"params" — отпечаток параметров обработки, с которыми они построены.
+
+Кто строит:
+    - фоновая задача thumbnails.refresh_variants (shopapp.tasks), которую ставят сигналы post_save
+      моделей (shopapp.signals, myauth.signals) — загрузка через представления и админку;
+    - команда generate_thumbnails — уже загруженные файлы, параллельно в пуле процессов.
+"""
+import hashlib
+import io
+import logging
+import math
+import os
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import models
+from PIL import ExifTags, Image, ImageOps, UnidentifiedImageError
+
+log = logging.getLogger(__name__)
+
+VARIANTS_VERSION = 1  # меняется вместе с алгоритмом обработки: новые пути для всех вариантов
+EXTENSIONS = {"webp": "webp", "jpeg": "jpg"}
+MIME_TYPES = {"webp": "image/webp", "jpeg": "image/jpeg"}
+# настройки, которые процессы пула generate_thumbnails получают от основного процесса
+WORKER_SETTINGS = ("MEDIA_ROOT", "THUMBNAIL_WIDTHS", "THUMBNAIL_FORMATS", "THUMBNAIL_QUALITY", "THUMBNAIL_DIR")
+
+
+def variants_attname(field_name: str) -> str:
+    """Имя JSON-поля с вариантами для поля картинки: preview -> preview_variants."""
+    return f"{field_name}_variants"
+
+
+def processing_params() -> str:
+    """Параметры обработки — часть хеша: другие ширины или качество дают другие пути."""
+    return repr((VARIANTS_VERSION, sorted(settings.THUMBNAIL_WIDTHS), settings.THUMBNAIL_FORMATS,
+                 settings.THUMBNAIL_QUALITY))
+
+
+def params_fingerprint() -> str:
+    """Короткий отпечаток параметров обработки для поля "params" описания вариантов."""
+    return hashlib.sha256(processing_params().encode()).hexdigest()[:12]
+
+
+def is_current(manifest: dict, name: str) -> bool:
+    """Описание построено для файла name с текущими параметрами обработки."""
+    return manifest.get("source") == name and manifest.get("params") == params_fingerprint()
+
+
+def encode(image: Image.Image, image_format: str) -> bytes:
+    buffer = io.BytesIO()
+    if image_format == "jpeg":
+        if image.mode != "RGB":  # JPEG без прозрачности: прозрачные области — белым фоном
+            background = Image.new("RGB", image.size, "white")
+            background.paste(image, mask=image.getchannel("A") if "A" in image.getbands() else None)
+            image = background
+        image.save(buffer, "JPEG", quality=settings.THUMBNAIL_QUALITY, optimize=True, progressive=True)
+    else:
+        image.save(buffer, "WEBP", quality=settings.THUMBNAIL_QUALITY, method=4)
+    return buffer.getvalue()
+
+
+def build_variants(name: str, storage=default_storage, overwrite: bool = False) -> dict:
+    """
+    Строит варианты файла name из хранилища и возвращает описание для поля "<поле>_variants".
+
+    Варианты, которые уже есть в хранилище (тот же хеш), не пересчитываются, если не передан
+    overwrite (generate_thumbnails --force: восстановить повреждённые файлы). Файл, который
+    не удалось прочитать как изображение, даёт описание без вариантов — шаблон покажет оригинал.
+    Функция не трогает БД: её вызывают и сигналы, и процессы пула generate_thumbnails.
+    """
+    with storage.open(name, "rb") as file:
+        content = file.read()
+    digest = hashlib.sha256(processing_params().encode() + content).hexdigest()
+    directory = f"{settings.THUMBNAIL_DIR}/{digest[:2]}/{digest[2:24]}"
+    try:
+        with Image.open(io.BytesIO(content)) as opened:
+            width, height = opened.size  # исходный размер (до draft) — по нему высота в <img>
+            if opened.getexif().get(ExifTags.Base.Orientation) in (5, 6, 7, 8):
+                width, height = height, width  # снимок повёрнут на 90°
+            scale = max(settings.THUMBNAIL_WIDTHS) / width
+            if scale < 1:  # JPEG декодируется сразу уменьшенным (в 2-8 раз), но не меньше самой большой ширины
+                opened.draft("RGB", (math.ceil(opened.width * scale), math.ceil(opened.height * scale)))
+            image = ImageOps.exif_transpose(opened)  # фото с телефона: поворот из EXIF
+            if image.mode not in ("RGB", "RGBA"):
+                image = image.convert("RGBA" if "transparency" in image.info or "A" in image.getbands() else "RGB")
+            image.load()
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError) as error:
+        log.warning("Cannot build thumbnails for %s: %s", name, error)
+        return {"source": name, "params": params_fingerprint()}
+
+    variants = {image_format: [] for image_format in settings.THUMBNAIL_FORMATS}
+    for target in sorted({min(target, width) for target in settings.THUMBNAIL_WIDTHS}):  # без увеличения
+        resized = image if image.width == target else image.resize(
+            (target, max(1, round(image.height * target / image.width))), Image.Resampling.LANCZOS,
+        )
+        for image_format in settings.THUMBNAIL_FORMATS:
+            path = f"{directory}/{target}w.{EXTENSIONS[image_format]}"
+            if overwrite and storage.exists(path):
+                storage.delete(path)
+            if not storage.exists(path):
+                path = storage.save(path, ContentFile(encode(resized, image_format)))
+            variants[image_format].append([target, path])
+    return {"source": name, "params": params_fingerprint(), "width": width, "height": height, "variants": variants}
+
+
+def needs_refresh(instance: models.Model, field_name: str) -> bool:
+    """Варианты картинки instance.<field_name> не соответствуют текущему файлу или параметрам обработки."""
+    if field_name in instance.get_deferred_fields():
+        return False  # экземпляр из .only() без картинки: картинку не меняли, а догружать её — лишний запрос
+    file = getattr(instance, field_name)
+    current = getattr(instance, variants_attname(field_name)) or {}
+    return not is_current(current, file.name) if file else bool(current)
+
+
+def refresh_variants(instance: models.Model, field_name: str) -> bool:
+    """
+    Строит варианты картинки instance.<field_name>, если они устарели, и сохраняет их в модель.
+
+    Сохраняется только поле вариантов (и auto_now-поля: у Product это версия карточки в кеше списка),
+    через queryset.update(): post_save не отправляется, поиск не переиндексируется, кеши не сбрасываются —
+    об изменении сообщает вызывающий (shopapp.tasks.refresh_thumbnails — сигналом products_changed).
+    Возвращает True, если описание вариантов изменилось.
+    """
+    if not needs_refresh(instance, field_name):
+        return False
+    file = getattr(instance, field_name)
+    attname = variants_attname(field_name)
+    manifest = build_variants(file.name) if file else {}
+    if manifest == (getattr(instance, attname) or {}):
+        return False
+    setattr(instance, attname, manifest)
+    values = {attname: manifest}
+    for field in instance._meta.concrete_fields:
+        if getattr(field, "auto_now", False):
+            values[field.attname] = field.pre_save(instance, False)  # pre_save проставляет и instance
+    type(instance)._base_manager.filter(pk=instance.pk).update(**values)
+    return True
+
+
+def setup_worker(overrides: dict) -> None:
+    """
+    Инициализатор процесса пула generate_thumbnails. Процессы запускаются через "spawn" и настраивают
+    Django сами: overrides подменяют настройки до django.setup(). Функция живёт здесь, а не в модуле
+    команды: тот импортирует модели, а в новом процессе до django.setup() это невозможно.
+    """
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "mysite.settings")
+    import django
+
+    for name, value in overrides.items():
+        setattr(settings, name, value)
+    django.setup()
@@ -22,57 +22,63 @@ from django.urls import path, include # path — для маршрутов; incl
 # он добавляет префиксы для каждой подключенной ссылки, со значением языка который выбрал пользователь
 from django.conf.urls.i18n import i18n_patterns
 
-from drf_spectacular.views import (
-    SpectacularAPIView,  # генерирует OpenAPI-схему по вашим View/Serializer/Model
-    SpectacularSwaggerView, SpectacularRedocView,  # отображает UI Swagger с использованием сгенерированной схемы
-)
-
 
-from django.contrib.sitemaps.views import sitemap # Встроенное представление Django для генерации sitemap.xml
-from .sitemaps import sitemaps # Импортируем словарь с зарегистрированными sitemap
+# Карта сайта из заранее построенных файлов (команда build_sitemaps): индекс и секции по 50 000 URL
+from .sitemap_files import sitemap_index, sitemap_section
 
 urlpatterns = [
     path('admin/doc/', include('django.contrib.admindocs.urls')),
     path('article/', include('blogapp.urls')), # Подключаем маршруты приложения blogapp; все URL будут начинаться с /article/
     path('blog/', include('new_blogapp_rss.urls')), # Подключаем маршруты приложения new_blogapp_rss; все URL будут начинаться с /blog/
-    path( # URL для карты сайта
+    path( # URL для карты сайта: индекс со ссылками на секции
         "sitemap.xml",
-        sitemap, # sitemap — view, которое генерирует XML
-        {"sitemaps": sitemaps}, # sitemaps — передаём описанные sitemap-классы
+        sitemap_index, # отдаёт готовый файл с диска, без запросов к БД
         name="django.contrib.sitemaps.views.sitemap" # name — имя маршрута для обращения к URL
-    )
+    ),
+    path( # секция карты сайта (gzip): /sitemap-shop-1.xml.gz
+        "sitemap-<slug:section>-<int:page>.xml.gz",
+        sitemap_section,
+        name="sitemap-section",
+    ),
 ] # список маршрутов
 
 urlpatterns += i18n_patterns( # Маршруты приложения myauth с поддержкой переключения языка (через /ru/, /en/)
 path('admin/', admin.site.urls), # URL для встроенной админки Django; админка доступна по /admin/
     path('accounts/', include('myauth.urls')), # Маршруты авторизации (раньше myauth/, теперь accounts/)
     path('shop/', include('shopapp.urls')), # Подключаем маршруты приложения shopapp; все URL будут начинаться с /shop/
+    path('jobs/', include('jobs.urls')), # Статус фоновых задач: /jobs/api/<id>/
 )
 
-urlpatterns += [
-    # Эндпоинт для генерации OpenAPI-схемы в формате JSON
-    path(
-        'api/schema/',                # URL для получения схемы API
-        SpectacularAPIView.as_view(),      # Представление, генерирующее JSON-схему
-        name='schema'                      # Имя маршрута для использования внутри Django
-    ),
-    # Swagger UI — визуальная документация на основе OpenAPI-схемы
-    path(
-        'api/swagger-ui/',            # URL для доступа к Swagger-интерфейсу
-        SpectacularSwaggerView.as_view(    # Представление, которое рендерит Swagger UI
-            url_name='schema'              # Указываем, откуда брать OpenAPI-схему
+if settings.API_DOCS:  # drf-spectacular (вместе с yaml) импортируется, только если документация API включена
+    from drf_spectacular.views import (
+        SpectacularAPIView,  # генерирует OpenAPI-схему по вашим View/Serializer/Model
+        SpectacularSwaggerView, SpectacularRedocView,  # отображает UI Swagger с использованием сгенерированной схемы
+    )
+
+    urlpatterns += [
+        # Эндпоинт для генерации OpenAPI-схемы в формате JSON
+        path(
+            'api/schema/',                # URL для получения схемы API
+            SpectacularAPIView.as_view(),      # Представление, генерирующее JSON-схему
+            name='schema'                      # Имя маршрута для использования внутри Django
         ),
-        name='swagger-ui'                  # Имя маршрута для ссылок внутри Django
-    ),
-    # ReDoc — альтернативная визуальная документация API
-    path(
-        'api/redoc/',                 # URL для доступа к ReDoc-интерфейсу
-        SpectacularRedocView.as_view(      # Представление, которое рендерит ReDoc
-            url_name='schema'              # Указываем, откуда брать OpenAPI-схему
+        # Swagger UI — визуальная документация на основе OpenAPI-схемы
+        path(
+            'api/swagger-ui/',            # URL для доступа к Swagger-интерфейсу
+            SpectacularSwaggerView.as_view(    # Представление, которое рендерит Swagger UI
+                url_name='schema'              # Указываем, откуда брать OpenAPI-схему
+            ),
+            name='swagger-ui'                  # Имя маршрута для ссылок внутри Django
         ),
-        name='redoc'                        # Имя маршрута для ссылок внутри Django
-    ),
-]
+        # ReDoc — альтернативная визуальная документация API
+        path(
+            'api/redoc/',                 # URL для доступа к ReDoc-интерфейсу
+            SpectacularRedocView.as_view(      # Представление, которое рендерит ReDoc
+                url_name='schema'              # Указываем, откуда брать OpenAPI-схему
+            ),
+            name='redoc'                        # Имя маршрута для ссылок внутри Django
+        ),
+    ]
 
 # Проверяем, включён ли режим разработки
 if settings.DEBUG:
@@ -92,6 +98,7 @@ if settings.DEBUG:
         static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
     )
 
+if settings.DEBUG_TOOLBAR:  # маршруты debug toolbar — только вместе с приложением (settings.DEBUG_TOOLBAR)
     urlpatterns.append(
         path("__debug__/", include("debug_toolbar.urls")),
     )
\ No newline at end of file
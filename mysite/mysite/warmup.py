@@ -0,0 +1,132 @@
+"""
+Прогрев процесса до fork: всё, что Django иначе делает лениво на первых запросах каждого воркера.
+
+Без прогрева каждый воркер gunicorn после деплоя или перезапуска сам на первых запросах
+собирает маршруты (для каждого языка отдельно), компилирует шаблоны, читает каталоги переводов
+и заполняет кеши метаданных моделей — отсюда всплески задержки после каждого рестарта.
+
+gunicorn.conf.py (preload_app = True) вызывает warm_up() один раз в мастере перед fork:
+воркеры получают уже заполненные кеши как страницы памяти, общие с мастером (copy-on-write).
+Шаги:
+    - urls: импорт всех include() и компиляция регулярных выражений маршрутов для каждого языка
+      из LANGUAGES, таблицы reverse() и пространств имён;
+    - templates: компиляция всех шаблонов из каталогов шаблонов (кеширующий загрузчик их запоминает);
+    - translations: каталоги .mo для каждого языка из LANGUAGES (Django, приложения, LOCALE_PATHS);
+    - models: кеши полей и связей (_meta.get_fields) всех моделей.
+Импорт настроек (в т.ч. sentry_sdk.init), drf-spectacular и админки происходит ещё раньше —
+при загрузке приложения (mysite.asgi / mysite.wsgi) в мастере.
+"""
+import logging
+from collections.abc import Iterable
+from pathlib import Path
+from timeit import default_timer
+from typing import NamedTuple
+
+from django.apps import apps
+from django.conf import settings
+from django.db import connections
+from django.template import TemplateSyntaxError, engines
+from django.urls import URLResolver, get_resolver
+from django.utils import translation
+from django.utils.formats import get_format_modules
+
+log = logging.getLogger(__name__)
+
+TEMPLATE_SUFFIXES = (".html", ".txt", ".xml")  # остальные файлы в каталогах шаблонов — не шаблоны
+
+
+class WarmUpStep(NamedTuple):
+    """Итог одного шага прогрева."""
+    name: str
+    items: int  # сколько маршрутов / шаблонов / языков / моделей прогрето
+    seconds: float
+
+
+def warm_urls() -> int:
+    """Маршруты: регулярные выражения каждого языка (i18n_patterns) и таблицы reverse()."""
+    resolver = get_resolver()
+    count = 0
+
+    def walk(patterns: Iterable) -> None:
+        nonlocal count
+        for pattern in patterns:
+            pattern.pattern.regex  # компилируется и кешируется для активного языка
+            count += 1
+            if isinstance(pattern, URLResolver):
+                walk(pattern.url_patterns)  # импортирует модуль include()
+                pattern.reverse_dict
+
+    for code, _ in settings.LANGUAGES:
+        with translation.override(code):
+            walk(resolver.url_patterns)
+            resolver.reverse_dict, resolver.namespace_dict, resolver.app_dict  # заполняются для языка
+    return count
+
+
+def template_names(loader) -> Iterable[str]:
+    """Имена всех шаблонов в каталогах загрузчика (для кеширующего загрузчика — всех вложенных)."""
+    for inner in getattr(loader, "loaders", [loader]):
+        for directory in inner.get_dirs():
+            for path in sorted(Path(directory).rglob("*")):
+                if path.suffix in TEMPLATE_SUFFIXES and path.is_file():
+                    yield path.relative_to(directory).as_posix()
+
+
+def warm_templates() -> int:
+    """Компилирует все шаблоны; сломанный шаблон не мешает старту, а попадает в лог."""
+    count = 0
+    for backend in engines.all():
+        engine = getattr(backend, "engine", None)  # только шаблоны Django: у Jinja2 свой кеш
+        if engine is None:
+            continue
+        engine.template_context_processors  # импорт контекстных процессоров
+        for loader in engine.template_loaders:
+            for name in template_names(loader):
+                try:
+                    engine.get_template(name)
+                except TemplateSyntaxError as error:
+                    log.warning("Template %s was not warmed up: %s", name, error)
+                    continue
+                count += 1
+    return count
+
+
+def warm_translations() -> int:
+    """Каталоги переводов и модули форматов каждого языка из LANGUAGES."""
+    for code, _ in settings.LANGUAGES:
+        translation.trans_real.translation(code)
+        get_format_modules(code)
+    return len(settings.LANGUAGES)
+
+
+def warm_models() -> int:
+    """Кеши метаданных: поля, обратные связи, карты полей всех моделей (включая промежуточные M2M)."""
+    models = apps.get_models(include_auto_created=True)
+    for model in models:
+        model._meta.get_fields(include_hidden=True)
+        model._meta.fields_map, model._meta._forward_fields_map
+    return len(models)
+
+
+STEPS = (
+    ("urls", warm_urls),
+    ("templates", warm_templates),
+    ("translations", warm_translations),
+    ("models", warm_models),
+)
+
+
+def warm_up() -> list[WarmUpStep]:
+    """
+    Выполняет все шаги прогрева и возвращает их итоги.
+
+    Соединения с БД в конце закрываются: открытый в мастере файл SQLite воркеры унаследовали бы
+    после fork, а одно соединение SQLite нельзя использовать из нескольких процессов.
+    """
+    report = []
+    for name, step in STEPS:
+        started = default_timer()
+        items = step()
+        report.append(WarmUpStep(name, items, default_timer() - started))
+    connections.close_all()
+    return report
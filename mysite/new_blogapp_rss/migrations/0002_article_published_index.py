@@ -0,0 +1,17 @@
+# Generated by Django 6.0 on 2026-10-17 01:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('new_blogapp_rss', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='article',
+            index=models.Index(condition=models.Q(('published_at__isnull', False)), fields=['-published_at'], name='article_published_idx'),
+        ),
+    ]
@@ -7,6 +7,16 @@ class Article(models.Model):
     класс - модель: Статья
 
     """
+    class Meta:
+        indexes = [
+            # список статей, RSS и sitemap: published_at IS NOT NULL ORDER BY -published_at
+            models.Index(
+                fields=["-published_at"],
+                condition=models.Q(published_at__isnull=False),
+                name="article_published_idx",
+            ),
+        ]
+
     title = models.CharField(max_length=100)
     body = models.TextField(null=True, blank=True) # Поле модет быть пустым(null=True), при заполнении через форму тоже( blank=True)
     published_at = models.DateTimeField(null=True, blank=True)
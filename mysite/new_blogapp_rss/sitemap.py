@@ -17,6 +17,7 @@ class BlogSitemap(Sitemap):
 
     changefreq = "never" # Подсказка поисковику: страницы статей редко меняются
     priority = 0.5 # Средний приоритет страницы в sitemap
+    lastmod_field = "published_at" # поле lastmod: по нему сборка карты (mysite.sitemap_files) замечает изменения
 
     def items(self):
         """
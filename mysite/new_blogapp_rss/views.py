@@ -39,6 +39,7 @@ class LatestArticlesFeed(Feed):
     title = "Blog articles (latest)" # Заголовок для rss-ленты
     description = "Update on changes and addition blog articles" # Описание ленты
     link = reverse_lazy("new_blogapp_rss:articles") # Ссылка на страницу со списком статей
+    replica_reads = True  # лента только читает: запросы идут в реплику БД (mysite.db_routers)
 
     def items(self):
         """
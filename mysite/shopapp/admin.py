@@ -1,13 +1,18 @@
-from django.contrib import admin
+from django.contrib import admin, messages
 from django.db.models import QuerySet
 from django.http import HttpRequest, HttpResponse
 from django.shortcuts import render, redirect
-from django.urls import path
+from django.urls import path, reverse
+from django.utils.html import format_html
 
-from .common import save_csv_products, save_file_orders
-from .models import Product, Order, ProductImages
+from jobs.models import Job
+from jobs.queue import enqueue, stage_file
+
+from . import search
+from .models import Product, Order, ProductImages, Export
 from .admin_mixins import ExportAsCsvMixin
 from .forms import CSVImportForm, FileImportForm
+from .signals import products_changed
 
 
 
@@ -21,6 +26,12 @@ class OrderInline(admin.TabularInline):
     # указываем промежуточную таблицу ManyToMany (через 'through'),
     # чтобы редактировать связи Product ↔ Order
 
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        """__str__ заказа показывает имя пользователя: варианты выбора загружаем вместе с ним одним JOIN."""
+        if db_field.name == "order":
+            kwargs["queryset"] = Order.objects.select_related("user")
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
 
 class ProductInline(admin.StackedInline):
     """
@@ -43,15 +54,38 @@ class ProductInline(admin.StackedInline):
     # Если бы использовали TabularInline — строки были бы в виде таблицы.
 
 
+ARCHIVE_INLINE_LIMIT = 1000  # больше товаров (выбраны "все N" в списке) — архивация фоновой задачей
+
+
+def message_job(request: HttpRequest, job: Job, action: str) -> None:
+    """Сообщение над списком: задача поставлена, её статус и результат — на странице задачи в админке."""
+    messages.info(request, format_html(
+        '{} queued as background job <a href="{}">#{}</a>',
+        action, reverse("admin:jobs_job_change", args=[job.pk]), job.pk,
+    ))
+
+
 @admin.action(description="Архивация продуктов")
 def mark_archived(modeladmin: admin.ModelAdmin, request: HttpRequest, queryset: QuerySet):
     """Функция, которая выполнит архивацию продукта."""
+    pks = list(queryset.values_list("pk", flat=True))
+    if len(pks) > ARCHIVE_INLINE_LIMIT:  # тысячи товаров — не в запросе
+        message_job(request, enqueue("shopapp.set_products_archived", {"pks": pks, "archived": True},
+                                     user=request.user), "Archiving")
+        return
     queryset.update(archived=True) # все записи которые были выделены в админке попадут в queryset, и затем массово обновятся(заархивируются)
+    products_changed.send(sender=Product, pks=pks, fields=("archived",)) # update() не отправляет post_save
 
 @admin.action(description="Разархивация продуктов")
 def mark_unarchived(modeladmin: admin.ModelAdmin, request: HttpRequest, queryset: QuerySet):
     """Функция, которая выполнит разархивацию продукта """
+    pks = list(queryset.values_list("pk", flat=True))
+    if len(pks) > ARCHIVE_INLINE_LIMIT:
+        message_job(request, enqueue("shopapp.set_products_archived", {"pks": pks, "archived": False},
+                                     user=request.user), "Unarchiving")
+        return
     queryset.update(archived=False) # все записи которые были выделены в админке попадут в queryset, и затем массово обновятся(заархивируются)
+    products_changed.send(sender=Product, pks=pks, fields=("archived",)) # update() не отправляет post_save
 
 
 @admin.register(Product)  # Регистрируем модель Product в админке (короткая запись)
@@ -121,6 +155,17 @@ class ProductAdmin(admin.ModelAdmin, ExportAsCsvMixin):
         return obj.description[:48] + "..."
         # иначе обрезаем и добавляем "..."
 
+    def get_search_results(self, request, queryset, search_term):
+        """
+        Поиск в списке товаров через FTS5-индекс вместо LIKE '%term%' по name/description.
+
+        Числовой запрос (цена) и БД без FTS-таблицы обрабатываются стандартным поиском по search_fields.
+        """
+        term = search_term.strip()
+        if not term or not search.is_available() or term.replace(".", "", 1).isdigit():
+            return super().get_search_results(request, queryset, search_term)
+        return search.search_queryset(queryset, term, rank=False), False
+
     def import_csv(self, request: HttpRequest) -> HttpResponse:
         # Вьюха для загрузки CSV файла
         if request.method == "GET":
@@ -138,10 +183,14 @@ class ProductAdmin(admin.ModelAdmin, ExportAsCsvMixin):
             }
             return render(request, 'admin/csv_fom.html', context=context, status=400)
 
-        save_csv_products( # вызываем функцию save_csv_products, которая прочитает CSV и создаст объекты Product в базе
-            file=form.files["csv_file"].file,  # берем файл CSV из загруженных через форму (поле "csv_file")
-            encoding=request.encoding,  # используем кодировку запроса, чтобы правильно читать текст
-        )
+        # импорт большого каталога длится минуты — его выполняет фоновая задача (shopapp.tasks),
+        # итог (счётчики и ошибки по строкам) — в результате задачи
+        job = enqueue("shopapp.import_products_csv", {
+            "path": stage_file(form.files["csv_file"]),  # файл CSV из загруженных через форму (поле "csv_file")
+            "encoding": request.encoding,  # кодировка запроса, чтобы правильно читать текст
+            "upsert": form.cleaned_data["update_existing"],  # обновлять товары с тем же именем
+        }, user=request.user)
+        message_job(request, job, "Import")
         return redirect(
             "..")  # перенаправляем пользователя обратно на список продуктов в админке после успешного импорта
 
@@ -170,6 +219,12 @@ class ProductInline(admin.StackedInline):
     model = Order.products.through # Используется, если связь ManyToMany.
     # through — это промежуточная таблица, которую Django создаёт автоматически для ManyToMany
 
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        """__str__ товара показывает автора: варианты выбора загружаем вместе с ним одним JOIN."""
+        if db_field.name == "product":
+            kwargs["queryset"] = Product.objects.select_related("created_by")
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
 
 
 
@@ -199,6 +254,12 @@ class OrderAdmin(admin.ModelAdmin):
         """Метод для подгрузки связанного обькта с заказом отношение один к одному или один ко многим """
         return Order.objects.select_related("user").prefetch_related("products")
 
+    def formfield_for_manytomany(self, db_field, request, **kwargs):
+        """Список товаров в форме заказа загружаем вместе с автором (его показывает __str__ товара)."""
+        if db_field.name == "products":
+            kwargs["queryset"] = Product.objects.select_related("created_by")
+        return super().formfield_for_manytomany(db_field, request, **kwargs)
+
     def user_verbose(self, obj: Order) -> str:
         """
         Возвращает имя пользователя для отображения в админке.
@@ -227,10 +288,11 @@ class OrderAdmin(admin.ModelAdmin):
             }
             return render(request, 'admin/csv_fom.html', context, status=400)
 
-        save_file_orders(
-            file=form.files["file"].file, # берем файл CSV из загруженных через форму (поле "file")
-            encoding=request.encoding, # используем кодировку запроса, чтобы правильно читать текст
-        )
+        job = enqueue("shopapp.import_orders_file", {
+            "path": stage_file(form.files["file"]), # файл из загруженных через форму (поле "file")
+            "encoding": request.encoding, # кодировка запроса, чтобы правильно читать текст
+        }, user=request.user)
+        message_job(request, job, "Import")
         return redirect(
             "..")  # перенаправляем пользователя обратно на список заказов
 
@@ -241,4 +303,28 @@ class OrderAdmin(admin.ModelAdmin):
         new_urls = [
             path("import-orders-file/", self.import_json, name="import_orders_file")
         ]
-        return new_urls + urls
\ No newline at end of file
+        return new_urls + urls
+
+
+@admin.register(Export)
+class ExportAdmin(admin.ModelAdmin):
+    """Выгрузки в файл (shopapp.exports): статус, части и ссылка на готовый файл. Создают их API и действие export_csv."""
+    list_display = "pk", "dataset", "format", "status", "shards", "rows", "size", "created_by", "created_at", "download"
+    list_filter = "status", "dataset"
+    list_select_related = "created_by",
+    ordering = "-pk",
+    readonly_fields = [field.name for field in Export._meta.fields if field.name != "filters"] + ["download"]
+    exclude = "filters",  # в выгрузке из админки — список всех выбранных pk
+
+    @admin.display(description="Файл")
+    def download(self, obj: Export) -> str:
+        if obj.status != Export.SUCCEEDED:
+            return "-"
+        return format_html('<a href="{}">{}</a>', reverse("shopapp:export-download", args=[obj.pk]), obj.file.name)
+
+    def has_add_permission(self, request: HttpRequest) -> bool:
+        return False
+
+    def has_change_permission(self, request: HttpRequest, obj=None) -> bool:
+        return False
+
@@ -1,13 +1,23 @@
-import csv
-# стандартный модуль Python для работы с CSV-файлами (чтение/запись)
 from django.db.models.options import Options
 # класс Options — это мета-информация о модели (через model._meta можно получить имя модели,
 # список её полей, название таблицы и т.п.)
 from django.db.models import QuerySet
 # тип данных для queryset — набора объектов, возвращаемых запросами к БД
-from django.http import HttpRequest, HttpResponse
+from django.http import HttpRequest, StreamingHttpResponse
 # HttpRequest — объект запроса (кто вызвал action, какие данные пришли)
-# HttpResponse — объект ответа (мы вернём CSV-файл как ответ браузеру)
+# StreamingHttpResponse — потоковый ответ (CSV-файл отдаётся браузеру по частям)
+from django.contrib import messages
+from django.contrib.admin.views.main import PAGE_VAR
+from django.urls import reverse
+from django.utils.html import format_html
+# messages, reverse, format_html — сообщение над списком со ссылкой на поставленную выгрузку
+# PAGE_VAR — номер страницы в строке запроса списка
+
+from .exports import start_export
+# start_export — выгрузка в файл фоновыми задачами, когда строк слишком много для одного запроса
+from .streaming import CHUNK_SIZE, streaming_csv_response
+# CHUNK_SIZE — сколько строк читать из БД за один раз
+# streaming_csv_response — собирает потоковый CSV-ответ (с gzip, если браузер его поддерживает)
 
 
 class ExportAsCsvMixin:
@@ -15,28 +25,51 @@ class ExportAsCsvMixin:
     Класс-примесь (mixin), который добавляет возможность экспорта данных в CSV.
     Примесь подключается к ModelAdmin и расширяет его функционал.
     """
-    def export_csv(self, request: HttpRequest, queryset: QuerySet):
+    export_inline_limit = 10000  # больше выбранных строк — файл пишут фоновые задачи (shopapp.exports)
+
+    def export_csv(self, request: HttpRequest, queryset: QuerySet) -> StreamingHttpResponse | None:
         """
         Метод, который будет превращать выбранные объекты админки в CSV
         и отдавать файл пользователю.
+
+        Файл отдаётся потоком: строки читаются из БД порциями через values_list,
+        без создания объектов модели, поэтому память не зависит от числа выбранных строк.
+        Больше export_inline_limit строк поток не успел бы за таймаут воркера — ставится выгрузка
+        фоновыми задачами, а над списком появляется ссылка на неё (файл — на её странице в админке).
         """
         meta: Options = self.model._meta  # получаем мета-информацию модели (поля, имя и т.д.)
 
-        field_name = [field.name for field in meta.fields]  # список имён всех полей модели для заголовков CSV
-
-        response = HttpResponse(content_type="text/csv")  # создаём HTTP-ответ с типом CSV
-
-        response["Content-Disposition"] = f"attachment; filename={meta}-export.csv"  # заставляем браузер скачать файл с именем
-
-        csv_writer = csv.writer(response)  # создаём CSV-писатель для записи в response.
+        if queryset.count() > self.export_inline_limit:
+            # в выгрузку идёт не список pk (при "выбрать все" их миллионы), а запрос списка:
+            # воркер по нему заново строит тот же queryset (shopapp.exports.SelectedRowsDataset)
+            query = request.GET.copy()
+            query.pop(PAGE_VAR, None)  # номер страницы на отбор не влияет
+            filters = {"model": meta.label_lower, "query": query.urlencode(), "user": request.user.pk}
+            if request.POST.get("select_across") != "1":
+                # отмечены флажки на странице — их не больше страницы списка
+                filters["pks"] = list(queryset.order_by("pk").values_list("pk", flat=True))
+            export = start_export("rows", filters=filters, user=request.user)
+            messages.info(request, format_html(
+                'Export queued as background job <a href="{}">#{}</a>',
+                reverse("admin:shopapp_export_change", args=[export.pk]), export.pk,
+            ))
+            return None  # остаёмся на списке объектов
 
-        csv_writer.writerow(field_name)  # записываем первую строку — заголовки колонок
+        field_name = [field.name for field in meta.concrete_fields]  # список имён всех полей модели для заголовков CSV
+        columns = [field.attname for field in meta.concrete_fields]  # имена колонок (для ForeignKey — created_by_id)
 
-        for obj in queryset:  # перебираем все выбранные объекты
-            csv_writer.writerow(
-                [getattr(obj, field) for field in field_name]
-            )  # записываем значения полей объекта как строку CSV
+        rows = (
+            queryset
+            .select_related(None)  # связанные объекты не нужны — берём только id
+            .values_list(*columns)  # только значения колонок, без объектов модели
+            .iterator(chunk_size=CHUNK_SIZE)  # курсор читает строки порциями
+        )
 
-        return response  # возвращаем сформированный CSV-файл пользователю
+        return streaming_csv_response(
+            request,
+            header=field_name,  # первая строка — заголовки колонок
+            rows=rows,
+            filename=f"{meta}-export.csv",  # заставляем браузер скачать файл с именем
+        )  # возвращаем потоковый CSV-файл пользователю
 
-    export_csv.short_description = "Export as CSV"  # описание метода для админки
\ No newline at end of file
+    export_csv.short_description = "Export as CSV"  # описание метода для админки
@@ -5,3 +5,7 @@ class ShopappConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'shopapp'
     verbose_name = 'Магазин'
+
+    def ready(self):
+        from . import signals  # noqa: F401 — подключаем обработчики сигналов (поисковый индекс и т.д.)
+        from mysite import sqlite  # noqa: F401 — PRAGMA для каждого нового соединения SQLite
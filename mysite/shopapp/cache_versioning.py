@@ -0,0 +1,125 @@
+"""
+Версионирование кеша по "поколениям" моделей.
+
+Для каждой модели в кеше хранится счётчик поколения (generation).
+Любая запись в модель (save, delete, queryset.update, bulk_create, изменение M2M)
+увеличивает счётчик, а ключи закешированных ответов включают текущие поколения моделей,
+от которых ответ зависит. После правки товара ключ меняется, и следующий запрос
+строит ответ заново — поэтому TTL кеша можно делать долгим (часы),
+не опасаясь показать устаревшие цены. Старые записи просто истекают по TTL.
+
+Поколение меняется только после фиксации транзакции (transaction.on_commit): иначе параллельный
+запрос успел бы прочитать ещё старые данные, увидеть уже новое поколение и закешировать
+устаревшую страницу под новым ключом на весь TTL.
+
+Пример:
+    @method_decorator(cache_page_versioned(60 * 60 * 6, Product), name="list")
+    class ProductViewSet(ModelViewSet): ...
+"""
+from functools import partial, wraps
+from time import time_ns
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Model
+from django.views.decorators.cache import cache_page
+
+from mysite.db_routers import use_primary
+
+GENERATION_KEY = "generation:{label}"  # ключ счётчика поколения модели в кеше
+GENERATION_HEADER = "X-Cache-Generation"  # заголовок ответа с поколениями, по которым он закеширован
+
+
+def _generation_key(model: type[Model]) -> str:
+    return GENERATION_KEY.format(label=model._meta.label_lower)
+
+
+def _initial_generation() -> int:
+    # Начальное значение зависит от времени: если счётчик вытеснили из кеша (или кеш очистили),
+    # новое поколение не совпадёт ни с одним старым и не "оживит" устаревшие страницы.
+    return time_ns() // 1000
+
+
+def get_generations(*models: type[Model]) -> dict[str, int]:
+    """Возвращает текущие поколения моделей: {"shopapp.product": 42, ...}."""
+    keys = {_generation_key(model): model._meta.label_lower for model in models}
+    generations = cache.get_many(list(keys))
+    for key in keys.keys() - generations.keys():
+        cache.add(key, _initial_generation(), timeout=None)  # add не перезапишет значение другого воркера
+        generations[key] = cache.get(key)
+    return {keys[key]: value for key, value in generations.items()}
+
+
+async def aget_generations(*models: type[Model]) -> dict[str, int]:
+    """Асинхронный вариант get_generations (async API кеша) для async-представлений."""
+    keys = {_generation_key(model): model._meta.label_lower for model in models}
+    generations = await cache.aget_many(list(keys))
+    for key in keys.keys() - generations.keys():
+        await cache.aadd(key, _initial_generation(), timeout=None)
+        generations[key] = await cache.aget(key)
+    return {keys[key]: value for key, value in generations.items()}
+
+
+def _bump(models: tuple[type[Model], ...]) -> None:
+    for model in models:
+        key = _generation_key(model)
+        current = cache.get(key)
+        # get/set не атомарны: два параллельных увеличения от одного N оба записали бы N + 1, и страница,
+        # закешированная между ними, осталась бы актуальной. Время в микросекундах делает значения разными,
+        # current + 1 — возрастающими, даже если часы отстают от сохранённого поколения.
+        # cache.incr не подходит: в FileBasedCache он пересохраняет значение с TTL по умолчанию (300 с).
+        new = max(current + 1, _initial_generation()) if current is not None else _initial_generation()
+        cache.set(key, new, timeout=None)
+
+
+def bump_generation(*models: type[Model]) -> None:
+    """
+    Увеличивает поколение моделей — все закешированные по ним ответы становятся неактуальными.
+    Внутри транзакции — после её фиксации (откат транзакции поколение не меняет).
+    """
+    transaction.on_commit(partial(_bump, models))
+
+
+def generation_tag(*models: type[Model]) -> str:
+    """
+    Строка с поколениями моделей для ключа кеша: "shopapp.product=42".
+
+    Ответ под этим ключом должен быть построен из основной БД: запрос переключается с реплики
+    на default (mysite.db_routers.use_primary) — отставшая реплика под новым поколением закешировала бы старые данные.
+    """
+    use_primary()
+    generations = get_generations(*models)
+    return ",".join(f"{label}={generations[label]}" for label in sorted(generations))
+
+
+async def ageneration_tag(*models: type[Model]) -> str:
+    """Асинхронный вариант generation_tag (тоже переключает запрос на основную БД)."""
+    use_primary()
+    generations = await aget_generations(*models)
+    return ",".join(f"{label}={generations[label]}" for label in sorted(generations))
+
+
+def cache_page_versioned(timeout: int, *models: type[Model]):
+    """
+    Аналог cache_page, у которого ключ кеша включает поколения указанных моделей.
+
+    Закешированный ответ помечается заголовком X-Cache-Generation,
+    чтобы было видно, для каких поколений данных он построен.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def tagged_view(request, *args, **kwargs):
+            response = view_func(request, *args, **kwargs)
+            response[GENERATION_HEADER] = request.cache_generation_tag
+            return response
+
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            tag = generation_tag(*models)
+            request.cache_generation_tag = tag
+            # key_prefix вычисляется на каждый запрос — после записи в модель ключ уже другой
+            return cache_page(timeout, key_prefix=tag)(tagged_view)(request, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,364 @@
+"""
+Выгрузки в файл фоновыми задачами (модель Export).
+
+Потоковые выгрузки (API download_csv, /orders/export/?format=ndjson, действие админки export_csv)
+не держат весь файл в памяти, но всё равно выполняются внутри запроса: большой каталог или все заказы
+не успевают выгрузиться за таймаут воркера gunicorn (30 с). Выгрузка через Export:
+
+    1. start_export() создаёт строку Export и ставит задачу shopapp.plan_export, запрос отвечает 202;
+    2. plan_export() считает строки набора и делит их на EXPORT_SHARDS диапазонов pk с равным числом строк
+       (граница — pk строки с номером k * count / N: запрос по индексу pk) и ставит по задаче на часть;
+    3. shopapp.export_shard пишет свою часть в отдельный файл (write_part) — части пишутся параллельно
+       в разных процессах run_workers. CSV-заголовок есть только в первой части; при compress каждая часть —
+       отдельный gzip-поток, а gzip-потоки, записанные подряд, — корректный gzip-файл (RFC 1952);
+    4. часть, закончившая последней, ставит shopapp.merge_export: части склеиваются побайтно (merge_parts).
+
+Файлы лежат в MEDIA_ROOT/EXPORTS_DIR/<случайный каталог>/ и отдаются только через
+/api/exports/<id>/download/ (владельцу выгрузки и сотрудникам), с докачкой по Range.
+Ошибка любой задачи выгрузки после всех повторов — выгрузка failed (fail_export, сигнал job_failed);
+готовый файл удаляется через EXPORTS_KEEP_HOURS часов (purge_expired, сигнал housekeeping).
+"""
+import math
+import os
+import shutil
+import uuid
+from collections import defaultdict
+from collections.abc import Iterable, Iterator
+from contextlib import contextmanager
+from datetime import timedelta
+from typing import BinaryIO
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.core.files.storage import default_storage
+from django.db.models import QuerySet
+from django.http import HttpRequest, QueryDict
+from django.utils import timezone
+
+from jobs.queue import enqueue
+from mysite.sqlite import serialized_writes
+
+from .models import Export, Order, Product
+from .streaming import FILE_CHUNK_SIZE, iter_csv, iter_gzip, iter_keyset_chunks, iter_ndjson, parse_since
+
+EXPORT_TASKS = ("shopapp.plan_export", "shopapp.export_shard", "shopapp.merge_export")
+
+
+def iter_order_records(queryset: QuerySet) -> Iterator[dict]:
+    """
+    Заказы из queryset.values(...) (pk, delivery_address, promocode, created_at, user_id) с pk товаров.
+
+    Заказы читаются порциями по pk, а товары заказов — одним запросом
+    к промежуточной таблице M2M на порцию, а не prefetch_related по всей таблице.
+    """
+    through = Order.products.through  # промежуточная таблица заказ <-> товар
+    for chunk in iter_keyset_chunks(queryset):
+        products = defaultdict(list)  # pk заказа -> список pk товаров
+        links = (
+            through.objects
+            .filter(order_id__in=[order["pk"] for order in chunk])
+            .order_by("order_id", "product_id")
+            .values_list("order_id", "product_id")
+        )
+        for order_id, product_id in links:
+            products[order_id].append(product_id)
+        for order in chunk:
+            yield {
+                "pk": order["pk"],  # первичный ключ заказа
+                "delivery_address": order["delivery_address"],  # Адрес заказа
+                "promocode": order["promocode"],  # промокод заказа
+                "created_at": order["created_at"],  # дата создания заказа
+                "user": order["user_id"],  # pk юзера сделавшего заказ
+                "products": products[order["pk"]],  # список pk - продуктов
+            }
+
+
+class Dataset:
+    """
+    Набор строк для выгрузки: queryset.values(...) с "pk", делится на части по диапазонам pk.
+
+    filters — Export.filters (JSON): параметры отбора, которые понимает queryset() набора.
+    """
+    fields: list[str] = []  # ключи записей и заголовок CSV
+    staff_only = False  # выгружать могут только сотрудники
+
+    def header(self, filters: dict) -> list[str]:
+        return self.fields
+
+    def queryset(self, filters: dict) -> QuerySet:
+        raise NotImplementedError
+
+    def records(self, queryset: QuerySet) -> Iterator[dict]:
+        for chunk in iter_keyset_chunks(queryset):
+            yield from chunk
+
+    def plan(self, filters: dict, max_shards: int) -> list[dict]:
+        """Делит набор на части с равным числом строк: [{"gte": pk, "lt": pk}, ...]."""
+        pks = self.queryset(filters).order_by("pk").values_list("pk", flat=True)
+        count = pks.count()
+        if not count:
+            return [{"gte": 0, "lt": 0}]  # пустая выгрузка — одна часть (CSV-заголовок)
+        shards = max(1, min(max_shards, math.ceil(count / settings.EXPORT_SHARD_MIN_ROWS)))
+        bounds = [pks[number * count // shards] for number in range(shards)]
+        bounds.append(pks.order_by("-pk")[0] + 1)  # строки, добавленные после плана, в выгрузку не попадут
+        return [{"gte": bounds[number], "lt": bounds[number + 1]} for number in range(shards)]
+
+    def rows(self, filters: dict, shard: dict) -> Iterator[dict]:
+        return self.records(self.queryset(filters).filter(pk__gte=shard["gte"], pk__lt=shard["lt"]))
+
+
+class ProductsDataset(Dataset):
+    """Товары; filters: since (created_at не раньше), archived."""
+    fields = ["pk", "name", "description", "price", "discount", "archived", "created_at"]
+
+    def queryset(self, filters: dict) -> QuerySet:
+        queryset = Product.objects.values(*self.fields)  # только нужные колонки, без объектов
+        if filters.get("since"):
+            queryset = queryset.filter(created_at__gte=parse_since(filters["since"]))
+        if filters.get("archived") is not None:
+            queryset = queryset.filter(archived=filters["archived"])
+        return queryset
+
+
+class OrdersDataset(Dataset):
+    """Заказы с pk товаров (как /orders/export/?format=ndjson); filters: since."""
+    fields = ["pk", "delivery_address", "promocode", "created_at", "user", "products"]
+    staff_only = True  # адреса доставки
+
+    def queryset(self, filters: dict) -> QuerySet:
+        queryset = Order.objects.values("pk", "delivery_address", "promocode", "created_at", "user_id")
+        if filters.get("since"):
+            queryset = queryset.filter(created_at__gte=parse_since(filters["since"]))
+        return queryset
+
+    def records(self, queryset: QuerySet) -> Iterator[dict]:
+        return iter_order_records(queryset)
+
+
+class SelectedRowsDataset(Dataset):
+    """
+    Строки, выбранные в админке (ExportAsCsvMixin.export_csv). Все поля модели, как в потоковой выгрузке админки.
+
+    filters — {"model": "shopapp.product", "query": "archived__exact=0&q=...", "user": pk, "pks": [...]}:
+    query — строка запроса списка в админке (фильтры, поиск), по ней воркер заново строит тот же queryset,
+    что видел сотрудник. pks — только если отмечены флажки на странице (не больше страницы списка);
+    при "выбрать все" их нет — выгружается весь отфильтрованный список.
+    """
+    staff_only = True
+
+    @staticmethod
+    def columns(filters: dict) -> tuple[list[str], list[str]]:
+        """Имена полей (заголовок) и колонок (для ForeignKey — created_by_id) модели."""
+        fields = apps.get_model(filters["model"])._meta.concrete_fields
+        return [field.name for field in fields], [field.attname for field in fields]
+
+    def header(self, filters: dict) -> list[str]:
+        return self.columns(filters)[0]
+
+    def queryset(self, filters: dict) -> QuerySet:
+        queryset = changelist_queryset(apps.get_model(filters["model"]), filters["query"], filters["user"])
+        if "pks" in filters:
+            queryset = queryset.filter(pk__in=filters["pks"])
+        return queryset.select_related(None).values("pk", *self.columns(filters)[1])
+
+    def rows(self, filters: dict, shard: dict) -> Iterator[dict]:
+        names, columns = self.columns(filters)
+        for row in super().rows(filters, shard):
+            yield {name: row[column] for name, column in zip(names, columns)}
+
+
+def changelist_queryset(model: type, query: str, user_id: int) -> QuerySet:
+    """
+    Queryset списка модели в админке для строки запроса query, как его видит пользователь user_id.
+
+    Отбор строит сам ModelAdmin (ChangeList: list_filter, поиск get_search_results, get_queryset) —
+    так же, как Django строит queryset для действия админки с "выбрать все".
+    """
+    request = HttpRequest()
+    request.method = "GET"
+    request.GET = QueryDict(query)
+    request.user = User.objects.get(pk=user_id)
+    model_admin = admin.site.get_model_admin(model)
+    return model_admin.get_changelist_instance(request).get_queryset(request)
+
+
+DATASETS: dict[str, Dataset] = {
+    "products": ProductsDataset(),
+    "orders": OrdersDataset(),
+    "rows": SelectedRowsDataset(),
+}
+API_DATASETS = ["products", "orders"]  # наборы, которые можно заказать через API (rows — только из админки)
+
+
+def export_dir(export: Export) -> str:
+    """Каталог выгрузки в MEDIA_ROOT: там и готовый файл, и части."""
+    return os.path.dirname(export.file.name)
+
+
+def part_path(export: Export, number: int) -> str:
+    return f"{export_dir(export)}/parts/{number}.part"
+
+
+def remove_files(export: Export) -> None:
+    if export.file.name:
+        shutil.rmtree(default_storage.path(export_dir(export)), ignore_errors=True)
+
+
+def start_export(dataset: str, *, format: str = Export.CSV, compress: bool = False,
+                 filters: dict | None = None, user=None) -> Export:
+    """Создаёт выгрузку и ставит задачу её планирования; файл будет готов, когда status станет succeeded."""
+    extension = format + (".gz" if compress else "")
+    with serialized_writes():
+        export = Export.objects.create(
+            dataset=dataset,
+            format=format,
+            compress=compress,
+            filters=filters or {},
+            # случайный каталог: по /media/ файл не найти перебором id
+            file=f"{settings.EXPORTS_DIR}/{uuid.uuid4().hex}/{dataset}-export.{extension}",
+            created_by=user if user is not None and user.is_authenticated else None,
+        )
+        enqueue("shopapp.plan_export", {"export": export.pk}, user=user)
+    return export
+
+
+def plan_export(export: Export) -> int:
+    """Делит выгрузку на части и ставит по задаче shopapp.export_shard на каждую; возвращает число частей."""
+    if export.status != Export.QUEUED:  # повтор задачи после того, как план уже записан
+        return export.shards
+    shards = DATASETS[export.dataset].plan(export.filters, settings.EXPORT_SHARDS)
+    with serialized_writes():
+        Export.objects.filter(pk=export.pk).update(status=Export.RUNNING, shards=len(shards))
+        for number, shard in enumerate(shards):
+            enqueue("shopapp.export_shard", {"export": export.pk, "number": number, "shard": shard},
+                    user=export.created_by)
+    return len(shards)
+
+
+def counted(records: Iterable[dict], counter: list[int]) -> Iterator[dict]:
+    """Пропускает записи насквозь, считая их в counter[0]."""
+    for record in records:
+        counter[0] += 1
+        yield record
+
+
+def csv_row(record: dict, header: list[str]) -> list:
+    """Значения записи в порядке заголовка; список (pk товаров заказа) — одной ячейкой через пробел."""
+    return [
+        " ".join(map(str, value)) if isinstance(value, list) else value
+        for value in (record[name] for name in header)
+    ]
+
+
+@contextmanager
+def replaced_atomically(path: str) -> Iterator[BinaryIO]:
+    """Файл для записи во временный файл этой попытки; после блока он атомарно заменяет path."""
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    try:
+        with open(tmp_path, "wb") as file:
+            yield file
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):  # ошибка при записи — недописанный файл не оставляем
+            os.remove(tmp_path)
+
+
+def write_part(export: Export, number: int, shard: dict) -> dict:
+    """
+    Пишет часть number выгрузки в файл и возвращает {"rows", "size"}.
+
+    Файл пишется во временный и переименовывается: повтор задачи после сбоя перезапишет часть целиком,
+    а склейка никогда не увидит недописанную. Временный файл свой у каждой попытки — повтор и ещё
+    не завершившаяся прошлая попытка (её аренда истекла) не пишут в один файл.
+    """
+    dataset = DATASETS[export.dataset]
+    counter = [0]
+    records = counted(dataset.rows(export.filters, shard), counter)
+    if export.format == Export.CSV:
+        header = dataset.header(export.filters)
+        chunks = iter_csv(header if number == 0 else None, (csv_row(record, header) for record in records))
+    else:
+        chunks = iter_ndjson(records)
+    if export.compress:
+        chunks = iter_gzip(chunks)
+
+    path = default_storage.path(part_path(export, number))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    size = 0
+    with replaced_atomically(path) as file:
+        for chunk in chunks:
+            data = chunk.encode() if isinstance(chunk, str) else chunk
+            file.write(data)
+            size += len(data)
+    return {"rows": counter[0], "size": size}
+
+
+def complete_part(export: Export, number: int, part: dict) -> bool:
+    """
+    Отмечает часть готовой; готовы все — ставит склейку (shopapp.merge_export) и возвращает True.
+
+    Строка перечитывается под блокировкой записи: части параллельных задач не затирают друг друга.
+    """
+    with serialized_writes():
+        export = Export.objects.get(pk=export.pk)
+        export.parts[str(number)] = part
+        export.save(update_fields=["parts"])
+        if export.status != Export.RUNNING or export.shards_done < export.shards:
+            return False
+        enqueue("shopapp.merge_export", {"export": export.pk}, user=export.created_by)
+    return True
+
+
+def merge_parts(export: Export) -> int:
+    """Склеивает части в файл выгрузки (без перекодирования) и возвращает его размер."""
+    path = default_storage.path(export.file.name)
+    with replaced_atomically(path) as target:
+        for number in range(export.shards):
+            with open(default_storage.path(part_path(export, number)), "rb") as source:
+                shutil.copyfileobj(source, target, FILE_CHUNK_SIZE)
+    shutil.rmtree(default_storage.path(f"{export_dir(export)}/parts"), ignore_errors=True)
+    return os.path.getsize(path)
+
+
+def finish_export(export: Export) -> dict:
+    """Склейка частей и статус succeeded со сроком хранения файла."""
+    if export.status != Export.RUNNING:  # повторная склейка (задача поставлена дважды) или выгрузка уже failed
+        return {"rows": export.rows, "size": export.size}
+    size = merge_parts(export)
+    rows = sum(part["rows"] for part in export.parts.values())
+    now = timezone.now()
+    with serialized_writes():
+        Export.objects.filter(pk=export.pk, status=Export.RUNNING).update(
+            status=Export.SUCCEEDED, rows=rows, size=size, finished_at=now,
+            expires_at=now + timedelta(hours=settings.EXPORTS_KEEP_HOURS),
+        )
+    return {"rows": rows, "size": size}
+
+
+def fail_export(pk: int, error: str) -> None:
+    """Задача выгрузки окончательно упала: выгрузка failed, части удаляются."""
+    with serialized_writes():
+        export = Export.objects.filter(pk=pk, status__in=[Export.QUEUED, Export.RUNNING]).first()
+        if export is None:
+            return
+        Export.objects.filter(pk=pk).update(status=Export.FAILED, error=error, finished_at=timezone.now())
+    remove_files(export)
+
+
+def purge_expired() -> int:
+    """
+    Удаляет файлы готовых выгрузок с истёкшим сроком (строка остаётся со статусом expired,
+    клиент получит 410, а не 404) и сами строки выгрузок старше JOBS_KEEP_DAYS дней.
+    """
+    now = timezone.now()
+    expired = list(Export.objects.filter(status=Export.SUCCEEDED, expires_at__lt=now).only("pk", "file"))
+    for export in expired:
+        remove_files(export)
+    with serialized_writes():
+        Export.objects.filter(pk__in=[export.pk for export in expired]).update(status=Export.EXPIRED)
+        Export.objects.filter(
+            status__in=[Export.EXPIRED, Export.FAILED], finished_at__lt=now - timedelta(days=settings.JOBS_KEEP_DAYS),
+        ).delete()
+    return len(expired)
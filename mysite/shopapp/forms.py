@@ -40,6 +40,12 @@ class OrderForm(forms.ModelForm):
             "products": forms.CheckboxSelectMultiple(),  # отображаем поле products в виде множества чекбоксов
         }
 
+    products = forms.ModelMultipleChoiceField(
+        # __str__ товара показывает автора: без JOIN форма делает запрос на каждый чекбокс
+        queryset=Product.objects.select_related("created_by"),
+        widget=forms.CheckboxSelectMultiple(),  # отображаем поле products в виде множества чекбоксов
+    )
+
     delivery_address = forms.CharField(
         label="Order address",
         help_text="Укажите город, улицу, номер дома и индекс",
@@ -67,6 +73,8 @@ class CSVImportForm(forms.Form):
     """
     csv_file = forms.FileField()
     # поле формы для загрузки файла; браузер покажет кнопку "Выберите файл"
+    update_existing = forms.BooleanField(required=False, label="Update products with the same name")
+    # галочка upsert: товары с уже существующим именем обновляются, а не дублируются
 
 class FileImportForm(forms.Form):
     """
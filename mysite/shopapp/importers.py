@@ -0,0 +1,447 @@
+"""
+Импорт каталога из файлов.
+
+ProductCSVImporter читает CSV потоком и пишет товары порциями:
+    - строки читаются по commit_size штук (память не зависит от размера файла);
+    - типы приводятся и проверяются конвертером колонки, который строится один раз по заголовку;
+    - каждая порция пишется bulk_create/bulk_update по batch_size строк в своей транзакции
+      через очередь записи SQLite (mysite.sqlite.serialized_writes);
+    - при upsert=True товары с тем же натуральным ключом (по умолчанию name) обновляются, а не дублируются;
+    - результат — ImportSummary: счётчики и ошибки по номерам строк, без эха всего каталога.
+
+Используется в API (POST /api/products/upload_csv/), в админке (ProductAdmin.import_csv)
+и в команде import_products_csv.
+
+OrderJSONImporter читает JSON-массив заказов потоком (без json.load всего файла),
+проверяет пользователей и товары запросами на множество id и пишет заказы
+и строки Order.products.through через bulk_create порциями в одной транзакции (тоже через очередь записи).
+Используется в админке (OrderAdmin.import_json).
+"""
+import csv
+import json
+from decimal import Decimal
+from collections.abc import Iterable, Iterator
+from dataclasses import asdict, dataclass, field
+from io import TextIOWrapper
+from itertools import islice
+from typing import IO
+
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.db import models
+
+from mysite.sqlite import serialized_writes
+
+from .cache_versioning import bump_generation
+from .models import Order, Product
+from .signals import products_changed
+
+
+@dataclass
+class RowError:
+    """Ошибка одной строки файла: номер строки и сообщения по колонкам."""
+    line: int
+    errors: dict[str, list[str]]
+
+
+@dataclass
+class ImportSummary:
+    """Итог импорта: сколько строк прочитано, создано, обновлено, отклонено."""
+    rows: int = 0
+    created: int = 0
+    updated: int = 0
+    failed: int = 0
+    errors: list[RowError] = field(default_factory=list)  # не больше max_errors первых ошибок
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+class Column:
+    """
+    Конвертер одной колонки CSV в значение поля модели.
+
+    Строится один раз по заголовку файла, а не на каждую строку:
+    поиск поля, to_python и валидаторы определяются заранее.
+    """
+
+    def __init__(self, name: str, model_field: models.Field):
+        self.name = name
+        self.field = model_field
+        self.attname = model_field.attname  # для ForeignKey — created_by_id
+        # для ForeignKey в файле лежит id связанного объекта — приводим его типом целевого поля
+        self.to_python = model_field.target_field.to_python if model_field.is_relation else model_field.to_python
+
+    def coerce(self, raw: str):
+        if raw == "":
+            # пустая ячейка: значение по умолчанию, NULL или пустая строка — что допускает поле
+            if self.field.has_default():
+                return self.field.get_default()
+            if self.field.null:
+                return None
+            if not self.field.blank:
+                raise ValidationError(self.field.error_messages["blank"], code="blank")
+            return ""
+        value = self.to_python(raw)
+        self.field.run_validators(value)
+        return value
+
+
+def _chunks(iterable: Iterable, size: int) -> Iterator[list]:
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def iter_json_array(text: IO[str], read_size: int = 64 * 1024) -> Iterator:
+    """
+    Потоково разбирает JSON-массив верхнего уровня: отдаёт элементы по одному.
+
+    Файл читается кусками по read_size символов, а элементы выделяются
+    JSONDecoder.raw_decode — в памяти одновременно только текущий кусок и один элемент.
+    """
+    decoder = json.JSONDecoder()
+    buffer, position, eof = "", 0, False
+    started = False  # прочитана ли открывающая "["
+    expect_value = True  # ждём элемент (после "[" или ","), а не "," / "]"
+
+    while True:
+        # пропускаем пробелы; если буфер кончился — дочитываем
+        while position < len(buffer) and buffer[position].isspace():
+            position += 1
+        if position >= len(buffer):
+            if eof:
+                raise ValueError("Unexpected end of JSON array")
+            buffer, position = buffer[position:] + text.read(read_size), 0
+            eof = position >= len(buffer)
+            continue
+
+        char = buffer[position]
+        if not started:
+            if char != "[":
+                raise ValueError("Expected a JSON array")
+            started, position = True, position + 1
+        elif char == "]":
+            return
+        elif not expect_value:
+            if char != ",":
+                raise ValueError(f"Expected ',' or ']' at position {position}")
+            expect_value, position = True, position + 1
+        else:
+            try:
+                value, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                # элемент не поместился в буфер целиком — дочитываем и пробуем снова
+                chunk = text.read(read_size)
+                eof = not chunk
+                buffer, position = buffer[position:] + chunk, 0
+                continue
+            if end == len(buffer) and not eof:
+                # число на границе буфера могло быть обрезано ("12" из "123") — дочитываем
+                chunk = text.read(read_size)
+                if chunk:
+                    buffer, position = buffer[position:] + chunk, 0
+                    continue
+                eof = True
+            yield value
+            expect_value, position = False, end
+            if position > read_size:
+                buffer, position = buffer[position:], 0  # отбрасываем разобранную часть буфера
+
+
+class BaseImporter:
+    """Общие настройки импортёров: размеры порций и сбор ошибок по строкам."""
+
+    def __init__(self, batch_size: int = 500, commit_size: int = 5000, max_errors: int = 100):
+        self.batch_size = batch_size  # строк в одном INSERT/UPDATE
+        self.commit_size = commit_size  # строк, одновременно находящихся в памяти
+        self.max_errors = max_errors
+
+    def add_error(self, summary: ImportSummary, line: int, errors: dict[str, list[str]]):
+        summary.failed += 1
+        if len(summary.errors) < self.max_errors:
+            summary.errors.append(RowError(line=line, errors=errors))
+
+
+class ProductCSVImporter(BaseImporter):
+    """
+    Потоковый импорт товаров из CSV.
+
+    Пример:
+        summary = ProductCSVImporter(upsert=True).run(file, encoding="utf-8")
+        summary.created, summary.updated, summary.errors
+    """
+    model = Product
+    natural_key = "name"  # колонка, по которой upsert находит существующий товар
+
+    def __init__(self, upsert: bool = False, **kwargs):
+        super().__init__(**kwargs)
+        self.upsert = upsert  # commit_size здесь — ещё и число строк в одной транзакции
+
+    def run(self, file: IO[bytes], encoding: str | None = None) -> ImportSummary:
+        """Импортирует бинарный файл (например, загруженный через форму)."""
+        text = TextIOWrapper(file, encoding or "utf-8", newline="")
+        try:
+            return self.run_text(text)
+        finally:
+            text.detach()  # не закрываем исходный файл вместе с обёрткой
+
+    def run_text(self, text: Iterable[str]) -> ImportSummary:
+        summary = ImportSummary()
+        reader = csv.reader(text)
+        header = next(reader, None)
+        if header is None:
+            return summary
+
+        try:
+            columns = self.build_columns(header)
+        except ValidationError as error:
+            self.add_error(summary, 1, {"__all__": error.messages})
+            return summary
+
+        numbered_rows = ((reader.line_num, row) for row in reader)
+        for chunk in _chunks(numbered_rows, self.commit_size):
+            summary.rows += len(chunk)
+            objects = self.coerce_rows(chunk, columns, summary)
+            with serialized_writes():  # своя транзакция на порцию, в очереди записи вместе с остальными писателями
+                self.save_chunk(objects, columns, summary)
+        return summary
+
+    def build_columns(self, header: list[str]) -> list[Column]:
+        """Сопоставляет заголовки CSV полям модели (по имени или attname, например created_by_id)."""
+        fields = {}
+        for model_field in self.model._meta.concrete_fields:
+            if model_field.primary_key or not model_field.editable:
+                continue  # pk и auto_now_add-поля из файла не принимаем
+            fields[model_field.name] = fields[model_field.attname] = model_field
+
+        unknown = [name for name in header if name not in fields]
+        if unknown:
+            raise ValidationError(f"Unknown columns: {', '.join(unknown)}")
+        columns = [Column(name, fields[name]) for name in header]
+
+        attnames = [column.attname for column in columns]
+        if len(set(attnames)) != len(attnames):
+            raise ValidationError("Duplicate columns")
+        missing = [
+            model_field.name
+            for model_field in set(fields.values())
+            if not model_field.has_default() and not model_field.null and not model_field.blank
+            and model_field.attname not in attnames
+        ]
+        if missing:
+            raise ValidationError(f"Missing required columns: {', '.join(sorted(missing))}")
+        if self.upsert and self.natural_key not in attnames:
+            raise ValidationError(f"Column {self.natural_key!r} is required for upsert")
+        return columns
+
+    def coerce_rows(self, chunk: list[tuple[int, list[str]]], columns: list[Column], summary: ImportSummary):
+        """Приводит значения к типам полей; строки с ошибками попадают в summary и пропускаются."""
+        valid = []
+        for line, row in chunk:
+            if len(row) != len(columns):
+                self.add_error(summary, line, {"__all__": [f"Expected {len(columns)} values, got {len(row)}"]})
+                continue
+            values, errors = {}, {}
+            for column, raw in zip(columns, row):
+                try:
+                    values[column.attname] = column.coerce(raw)
+                except ValidationError as error:
+                    errors[column.name] = error.messages
+            if errors:
+                self.add_error(summary, line, errors)
+            else:
+                valid.append((line, values))
+        return self.check_relations(valid, columns, summary)
+
+    def check_relations(self, rows: list[tuple[int, dict]], columns: list[Column], summary: ImportSummary):
+        """Проверяет id связанных объектов одним запросом на колонку, а не запросом на строку."""
+        for column in columns:
+            if not column.field.is_relation:
+                continue
+            ids = {values[column.attname] for _, values in rows} - {None}
+            related = column.field.related_model._default_manager
+            existing = set()
+            for batch in _chunks(ids, self.batch_size):
+                existing.update(related.filter(pk__in=batch).order_by().values_list("pk", flat=True))
+            checked = []
+            for line, values in rows:
+                value = values[column.attname]
+                if value is not None and value not in existing:
+                    self.add_error(summary, line, {column.name: [f"Object with id {value} does not exist"]})
+                else:
+                    checked.append((line, values))
+            rows = checked
+        return [values for _, values in rows]
+
+    def save_chunk(self, rows: list[dict], columns: list[Column], summary: ImportSummary):
+        """Пишет порцию строк: новые — bulk_create, существующие (при upsert) — bulk_update."""
+        attnames = [column.attname for column in columns]
+        created_pks, updated_pks = [], []
+        for batch in _chunks(rows, self.batch_size):
+            to_create, to_update = self.split_batch(batch)
+            created = self.model.objects.bulk_create(to_create, batch_size=self.batch_size)
+            update_fields = [name for name in attnames if name != self.natural_key]
+            if to_update and update_fields:
+                # bulk_update не заполняет auto_now (Product.updated_at — версия карточки в кеше списка)
+                auto_now = [
+                    model_field for model_field in self.model._meta.concrete_fields
+                    if getattr(model_field, "auto_now", False)
+                ]
+                for obj in to_update:
+                    for model_field in auto_now:
+                        model_field.pre_save(obj, add=False)
+                self.model.objects.bulk_update(
+                    to_update, update_fields + [model_field.attname for model_field in auto_now],
+                    batch_size=self.batch_size,
+                )
+            created_pks.extend(obj.pk for obj in created)
+            updated_pks.extend(obj.pk for obj in to_update)
+
+        summary.created += len(created_pks)
+        summary.updated += len(updated_pks)
+        # bulk_create/bulk_update не отправляют post_save — сообщаем об изменениях сами
+        if created_pks:
+            products_changed.send(sender=self.model, pks=created_pks)
+        if updated_pks:
+            products_changed.send(sender=self.model, pks=updated_pks, fields=tuple(attnames))
+
+    def split_batch(self, batch: list[dict]) -> tuple[list[models.Model], list[models.Model]]:
+        """Делит строки на новые объекты и обновления существующих (по натуральному ключу)."""
+        if not self.upsert:
+            return [self.model(**values) for values in batch], []
+
+        keys = {values[self.natural_key] for values in batch}
+        existing = dict(
+            self.model.objects
+            .filter(**{f"{self.natural_key}__in": keys})
+            .order_by("-pk")  # при дублях в базе обновляем самый ранний товар (он запишется последним)
+            .values_list(self.natural_key, "pk")
+        )
+        # ключ -> объект; повтор ключа внутри порции перезаписывает значения и в счётчиках учитывается один раз
+        pending: dict[str, models.Model] = {}
+        for values in batch:
+            key = values[self.natural_key]
+            if key in pending:
+                for name, value in values.items():
+                    setattr(pending[key], name, value)
+                continue
+            pending[key] = self.model(pk=existing.get(key), **values)
+        to_create = [obj for obj in pending.values() if obj.pk is None]
+        to_update = [obj for obj in pending.values() if obj.pk is not None]
+        return to_create, to_update
+
+
+class OrderJSONImporter(BaseImporter):
+    """
+    Импорт заказов из JSON-массива вида:
+        [{"delivery_address": "...", "promocode": "...", "user_id": 1, "product_ids": [1, 2]}, ...]
+
+    Вместо запросов на каждый заказ (get пользователя, create, filter товаров, products.set)
+    каждая порция из commit_size заказов обходится несколькими запросами:
+    проверка id пользователей и товаров по множествам, bulk_create заказов и bulk_create связей.
+    Весь файл импортируется в одной транзакции; некорректные записи пропускаются и попадают в отчёт.
+    Дата создания заказа, как и раньше, проставляется моделью (auto_now_add).
+    """
+    model = Order
+    text_fields = ("delivery_address", "promocode")
+
+    def run(self, file: IO[bytes], encoding: str | None = None) -> ImportSummary:
+        text = TextIOWrapper(file, encoding or "utf-8")
+        try:
+            return self.run_text(text)
+        finally:
+            text.detach()
+
+    def run_text(self, text: IO[str]) -> ImportSummary:
+        summary = ImportSummary()
+        columns = [Column(name, self.model._meta.get_field(name)) for name in self.text_fields]
+        records = enumerate(iter_json_array(text), start=1)  # номер записи в массиве вместо номера строки
+        try:
+            # весь файл — одна транзакция; в очереди записи остальные писатели ждут её на блокировке файла,
+            # а не падают с "database is locked" через busy_timeout
+            with serialized_writes():
+                for chunk in _chunks(records, self.commit_size):
+                    summary.rows += len(chunk)
+                    self.save_chunk(self.coerce_records(chunk, columns, summary), summary)
+        except ValueError as error:  # битый JSON: транзакция откатывается целиком
+            return ImportSummary(rows=summary.rows, failed=1, errors=[RowError(line=0, errors={"__all__": [str(error)]})])
+        if summary.created:
+            bump_generation(Order)  # bulk_create не отправляет post_save/m2m_changed
+        return summary
+
+    def coerce_records(self, chunk: list[tuple[int, object]], columns: list[Column], summary: ImportSummary):
+        """Проверяет записи порции; пользователи и товары проверяются двумя запросами на всю порцию."""
+        parsed = []
+        for line, record in chunk:
+            if not isinstance(record, dict):
+                self.add_error(summary, line, {"__all__": ["Expected a JSON object"]})
+                continue
+            values, errors = {}, {}
+            for column in columns:
+                raw = record.get(column.name)
+                try:
+                    values[column.attname] = column.coerce("" if raw is None else str(raw))
+                except ValidationError as error:
+                    errors[column.name] = error.messages
+            user_id, product_ids = record.get("user_id"), record.get("product_ids", [])
+            if not isinstance(user_id, int) or isinstance(user_id, bool):
+                errors["user_id"] = ["Expected an integer id"]
+            if not isinstance(product_ids, list) or not all(
+                isinstance(pk, int) and not isinstance(pk, bool) for pk in product_ids
+            ):
+                errors["product_ids"] = ["Expected a list of integer ids"]
+            if errors:
+                self.add_error(summary, line, errors)
+                continue
+            values["user_id"] = user_id
+            parsed.append((line, values, set(product_ids)))
+
+        user_ids = self.existing_pks(User, {values["user_id"] for _, values, _ in parsed})
+        prices = self.product_prices(set().union(*(pks for _, _, pks in parsed)))
+        valid = []
+        for line, values, pks in parsed:
+            errors = {}
+            if values["user_id"] not in user_ids:
+                errors["user_id"] = [f"User with id {values['user_id']} does not exist"]
+            if missing := pks - prices.keys():
+                errors["product_ids"] = [f"Products do not exist: {sorted(missing)}"]
+            if errors:
+                self.add_error(summary, line, errors)
+                continue
+            # связи пишутся bulk_create без m2m_changed — итоги заказа считаем сразу по уже загруженным ценам
+            values["total"] = sum((prices[pk] for pk in pks), Decimal("0.00"))
+            values["product_count"] = len(pks)
+            valid.append((values, sorted(pks)))
+        return valid
+
+    def existing_pks(self, model: type[models.Model], pks: set[int]) -> set[int]:
+        existing = set()
+        for batch in _chunks(pks, self.batch_size):
+            existing.update(model._default_manager.filter(pk__in=batch).order_by().values_list("pk", flat=True))
+        return existing
+
+    def product_prices(self, pks: set[int]) -> dict[int, Decimal]:
+        prices = {}
+        for batch in _chunks(pks, self.batch_size):
+            prices.update(Product.objects.filter(pk__in=batch).order_by().values_list("pk", "price"))
+        return prices
+
+    def save_chunk(self, rows: list[tuple[dict, list[int]]], summary: ImportSummary):
+        """Создаёт заказы порции, затем их связи с товарами — обе вставки через bulk_create."""
+        orders = self.model.objects.bulk_create(
+            [self.model(**values) for values, _ in rows],
+            batch_size=self.batch_size,
+        )
+        through = self.model.products.through
+        through.objects.bulk_create(
+            (
+                through(order_id=order.pk, product_id=product_id)
+                for order, (_, product_ids) in zip(orders, rows)
+                for product_id in product_ids
+            ),
+            batch_size=self.batch_size,
+        )
+        summary.created += len(orders)
@@ -0,0 +1,37 @@
+from django.core.management import BaseCommand
+from django.db import transaction
+
+from shopapp.models import Order
+from shopapp.order_totals import recalculate_order_totals
+
+
+class Command(BaseCommand):
+    """
+    Пересчёт денормализованных итогов заказов (Order.total, Order.product_count).
+
+    Нужен после правок заказов или цен в обход ORM (сырой SQL, импорт дампа).
+    Заказы пересчитываются диапазонами pk по --batch-size штук, каждый диапазон — в своей транзакции,
+    чтобы не держать блокировку записи SQLite на всё время пересчёта.
+
+    Пример:
+        python manage.py backfill_order_totals --batch-size 5000
+    """
+    help = "Recalculates stored order totals and product counts"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=5000, help="Сколько заказов пересчитывать за раз")
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        last_pk, updated = 0, 0
+        while True:
+            pks = list(
+                Order.objects.filter(pk__gt=last_pk).order_by("pk").values_list("pk", flat=True)[:batch_size]
+            )
+            if not pks:
+                break
+            with transaction.atomic():
+                updated += recalculate_order_totals(pks)
+            last_pk = pks[-1]
+            self.stdout.write(f"Recalculated orders up to pk={last_pk}")
+        self.stdout.write(self.style.SUCCESS(f"Done: {updated} orders"))
@@ -0,0 +1,203 @@
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+from timeit import default_timer
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.sessions.backends.base import SessionBase
+from django.core.management import BaseCommand, CommandError
+from django.test import Client
+from django.urls import reverse
+from django.utils import translation
+from django.utils.module_loading import import_string
+
+from shopapp.management.commands.bench_shop import percentile
+from shopapp.models import Order, Product
+
+SERVERS = {  # аргументы gunicorn для каждого варианта развёртывания
+    # класс воркера указан явно: gunicorn.conf.py выбирает его по GUNICORN_ASGI
+    "wsgi": ["mysite.wsgi:application", "--worker-class", "sync"],  # синхронные воркеры — по умолчанию в Dockerfile
+    "asgi": ["mysite.asgi:application", "--worker-class", "uvicorn_worker.UvicornWorker"],  # GUNICORN_ASGI=1
+}
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def fetch(connection, port: int, path: str, cookie: str):
+    """
+    Один GET по HTTP/1.1. Возвращает (статус, соединение для следующего запроса или None).
+
+    Соединение переиспользуется (keep-alive), если сервер его не закрывает:
+    синхронные воркеры gunicorn отвечают "Connection: close", uvicorn держит соединение.
+    """
+    reader, writer = connection or await asyncio.open_connection("127.0.0.1", port)
+    writer.write(
+        f"GET {path} HTTP/1.1\r\nHost: 127.0.0.1:{port}\r\nCookie: {cookie}\r\n\r\n".encode()
+    )
+    await writer.drain()
+    status_line, *lines = (await reader.readuntil(b"\r\n\r\n")).decode("latin-1").split("\r\n")
+    headers = {
+        name.strip().lower(): value.strip()
+        for name, _, value in (line.partition(":") for line in lines if line)
+    }
+    if "content-length" in headers:
+        await reader.readexactly(int(headers["content-length"]))
+    elif headers.get("transfer-encoding") == "chunked":
+        while size := int((await reader.readline()).strip(), 16):
+            await reader.readexactly(size + 2)  # данные куска и \r\n после него
+        await reader.readline()
+    else:
+        await reader.read()  # тело до закрытия соединения
+        headers["connection"] = "close"
+    if headers.get("connection", "").lower() == "close":
+        writer.close()
+        return int(status_line.split()[1]), None
+    return int(status_line.split()[1]), (reader, writer)
+
+
+async def probe(port: int, path: str, cookie: str) -> int:
+    """Один запрос на новом соединении; возвращает статус."""
+    status, connection = await fetch(None, port, path, cookie)
+    if connection is not None:
+        connection[1].close()
+    return status
+
+
+async def run_client(port: int, paths: list[str], cookie: str, deadline: float, offset: int, result: dict):
+    """Один клиент: запросы по кругу по paths, пока не истечёт deadline."""
+    connection = None
+    number = offset
+    while time.monotonic() < deadline:
+        path = paths[number % len(paths)]
+        number += 1
+        started = default_timer()
+        try:
+            status, connection = await asyncio.wait_for(fetch(connection, port, path, cookie), timeout=30)
+        except (OSError, asyncio.IncompleteReadError, asyncio.TimeoutError, ValueError):
+            result["errors"] += 1
+            connection = None
+            continue
+        if status == 200:
+            result["ms"].append((default_timer() - started) * 1000)
+        else:
+            result["errors"] += 1
+    if connection is not None:
+        connection[1].close()
+
+
+async def run_load(port: int, paths: list[str], cookie: str, concurrency: int, seconds: float) -> dict:
+    result = {"ms": [], "errors": 0}
+    deadline = time.monotonic() + seconds
+    await asyncio.gather(*(
+        run_client(port, paths, cookie, deadline, client, result) for client in range(concurrency)
+    ))
+    return result
+
+
+class Command(BaseCommand):
+    """
+    Нагрузочное сравнение развёртываний: gunicorn с синхронными воркерами (WSGI)
+    против gunicorn с воркерами uvicorn (ASGI) на JSON-выгрузках.
+
+    Для каждого варианта запускается gunicorn с одинаковым числом воркеров на свободном порту,
+    затем --concurrency асинхронных клиентов --seconds секунд по кругу запрашивают
+    выгрузки товаров, заказов (от имени временного сотрудника) и заказов пользователя.
+    Выводятся запросы в секунду, p50/p95/p99 и число ошибок (не 200, таймауты, обрывы).
+
+    Нужны gunicorn и uvicorn-worker (зависимости проекта) и данные в БД: хотя бы один товар.
+    Выгрузка заказов отдаёт все заказы сразу — на каталоге из generate_catalog её лучше исключить (--skip-orders).
+
+    Пример:
+        python manage.py bench_asgi --concurrency 200 --seconds 15 --workers 2
+    """
+    help = "Compares requests per second of the JSON export endpoints under WSGI and ASGI gunicorn workers"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--concurrency", type=int, default=200, help="Сколько одновременных клиентов")
+        parser.add_argument("--seconds", type=float, default=10, help="Длительность замера для каждого сервера")
+        parser.add_argument("--warmup", type=float, default=2, help="Прогрев (кеши, соединения) без учёта, с")
+        parser.add_argument("--workers", type=int, default=2, help="Воркеров gunicorn в каждом варианте")
+        parser.add_argument(
+            "--servers", nargs="+", choices=list(SERVERS), default=list(SERVERS), help="Какие варианты сравнить",
+        )
+        parser.add_argument("--skip-orders", action="store_true", help="Не запрашивать выгрузку всех заказов")
+
+    def handle(self, *args, **options):
+        product = Product.objects.order_by("pk").first()
+        if product is None:
+            raise CommandError("No products in the database: load fixtures or run generate_catalog first")
+        order = Order.objects.order_by("pk").first()
+
+        staff = User.objects.create_user(username=f"bench-asgi-{os.getpid()}", is_staff=True)
+        client = Client()
+        client.force_login(staff)  # сессия в БД: её cookie передают все клиенты нагрузки
+        session_key = client.cookies[settings.SESSION_COOKIE_NAME].value
+        try:
+            with translation.override("en"):
+                paths = [
+                    reverse("shopapp:products-export"),
+                    reverse("shopapp:users_orders_export", kwargs={"user_id": order.user_id if order else staff.pk}),
+                ]
+                if not options["skip_orders"]:
+                    paths.append(reverse("shopapp:orders-export"))
+            cookie = f"{settings.SESSION_COOKIE_NAME}={session_key}"
+            self.stdout.write(f"{options['concurrency']} clients, {options['workers']} workers: {', '.join(paths)}")
+            for name in options["servers"]:
+                self.bench(name, paths, cookie, options)
+        finally:
+            session_store: type[SessionBase] = import_string(f"{settings.SESSION_ENGINE}.SessionStore")
+            session_store(session_key).delete()
+            staff.delete()
+
+    def bench(self, name: str, paths: list[str], cookie: str, options) -> None:
+        port = free_port()
+        server = subprocess.Popen(
+            [
+                sys.executable, "-m", "gunicorn", *SERVERS[name],
+                "--bind", f"127.0.0.1:{port}", "--workers", str(options["workers"]),
+                "--backlog", str(max(2048, options["concurrency"] * 2)), "--log-level", "error",
+            ],
+            cwd=settings.BASE_DIR,
+            env={**os.environ, "DJANGO_DEBUG": "0"},
+            stdout=subprocess.DEVNULL,
+        )
+        try:
+            self.wait_ready(server, port, paths[0], cookie)
+            asyncio.run(run_load(port, paths, cookie, options["concurrency"], options["warmup"]))
+            result = asyncio.run(run_load(port, paths, cookie, options["concurrency"], options["seconds"]))
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+        self.report(name, result, options["seconds"])
+
+    @staticmethod
+    def wait_ready(server: subprocess.Popen, port: int, path: str, cookie: str) -> None:
+        deadline = time.monotonic() + 60
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                raise CommandError(f"gunicorn exited with code {server.returncode}: is uvicorn-worker installed?")
+            try:
+                status = asyncio.run(probe(port, path, cookie))
+            except OSError:
+                time.sleep(0.2)
+                continue
+            if status != 200:
+                raise CommandError(f"{path} returned {status}")
+            return
+        raise CommandError("gunicorn did not start in 60 seconds")
+
+    def report(self, name: str, result: dict, seconds: float) -> None:
+        timings = result["ms"] or [float("nan")]
+        line = (
+            f"{name:>5}: {len(result['ms']) / seconds:8.1f} req/s | p50 {percentile(timings, 50):8.2f} ms | "
+            f"p95 {percentile(timings, 95):8.2f} ms | p99 {percentile(timings, 99):8.2f} ms | {result['errors']} errors"
+        )
+        self.stdout.write(self.style.WARNING(line) if result["errors"] else self.style.SUCCESS(line))
@@ -0,0 +1,81 @@
+import random
+import shutil
+import tempfile
+from timeit import default_timer
+
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.management import BaseCommand
+
+from mysite.cache_backends import TwoTierFileBasedCache
+
+
+class Command(BaseCommand):
+    """
+    Бенчмарк кеш-бэкендов: FileBasedCache против TwoTierFileBasedCache.
+
+    Каждый бэкенд получает свой временный каталог, затем:
+        - set: записывается --keys ключей со значением, похожим на экспорт товаров
+        - get: --reads чтений с "горячим" набором ключей (20% ключей получают 80% чтений)
+        - cull: запись сверх MAX_ENTRIES, чтобы сравнить стоимость очистки каталога
+
+    Пример:
+        python manage.py bench_cache --keys 2000 --reads 50000
+    """
+    help = "Benchmarks the two-tier cache backend against the plain file-based cache"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--keys", type=int, default=2000, help="Сколько разных ключей записать")
+        parser.add_argument("--reads", type=int, default=50000, help="Сколько чтений выполнить")
+        parser.add_argument("--value-size", type=int, default=100, help="Сколько товаров в одном значении")
+        parser.add_argument("--seed", type=int, default=42, help="Seed генератора для воспроизводимости")
+
+    def handle(self, *args, **options):
+        value = [
+            {"pk": pk, "name": f"Product {pk}", "price": f"{pk}.00", "archived": False}
+            for pk in range(options["value_size"])
+        ]
+        backends = {
+            "filebased": lambda location, params: FileBasedCache(location, params),
+            "two-tier": lambda location, params: TwoTierFileBasedCache(
+                location, {**params, "OPTIONS": {**params["OPTIONS"], "SHARD_DEPTH": 1}}
+            ),
+        }
+        for name, factory in backends.items():
+            location = tempfile.mkdtemp(prefix=f"bench_cache_{name}_")
+            try:
+                params = {"OPTIONS": {"MAX_ENTRIES": options["keys"] * 10, "LOCAL_MAX_ENTRIES": 1000}}
+                cache = factory(location, params)
+                self.run_benchmark(name, cache, value, options)
+            finally:
+                shutil.rmtree(location, ignore_errors=True)
+
+    def run_benchmark(self, name: str, cache, value, options):
+        keys = [f"bench:{i}" for i in range(options["keys"])]
+        rng = random.Random(options["seed"])
+        hot_keys = keys[:max(1, len(keys) // 5)]
+
+        started = default_timer()
+        for key in keys:
+            cache.set(key, value, timeout=None)
+        set_seconds = default_timer() - started
+
+        started = default_timer()
+        for _ in range(options["reads"]):
+            key = rng.choice(hot_keys) if rng.random() < 0.8 else rng.choice(keys)
+            cache.get(key)
+        get_seconds = default_timer() - started
+
+        # заполнение до переполнения: каждая запись сверх MAX_ENTRIES запускает cull
+        cache._max_entries = len(keys)
+        started = default_timer()
+        for i in range(200):
+            cache.set(f"bench:overflow:{i}", value, timeout=None)
+        cull_seconds = default_timer() - started
+
+        self.stdout.write(
+            f"{name:>10}: set {len(keys) / set_seconds:10.0f} ops/s | "
+            f"get {options['reads'] / get_seconds:10.0f} ops/s | "
+            f"set with cull {200 / cull_seconds:8.0f} ops/s"
+        )
+        if hasattr(cache, "stats"):
+            self.stdout.write(f"{'':>10}  local tier: {cache.stats()}")
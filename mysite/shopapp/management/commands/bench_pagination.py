@@ -0,0 +1,88 @@
+from statistics import median
+from timeit import default_timer
+
+from django.core.management import BaseCommand
+from django.db import transaction
+from django.test import RequestFactory
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.request import Request
+
+from shopapp.models import Product
+from shopapp.pagination import KeysetPagination
+
+
+class Command(BaseCommand):
+    """
+    Бенчмарк пагинации API товаров: OFFSET (PageNumberPagination) против keyset (KeysetPagination).
+
+    Засевает временный каталог внутри транзакции (после замера она откатывается),
+    затем замеряет время получения одной и той же глубокой страницы двумя способами.
+
+    Пример:
+        python manage.py bench_pagination --rows 20000 --page 1000
+    """
+    help = "Compares deep-page latency of offset and keyset pagination"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=20000, help="Сколько товаров засеять")
+        parser.add_argument("--page", type=int, default=1000, help="Номер страницы для замера")
+        parser.add_argument("--page-size", type=int, default=10, help="Размер страницы")
+        parser.add_argument("--repeat", type=int, default=20, help="Сколько раз повторять замер")
+
+    def handle(self, *args, **options):
+        rows, page, page_size = options["rows"], options["page"], options["page_size"]
+        if rows < page * page_size:
+            rows = page * page_size + page_size  # страница должна существовать
+        self.stdout.write(f"Seeding {rows} products (rolled back afterwards)")
+
+        with transaction.atomic():
+            Product.objects.bulk_create(
+                (
+                    Product(name=f"Bench product {i % 997}", price=i % 5000, description="")
+                    for i in range(rows)
+                ),
+                batch_size=1000,
+            )
+            offset_times = self.measure_offset(page, page_size, options["repeat"])
+            keyset_times = self.measure_keyset(page, page_size, options["repeat"])
+            transaction.set_rollback(True)  # тестовые товары в базе не остаются
+
+        offset_ms, keyset_ms = median(offset_times) * 1000, median(keyset_times) * 1000
+        self.stdout.write(f"offset  page {page}: {offset_ms:.2f} ms (median of {options['repeat']})")
+        self.stdout.write(f"keyset  page {page}: {keyset_ms:.2f} ms (median of {options['repeat']})")
+        self.stdout.write(self.style.SUCCESS(f"Speedup: x{offset_ms / keyset_ms:.1f}"))
+
+    @staticmethod
+    def make_request(**params) -> Request:
+        return Request(RequestFactory().get("/shop/api/products/", params))
+
+    def measure_offset(self, page: int, page_size: int, repeat: int) -> list[float]:
+        """Время PageNumberPagination: COUNT(*) + LIMIT/OFFSET."""
+        paginator = PageNumberPagination()
+        paginator.page_size = page_size
+        request = self.make_request(page=page)
+        timings = []
+        for _ in range(repeat):
+            started = default_timer()
+            list(paginator.paginate_queryset(Product.objects.all(), request))
+            timings.append(default_timer() - started)
+        return timings
+
+    def measure_keyset(self, page: int, page_size: int, repeat: int) -> list[float]:
+        """Время KeysetPagination для той же страницы (курсор = последняя строка предыдущей)."""
+        paginator = KeysetPagination()
+        paginator.page_size = page_size
+        paginator.ordering = paginator.get_ordering(Product.objects.all())
+        previous_row = (
+            Product.objects.order_by("name", "price", "pk")[(page - 1) * page_size - 1]
+        )
+        cursor = paginator.encode_cursor([
+            paginator.get_row_value(previous_row, field) for field, _ in paginator.ordering
+        ])
+        request = self.make_request(cursor=cursor)
+        timings = []
+        for _ in range(repeat):
+            started = default_timer()
+            paginator.paginate_queryset(Product.objects.all(), request)
+            timings.append(default_timer() - started)
+        return timings
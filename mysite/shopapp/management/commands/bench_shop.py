@@ -0,0 +1,208 @@
+import json
+import platform
+import tracemalloc
+from datetime import datetime
+from math import ceil
+from pathlib import Path
+from timeit import default_timer
+
+import django
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import translation
+
+from mysite.query_budgets import QUERY_BUDGETS, seed_budget_data
+
+
+def percentile(values: list[float], percent: float) -> float:
+    """Перцентиль по методу ближайшего ранга (без интерполяции — как в большинстве нагрузочных отчётов)."""
+    ordered = sorted(values)
+    return ordered[max(0, ceil(percent / 100 * len(ordered)) - 1)]
+
+
+class Command(BaseCommand):
+    """
+    Бенчмарк страниц магазина, блога и API: время ответа, запросы, размер ответа, память.
+
+    Маршруты берутся из реестра бюджетов запросов (mysite.query_budgets) — тот же список,
+    что проверяет QueryBudgetTestCase. Данные засеваются Faker внутри транзакции
+    и после замера откатываются, кеш на время замера отключён (иначе меряется попадание в кеш).
+
+    Для каждого маршрута:
+        - p50/p95/p99 времени ответа по --repeat запросам (после --warmup прогревочных);
+        - число SQL-запросов, размер ответа в байтах и пик выделенной памяти (tracemalloc)
+          — отдельным запросом, чтобы трассировка памяти не искажала время.
+
+    Пример:
+        python manage.py bench_shop --size 1000 --output bench-before.json
+        python manage.py bench_shop --size 1000 --output bench-after.json
+        python manage.py bench_shop --compare bench-before.json bench-after.json
+    """
+    help = "Benchmarks shop, blog and API endpoints and compares benchmark runs"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--size", type=int, default=1000, help="Сколько объектов каждого вида засеять")
+        parser.add_argument("--repeat", type=int, default=50, help="Сколько замеров времени на маршрут")
+        parser.add_argument("--warmup", type=int, default=3, help="Сколько прогревочных запросов не учитывать")
+        parser.add_argument("--seed", type=int, default=42, help="Seed Faker для воспроизводимых данных")
+        parser.add_argument("--only", default="", help="Замерять только маршруты, имя которых содержит строку")
+        parser.add_argument("--output", default="bench_shop.json", help="Куда записать результаты (JSON)")
+        parser.add_argument(
+            "--compare", nargs=2, metavar=("BASELINE", "CURRENT"),
+            help="Не замерять, а сравнить два файла результатов",
+        )
+        parser.add_argument(
+            "--threshold", type=float, default=0.10,
+            help="Допустимый относительный рост времени, байт и памяти (0.10 = 10%%)",
+        )
+        parser.add_argument(
+            "--min-delta-ms", type=float, default=1.0,
+            help="Рост времени меньше этого порога считается шумом",
+        )
+
+    def handle(self, *args, **options):
+        if options["compare"]:
+            return self.compare(*options["compare"], options["threshold"], options["min_delta_ms"])
+
+        try:
+            from faker import Faker  # dev-зависимость: в production-окружении её нет
+        except ImportError:
+            raise CommandError("bench_shop requires Faker: pip install faker (dev dependency group)")
+        Faker.seed(options["seed"])
+
+        routes = {
+            name: budget for name, budget in QUERY_BUDGETS.items()
+            if not budget.skip and options["only"] in name
+        }
+        self.stdout.write(f"Seeding {options['size']} objects of each kind (rolled back afterwards)")
+        with (
+            override_settings(
+                CACHES={"default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}},
+                ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"],
+                DEBUG=False,  # без debug toolbar и накопления connection.queries — как в production
+            ),
+            translation.override("en"),
+            transaction.atomic(),
+        ):
+            objects = seed_budget_data(options["size"], fake=Faker())
+            client = Client()
+            results = {}
+            for name, budget in routes.items():
+                url = reverse(name, kwargs={param: objects[key].pk for param, key in budget.kwargs.items()})
+                results[name] = self.measure(client, url, objects["staff"], options["repeat"], options["warmup"])
+                self.stdout.write(
+                    f"{name:<42} p50 {results[name]['p50_ms']:8.2f} ms | p95 {results[name]['p95_ms']:8.2f} ms | "
+                    f"{results[name]['queries']:3d} queries | {results[name]['bytes']:8d} B"
+                )
+            transaction.set_rollback(True)  # тестовые данные в базе не остаются
+
+        report = {
+            "meta": {
+                "created_at": datetime.now().isoformat(timespec="seconds"),
+                "size": options["size"],
+                "repeat": options["repeat"],
+                "seed": options["seed"],
+                "python": platform.python_version(),
+                "django": django.get_version(),
+                "database": connection.vendor,
+            },
+            "endpoints": results,
+        }
+        Path(options["output"]).write_text(json.dumps(report, indent=2, ensure_ascii=False))
+        self.stdout.write(self.style.SUCCESS(f"Results for {len(results)} endpoints written to {options['output']}"))
+
+    @staticmethod
+    def request(client: Client, url: str) -> tuple[int, int]:
+        """GET с дочитыванием потокового ответа; возвращает (статус, размер тела в байтах)."""
+        response = client.get(url)
+        if response.streaming:
+            size = sum(len(chunk) for chunk in response.streaming_content)
+        else:
+            size = len(response.content)
+        return response.status_code, size
+
+    @staticmethod
+    def login(client: Client, user) -> None:
+        """Логинит клиента заново, если предыдущий запрос его разлогинил (страница выхода); вне замера."""
+        if "_auth_user_id" not in client.session:
+            client.force_login(user)
+
+    def measure(self, client: Client, url: str, user, repeat: int, warmup: int) -> dict:
+        for _ in range(warmup):
+            self.login(client, user)
+            self.request(client, url)
+
+        timings = []
+        for _ in range(repeat):
+            self.login(client, user)
+            started = default_timer()
+            self.request(client, url)
+            timings.append((default_timer() - started) * 1000)
+
+        # запросы, байты и память — одним отдельным запросом под трассировкой
+        self.login(client, user)
+        tracemalloc.start()
+        try:
+            with CaptureQueriesContext(connection) as queries:
+                status, size = self.request(client, url)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        return {
+            "url": url,
+            "status": status,
+            "p50_ms": round(percentile(timings, 50), 3),
+            "p95_ms": round(percentile(timings, 95), 3),
+            "p99_ms": round(percentile(timings, 99), 3),
+            "queries": len(queries),
+            "bytes": size,
+            "alloc_peak_kb": round(peak / 1024, 1),
+        }
+
+    def compare(self, baseline_path: str, current_path: str, threshold: float, min_delta_ms: float):
+        """
+        Сравнивает два прогона и перечисляет регрессии.
+
+        Регрессия — рост числа запросов (любой), рост p95 больше чем на threshold и на min_delta_ms,
+        рост размера ответа или пика памяти больше чем на threshold.
+        При регрессиях команда завершается с ошибкой (удобно в CI).
+        """
+        try:
+            baseline, current = (
+                json.loads(Path(path).read_text())["endpoints"] for path in (baseline_path, current_path)
+            )
+        except (OSError, ValueError, KeyError) as error:
+            raise CommandError(f"Cannot read benchmark results: {error}")
+
+        regressions = []
+        for name in sorted(baseline.keys() & current.keys()):
+            old, new = baseline[name], current[name]
+            problems = []
+            if new["queries"] > old["queries"]:
+                problems.append(f"queries {old['queries']} -> {new['queries']}")
+            if new["p95_ms"] > old["p95_ms"] * (1 + threshold) and new["p95_ms"] - old["p95_ms"] > min_delta_ms:
+                problems.append(f"p95 {old['p95_ms']:.2f} -> {new['p95_ms']:.2f} ms")
+            for key, unit in (("bytes", "B"), ("alloc_peak_kb", "KiB")):
+                if new[key] > old[key] * (1 + threshold):
+                    problems.append(f"{key} {old[key]} -> {new[key]} {unit}")
+
+            line = f"{name:<42} p95 {old['p95_ms']:8.2f} -> {new['p95_ms']:8.2f} ms"
+            if problems:
+                regressions.append(name)
+                self.stdout.write(self.style.ERROR(f"{line} | REGRESSION: {'; '.join(problems)}"))
+            else:
+                self.stdout.write(line)
+
+        for name in sorted(baseline.keys() - current.keys()):
+            self.stdout.write(self.style.WARNING(f"{name:<42} missing in {current_path}"))
+        for name in sorted(current.keys() - baseline.keys()):
+            self.stdout.write(self.style.WARNING(f"{name:<42} new endpoint (no baseline)"))
+
+        if regressions:
+            raise CommandError(f"{len(regressions)} endpoint(s) regressed: {', '.join(regressions)}")
+        self.stdout.write(self.style.SUCCESS("No regressions"))
@@ -0,0 +1,148 @@
+import random
+import shutil
+import sqlite3
+import tempfile
+from multiprocessing import get_context
+from pathlib import Path
+from statistics import quantiles
+from timeit import default_timer
+
+from django.conf import settings
+from django.core.management import BaseCommand
+
+from mysite.sqlite import pragma_statements
+
+SCHEMA = """
+CREATE TABLE product (id INTEGER PRIMARY KEY, name TEXT NOT NULL, price NUMERIC NOT NULL);
+CREATE TABLE "order" (id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL, total NUMERIC NOT NULL DEFAULT 0);
+CREATE TABLE order_products (order_id INTEGER NOT NULL, product_id INTEGER NOT NULL);
+CREATE INDEX order_products_order_idx ON order_products (order_id);
+CREATE INDEX order_user_idx ON "order" (user_id, id);
+"""
+
+DEFAULT_PROFILE = {  # то, с чем SQLite работает без настройки (и как работал проект раньше)
+    "pragmas": {"journal_mode": "delete", "synchronous": "full"},
+    "begin": "BEGIN",  # DEFERRED — как транзакции Django по умолчанию
+}
+
+
+def run_worker(path: str, statements: list[str], begin: str, seconds: float, read_ratio: float,
+               products: int, seed: int) -> dict:
+    """
+    Один "воркер gunicorn": своё соединение, смесь чтений страницы заказов и оформлений заказа.
+
+    Оформление заказа читает цены товаров и затем пишет заказ и строки заказа — в DEFERRED-транзакции
+    это повышение блокировки с чтения до записи, на котором конкурирующие писатели получают "database is locked".
+    Функция уровня модуля: выполняется в отдельном процессе (старт "spawn").
+    """
+    rng = random.Random(seed)
+    connection = sqlite3.connect(path, timeout=5, isolation_level=None)  # 5 с — таймаут sqlite3 по умолчанию
+    for statement in statements:
+        connection.execute(statement)
+    result = {"writes": 0, "reads": 0, "errors": 0, "write_ms": []}
+    deadline = default_timer() + seconds
+    while default_timer() < deadline:
+        started = default_timer()
+        try:
+            if rng.random() < read_ratio:
+                connection.execute(
+                    'SELECT o.id, o.total, COUNT(l.product_id) FROM "order" o '
+                    "LEFT JOIN order_products l ON l.order_id = o.id "
+                    "WHERE o.user_id = ? GROUP BY o.id ORDER BY o.id DESC LIMIT 20",
+                    (rng.randrange(100),),
+                ).fetchall()
+                result["reads"] += 1
+                continue
+            connection.execute(begin)
+            product_ids = rng.sample(range(1, products + 1), 3)
+            total = connection.execute(
+                "SELECT SUM(price) FROM product WHERE id IN (?, ?, ?)", product_ids,
+            ).fetchone()[0]
+            order_id = connection.execute(
+                'INSERT INTO "order" (user_id, total) VALUES (?, ?)', (rng.randrange(100), total),
+            ).lastrowid
+            connection.executemany(
+                "INSERT INTO order_products (order_id, product_id) VALUES (?, ?)",
+                [(order_id, product_id) for product_id in product_ids],
+            )
+            connection.execute("COMMIT")
+            result["writes"] += 1
+            result["write_ms"].append((default_timer() - started) * 1000)
+        except sqlite3.OperationalError:  # database is locked / busy
+            result["errors"] += 1
+            if connection.in_transaction:
+                connection.execute("ROLLBACK")
+    connection.close()
+    return result
+
+
+class Command(BaseCommand):
+    """
+    Бенчмарк конкурентной записи в SQLite: настройки по умолчанию против профиля mysite.sqlite.
+
+    Для каждого профиля создаётся временная БД (товары, заказы, строки заказов),
+    затем --workers процессов параллельно --seconds секунд читают страницу заказов
+    и оформляют заказы. Сравниваются пропускная способность, число ошибок "database is locked"
+    и p95 времени оформления заказа.
+
+    Профили:
+        default — journal_mode=DELETE, synchronous=FULL, транзакции DEFERRED;
+        tuned   — settings.SQLITE_PRAGMAS (WAL, synchronous=NORMAL, busy_timeout, ...), BEGIN IMMEDIATE.
+
+    Пример:
+        python manage.py bench_sqlite_concurrency --workers 8 --seconds 10
+    """
+    help = "Compares concurrent SQLite write throughput with default and tuned connection settings"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=4, help="Сколько процессов-воркеров запустить")
+        parser.add_argument("--seconds", type=float, default=5, help="Длительность замера для каждого профиля")
+        parser.add_argument("--read-ratio", type=float, default=0.7, help="Доля чтений среди операций")
+        parser.add_argument("--products", type=int, default=10000, help="Сколько товаров засеять")
+
+    def handle(self, *args, **options):
+        profiles = {
+            "default": DEFAULT_PROFILE,
+            "tuned": {"pragmas": settings.SQLITE_PRAGMAS, "begin": "BEGIN IMMEDIATE"},
+        }
+        for name, profile in profiles.items():
+            directory = tempfile.mkdtemp(prefix=f"bench_sqlite_{name}_")
+            try:
+                path = str(Path(directory) / "bench.sqlite3")
+                self.create_database(path, options["products"])
+                results = self.run_profile(path, pragma_statements(profile["pragmas"]), profile["begin"], options)
+                self.report(name, results, options["seconds"])
+            finally:
+                shutil.rmtree(directory, ignore_errors=True)
+
+    @staticmethod
+    def create_database(path: str, products: int) -> None:
+        connection = sqlite3.connect(path)
+        connection.executescript(SCHEMA)
+        connection.executemany(
+            "INSERT INTO product (id, name, price) VALUES (?, ?, ?)",
+            ((pk, f"Product {pk}", pk % 5000 + 0.99) for pk in range(1, products + 1)),
+        )
+        connection.commit()
+        connection.close()
+
+    @staticmethod
+    def run_profile(path: str, statements: list[str], begin: str, options) -> list[dict]:
+        arguments = [
+            (path, statements, begin, options["seconds"], options["read_ratio"], options["products"], seed)
+            for seed in range(options["workers"])
+        ]
+        with get_context("spawn").Pool(options["workers"]) as pool:
+            return pool.starmap(run_worker, arguments)
+
+    def report(self, name: str, results: list[dict], seconds: float) -> None:
+        writes = sum(result["writes"] for result in results)
+        reads = sum(result["reads"] for result in results)
+        errors = sum(result["errors"] for result in results)
+        write_ms = [ms for result in results for ms in result["write_ms"]]
+        p95 = quantiles(write_ms, n=20)[-1] if len(write_ms) > 1 else float("nan")
+        line = (
+            f"{name:>8}: {writes / seconds:8.0f} orders/s | {reads / seconds:8.0f} reads/s | "
+            f"p95 order {p95:7.2f} ms | {errors} locked errors"
+        )
+        self.stdout.write(self.style.WARNING(line) if errors else self.style.SUCCESS(line))
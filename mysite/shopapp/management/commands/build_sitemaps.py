@@ -0,0 +1,28 @@
+from django.core.management import BaseCommand
+
+from mysite.sitemap_files import build_sitemaps
+
+
+class Command(BaseCommand):
+    """
+    Сборка карты сайта в файлы (mysite.sitemap_files): индекс sitemap.xml и gzip-секции до 50 000 URL.
+
+    Перерисовываются только секции, строки которых изменились с прошлого запуска, поэтому
+    повторный запуск дешёвый: чтение pk и даты по индексу. Запускается при деплое; дальше карту
+    пересобирают воркеры (задача shopapp.build_sitemaps после изменения товаров и раз в час).
+
+    Пример:
+        python manage.py build_sitemaps
+        python manage.py build_sitemaps --force   # пересобрать все секции
+    """
+    help = "Builds the sitemap index and gzip sections, rebuilding only changed sections"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--force", action="store_true", help="Пересобрать все секции")
+
+    def handle(self, *args, **options):
+        stats = build_sitemaps(force=options["force"])
+        self.stdout.write(self.style.SUCCESS(
+            f"Sitemap: {stats['sections']} sections, {stats['built']} rebuilt, "
+            f"{stats['removed']} removed, {stats['urls']} URLs"
+        ))
@@ -1,6 +1,8 @@
 from django.core.management import BaseCommand  # Базовый класс для создания management-команд
 from shopapp.models import Product             # Модель Product для работы с товарами
 from django.db import transaction               # Модуль для атомарных транзакций
+from django.utils import timezone
+from shopapp.signals import products_changed    # Сигнал массового изменения товаров (кеш, поиск, итоги заказов)
 
 
 class Command(BaseCommand):
@@ -22,9 +24,13 @@ class Command(BaseCommand):
         self.stdout.write("Start demo bulk actions products update")  # Лог начала команды
 
         # Массовое обновление поля discount для всех товаров, содержащих "Smartphone" в имени
-        result = Product.objects.filter(
+        products = Product.objects.filter(
             name__contains="Smartphone", # __contains — это оператор Django для SQL LIKE '%Smartphone%'
-        ).update(discount=10) # Обновляем поле discount на 10
+        )
+        pks = list(products.values_list("pk", flat=True))
+        # Обновляем поле discount на 10; update() не заполняет auto_now — версию товара (updated_at) ставим сами
+        result = products.update(discount=10, updated_at=timezone.now())
+        products_changed.send(sender=Product, pks=pks, fields=("discount",))  # update() не отправляет post_save
 
         print(result)  # Вывод количества обновлённых записей
 
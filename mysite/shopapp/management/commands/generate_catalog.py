@@ -0,0 +1,199 @@
+from array import array
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+from timeit import default_timer
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from myauth.models import Profile
+from shopapp import search
+from shopapp.cache_versioning import bump_generation
+from shopapp.models import Order, Product
+from shopapp.synthetic import generate_orders, generate_products, generate_users, iter_chunk_specs, run_chunks
+
+
+@contextmanager
+def explicit_created_at(*models):
+    """
+    Внутри блока created_at моделей берётся из объекта, а не заполняется текущим временем (auto_now_add).
+
+    Меняет поле модели на уровне процесса — только для однопоточной команды, не для запросов.
+    """
+    fields = [model._meta.get_field("created_at") for model in models]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+class Command(BaseCommand):
+    """
+    Генератор синтетического каталога: миллионы пользователей, товаров, заказов и строк заказов.
+
+    В отличие от create_products / create_order (get_or_create и order.products.add по одной строке):
+        - строки генерируются порциями (--chunk-rows), при --workers > 1 — в пуле процессов;
+        - каждая порция пишется bulk_create (--batch-size строк на INSERT) в своей транзакции;
+        - строки заказов пишутся прямо в промежуточную таблицу M2M одним executemany на порцию;
+        - Order.total и Order.product_count считаются в Python по ценам сгенерированных товаров,
+          поэтому пересчёт итогов (сигналы m2m_changed) не нужен;
+        - одинаковый --seed даёт одинаковый каталог при любом числе процессов.
+
+    Заказы ссылаются только на сгенерированных пользователей и товары. created_at товаров и заказов
+    равномерно растёт с pk за последние --days дней (как у данных, накопленных со временем): иначе у всех
+    строк одна дата, и keyset-пагинация по created_at, ленты, lastmod карты сайта и дневные
+    агрегаты продаж проверялись бы на вырожденных данных. После генерации FTS-индекс товаров
+    обновляется по порциям, а кеш страниц товаров и заказов сбрасывается.
+
+    Пример:
+        python manage.py generate_catalog --users 100000 --products 1000000 --orders 2000000 --workers 4
+    """
+    help = "Generates a large synthetic catalog of users, products, orders and order lines"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=10000, help="Сколько пользователей создать")
+        parser.add_argument("--products", type=int, default=100000, help="Сколько товаров создать")
+        parser.add_argument("--orders", type=int, default=100000, help="Сколько заказов создать")
+        parser.add_argument("--max-lines", type=int, default=5, help="Максимум товаров в одном заказе")
+        parser.add_argument("--seed", type=int, default=42, help="Seed генератора для воспроизводимости")
+        parser.add_argument("--chunk-rows", type=int, default=20000, help="Строк в порции (одна транзакция)")
+        parser.add_argument("--batch-size", type=int, default=2000, help="Строк в одном INSERT")
+        parser.add_argument("--workers", type=int, default=1, help="Процессов для генерации строк (1 — без пула)")
+        parser.add_argument("--prefix", default="synthetic-", help="Префикс имён пользователей")
+        parser.add_argument("--days", type=int, default=365, help="За сколько дней до сейчас распределить created_at")
+
+    def handle(self, *args, **options):
+        if options["users"] < 1 or options["products"] < 1 or options["max_lines"] < 1:
+            raise CommandError("--users, --products and --max-lines must be positive")
+        if User.objects.filter(username__startswith=options["prefix"]).exists():
+            raise CommandError(f"Users with prefix {options['prefix']!r} already exist, choose another --prefix")
+
+        common = {
+            "seed": options["seed"],
+            "users": options["users"],
+            "products": options["products"],
+            "max_lines": options["max_lines"],
+            "prefix": options["prefix"],
+        }
+        started = default_timer()
+        self.until = timezone.now()
+        self.span = timedelta(days=max(options["days"], 0))
+        user_pks = self.create_users(
+            iter_chunk_specs(options["users"], options["chunk_rows"], **common), options,
+        )
+        product_pks, prices = self.create_products(
+            iter_chunk_specs(options["products"], options["chunk_rows"], **common), user_pks, options,
+        )
+        lines = self.create_orders(
+            iter_chunk_specs(options["orders"], options["chunk_rows"], **common), user_pks, product_pks, prices, options,
+        )
+        bump_generation(Product, Order)  # закешированные списки товаров и заказов устарели
+        self.stdout.write(self.style.SUCCESS(
+            f"Generated {len(user_pks)} users, {len(product_pks)} products, "
+            f"{options['orders']} orders with {lines} lines in {default_timer() - started:.1f}s"
+        ))
+
+    def report(self, kind: str, done: int, total: int, started: float) -> None:
+        elapsed = default_timer() - started
+        self.stdout.write(f"{kind}: {done}/{total} ({done / elapsed:,.0f} rows/s)")
+
+    def created_at(self, index: int, total: int):
+        """Дата создания строки с номером index из total: от now - days до now, по возрастанию."""
+        return self.until - self.span + self.span * (index / total)
+
+    def create_users(self, specs, options) -> array:
+        """Создаёт пользователей (с профилями) и возвращает их pk по индексу генерации."""
+        password = make_password(None)  # непригодный для входа пароль, хешируется один раз на всех
+        pks = array("q")
+        started = default_timer()
+        for rows in run_chunks(generate_users, specs, options["workers"]):
+            with transaction.atomic():
+                users = User.objects.bulk_create(
+                    (
+                        User(username=username, first_name=first_name, last_name=last_name, email=email,
+                             password=password)
+                        for username, first_name, last_name, email in rows
+                    ),
+                    batch_size=options["batch_size"],
+                )
+                Profile.objects.bulk_create(
+                    (Profile(user_id=user.pk) for user in users), batch_size=options["batch_size"],
+                )
+            pks.extend(user.pk for user in users)
+            self.report("users", len(pks), options["users"], started)
+        return pks
+
+    def create_products(self, specs, user_pks: array, options) -> tuple[array, array]:
+        """Создаёт товары; возвращает их pk и цены в копейках (по индексу генерации) для итогов заказов."""
+        pks, prices = array("q"), array("q")
+        started = default_timer()
+        for rows in run_chunks(generate_products, specs, options["workers"]):
+            with transaction.atomic(), explicit_created_at(Product):
+                products = Product.objects.bulk_create(
+                    (
+                        Product(
+                            created_at=self.created_at(len(pks) + number, options["products"]),
+                            name=name,
+                            description=description,
+                            price=Decimal(price_cents).scaleb(-2),
+                            discount=discount,
+                            archived=archived,
+                            created_by_id=user_pks[user_index] if user_index is not None else None,
+                        )
+                        for number, (name, description, price_cents, discount, archived, user_index)
+                        in enumerate(rows)
+                    ),
+                    batch_size=options["batch_size"],
+                )
+                search.index_products(product.pk for product in products)  # новые товары сразу находятся поиском
+            pks.extend(product.pk for product in products)
+            prices.extend(row[2] for row in rows)
+            self.report("products", len(pks), options["products"], started)
+        return pks, prices
+
+    def create_orders(self, specs, user_pks: array, product_pks: array, prices: array, options) -> int:
+        """Создаёт заказы и строки заказов (вставка в промежуточную таблицу); возвращает число строк."""
+        # строк заказов в несколько раз больше, чем заказов: вставляем их executemany из кортежей,
+        # без создания объектов модели и компиляции INSERT по значениям (это основная часть времени bulk_create)
+        through = Order.products.through._meta
+        insert_lines = (
+            f"INSERT INTO {connection.ops.quote_name(through.db_table)} "
+            f"({connection.ops.quote_name(through.get_field('order').column)}, "
+            f"{connection.ops.quote_name(through.get_field('product').column)}) VALUES (%s, %s)"
+        )
+        created = lines = 0
+        started = default_timer()
+        for rows in run_chunks(generate_orders, specs, options["workers"]):
+            with transaction.atomic(), explicit_created_at(Order):
+                orders = Order.objects.bulk_create(
+                    (
+                        Order(
+                            created_at=self.created_at(created + number, options["orders"]),
+                            user_id=user_pks[user_index],
+                            delivery_address=address,
+                            promocode=promocode,
+                            total=Decimal(sum(prices[index] for index in product_indexes)).scaleb(-2),
+                            product_count=len(product_indexes),
+                        )
+                        for number, (user_index, address, promocode, product_indexes) in enumerate(rows)
+                    ),
+                    batch_size=options["batch_size"],
+                )
+                through_rows = [
+                    (order.pk, product_pks[index])
+                    for order, (_, _, _, product_indexes) in zip(orders, rows)
+                    for index in product_indexes
+                ]
+                with connection.cursor() as cursor:
+                    cursor.executemany(insert_lines, through_rows)
+            created += len(orders)
+            lines += len(through_rows)
+            self.report("orders", created, options["orders"], started)
+        return lines
@@ -0,0 +1,95 @@
+import os
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import get_context
+from timeit import default_timer
+
+from django.conf import settings
+from django.core.management import BaseCommand
+from django.db.models import Model
+from django.utils import timezone
+
+from mysite import thumbnails
+from myauth.models import Profile
+from shopapp.models import Product, ProductImages
+from shopapp.signals import products_changed
+
+# модели и поля картинок, для которых строятся варианты
+TARGETS = ((Product, "preview"), (ProductImages, "image"), (Profile, "avatar"))
+
+
+class Command(BaseCommand):
+    """
+    Строит уменьшенные копии уже загруженных картинок (mysite.thumbnails): превью и изображения
+    товаров, аватары.
+
+    Новые загрузки получают варианты сразу (сигналы post_save), команда нужна для файлов,
+    загруженных раньше, и после смены THUMBNAIL_WIDTHS / THUMBNAIL_FORMATS / THUMBNAIL_QUALITY.
+    Декодирование и кодирование изображений упирается в CPU, поэтому файлы обрабатываются
+    в пуле процессов (--workers), а в БД результаты пишет только основной процесс — порциями
+    через queryset.update, без post_save каждой строки.
+
+    Строки, варианты которых построены для текущего файла с текущими параметрами, пропускаются;
+    --force пересобирает все варианты заново (в т.ч. перезаписывает уже существующие файлы).
+    """
+    help = "Builds WebP/JPEG thumbnail variants for existing product previews, product images and avatars"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers", type=int, default=os.cpu_count() or 1,
+            help="Сколько процессов кодируют изображения (1 — в текущем процессе)",
+        )
+        parser.add_argument("--force", action="store_true", help="Пересобрать варианты всех картинок")
+
+    def handle(self, *args, **options):
+        started = default_timer()
+        # имя файла -> строки, которые на него ссылаются (один файл мог попасть в несколько строк)
+        pending = defaultdict(list)
+        for model, field_name in TARGETS:
+            attname = thumbnails.variants_attname(field_name)
+            rows = model.objects.exclude(**{f"{field_name}__isnull": True}).exclude(**{field_name: ""})
+            for pk, name, manifest in rows.values_list("pk", field_name, attname).iterator():
+                if options["force"] or not thumbnails.is_current(manifest or {}, name):
+                    pending[name].append((model, field_name, pk))
+        self.stdout.write(f"Build thumbnails for {len(pending)} files")
+
+        built = 0
+        for name, manifest in self.build(list(pending), options["workers"], options["force"]):
+            rows = defaultdict(list)
+            for model, field_name, pk in pending[name]:
+                rows[model, field_name].append(pk)
+            for (model, field_name), pks in rows.items():
+                self.save(model, field_name, pks, manifest)
+            built += bool(manifest.get("variants"))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Built variants for {built} of {len(pending)} files in {default_timer() - started:.1f}s"
+        ))
+
+    @staticmethod
+    def build(names: list[str], workers: int, overwrite: bool):
+        """Отдаёт (имя файла, описание вариантов) по мере готовности: в текущем процессе или в пуле."""
+        if workers <= 1 or len(names) <= 1:
+            for name in names:
+                yield name, thumbnails.build_variants(name, overwrite=overwrite)
+            return
+        # "spawn": процессы не наследуют соединение с БД; настройки (в т.ч. подменённые в тестах) — от нас
+        overrides = {name: getattr(settings, name) for name in thumbnails.WORKER_SETTINGS}
+        with ProcessPoolExecutor(
+            max_workers=workers, mp_context=get_context("spawn"),
+            initializer=thumbnails.setup_worker, initargs=(overrides,),
+        ) as pool:
+            futures = [pool.submit(thumbnails.build_variants, name, overwrite=overwrite) for name in names]
+            for future in as_completed(futures):
+                manifest = future.result()
+                yield manifest["source"], manifest
+
+    @staticmethod
+    def save(model: type[Model], field_name: str, pks: list[int], manifest: dict) -> None:
+        """Записывает описание вариантов в строки pks; у товаров — вместе с новой версией карточки."""
+        values = {thumbnails.variants_attname(field_name): manifest}
+        if model is Product:
+            values["updated_at"] = timezone.now()  # карточка в кеше списка перерисуется с <picture>
+        model.objects.filter(pk__in=pks).update(**values)
+        if model is Product:
+            products_changed.send(sender=Product, pks=pks, fields=tuple(values))  # update() не отправляет post_save
@@ -0,0 +1,40 @@
+from django.core.management import BaseCommand, CommandError
+
+from shopapp.importers import ProductCSVImporter
+
+
+class Command(BaseCommand):
+    """
+    Импорт товаров из CSV-файла тем же импортёром, что и в API и админке.
+
+    Пример:
+        python manage.py import_products_csv catalog.csv --upsert --commit-size 20000
+    """
+    help = "Imports products from a CSV file"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Путь к CSV-файлу (первая строка — заголовки полей Product)")
+        parser.add_argument("--encoding", default="utf-8", help="Кодировка файла")
+        parser.add_argument("--upsert", action="store_true", help="Обновлять товары с тем же именем")
+        parser.add_argument("--batch-size", type=int, default=500, help="Строк в одном INSERT/UPDATE")
+        parser.add_argument("--commit-size", type=int, default=5000, help="Строк в одной транзакции")
+
+    def handle(self, *args, **options):
+        importer = ProductCSVImporter(
+            upsert=options["upsert"],
+            batch_size=options["batch_size"],
+            commit_size=options["commit_size"],
+        )
+        try:
+            with open(options["path"], encoding=options["encoding"], newline="") as file:
+                summary = importer.run_text(file)
+        except OSError as error:
+            raise CommandError(error)
+
+        for error in summary.errors:
+            self.stderr.write(f"line {error.line}: {error.errors}")
+        style = self.style.WARNING if summary.failed else self.style.SUCCESS
+        self.stdout.write(style(
+            f"Rows: {summary.rows}, created: {summary.created}, "
+            f"updated: {summary.updated}, failed: {summary.failed}"
+        ))
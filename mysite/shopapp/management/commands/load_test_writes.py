@@ -0,0 +1,160 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+from multiprocessing import get_context
+from pathlib import Path
+from statistics import quantiles
+from timeit import default_timer
+
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError
+from django.db import connection
+
+ADDRESS = "Город Москва Улица Пушкина Дом 66А Квартира 17"  # формат, который пропускает валидатор OrderForm
+
+
+def run_worker(overrides: dict, worker: int, requests: int) -> dict:
+    """
+    Один воркер: отдельный процесс с собственным Django и соединением к копии БД.
+
+    Половина запросов — оформление заказа (OrderCreateView), половина — регистрация (RegisterView:
+    пользователь, профиль и сессия). Выполняется в процессе, запущенном через "spawn",
+    поэтому настраивает Django сам: overrides подменяют настройки до django.setup().
+    """
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "mysite.settings")
+    import django
+    from django.conf import settings as worker_settings
+
+    for name, value in overrides.items():
+        setattr(worker_settings, name, value)
+    django.setup()
+
+    from django.contrib.auth.models import User
+    from django.db import OperationalError
+    from django.test import Client
+    from django.urls import reverse
+    from django.utils import translation
+
+    from mysite.sqlite import serialized_writes
+    from shopapp.models import Product
+
+    translation.activate("en")
+    client = Client()
+    for _ in range(100):  # подготовка воркера не входит в замер: без очереди записи её повторяем до успеха
+        try:
+            with serialized_writes():
+                user = User.objects.create_user(username=f"load-{worker}", password="qwerty")
+                product_ids = [
+                    Product.objects.create(name=f"Load {worker}-{i}", price=100 + i, created_by=user).pk
+                    for i in range(3)
+                ]
+                client.force_login(user)
+            break
+        except OperationalError:
+            time.sleep(0.05)
+    else:
+        raise RuntimeError(f"Worker {worker} could not prepare its user and products")
+
+    result = {"ok": 0, "locked": 0, "failed": 0, "ms": []}
+    for number in range(requests):
+        started = default_timer()
+        try:
+            if number % 2:
+                response = client.post(reverse("shopapp:order_create"), {
+                    "user": user.pk, "products": product_ids, "delivery_address": ADDRESS, "promocode": "",
+                })
+            else:
+                response = Client().post(reverse("myauth:register"), {
+                    "username": f"load-{worker}-{number}", "password1": "Very-long-pass-42", "password2": "Very-long-pass-42",
+                })
+        except OperationalError as error:
+            result["locked" if "locked" in str(error) else "failed"] += 1
+            continue
+        if response.status_code == 302:
+            result["ok"] += 1
+            result["ms"].append((default_timer() - started) * 1000)
+        else:
+            result["failed"] += 1
+    return result
+
+
+class Command(BaseCommand):
+    """
+    Нагрузочный тест пишущих путей SQLite: с очередью записи (mysite.sqlite.serialized_writes) и без неё.
+
+    Текущая БД копируется во временный файл (sqlite backup API, схема и миграции уже на месте),
+    затем --workers процессов одновременно оформляют заказы и регистрируют пользователей
+    через настоящие представления (test Client). Для каждого режима выводятся число успешных
+    запросов, ошибок "database is locked", пропускная способность и p95.
+
+    --busy-timeout задаёт, сколько SQLite ждёт блокировку (мс). Короткое ожидание моделирует
+    всплеск нагрузки, при котором без очереди писатели не дожидаются друг друга.
+
+    Пример:
+        python manage.py load_test_writes --workers 16 --requests 100 --busy-timeout 100
+    """
+    help = "Load-tests concurrent order creation and registration with and without the SQLite write queue"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=8, help="Сколько процессов-воркеров запустить")
+        parser.add_argument("--requests", type=int, default=50, help="Сколько POST-запросов на воркер")
+        parser.add_argument(
+            "--busy-timeout", type=int, default=settings.SQLITE_PRAGMAS.get("busy_timeout", 5000),
+            help="PRAGMA busy_timeout для воркеров, мс",
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != "sqlite":
+            raise CommandError("load_test_writes works only with the SQLite backend")
+
+        for mode in ("unserialized", "serialized"):
+            directory = tempfile.mkdtemp(prefix=f"load_test_{mode}_")
+            try:
+                path = Path(directory) / "db.sqlite3"
+                self.copy_database(path)
+                overrides = {
+                    "DATABASES": {"default": {**settings.DATABASES["default"], "NAME": path}},
+                    "SQLITE_PRAGMAS": {**settings.SQLITE_PRAGMAS, "busy_timeout": options["busy_timeout"]},
+                    "SQLITE_WRITE_LOCK": str(path) + ".write-lock" if mode == "serialized" else "",
+                    "CACHES": {"default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}},
+                    "ALLOWED_HOSTS": ["testserver"],
+                    "DEBUG": False,
+                    # хеширование паролей — не предмет теста, быстрый хешер оставляет время на запись
+                    "PASSWORD_HASHERS": ["django.contrib.auth.hashers.MD5PasswordHasher"],
+                }
+                started = default_timer()
+                with get_context("spawn").Pool(options["workers"]) as pool:
+                    results = pool.starmap(
+                        run_worker, [(overrides, worker, options["requests"]) for worker in range(options["workers"])],
+                    )
+                locked = self.report(mode, results, default_timer() - started)
+                if mode == "serialized" and locked:
+                    raise CommandError(f"{locked} writes failed with \"database is locked\" despite the write queue")
+            finally:
+                shutil.rmtree(directory, ignore_errors=True)
+
+    @staticmethod
+    def copy_database(path: Path) -> None:
+        """Копия текущей БД через backup API (согласованный снимок даже при работающем сайте)."""
+        connection.ensure_connection()
+        target = sqlite3.connect(path)
+        try:
+            connection.connection.backup(target)
+        finally:
+            target.close()
+
+    def report(self, mode: str, results: list[dict], seconds: float) -> int:
+        """Печатает итоги режима и возвращает число ошибок "database is locked"."""
+        ok = sum(result["ok"] for result in results)
+        locked = sum(result["locked"] for result in results)
+        failed = sum(result["failed"] for result in results)
+        timings = [ms for result in results for ms in result["ms"]]
+        p95 = quantiles(timings, n=20)[-1] if len(timings) > 1 else float("nan")
+        line = (
+            f"{mode:>12}: {ok} ok, {locked} database is locked, {failed} other failures | "
+            f"{ok / seconds:7.1f} writes/s | p95 {p95:8.2f} ms"
+        )
+        self.stdout.write(self.style.ERROR(line) if locked or failed else self.style.SUCCESS(line))
+        return locked
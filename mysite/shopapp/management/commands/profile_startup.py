@@ -0,0 +1,127 @@
+import json
+import os
+import re
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError
+
+# Код, который выполняется в отдельном чистом процессе (python -X importtime): в текущем процессе
+# всё уже импортировано и замерять нечего. Время каждого ready() снимается обёрткой над
+# AppConfig.create, итог фаз печатается последней строкой stdout в JSON.
+CHILD = """
+import json, os
+from timeit import default_timer
+started = default_timer()
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "mysite.settings")
+import django
+from django.apps.config import AppConfig
+from django.conf import settings
+
+ready = []
+create = AppConfig.create.__func__
+
+def timed_create(cls, entry):
+    app_config = create(cls, entry)
+    original = app_config.ready
+    def timed_ready():
+        began = default_timer()
+        original()
+        ready.append((app_config.label, default_timer() - began))
+    app_config.ready = timed_ready
+    return app_config
+
+AppConfig.create = classmethod(timed_create)
+phases = []
+began = default_timer()
+settings.INSTALLED_APPS
+phases.append(("settings", default_timer() - began))
+began = default_timer()
+django.setup()
+phases.append(("django.setup", default_timer() - began))
+if %(urls)r:
+    from importlib import import_module
+    began = default_timer()
+    import_module(settings.ROOT_URLCONF)
+    from django.urls import get_resolver
+    get_resolver().url_patterns
+    phases.append(("urls", default_timer() - began))
+phases.append(("total", default_timer() - started))
+print(json.dumps({"phases": phases, "ready": ready}))
+"""
+
+# строка отчёта -X importtime: "import time:   self [us] |  cumulative | imported package"
+IMPORT_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+def parse_importtime(stderr: str) -> list[tuple[str, int, int, int]]:
+    """Строки -X importtime: (модуль, собственное время, время с вложенными импортами, глубина), мкс."""
+    modules = []
+    for line in stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if match:
+            modules.append((match[4], int(match[1]), int(match[2]), len(match[3]) // 2))
+    return modules
+
+
+class Command(BaseCommand):
+    """
+    Профиль холодного старта Django: сколько стоят импорты модулей и ready() приложений.
+
+    Старт замеряется в отдельном процессе с python -X importtime, как у нового воркера gunicorn
+    или команды manage.py: загрузка настроек, django.setup() (импорт приложений и моделей, ready())
+    и импорт корневого URLconf (представления, админка, drf-spectacular).
+    Выводятся:
+        - время фаз старта;
+        - ready() каждого приложения;
+        - пакеты верхнего уровня по суммарному собственному времени импорта (sentry_sdk, rest_framework...);
+        - самые дорогие модули по времени импорта с вложенными.
+
+    Переменные окружения передаются процессу как есть — так сравниваются флаги необязательных
+    подсистем (settings.SENTRY_ENABLED, DEBUG_TOOLBAR, API_DOCS). Для этой команды, как для тестов,
+    manage.py выключает Sentry; старт воркера gunicorn со всеми подсистемами:
+        DJANGO_SENTRY=1 DJANGO_DEBUG_TOOLBAR=1 python manage.py profile_startup
+    и как стартуют тесты и runserver:
+        python manage.py profile_startup
+    """
+    help = "Reports per-module import time and per-app ready() cost of a cold Django start"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--top", type=int, default=20, help="Сколько самых дорогих модулей и пакетов вывести")
+        parser.add_argument("--no-urls", action="store_true", help="Не импортировать корневой URLconf")
+
+    def handle(self, *args, **options):
+        process = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", CHILD % {"urls": not options["no_urls"]}],
+            cwd=settings.BASE_DIR,
+            env={**os.environ, "DJANGO_SETTINGS_MODULE": os.environ.get("DJANGO_SETTINGS_MODULE", "mysite.settings")},
+            capture_output=True,
+            text=True,
+        )
+        if process.returncode:
+            raise CommandError(f"Django failed to start:\n{process.stderr[-2000:]}")
+        result = json.loads(process.stdout.strip().splitlines()[-1])
+        modules = parse_importtime(process.stderr)
+
+        self.stdout.write("Startup phases:")
+        for name, seconds in result["phases"]:
+            self.stdout.write(f"  {name:<40} {seconds * 1000:9.1f} ms")
+
+        self.stdout.write("AppConfig.ready():")
+        for label, seconds in sorted(result["ready"], key=lambda item: -item[1]):
+            self.stdout.write(f"  {label:<40} {seconds * 1000:9.1f} ms")
+
+        packages = defaultdict(int)
+        for name, self_us, _, _ in modules:
+            packages[name.split(".")[0]] += self_us
+        self.stdout.write(f"Top-level packages by import time ({len(modules)} modules imported):")
+        for name, self_us in sorted(packages.items(), key=lambda item: -item[1])[:options["top"]]:
+            self.stdout.write(f"  {name:<40} {self_us / 1000:9.1f} ms")
+
+        self.stdout.write("Modules by cumulative import time:")
+        for name, self_us, cumulative_us, depth in sorted(modules, key=lambda item: -item[2])[:options["top"]]:
+            self.stdout.write(
+                f"  {name:<40} {cumulative_us / 1000:9.1f} ms (self {self_us / 1000:.1f} ms, depth {depth})"
+            )
@@ -0,0 +1,24 @@
+from django.core.management import BaseCommand, CommandError
+from django.db import transaction
+
+from shopapp import search
+
+
+class Command(BaseCommand):
+    """
+    Команда для полной перестройки полнотекстового индекса товаров (FTS5).
+
+    Нужна после ручных правок таблицы shopapp_product в обход ORM
+    или если индекс разошёлся с данными.
+    """
+    help = "Rebuilds the FTS5 full-text search index for products"
+
+    def handle(self, *args, **options):
+        if not search.is_available():
+            raise CommandError(
+                f"Table {search.FTS_TABLE} not found: the database is not SQLite or migrations are not applied"
+            )
+        self.stdout.write("Rebuild product search index")
+        with transaction.atomic():  # пока индекс перестраивается, поиск видит старую версию
+            count = search.rebuild_index()
+        self.stdout.write(self.style.SUCCESS(f"Indexed {count} products"))
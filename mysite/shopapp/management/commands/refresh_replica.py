@@ -0,0 +1,57 @@
+import sqlite3
+import time
+from timeit import default_timer
+
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class Command(BaseCommand):
+    """
+    Обновляет реплику для чтения (settings.DATABASE_REPLICA, см. mysite.db_routers) копией основной БД.
+
+    Копирование — online backup API SQLite прямо в файл реплики:
+        - источник в WAL-режиме: копия — согласованный снимок, писатели default при этом не ждут;
+        - файл реплики не подменяется, а перезаписывается в одной транзакции: воркеры с открытыми
+          соединениями (CONN_MAX_AGE) дочитывают старый снимок и со следующего запроса видят новый.
+
+    Разово (первое заполнение реплики — до включения DJANGO_DB_REPLICA у воркеров):
+        python manage.py refresh_replica
+    Постоянно, раз в 30 секунд (интервал меньше DATABASE_REPLICA_STICKY_SECONDS):
+        python manage.py refresh_replica --interval 30
+    """
+    help = "Copies the primary SQLite database into the read replica using the online backup API"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--interval", type=float, default=0,
+            help="Обновлять реплику каждые N секунд, пока команду не остановят (0 — один раз)",
+        )
+
+    def handle(self, *args, **options):
+        alias = settings.DATABASE_REPLICA
+        if not alias:
+            raise CommandError("Read replica is not configured: set DJANGO_DB_REPLICA")
+        source = connections[DEFAULT_DB_ALIAS]
+        if source.vendor != "sqlite" or connections[alias].vendor != "sqlite":
+            raise CommandError("refresh_replica works only with the SQLite backend")
+
+        while True:
+            self.refresh(source, settings.DATABASES[alias]["NAME"])
+            if options["interval"] <= 0:
+                break
+            time.sleep(options["interval"])
+
+    def refresh(self, source, path) -> None:
+        source.ensure_connection()
+        started = default_timer()
+        # timeout: читатели реплики ненадолго держат блокировку, копирование её дожидается
+        target = sqlite3.connect(path, timeout=30)
+        try:
+            # pages=-1 (по умолчанию) — вся БД за один шаг, то есть в одной транзакции на реплике
+            source.connection.backup(target)
+            pages = target.execute("PRAGMA page_count").fetchone()[0]
+        finally:
+            target.close()
+        self.stdout.write(self.style.SUCCESS(f"Replica refreshed: {pages} pages in {default_timer() - started:.2f}s"))
@@ -0,0 +1,36 @@
+from django.core.management import BaseCommand
+
+from shopapp.models import RollupWatermark
+from shopapp.rollups import LAG_DAYS, WATERMARK_NAME, refresh_sales_rollups
+
+
+class Command(BaseCommand):
+    """
+    Инкрементальный пересчёт rollup-таблиц продаж (по дням и месяцам, по товарам).
+
+    Обрабатывает заказы, созданные после последнего запуска (водяной знак по pk заказа),
+    и пересчитывает последние --lag-days дней: в недавние заказы могли добавить товары.
+    Удобно запускать по cron раз в несколько минут.
+
+    Пример:
+        python manage.py refresh_sales_rollups
+        python manage.py refresh_sales_rollups --full   # пересчитать всё с нуля
+    """
+    help = "Incrementally refreshes daily and monthly product sales rollups"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=10000, help="Сколько заказов учитывать за одну транзакцию")
+        parser.add_argument("--full", action="store_true", help="Очистить rollup-таблицы и пересчитать с нуля")
+        parser.add_argument(
+            "--lag-days", type=int, default=LAG_DAYS, help="Сколько последних дней пересчитывать заново (0 — не пересчитывать)",
+        )
+
+    def handle(self, *args, **options):
+        processed = refresh_sales_rollups(
+            batch_size=options["batch_size"], full=options["full"], lag_days=options["lag_days"],
+        )
+        watermark = RollupWatermark.objects.filter(name=WATERMARK_NAME).first()
+        last_order_id = watermark.last_order_id if watermark else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Processed {processed} orders, watermark at order pk={last_order_id}"
+        ))
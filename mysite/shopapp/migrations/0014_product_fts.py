@@ -0,0 +1,45 @@
+# Generated by Django 6.0 on 2026-10-17 00:52
+
+from django.db import migrations, models
+
+
+FTS_TABLE = "shopapp_product_fts"
+
+
+def create_fts_table(apps, schema_editor):
+    """Создаёт FTS5-таблицу для поиска товаров и заполняет её текущими товарами (только SQLite)."""
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    schema_editor.execute(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+        "name, description, "
+        "tokenize = 'unicode61 remove_diacritics 2', "
+        "prefix = '2 3'"
+        ")"
+    )
+    schema_editor.execute(
+        f"INSERT INTO {FTS_TABLE} (rowid, name, description) "
+        "SELECT id, name, description FROM shopapp_product"
+    )
+
+
+def drop_fts_table(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shopapp', '0013_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='product',
+            name='description',
+            field=models.TextField(blank=True),
+        ),
+        migrations.RunPython(create_fts_table, drop_fts_table),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 6.0 on 2026-10-17 00:56
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def fill_order_totals(apps, schema_editor):
+    """Заполняет total и product_count у существующих заказов одним UPDATE с подзапросами."""
+    Order = apps.get_model("shopapp", "Order")
+    through = Order.products.through
+
+    def subquery(aggregate):
+        return Subquery(
+            through.objects.filter(order_id=OuterRef("pk")).order_by()
+            .values("order_id").annotate(value=aggregate).values("value")
+        )
+
+    Order.objects.update(
+        total=Coalesce(
+            subquery(Sum("product__price")),
+            Value(Decimal("0.00")),
+            output_field=models.DecimalField(max_digits=12, decimal_places=2),
+        ),
+        product_count=Coalesce(subquery(Count("product_id")), Value(0), output_field=models.IntegerField()),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shopapp', '0014_product_fts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='product_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='total',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=12),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['total', 'id'], name='order_total_pk_idx'),
+        ),
+        migrations.RunPython(fill_order_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 6.0 on 2026-10-17 01:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shopapp', '0015_order_totals'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RollupWatermark',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('last_order_id', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DailyProductSales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('orders_count', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_sales', to='shopapp.product')),
+            ],
+            options={
+                'verbose_name': 'Daily product sales',
+                'verbose_name_plural': 'Daily product sales',
+                'indexes': [models.Index(fields=['day', 'product'], name='daily_sales_day_prod_idx')],
+                'constraints': [models.UniqueConstraint(fields=('product', 'day'), name='daily_sales_product_day_uniq')],
+            },
+        ),
+        migrations.CreateModel(
+            name='MonthlyProductSales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('orders_count', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='monthly_sales', to='shopapp.product')),
+            ],
+            options={
+                'verbose_name': 'Monthly product sales',
+                'verbose_name_plural': 'Monthly product sales',
+                'indexes': [models.Index(fields=['month', 'product'], name='monthly_sales_month_prod_idx')],
+                'constraints': [models.UniqueConstraint(fields=('product', 'month'), name='monthly_sales_product_month_uniq')],
+            },
+        ),
+    ]
@@ -32,11 +32,26 @@ class Product(models.Model):
         # db_table = 'product'  # явное имя таблицы в БД (по умолчанию было бы appname_product)
         verbose_name = _('Product')
         verbose_name_plural = _('products')  # добавляем перевод для админки в человеко-читаемой форме
+        indexes = [
+            # составные индексы под keyset-пагинацию API: сортировка Meta.ordering + pk как разрыв ничьих
+            models.Index(fields=["name", "price", "id"], name="product_name_price_pk_idx"),
+            models.Index(fields=["created_at", "id"], name="product_created_pk_idx"),
+            # частичные индексы только по неархивным товарам (витрина никогда не показывает архив):
+            # RSS-лента и sitemap — archived=False ORDER BY -created_at
+            models.Index(
+                fields=["-created_at"], condition=models.Q(archived=False), name="product_active_created_idx",
+            ),
+            # ProductsListView — archived=False ORDER BY name, price, pk (rowid и так хранится в индексе)
+            models.Index(
+                fields=["name", "price"], condition=models.Q(archived=False), name="product_active_name_idx",
+            ),
+        ]
     name = models.CharField(max_length=100, db_index=True)  # название продукта, индексированное поле
     description = models.TextField(  # описание продукта
         null=False, # в БД не может быть значение NULL
         blank=True, # может быть пустым в форме (в бд сохраниться пустая строка)
-        db_index=True # индексированное поле (обеспечивается эффективность)
+        # без db_index: B-tree индекс не помогает поиску LIKE '%term%', а только замедляет запись;
+        # поиск по описанию идёт через FTS5-индекс (shopapp.search)
     )
     price = models.DecimalField(default=0, max_digits=8, decimal_places=2)  # цена продукта, точная денежная величина
     discount = models.SmallIntegerField(default=0)  # скидка, маленькое целое число
@@ -45,6 +60,9 @@ class Product(models.Model):
     # related_name='products' позволяет получить все продукты пользователя через user.products.all()
     created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='products')
     created_at = models.DateTimeField(auto_now_add=True)  # время создания продукта автоматически
+    # время последнего изменения (в т.ч. замены превью) — версия товара в ключах кеша карточек списка;
+    # queryset.update и bulk_update его не трогают сами — такие места ставят значение явно
+    updated_at = models.DateTimeField(auto_now=True)
     archived = models.BooleanField(default=False)  # флаг архивирования продукта(True=архивирован, False=доступен)
     preview = models.ImageField( # Поле для хранения картинки-превью товара
         null=True, # null=True → в базе можно хранить NULL, т.е. картинка необязательна
@@ -52,6 +70,8 @@ class Product(models.Model):
         upload_to=product_preview_directory_path # upload_to=product_preview_directory_path → функция,
         # которая возвращает путь для сохранения файла
     )
+    # уменьшенные копии превью (WebP/JPEG нескольких ширин) — строит mysite.thumbnails после загрузки
+    preview_variants = models.JSONField(default=dict, blank=True, editable=False)
 
     def __str__(self) -> str:
         """
@@ -91,6 +111,8 @@ class ProductImages(models.Model):
     image = models.ImageField(
         upload_to=product_images_directory_path,
         )
+    # уменьшенные копии изображения — строит mysite.thumbnails после загрузки
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     # Короткое текстовое описание изображения (необязательно для формы)
     description = models.CharField(max_length=200, null=False, blank=True)
 
@@ -103,6 +125,14 @@ class Order(models.Model):
         ordering = ['created_at']
         verbose_name = _('Order')
         verbose_name_plural = _('Orders')# добавляем перевод для админки в человеко-читаемой форме
+        indexes = [
+            # индекс под keyset-пагинацию заказов в API (created_at, pk)
+            models.Index(fields=["created_at", "id"], name="order_created_pk_idx"),
+            # сортировка и фильтр заказов по сумме (?ordering=-total, ?total__gte=...)
+            models.Index(fields=["total", "id"], name="order_total_pk_idx"),
+            # UserOrdersListView — заказы пользователя ORDER BY created_at (Meta.ordering)
+            models.Index(fields=["user", "created_at"], name="order_user_created_idx"),
+        ]
 
     delivery_address = models.TextField(null=True, blank=True)  # адрес доставки, может быть пустым
     promocode = models.CharField(max_length=20, null=False, blank=True)  # промокод, строка до 20 символов, нельзя NULL
@@ -114,9 +144,127 @@ class Order(models.Model):
         null=True, # null=True → разрешает хранить пустое значение в базе, т.е. файл необязательный
         upload_to='orders/receipt' # upload_to='orders/receipt' → файлы будут сохраняться в папку MEDIA_ROOT/orders/receipt/
     )
+    # Денормализованные итоги заказа: поддерживаются сигналами (shopapp.order_totals), руками не редактируются
+    total = models.DecimalField(max_digits=12, decimal_places=2, default=0, editable=False)  # сумма цен товаров
+    product_count = models.PositiveIntegerField(default=0, editable=False)  # количество товаров в заказе
 
     def __str__(self) -> str:
         """
         Строковое представление экземпляра класса.
         """
         return f"Order(pk={self.pk}, user_name={self.user.last_name + self.user.first_name})"
+
+
+class DailyProductSales(models.Model):
+    """
+    Предрассчитанные продажи товара за день (rollup-таблица для дашбордов).
+
+    Заполняется командой refresh_sales_rollups (shopapp.rollups), вручную не редактируется.
+    Выручка считается по цене товара на момент пересчёта (в заказе цена не хранится).
+    """
+    class Meta:
+        verbose_name = _('Daily product sales')
+        verbose_name_plural = _('Daily product sales')
+        constraints = [
+            models.UniqueConstraint(fields=["product", "day"], name="daily_sales_product_day_uniq"),
+        ]
+        indexes = [
+            # выборка дашборда "все товары за период" (?day__gte=...&day__lte=...)
+            models.Index(fields=["day", "product"], name="daily_sales_day_prod_idx"),
+        ]
+
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="daily_sales")
+    day = models.DateField()  # день создания заказов (в часовом поясе проекта)
+    orders_count = models.PositiveIntegerField(default=0)  # в скольких заказах за день был товар
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)  # выручка по товару за день
+
+
+class MonthlyProductSales(models.Model):
+    """
+    Предрассчитанные продажи товара за месяц; month — первое число месяца.
+    """
+    class Meta:
+        verbose_name = _('Monthly product sales')
+        verbose_name_plural = _('Monthly product sales')
+        constraints = [
+            models.UniqueConstraint(fields=["product", "month"], name="monthly_sales_product_month_uniq"),
+        ]
+        indexes = [
+            models.Index(fields=["month", "product"], name="monthly_sales_month_prod_idx"),
+        ]
+
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="monthly_sales")
+    month = models.DateField()  # первое число месяца
+    orders_count = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+
+
+class RollupWatermark(models.Model):
+    """
+    "Водяной знак" инкрементального пересчёта: до какого заказа (pk) данные уже учтены.
+    """
+    name = models.CharField(max_length=50, primary_key=True)  # имя rollup-а, например "product_sales"
+    last_order_id = models.BigIntegerField(default=0)  # последний учтённый pk заказа
+    updated_at = models.DateTimeField(auto_now=True)  # когда пересчёт выполнялся в последний раз
+
+    def __str__(self) -> str:
+        return f"RollupWatermark(name={self.name!r}, last_order_id={self.last_order_id})"
+
+
+class Export(models.Model):
+    """
+    Выгрузка в файл фоновыми задачами (shopapp.exports): товары, заказы или выбранные в админке строки.
+
+    Файл (CSV или NDJSON, по желанию gzip) пишется в MEDIA_ROOT по частям: набор строк делится
+    на диапазоны pk (shards), каждый пишет своя задача в своём процессе run_workers, последняя
+    склеивает части в file. Готовый файл отдаётся по /api/exports/<id>/download/ (с Range)
+    и удаляется по истечении expires_at.
+    """
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+    EXPIRED = "expired"
+    STATUSES = [
+        (QUEUED, "В очереди"),
+        (RUNNING, "Выполняется"),
+        (SUCCEEDED, "Готова"),
+        (FAILED, "Ошибка"),
+        (EXPIRED, "Удалена по сроку"),
+    ]
+    CSV = "csv"
+    NDJSON = "ndjson"
+    FORMATS = [(CSV, "CSV"), (NDJSON, "NDJSON")]
+
+    class Meta:
+        ordering = ["-pk"]
+        verbose_name = "Выгрузка"
+        verbose_name_plural = "Выгрузки"
+        indexes = [
+            # уборка: готовые выгрузки с истёкшим сроком хранения
+            models.Index(fields=["status", "expires_at"], name="export_status_expires_idx"),
+        ]
+
+    dataset = models.CharField(max_length=20)  # имя набора данных из shopapp.exports.DATASETS
+    format = models.CharField(max_length=10, choices=FORMATS, default=CSV)
+    compress = models.BooleanField(default=False)  # файл .gz
+    filters = models.JSONField(default=dict, blank=True)  # параметры отбора строк набора
+    status = models.CharField(max_length=10, choices=STATUSES, default=QUEUED)
+    shards = models.PositiveSmallIntegerField(default=0)  # на сколько частей разбит набор (0 — ещё не разбит)
+    parts = models.JSONField(default=dict, blank=True)  # готовые части: номер -> {"rows", "size"}
+    rows = models.PositiveBigIntegerField(default=0)
+    size = models.PositiveBigIntegerField(default=0)  # размер готового файла, байт
+    # путь задаётся при создании (случайный каталог), сам файл появляется, когда выгрузка готова
+    file = models.FileField(max_length=255, blank=True)
+    error = models.TextField(blank=True)
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name="exports")
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    expires_at = models.DateTimeField(null=True, blank=True)  # после этого файл удаляется
+
+    def __str__(self) -> str:
+        return f"Export(pk={self.pk}, dataset={self.dataset!r}, status={self.status!r})"
+
+    @property
+    def shards_done(self) -> int:
+        return len(self.parts)
@@ -0,0 +1,94 @@
+"""
+Денормализованные итоги заказа: Order.total (сумма цен товаров) и Order.product_count.
+
+Раньше сумма считалась каждый раз через Sum("products__price") по M2M-джойну,
+и сортировка/фильтр заказов по сумме были агрегатом по всей таблице.
+Теперь итоги хранятся в колонках заказа и поддерживаются сигналами (shopapp.signals):
+    - добавление товаров в заказ — инкрементально: total = total + сумма цен добавленных;
+    - удаление товаров, очистка заказа, удаление товара — пересчёт только затронутых заказов;
+    - изменение цены товара — total = total + (новая цена - старая) у всех заказов с этим товаром.
+
+Полный пересчёт (после правок в обход ORM) — команда backfill_order_totals.
+"""
+from collections.abc import Iterable
+from decimal import Decimal
+
+from django.db.models import Count, DecimalField, F, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from .models import Order, Product
+
+
+def _through_subquery(aggregate):
+    """Подзапрос агрегата по строкам промежуточной таблицы для текущего заказа (OuterRef("pk"))."""
+    through = Order.products.through
+    return Subquery(
+        through.objects
+        .filter(order_id=OuterRef("pk"))
+        .order_by()
+        .values("order_id")  # GROUP BY order_id
+        .annotate(value=aggregate)
+        .values("value")
+    )
+
+
+def recalculate_order_totals(order_ids: Iterable[int] | None = None) -> int:
+    """
+    Пересчитывает total и product_count одним UPDATE с подзапросами.
+
+    order_ids=None — все заказы. Возвращает число обновлённых строк.
+    """
+    queryset = Order.objects.all()
+    if order_ids is not None:
+        queryset = queryset.filter(pk__in=list(order_ids))
+    return queryset.update(
+        # у заказа без товаров подзапрос вернёт NULL — подставляем 0
+        total=Coalesce(
+            _through_subquery(Sum("product__price")),
+            Value(Decimal("0.00")),
+            output_field=DecimalField(max_digits=12, decimal_places=2),
+        ),
+        product_count=Coalesce(
+            _through_subquery(Count("product_id")),
+            Value(0),
+            output_field=IntegerField(),
+        ),
+    )
+
+
+def add_products_to_orders(order_ids: Iterable[int], product_ids: Iterable[int]) -> None:
+    """
+    Инкрементально учитывает товары, добавленные в заказы.
+
+    m2m_changed(post_add) передаёт только действительно новые связи, поэтому прибавлять безопасно.
+    """
+    order_ids, product_ids = list(order_ids), list(product_ids)
+    if not order_ids or not product_ids:
+        return
+    added = Product.objects.filter(pk__in=product_ids).order_by().aggregate(
+        total=Sum("price", default=Decimal("0.00")),
+        count=Count("pk"),
+    )
+    Order.objects.filter(pk__in=order_ids).update(
+        total=F("total") + added["total"],
+        product_count=F("product_count") + added["count"],
+    )
+
+
+def apply_price_change(product_id: int, delta: Decimal) -> None:
+    """Прибавляет разницу цены товара к сумме всех заказов, в которых он есть."""
+    if not delta:
+        return
+    order_ids = Order.products.through.objects.filter(product_id=product_id).values("order_id")
+    Order.objects.filter(pk__in=order_ids).update(total=F("total") + delta)
+
+
+def orders_with_products(product_ids: Iterable[int]) -> list[int]:
+    """id заказов, содержащих хотя бы один из товаров."""
+    return list(
+        Order.products.through.objects
+        .filter(product_id__in=list(product_ids))
+        .order_by()
+        .values_list("order_id", flat=True)
+        .distinct()
+    )
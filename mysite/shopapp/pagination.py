@@ -0,0 +1,225 @@
+"""
+Классы пагинации для REST API магазина.
+
+KeysetPagination — постраничная навигация "по ключу" (keyset / seek pagination).
+Вместо LIMIT/OFFSET и COUNT(*) следующая страница выбирается условием
+"строки, которые идут строго после последней строки предыдущей страницы",
+поэтому стоимость запроса не растёт с номером страницы.
+"""
+import base64
+import binascii
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Field, Model, Q, QuerySet
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(PageNumberPagination):
+    """
+    Пагинация с опциональным keyset-режимом.
+
+    По умолчанию ведёт себя как обычная PageNumberPagination (?page=N),
+    чтобы не ломать существующих клиентов.
+    Keyset-режим включается параметром ?cursor= (пустое значение — первая страница):
+        GET /shop/api/products/?cursor=
+        GET /shop/api/products/?cursor=<значение next из предыдущего ответа>
+
+    Курсор — составной ключ из полей сортировки + pk в качестве "разрыва ничьих",
+    например (name, price, pk) для Product.Meta.ordering или (created_at, pk) для заказов.
+    Сортировка берётся из OrderingFilter (?ordering=...), а если её нет — из Meta.ordering модели.
+
+    Курсор строится только по полям модели без NULL. Сортировка по вычисляемому значению
+    (fts_rank поиска ?search=), по полю с NULL или случайная (?) — обычные страницы ?page=N
+    даже при ?cursor=: иначе next вёл бы на страницу, которую не построить (404).
+    """
+    cursor_query_param = "cursor"  # имя GET-параметра с курсором
+    invalid_cursor_message = "Invalid cursor"  # текст ошибки при битом/чужом курсоре
+
+    keyset_mode = False  # включён ли keyset-режим для текущего запроса
+
+    def paginate_queryset(self, queryset: QuerySet, request: Request, view=None):
+        if self.cursor_query_param not in request.query_params:
+            # курсора нет — обычная постраничная пагинация с COUNT(*) и OFFSET
+            self.keyset_mode = False
+            return super().paginate_queryset(queryset, request, view)
+
+        ordering = self.get_ordering(queryset)
+        fields = self.get_ordering_fields(queryset.model, ordering) if ordering is not None else None
+        if fields is None:
+            # курсор по такой сортировке не построить — обычные страницы с COUNT(*) и OFFSET
+            self.keyset_mode = False
+            return super().paginate_queryset(queryset, request, view)
+
+        self.keyset_mode = True
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.ordering = ordering
+        self.ordering_fields = fields
+
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            queryset = queryset.filter(self.build_keyset_filter(self.decode_cursor(cursor)))
+
+        # Выбираем на одну строку больше, чтобы понять, есть ли следующая страница (без COUNT(*))
+        order_by = [f"-{field}" if desc else field for field, desc in self.ordering]
+        rows = list(queryset.order_by(*order_by)[:self.page_size + 1])
+        self.has_next = len(rows) > self.page_size
+        self.page_rows = rows[:self.page_size]
+        return self.page_rows
+
+    def get_paginated_response(self, data):
+        if not self.keyset_mode:
+            return super().get_paginated_response(data)
+        return Response({
+            "next": self.get_next_link(),
+            "results": data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        # В схеме описываем оба режима: count/previous появляются только в режиме ?page=
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema["required"] = ["results"]
+        return response_schema
+
+    def get_next_link(self):
+        if not self.keyset_mode:
+            return super().get_next_link()
+        if not self.has_next:
+            return None
+        last_row = self.page_rows[-1]
+        cursor = self.encode_cursor([
+            self.get_row_value(last_row, field) for field, _ in self.ordering
+        ])
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def get_previous_link(self):
+        if not self.keyset_mode:
+            return super().get_previous_link()
+        return None  # keyset-режим предназначен для прохода вперёд (синхронизация каталога)
+
+    @staticmethod
+    def get_ordering(queryset: QuerySet) -> list[tuple[str, bool]] | None:
+        """
+        Возвращает сортировку queryset в виде списка (поле, по_убыванию) или None,
+        если она задана выражением или случайная.
+
+        Гарантирует, что последним полем идёт pk, — без него курсор не уникален
+        и строки с одинаковым (name, price) могли бы потеряться между страницами.
+        """
+        fields = list(queryset.query.order_by) or list(queryset.model._meta.ordering)
+        ordering = []
+        for field in fields:
+            if not isinstance(field, str) or field == "?":
+                return None
+            ordering.append((field.lstrip("-"), field.startswith("-")))
+
+        pk_names = {"pk", queryset.model._meta.pk.name}
+        if not any(field in pk_names for field, _ in ordering):
+            # направление pk совпадает с направлением последнего поля, чтобы хватило одного индекса
+            ordering.append(("pk", ordering[-1][1] if ordering else False))
+        return ordering
+
+    @staticmethod
+    def get_ordering_fields(model: type[Model], ordering: list[tuple[str, bool]]) -> list[Field] | None:
+        """
+        Поля модели для сортировки (пути вида user__username — через связи) или None, если какое-то
+        из них не поле модели (аннотация, например fts_rank), связь или может быть NULL.
+        """
+        fields = []
+        for path, _ in ordering:
+            current = model
+            field = None
+            for part in path.split("__"):
+                if current is None:
+                    return None
+                try:
+                    field = current._meta.pk if part == "pk" else current._meta.get_field(part)
+                except FieldDoesNotExist:
+                    return None
+                current = field.related_model
+            if field.is_relation or not field.concrete or field.null:
+                return None
+            fields.append(field)
+        return fields
+
+    def build_keyset_filter(self, values: list) -> Q:
+        """
+        Строит условие "строго после курсора" для составного ключа.
+
+        Для (name, price, pk) получается:
+            name >= v1 AND (name > v1 OR (name = v1 AND (price > v2 OR (price = v2 AND pk > v3))))
+        Ведущее условие name >= v1 позволяет SQLite начать просмотр индекса
+        (name, price, id) сразу с нужного места, а не с начала таблицы.
+        """
+        condition = None
+        # собираем вложенное условие с конца: сначала для pk, затем для остальных полей
+        for (field, desc), value in reversed(list(zip(self.ordering, values))):
+            after = Q(**{f"{field}__{'lt' if desc else 'gt'}": value})
+            if condition is None:
+                condition = after
+            else:
+                condition = after | (Q(**{field: value}) & condition)
+
+        first_field, first_desc = self.ordering[0]
+        leading = Q(**{f"{first_field}__{'lte' if first_desc else 'gte'}": values[0]})
+        return leading & condition
+
+    @staticmethod
+    def get_row_value(row, field: str):
+        """Достаёт значение поля сортировки из объекта (поддерживает пути вида user__username)."""
+        value = row
+        for part in field.split("__"):
+            value = getattr(value, part)
+        return value
+
+    def encode_cursor(self, values: list) -> str:
+        """Кодирует значения ключа в непрозрачную строку для клиента."""
+        payload = {
+            "o": [f"-{field}" if desc else field for field, desc in self.ordering],
+            "v": [self._serialize_value(value) for value in values],
+        }
+        raw = json.dumps(payload, separators=(",", ":")).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+    def decode_cursor(self, cursor: str) -> list:
+        """Раскодирует курсор и проверяет, что он выдан для той же сортировки."""
+        try:
+            raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+            payload = json.loads(raw)
+            ordering, values = payload["o"], payload["v"]
+        except (TypeError, ValueError, KeyError, binascii.Error):
+            raise NotFound(self.invalid_cursor_message)
+
+        expected = [f"-{field}" if desc else field for field, desc in self.ordering]
+        if ordering != expected or not isinstance(values, list) or len(values) != len(expected):
+            # курсор от другой сортировки (?ordering изменился между запросами)
+            raise NotFound(self.invalid_cursor_message)
+        try:
+            # значения приводятся к типам полей: подделанный курсор ("abc" вместо цены) — 404, а не 500
+            return [self._parse_value(field, value) for field, value in zip(self.ordering_fields, values)]
+        except (ValidationError, TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+    @staticmethod
+    def _parse_value(field: Field, value):
+        if value is None or isinstance(value, (dict, list)):
+            raise ValueError("Cursor value must be a scalar")
+        return field.to_python(value)
+
+    @staticmethod
+    def _serialize_value(value):
+        # datetime сохраняем с микросекундами (DjangoJSONEncoder обрезает до миллисекунд,
+        # и курсор по created_at начинал бы пропускать строки)
+        if isinstance(value, (datetime, date)):
+            return value.isoformat()
+        if isinstance(value, Decimal):
+            return str(value)
+        return value
@@ -0,0 +1,114 @@
+"""
+Rollup-таблицы продаж: DailyProductSales и MonthlyProductSales.
+
+Дашборды читают готовые агрегаты вместо скана shopapp_order + shopapp_order_products + shopapp_product.
+Пересчёт инкрементальный: RollupWatermark хранит pk последнего учтённого заказа,
+и refresh_sales_rollups обрабатывает только заказы с большим pk, диапазонами по batch_size.
+Дни, в которые созданы эти заказы, пересчитываются целиком (а не прибавлением вклада), месяцы этих
+дней — суммой дневных строк: повторный пересчёт дня ничего не удваивает.
+
+Поэтому каждый запуск заодно пересчитывает хвост — последние lag_days дней: товары, добавленные
+в уже учтённые заказы (их pk ниже водяного знака), попадают в агрегаты при следующем запуске.
+
+Ограничения инкрементального режима (для них есть полный пересчёт full=True):
+    - изменение состава заказа старше lag_days дней не попадает в агрегаты;
+    - выручка считается по цене товара на момент пересчёта.
+"""
+from datetime import date, datetime, time, timedelta
+
+from django.db import transaction
+from django.db.models import Count, Max, QuerySet, Sum
+from django.db.models.functions import TruncDate, TruncMonth
+from django.utils import timezone
+
+from .models import DailyProductSales, MonthlyProductSales, Order, RollupWatermark
+
+WATERMARK_NAME = "product_sales"
+LAG_DAYS = 3  # сколько дней после создания заказ ещё правят (OrderUpdateView, админка)
+
+
+def refresh_sales_rollups(batch_size: int = 10000, full: bool = False, lag_days: int = LAG_DAYS) -> int:
+    """
+    Учитывает в rollup-таблицах заказы, созданные после водяного знака, и пересчитывает последние lag_days дней.
+
+    full=True — очистить таблицы и пересчитать всё с нуля.
+    Каждый диапазон заказов учитывается в одной транзакции вместе со сдвигом водяного знака,
+    поэтому прерванный пересчёт можно просто запустить снова. Возвращает число учтённых новых заказов.
+    """
+    if full:
+        with transaction.atomic():
+            DailyProductSales.objects.all().delete()
+            MonthlyProductSales.objects.all().delete()
+            RollupWatermark.objects.filter(name=WATERMARK_NAME).delete()
+
+    # верхняя граница фиксируется заранее: заказы, созданные во время пересчёта, учтёт следующий запуск
+    max_order_id = Order.objects.aggregate(max_id=Max("pk"))["max_id"] or 0
+    processed = 0
+    while True:
+        with transaction.atomic():
+            watermark, _ = RollupWatermark.objects.select_for_update().get_or_create(name=WATERMARK_NAME)
+            if watermark.last_order_id >= max_order_id:
+                break
+            upper = min(watermark.last_order_id + batch_size, max_order_id)
+            orders = Order.objects.filter(pk__gt=watermark.last_order_id, pk__lte=upper)
+            processed += orders.count()
+            recompute_order_days(orders)
+            watermark.last_order_id = upper
+            watermark.save(update_fields=["last_order_id", "updated_at"])
+
+    if lag_days:
+        # хвост ниже водяного знака: в недавние заказы могли добавить товары
+        with transaction.atomic():
+            recompute_order_days(Order.objects.filter(created_at__gte=timezone.now() - timedelta(days=lag_days)))
+    return processed
+
+
+def recompute_order_days(orders: QuerySet) -> None:
+    """Пересчитывает с нуля дни, в которые созданы заказы orders, и месяцы этих дней."""
+    days = sorted(
+        orders.annotate(day=TruncDate("created_at")).order_by().values_list("day", flat=True).distinct()
+    )
+    # подряд идущие дни — одним диапазоном: заказы с растущим pk обычно ложатся в один-два дня
+    first = previous = None
+    for day in days:
+        if previous is not None and day - previous > timedelta(days=1):
+            recompute_period(first, previous)
+            first = None
+        first, previous = first or day, day
+    if first is not None:
+        recompute_period(first, previous)
+
+
+def recompute_period(first: date, last: date) -> None:
+    """Заменяет строки DailyProductSales за first..last и MonthlyProductSales за месяцы этих дней."""
+    through = Order.products.through
+    rows = (
+        through.objects
+        .filter(order__created_at__gte=_day_start(first), order__created_at__lt=_day_start(last + timedelta(days=1)))
+        .annotate(day=TruncDate("order__created_at"))
+        .order_by()
+        .values("product_id", "day")  # GROUP BY товар, день
+        .annotate(orders_count=Count("order_id"), revenue=Sum("product__price"))
+    )
+    DailyProductSales.objects.filter(day__gte=first, day__lte=last).delete()
+    DailyProductSales.objects.bulk_create(
+        [DailyProductSales(revenue=row.pop("revenue") or 0, **row) for row in rows], batch_size=1000,
+    )
+
+    # месяц — сумма своих дневных строк (остальные дни месяца уже посчитаны)
+    first_month, last_month = first.replace(day=1), last.replace(day=1)
+    months = (
+        DailyProductSales.objects
+        .filter(day__gte=first_month, day__lt=(last_month + timedelta(days=31)).replace(day=1))
+        .annotate(month=TruncMonth("day"))
+        .order_by()
+        .values("product_id", "month")  # GROUP BY товар, месяц
+        .annotate(orders_count=Sum("orders_count"), revenue=Sum("revenue"))
+    )
+    MonthlyProductSales.objects.filter(month__gte=first_month, month__lte=last_month).delete()
+    MonthlyProductSales.objects.bulk_create([MonthlyProductSales(**row) for row in months], batch_size=1000)
+
+
+def _day_start(day: date) -> datetime:
+    """Начало дня в текущем часовом поясе — в нём же TruncDate режет created_at на дни."""
+    return timezone.make_aware(datetime.combine(day, time.min))
@@ -1,6 +1,8 @@
+from django.urls import reverse
 from rest_framework import serializers  # Импортируем модуль сериализаторов DRF
 
-from .models import Product, Order  # Импортируем модель Product из текущего приложения
+from .exports import API_DATASETS, DATASETS
+from .models import Product, Order, DailyProductSales, MonthlyProductSales, Export  # Импортируем модели из текущего приложения
 
 
 class ProductSerializer(serializers.ModelSerializer):
@@ -39,4 +41,84 @@ class OrderSerializer(serializers.ModelSerializer):
             "user", # Пользователь, создавший заказ
             "products", # Список товаров в заказе
             "receipt",   # Чек (файл)
-        ]
\ No newline at end of file
+            "total",  # Сумма цен товаров (считается автоматически)
+            "product_count",  # Количество товаров (считается автоматически)
+        ]
+        read_only_fields = ["total", "product_count"]  # итоги поддерживаются сигналами, клиент их не задаёт
+
+
+class DailyProductSalesSerializer(serializers.ModelSerializer):
+    """
+    Сериализатор rollup-таблицы продаж товара за день (только чтение).
+    """
+    class Meta:
+        model = DailyProductSales
+        fields = [
+            "product",  # pk товара
+            "day",  # день
+            "orders_count",  # в скольких заказах был товар
+            "revenue",  # выручка по товару за день
+        ]
+
+
+class MonthlyProductSalesSerializer(serializers.ModelSerializer):
+    """
+    Сериализатор rollup-таблицы продаж товара за месяц (только чтение).
+    """
+    class Meta:
+        model = MonthlyProductSales
+        fields = [
+            "product",  # pk товара
+            "month",  # первое число месяца
+            "orders_count",  # в скольких заказах был товар
+            "revenue",  # выручка по товару за месяц
+        ]
+
+
+class ExportSerializer(serializers.ModelSerializer):
+    """
+    Выгрузка в файл фоновыми задачами (shopapp.exports).
+    При создании клиент задаёт набор, формат, сжатие и отбор (since — созданные не раньше, archived — для товаров),
+    затем опрашивает выгрузку, пока status не станет succeeded, и скачивает файл по ссылке download.
+    """
+    dataset = serializers.ChoiceField(choices=API_DATASETS)
+    since = serializers.DateTimeField(write_only=True, required=False)
+    archived = serializers.BooleanField(write_only=True, required=False, allow_null=True, default=None)
+    shards_done = serializers.IntegerField(read_only=True)  # сколько частей уже записано
+    download = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Export
+        fields = [
+            "pk",
+            "dataset",  # products или orders
+            "format",  # csv или ndjson
+            "compress",  # файл .gz
+            "since",
+            "archived",
+            "filters",  # отбор, с которым выгрузка создана
+            "status",
+            "shards",  # на сколько частей разбита выгрузка
+            "shards_done",
+            "rows",
+            "size",  # размер файла, байт
+            "error",
+            "created_at",
+            "finished_at",
+            "expires_at",  # после этого файл удаляется
+            "download",  # ссылка на файл, когда выгрузка готова
+        ]
+        read_only_fields = [
+            "filters", "status", "shards", "rows", "size", "error", "created_at", "finished_at", "expires_at",
+        ]
+
+    def validate_dataset(self, value: str) -> str:
+        request = self.context.get("request")
+        if DATASETS[value].staff_only and not (request and request.user.is_staff):
+            raise serializers.ValidationError("Only staff can export this dataset.")
+        return value
+
+    def get_download(self, export: Export) -> str | None:
+        if export.status != Export.SUCCEEDED:
+            return None
+        return reverse("shopapp:export-download", kwargs={"pk": export.pk})
@@ -0,0 +1,195 @@
+"""
+Сигналы приложения shopapp и их обработчики.
+
+products_changed — собственный сигнал для массовых операций над товарами
+(bulk_create, queryset.update), при которых post_save/post_delete не отправляются.
+Отправляется так:
+    products_changed.send(sender=Product, pks=[...], fields=("archived",))
+fields=None означает, что могли измениться любые поля.
+"""
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import Signal, receiver
+
+from jobs.models import Job
+from jobs.queue import enqueue
+from jobs.signals import housekeeping, job_failed
+from mysite.thumbnails import needs_refresh
+
+from . import exports, order_totals, search
+from .cache_versioning import bump_generation
+from .models import Export, Order, Product, ProductImages
+
+products_changed = Signal()  # аргументы: pks — id изменённых товаров, fields — изменённые поля или None
+
+SEARCH_FIELDS = {"name", "description"}  # поля товара, которые зеркалируются в FTS-индекс
+SITEMAP_TASK = "shopapp.build_sitemaps"
+
+
+@receiver(post_save, sender=Product)
+def index_saved_product(sender, instance: Product, update_fields=None, **kwargs):
+    """После сохранения товара обновляем его строку в поисковом индексе."""
+    if update_fields is not None and not SEARCH_FIELDS & set(update_fields):
+        return  # сохраняли поля, которых нет в индексе (например, только archived)
+    search.index_products([instance.pk])
+
+
+@receiver(post_delete, sender=Product)
+def unindex_deleted_product(sender, instance: Product, **kwargs):
+    """После удаления товара убираем его из поискового индекса."""
+    search.remove_products([instance.pk])
+
+
+@receiver(products_changed, sender=Product)
+def index_changed_products(sender, pks, fields=None, **kwargs):
+    """Переиндексирует товары, изменённые массовой операцией."""
+    if fields is not None and not SEARCH_FIELDS & set(fields):
+        return
+    search.index_products(pks)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=Order)
+@receiver(post_delete, sender=Order)
+def bump_model_generation(sender, **kwargs):
+    """Любая запись в Product/Order делает закешированные по ним ответы неактуальными."""
+    bump_generation(sender)
+
+
+@receiver(m2m_changed, sender=Order.products.through)
+def bump_order_generation_on_products_change(sender, action, **kwargs):
+    """Изменение состава заказа (order.products.set/add/remove) — тоже запись в заказы."""
+    if action in ("post_add", "post_remove", "post_clear"):
+        bump_generation(Order)
+
+
+@receiver(products_changed, sender=Product)
+def bump_generation_on_bulk_change(sender, **kwargs):
+    """Массовые операции над товарами (queryset.update, bulk_create)."""
+    bump_generation(Product)
+
+
+@receiver(m2m_changed, sender=Order.products.through)
+def update_order_totals_on_products_change(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Поддерживает Order.total/product_count при изменении состава заказов.
+
+    reverse=False — order.products.add/remove/clear (instance — заказ, pk_set — товары),
+    reverse=True — product.orders.add/remove/clear (instance — товар, pk_set — заказы).
+    """
+    if action == "post_add":
+        # pk_set содержит только новые связи — можно прибавлять
+        if reverse:
+            order_totals.add_products_to_orders(pk_set, [instance.pk])
+        else:
+            order_totals.add_products_to_orders([instance.pk], pk_set)
+    elif action == "post_remove":
+        # pk_set — запрошенные к удалению id (могли и не состоять в заказе), поэтому пересчитываем
+        order_totals.recalculate_order_totals(pk_set if reverse else [instance.pk])
+    elif action == "pre_clear" and reverse:
+        # после очистки уже не узнать, в каких заказах был товар — запоминаем заранее
+        instance._cleared_order_ids = order_totals.orders_with_products([instance.pk])
+    elif action == "post_clear":
+        if reverse:
+            order_totals.recalculate_order_totals(instance.__dict__.pop("_cleared_order_ids", []))
+        else:
+            order_totals.recalculate_order_totals([instance.pk])
+
+
+@receiver(pre_save, sender=Product)
+def remember_product_price(sender, instance: Product, raw=False, update_fields=None, **kwargs):
+    """Перед сохранением существующего товара запоминаем цену из базы, чтобы посчитать разницу."""
+    if raw or instance._state.adding or instance.pk is None:
+        return
+    if update_fields is not None and "price" not in update_fields:
+        return
+    instance._old_price = Product.objects.filter(pk=instance.pk).values_list("price", flat=True).first()
+
+
+@receiver(post_save, sender=Product)
+def update_order_totals_on_price_change(sender, instance: Product, created, raw=False, **kwargs):
+    """Изменение цены товара меняет сумму всех заказов с этим товаром на разницу цен."""
+    old_price = instance.__dict__.pop("_old_price", None)
+    if created or raw or old_price is None:
+        return
+    order_totals.apply_price_change(instance.pk, Decimal(str(instance.price)) - old_price)
+
+
+@receiver(pre_delete, sender=Product)
+def remember_product_orders(sender, instance: Product, **kwargs):
+    """Связи товара с заказами удаляются каскадно без m2m_changed — запоминаем заказы заранее."""
+    instance._deleted_order_ids = order_totals.orders_with_products([instance.pk])
+
+
+@receiver(post_delete, sender=Product)
+def update_order_totals_on_product_delete(sender, instance: Product, **kwargs):
+    order_totals.recalculate_order_totals(instance.__dict__.pop("_deleted_order_ids", []))
+
+
+@receiver(products_changed, sender=Product)
+def update_order_totals_on_bulk_change(sender, pks, fields=None, **kwargs):
+    """Массовое изменение цен (bulk_update, queryset.update) — пересчёт заказов с этими товарами."""
+    if fields is not None and "price" not in fields:
+        return
+    order_ids = order_totals.orders_with_products(pks)
+    if order_ids:
+        order_totals.recalculate_order_totals(order_ids)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=ProductImages)
+def build_image_variants(sender, instance, raw=False, update_fields=None, **kwargs):
+    """
+    Загруженная или заменённая картинка товара (ProductCreateView, ProductUpdateView, админка) —
+    ставим задачу построить её уменьшенные копии (декодирование фото — не в запросе).
+    Сохранение самих вариантов (update_fields без поля картинки) и загрузка фикстур (raw) сюда не доходят.
+    """
+    field_name = "preview" if sender is Product else "image"
+    if raw or (update_fields is not None and field_name not in update_fields):
+        return
+    if needs_refresh(instance, field_name):
+        enqueue("thumbnails.refresh_variants", {
+            "model": instance._meta.label_lower, "pk": instance.pk, "field": field_name,
+        })
+
+
+@receiver(job_failed)
+def fail_export_on_job_failure(sender, job, **kwargs):
+    """Любая задача выгрузки упала окончательно — выгрузка целиком failed (без части файл неполный)."""
+    if job.task in exports.EXPORT_TASKS:
+        exports.fail_export(job.payload["export"], job.error)
+
+
+@receiver(housekeeping)
+def purge_expired_exports(sender, **kwargs):
+    exports.purge_expired()
+
+
+@receiver(post_delete, sender=Export)
+def delete_export_files(sender, instance: Export, **kwargs):
+    """Удалённая выгрузка (в т.ч. из админки) — вместе с файлом."""
+    exports.remove_files(instance)
+
+
+def enqueue_sitemap_build(delay: float = 0) -> None:
+    """Ставит пересборку карты сайта, если она ещё не ждёт в очереди (правки товаров копятся в одну сборку)."""
+    if not Job.objects.filter(task=SITEMAP_TASK, status=Job.QUEUED).exists():
+        enqueue(SITEMAP_TASK, delay=delay)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(products_changed, sender=Product)
+def schedule_sitemap_build(sender, **kwargs):
+    """Изменились товары — карта сайта (файлы mysite.sitemap_files) пересобирается через SITEMAP_REBUILD_DELAY."""
+    transaction.on_commit(lambda: enqueue_sitemap_build(settings.SITEMAP_REBUILD_DELAY))
+
+
+@receiver(housekeeping)
+def rebuild_sitemaps(sender, **kwargs):
+    """Раз в час — и для статей блога, и на случай пропущенных сигналов (правки в обход ORM)."""
+    enqueue_sitemap_build()
@@ -13,6 +13,7 @@ class ShopappSitemap(Sitemap):
     """
     changefreq = "never" # Подсказка поисковику: страницы статей редко меняются
     priority = 0.5 # Средний приоритет страницы в sitemap
+    lastmod_field = "updated_at" # поле lastmod: по нему сборка карты (mysite.sitemap_files) замечает изменения
 
     def items(self):
         """
@@ -27,4 +28,4 @@ class ShopappSitemap(Sitemap):
         """
         Возвращает дату последнего изменения для sitemap.
         """
-        return obj.created_at # используем created_at как дату изменения
\ No newline at end of file
+        return obj.updated_at # дата последнего сохранения товара (правка цены, описания, архивация)
\ No newline at end of file
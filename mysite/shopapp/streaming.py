@@ -0,0 +1,268 @@
+"""
+Помощники для потоковой (streaming) выгрузки больших наборов данных.
+
+Вместо того чтобы собирать весь файл в памяти HttpResponse, строки читаются из БД
+порциями (values_list + iterator(chunk_size=...)) и сразу отдаются клиенту
+через StreamingHttpResponse — память воркера не зависит от количества строк.
+
+Форматы:
+    - CSV (iter_csv) — выгрузки для людей (API download_csv, действие админки);
+    - NDJSON (iter_ndjson) — по одному JSON-объекту на строку, для синхронизации со складом:
+      клиент может обрабатывать записи по мере получения, не дожидаясь конца ответа.
+
+Готовые файлы (выгрузки shopapp.exports) отдаёт ranged_file_response: с заголовком Range —
+только запрошенный кусок (206), так прерванное скачивание большого файла продолжается с места обрыва.
+"""
+import csv
+import io
+import os
+import re
+import zlib
+from collections.abc import AsyncIterator, Iterable, Iterator, Sequence
+from datetime import datetime, time
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import QuerySet
+from django.http import HttpRequest, HttpResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from django.utils.http import http_date
+
+CHUNK_SIZE = 2000  # сколько строк читать из БД за один запрос курсора
+ROWS_PER_CHUNK = 500  # сколько CSV-строк склеивать в один кусок ответа
+
+FILE_CHUNK_SIZE = 64 * 1024  # кусок файла в ответе ranged_file_response, байт
+
+NDJSON_CONTENT_TYPE = "application/x-ndjson"
+
+_accepts_gzip = re.compile(r"\bgzip\b")
+_byte_range = re.compile(r"^bytes=(\d*)-(\d*)$")  # один диапазон: bytes=0-99, bytes=100-, bytes=-100
+
+
+def accepts_gzip(request: HttpRequest) -> bool:
+    """Клиент готов принять ответ, сжатый gzip (заголовок Accept-Encoding)."""
+    return bool(_accepts_gzip.search(request.headers.get("Accept-Encoding", "")))
+
+
+def iter_csv(header: Sequence[str] | None, rows: Iterable[Sequence]) -> Iterator[str]:
+    """
+    Превращает строки в куски CSV-текста.
+
+    Строки пишутся в небольшой буфер, который отдаётся и очищается каждые ROWS_PER_CHUNK строк:
+    так куски ответа не слишком мелкие и не слишком большие.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header is not None:  # без заголовка — продолжение файла (части выгрузки shopapp.exports)
+        writer.writerow(header)
+    for number, row in enumerate(rows, start=1):
+        writer.writerow(row)
+        if number % ROWS_PER_CHUNK == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def iter_ndjson(records: Iterable[dict]) -> Iterator[str]:
+    """
+    Превращает словари в куски NDJSON: одна запись — одна строка JSON.
+
+    Даты и Decimal сериализуются DjangoJSONEncoder так же, как в JsonResponse.
+    """
+    encoder = DjangoJSONEncoder(ensure_ascii=False, separators=(",", ":"))
+    lines = []
+    for record in records:
+        lines.append(encoder.encode(record))
+        if len(lines) == ROWS_PER_CHUNK:
+            yield "\n".join(lines) + "\n"
+            lines.clear()
+    if lines:
+        yield "\n".join(lines) + "\n"
+
+
+def iter_keyset_chunks(queryset: QuerySet, chunk_size: int | None = None) -> Iterator[list[dict]]:
+    """
+    Читает queryset.values(...) порциями по возрастанию pk.
+
+    Каждая порция — отдельный запрос "WHERE pk > последний_pk ORDER BY pk LIMIT n":
+    в отличие от OFFSET он не замедляется к концу таблицы, а в отличие от одного курсора
+    на всю выгрузку не держит открытым долгий запрос. В values(...) должен быть "pk".
+    """
+    chunk_size = chunk_size or CHUNK_SIZE
+    last_pk = None
+    while True:
+        chunk_queryset = queryset.order_by("pk")
+        if last_pk is not None:
+            chunk_queryset = chunk_queryset.filter(pk__gt=last_pk)
+        chunk = list(chunk_queryset[:chunk_size])
+        if not chunk:
+            return
+        yield chunk
+        if len(chunk) < chunk_size:
+            return
+        last_pk = chunk[-1]["pk"]
+
+
+def parse_since(value: str | None) -> datetime | None:
+    """
+    Разбирает параметр ?since= (дата или дата-время в ISO 8601).
+
+    Время без часового пояса считается в текущем поясе проекта.
+    Некорректное значение — ValueError.
+    """
+    if not value:
+        return None
+    since = parse_datetime(value)
+    if since is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(f"Invalid since value: {value!r}")
+        since = datetime.combine(day, time.min)
+    if timezone.is_naive(since):
+        since = timezone.make_aware(since)
+    return since
+
+
+def iter_gzip(chunks: Iterable[str | bytes]) -> Iterator[bytes]:
+    """Сжимает поток кусков в gzip на лету (без буферизации всего файла)."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31 — формат gzip с заголовком
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode() if isinstance(chunk, str) else chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+async def aiter_in_thread(chunks: Iterable[str | bytes]) -> AsyncIterator[str | bytes]:
+    """
+    Отдаёт куски синхронного итератора в асинхронный ответ (ASGI).
+
+    Каждый следующий кусок (порция запроса к БД + её сериализация) считается через sync_to_async —
+    в том же потоке, где работает async ORM, поэтому event loop не блокируется.
+    Без этого Django под ASGI сначала собрал бы весь синхронный поток в список в памяти.
+    """
+    iterator = iter(chunks)
+    next_chunk = sync_to_async(next)
+    while (chunk := await next_chunk(iterator, None)) is not None:
+        yield chunk
+
+
+def streaming_response(
+    request: HttpRequest,
+    chunks: Iterable[str | bytes],
+    content_type: str,
+    filename: str | None = None,
+) -> StreamingHttpResponse:
+    """
+    Потоковый ответ из кусков текста.
+
+    Если клиент поддерживает gzip, ответ сжимается на лету (Content-Encoding: gzip) —
+    браузер или HTTP-клиент распакует его сам. Под ASGI куски отдаются через aiter_in_thread.
+    """
+    response = StreamingHttpResponse(content_type=content_type)
+    if accepts_gzip(request):
+        chunks = iter_gzip(chunks)
+        response["Content-Encoding"] = "gzip"
+    # под ASGI (async-представления, uvicorn) — асинхронный итератор, под WSGI — обычный
+    response.streaming_content = aiter_in_thread(chunks) if isinstance(request, ASGIRequest) else chunks
+    if filename:
+        response["Content-Disposition"] = f"attachment; filename={filename}"
+    response["Vary"] = "Accept-Encoding"
+    return response
+
+
+def streaming_csv_response(
+    request: HttpRequest,
+    header: Sequence[str],
+    rows: Iterable[Sequence],
+    filename: str,
+) -> StreamingHttpResponse:
+    """Потоковый CSV-ответ для скачивания (браузер сохранит обычный .csv)."""
+    return streaming_response(request, iter_csv(header, rows), "text/csv", filename)
+
+
+def streaming_ndjson_response(request: HttpRequest, records: Iterable[dict]) -> StreamingHttpResponse:
+    """Потоковый NDJSON-ответ (application/x-ndjson)."""
+    return streaming_response(request, iter_ndjson(records), NDJSON_CONTENT_TYPE)
+
+
+def parse_byte_range(header: str | None, size: int) -> tuple[int, int] | None:
+    """
+    Разбирает заголовок Range для файла размером size: (первый байт, последний байт) включительно.
+
+    None — отдать файл целиком: заголовка нет, он некорректен или в нём несколько диапазонов
+    (RFC 9110 разрешает серверу в этих случаях ответить всем файлом).
+    Диапазон за концом файла — ValueError (ответ 416).
+    """
+    match = _byte_range.match((header or "").strip())
+    if match is None or match.groups() == ("", ""):
+        return None
+    first, last = match.groups()
+    if not first:  # bytes=-N — последние N байт
+        if int(last) == 0:
+            raise ValueError("Empty suffix range")
+        return max(size - int(last), 0), size - 1
+    start = int(first)
+    if last and int(last) < start:
+        return None
+    if start >= size:
+        raise ValueError(f"Range starts after the end of a {size}-byte file")
+    return start, min(int(last), size - 1) if last else size - 1
+
+
+def iter_file(path: str, start: int, length: int) -> Iterator[bytes]:
+    """Читает length байт файла с позиции start кусками по FILE_CHUNK_SIZE."""
+    with open(path, "rb") as file:
+        file.seek(start)
+        while length > 0:
+            chunk = file.read(min(FILE_CHUNK_SIZE, length))
+            if not chunk:
+                return
+            length -= len(chunk)
+            yield chunk
+
+
+def ranged_file_response(
+    request: HttpRequest,
+    path: str,
+    content_type: str,
+    filename: str,
+) -> HttpResponse:
+    """
+    Потоковый ответ с файлом с диска и поддержкой докачки (Range).
+
+    Range: bytes=N- — ответ 206 с куском файла и Content-Range; диапазон за концом файла — 416.
+    If-Range: если файл изменился (ETag или Last-Modified не совпадают), Range не учитывается —
+    клиент получит весь новый файл, а не склейку старого начала с новым концом.
+    """
+    stat = os.stat(path)
+    size = stat.st_size
+    etag = f'"{stat.st_mtime_ns:x}-{size:x}"'
+    last_modified = http_date(stat.st_mtime)
+
+    range_header = request.headers.get("Range")
+    if_range = request.headers.get("If-Range")
+    if if_range and if_range not in (etag, last_modified):
+        range_header = None
+    try:
+        byte_range = parse_byte_range(range_header, size)
+    except ValueError:
+        response = HttpResponse(status=416)
+        response["Content-Range"] = f"bytes */{size}"
+        return response
+
+    start, end = byte_range or (0, size - 1)
+    response = StreamingHttpResponse(content_type=content_type, status=206 if byte_range else 200)
+    chunks = iter_file(path, start, end - start + 1)
+    response.streaming_content = aiter_in_thread(chunks) if isinstance(request, ASGIRequest) else chunks
+    response["Content-Length"] = end - start + 1
+    if byte_range:
+        response["Content-Range"] = f"bytes {start}-{end}/{size}"
+    response["Accept-Ranges"] = "bytes"
+    response["ETag"] = etag
+    response["Last-Modified"] = last_modified
+    response["Content-Disposition"] = f"attachment; filename={filename}"
+    return response
@@ -0,0 +1,149 @@
+"""
+Генерация синтетических строк каталога для команды generate_catalog.
+
+Модуль намеренно не импортирует Django: функции generate_* запускаются в отдельных процессах
+(ProcessPoolExecutor, старт "spawn"), получают на вход простое описание порции (ChunkSpec)
+и возвращают списки кортежей. Превращение кортежей в модели и запись в БД — в основном процессе.
+
+Детерминированность: у каждой порции свой генератор random.Random с seed вида
+"<seed>:<вид>:<номер порции>", поэтому результат не зависит ни от числа процессов,
+ни от порядка их завершения — одинаковый --seed даёт одинаковый каталог.
+
+Ссылки между сущностями — индексы (0..N-1) в пределах генерации: "пользователь №17", "товар №42".
+Основной процесс сопоставляет индексы с pk, которые вернул bulk_create.
+"""
+import random
+from collections import deque
+from collections.abc import Callable, Iterator
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from multiprocessing import get_context
+
+FIRST_NAMES = (
+    "Alexander", "Maria", "Ivan", "Anna", "Dmitry", "Elena", "Sergey", "Olga", "Pavel", "Irina",
+    "Nikolay", "Tatiana", "Mikhail", "Natalia", "Andrey", "Svetlana", "Alexey", "Ekaterina",
+)
+LAST_NAMES = (
+    "Ivanov", "Petrova", "Smirnov", "Kuznetsova", "Popov", "Vasilieva", "Sokolov", "Mikhailova",
+    "Novikov", "Fedorova", "Morozov", "Volkova", "Alekseev", "Lebedeva", "Semenov", "Egorova",
+)
+ADJECTIVES = (
+    "Compact", "Wireless", "Smart", "Portable", "Ergonomic", "Gaming", "Professional", "Silent",
+    "Ultra", "Classic", "Premium", "Budget", "Rugged", "Slim", "Modular", "Eco",
+)
+NOUNS = (
+    "Laptop", "Desktop", "Smartphone", "Tablet", "Monitor", "Keyboard", "Mouse", "Headphones",
+    "Speaker", "Router", "Camera", "Printer", "Charger", "Watch", "Drive", "Projector",
+)
+CITIES = ("Moscow", "Kazan", "Samara", "Omsk", "Tver", "Sochi", "Perm", "Ufa", "Tomsk", "Kursk")
+STREETS = ("Lenina", "Pushkina", "Gagarina", "Mira", "Sadovaya", "Lesnaya", "Shkolnaya", "Tsentralnaya")
+PROMOCODES = ("SALE10", "WELCOME", "BLACKFRIDAY", "SPRING", "VIP")
+
+
+@dataclass(frozen=True)
+class ChunkSpec:
+    """
+    Описание одной порции строк.
+
+    start — индекс первой строки порции, count — сколько строк;
+    users / products — сколько всего пользователей и товаров генерируется (для ссылок по индексу);
+    max_lines — максимум товаров в одном заказе; prefix — префикс имён пользователей.
+    """
+    seed: int
+    index: int
+    start: int
+    count: int
+    users: int = 0
+    products: int = 0
+    max_lines: int = 0
+    prefix: str = ""
+
+
+def iter_chunk_specs(total: int, chunk_rows: int, **common) -> Iterator[ChunkSpec]:
+    """Нарезает total строк на порции по chunk_rows."""
+    for index, start in enumerate(range(0, total, chunk_rows)):
+        yield ChunkSpec(index=index, start=start, count=min(chunk_rows, total - start), **common)
+
+
+def _rng(spec: ChunkSpec, kind: str) -> random.Random:
+    return random.Random(f"{spec.seed}:{kind}:{spec.index}")
+
+
+def generate_users(spec: ChunkSpec) -> list[tuple[str, str, str, str]]:
+    """Пользователи: (username, first_name, last_name, email)."""
+    rng = _rng(spec, "users")
+    rows = []
+    for number in range(spec.start, spec.start + spec.count):
+        first_name, last_name = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        username = f"{spec.prefix}{number}"  # уникальность гарантирует номер, а не случайность
+        rows.append((username, first_name, last_name, f"{username}@example.com"))
+    return rows
+
+
+def generate_products(spec: ChunkSpec) -> list[tuple[str, str, int, int, bool, int | None]]:
+    """
+    Товары: (name, description, price_cents, discount, archived, created_by_index).
+
+    Цены — логнормальное распределение (много дешёвых, мало дорогих), как в реальном каталоге;
+    скидка только у товаров дороже 3000 (то же правило, что в ProductForm); ~5% товаров в архиве.
+    """
+    rng = _rng(spec, "products")
+    rows = []
+    for number in range(spec.start, spec.start + spec.count):
+        adjective, noun = rng.choice(ADJECTIVES), rng.choice(NOUNS)
+        price_cents = min(int(rng.lognormvariate(7.5, 1.2) * 100), 999_999_99)  # max_digits=8
+        discount = rng.choice((0, 5, 10, 15, 20)) if price_cents > 3000_00 else 0
+        rows.append((
+            f"{adjective} {noun} {number}",
+            f"{adjective} {noun.lower()} for home and office, model {rng.randrange(100, 1000)}",
+            price_cents,
+            discount,
+            rng.random() < 0.05,
+            rng.randrange(spec.users) if spec.users else None,
+        ))
+    return rows
+
+
+def generate_orders(spec: ChunkSpec) -> list[tuple[int, str, str, tuple[int, ...]]]:
+    """
+    Заказы: (user_index, delivery_address, promocode, product_indexes).
+
+    Число товаров в заказе — от 1 до max_lines, товары в заказе различны.
+    Популярность товаров неравномерна: половина строк заказов приходится на первые 10% каталога.
+    """
+    rng = _rng(spec, "orders")
+    hot_products = max(1, spec.products // 10)
+    rows = []
+    for _ in range(spec.count):
+        lines = set()
+        for _ in range(rng.randint(1, min(spec.max_lines, spec.products))):
+            lines.add(rng.randrange(hot_products) if rng.random() < 0.5 else rng.randrange(spec.products))
+        rows.append((
+            rng.randrange(spec.users),
+            f"{rng.choice(CITIES)}, {rng.choice(STREETS)} st. {rng.randint(1, 200)}, apt. {rng.randint(1, 300)}",
+            rng.choice(PROMOCODES) if rng.random() < 0.2 else "",
+            tuple(sorted(lines)),
+        ))
+    return rows
+
+
+def run_chunks(generate: Callable[[ChunkSpec], list], specs: Iterator[ChunkSpec], workers: int) -> Iterator[list]:
+    """
+    Генерирует порции по порядку: в текущем процессе (workers <= 1) или в пуле процессов.
+
+    Пул заранее считает следующие порции, пока основной процесс пишет в БД текущую,
+    но не больше 2 * workers наперёд — иначе готовые порции копились бы в памяти быстрее, чем пишутся.
+    Результаты отдаются в порядке порций, поэтому вставка остаётся детерминированной.
+    """
+    if workers <= 1:
+        yield from map(generate, specs)
+        return
+    # "spawn": дочерние процессы не наследуют открытое соединение с БД и состояние Django
+    with ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn")) as pool:
+        pending = deque()
+        for spec in specs:
+            pending.append(pool.submit(generate, spec))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
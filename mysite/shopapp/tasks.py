@@ -0,0 +1,112 @@
+"""
+Фоновые задачи магазина (jobs.registry): их ставят в очередь представления и админка,
+выполняют процессы run_workers. Каждая задача получает строку Job, аргументы — в job.payload,
+возвращаемое значение сохраняется в job.result и видно в API статуса задачи.
+"""
+from django.apps import apps
+
+from jobs.models import Job
+from jobs.queue import discard_file, job_files
+from jobs.registry import task
+from mysite.sitemap_files import build_sitemaps as build_sitemap_files
+from mysite.sqlite import serialized_writes
+from mysite.thumbnails import refresh_variants, variants_attname
+
+from . import exports
+from .common import save_csv_products, save_file_orders
+from .models import Export, Product
+from .signals import products_changed
+
+ARCHIVE_BATCH_SIZE = 500  # товаров в одной транзакции массовой архивации
+
+
+# импорт не идемпотентен (без upsert повтор создал бы товары второй раз) — одна попытка
+@task("shopapp.import_products_csv", timeout=30 * 60, max_attempts=1)
+def import_products_csv(job: Job) -> dict:
+    """Импорт товаров из загруженного CSV: payload — {"path", "encoding", "upsert"}."""
+    try:
+        with job_files().open(job.payload["path"], "rb") as file:
+            summary = save_csv_products(file, job.payload.get("encoding"), upsert=job.payload.get("upsert", False))
+    finally:
+        discard_file(job.payload["path"])
+    return summary.as_dict()
+
+
+@task("shopapp.import_orders_file", timeout=30 * 60, max_attempts=1)
+def import_orders_file(job: Job) -> dict:
+    """Импорт заказов из загруженного JSON-файла: payload — {"path", "encoding"}."""
+    try:
+        with job_files().open(job.payload["path"], "rb") as file:
+            summary = save_file_orders(file, job.payload.get("encoding"))
+    finally:
+        discard_file(job.payload["path"])
+    return summary.as_dict()
+
+
+@task("shopapp.set_products_archived", timeout=10 * 60, priority=5)
+def set_products_archived(job: Job) -> dict:
+    """
+    Массовая (раз)архивация товаров: payload — {"pks": [...], "archived": true}.
+
+    Порциями по ARCHIVE_BATCH_SIZE: каждая порция — короткая транзакция, между ними
+    успевают записать другие воркеры и запросы. Повтор после ошибки безопасен.
+    """
+    pks, archived = job.payload["pks"], job.payload["archived"]
+    updated = 0
+    for start in range(0, len(pks), ARCHIVE_BATCH_SIZE):
+        batch = pks[start:start + ARCHIVE_BATCH_SIZE]
+        with serialized_writes():
+            updated += Product.objects.filter(pk__in=batch).update(archived=archived)
+        products_changed.send(sender=Product, pks=batch, fields=("archived",))  # update() не отправляет post_save
+    return {"updated": updated}
+
+
+@task("shopapp.plan_export", timeout=10 * 60)
+def plan_export(job: Job) -> dict:
+    """Выгрузка (shopapp.exports): деление набора на части по pk, payload — {"export"}."""
+    return {"shards": exports.plan_export(Export.objects.get(pk=job.payload["export"]))}
+
+
+@task("shopapp.export_shard", timeout=30 * 60)
+def export_shard(job: Job) -> dict:
+    """Одна часть выгрузки: payload — {"export", "number", "shard": диапазон pk}."""
+    export = Export.objects.get(pk=job.payload["export"])
+    if export.status != Export.RUNNING:  # выгрузка уже failed из-за другой части
+        return {"rows": 0, "size": 0}
+    part = exports.write_part(export, job.payload["number"], job.payload["shard"])
+    exports.complete_part(export, job.payload["number"], part)
+    return part
+
+
+@task("shopapp.merge_export", timeout=30 * 60)
+def merge_export(job: Job) -> dict:
+    """Склейка готовых частей выгрузки в один файл: payload — {"export"}."""
+    return exports.finish_export(Export.objects.get(pk=job.payload["export"]))
+
+
+# пользователь ждёт картинку на странице — раньше импортов и архивации
+@task("thumbnails.refresh_variants", timeout=5 * 60, priority=10)
+def refresh_thumbnails(job: Job) -> dict:
+    """
+    Варианты картинки (mysite.thumbnails): payload — {"model": "shopapp.product", "pk", "field"}.
+
+    Строка перечитывается из БД: за время в очереди картинку могли заменить ещё раз или удалить.
+    Варианты пишутся через update() — у товара кеши сбрасываются сигналом products_changed,
+    без post_save и переиндексации поиска.
+    """
+    model = apps.get_model(job.payload["model"])
+    instance = model.objects.filter(pk=job.payload["pk"]).first()
+    if instance is None:
+        return {"refreshed": False}
+    refreshed = refresh_variants(instance, job.payload["field"])
+    if refreshed and model is Product:
+        fields = (variants_attname(job.payload["field"]), "updated_at")
+        products_changed.send(sender=Product, pks=[instance.pk], fields=fields)  # update() не отправляет post_save
+    return {"refreshed": refreshed}
+
+
+# карта сайта подождёт: после всех задач, которые ждут пользователи
+@task("shopapp.build_sitemaps", timeout=30 * 60, priority=-5)
+def build_sitemaps(job: Job) -> dict:
+    """Пересборка изменившихся секций карты сайта (mysite.sitemap_files), payload пустой."""
+    return build_sitemap_files()
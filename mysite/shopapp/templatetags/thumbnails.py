@@ -0,0 +1,59 @@
+"""
+Шаблонный тег {% responsive_image %}: картинка модели с уменьшенными копиями (mysite.thumbnails).
+
+    {% load thumbnails %}
+    {% responsive_image product "preview" 150 alt=product.name %}
+
+выводит
+    <picture>
+        <source type="image/webp" srcset=".../150w.webp 150w, .../300w.webp 300w, ..." sizes="150px">
+        <img src=".../150w.jpg" srcset=".../150w.jpg 150w, ..." sizes="150px" width="150" height="113" ...>
+    </picture>
+Браузер берёт формат, который понимает, и ширину под экран (300w на экранах 2x).
+Пока вариантов нет (файл только что заменили, backfill ещё не прошёл) — выводится оригинал, как раньше.
+"""
+from django import template
+from django.conf import settings
+from django.db import models
+from django.utils.html import format_html, format_html_join
+
+from mysite.thumbnails import MIME_TYPES, variants_attname
+
+register = template.Library()
+
+
+@register.simple_tag
+def responsive_image(instance: models.Model, field_name: str, width: int, alt: str = "", sizes: str | None = None):
+    """
+    <picture> для картинки instance.<field_name>, показанной шириной width CSS-пикселей.
+
+    sizes — атрибут sizes для srcset (по умолчанию "<width>px": картинка фиксированной ширины).
+    Высота в <img> считается по пропорциям оригинала — место под картинку резервируется до загрузки.
+    """
+    file = getattr(instance, field_name)
+    if not file:
+        return ""
+    manifest = getattr(instance, variants_attname(field_name)) or {}
+    variants = manifest.get("variants") if manifest.get("source") == file.name else None
+    if not variants or not any(variants.values()):
+        return format_html('<img src="{}" alt="{}" width="{}" height="{}">', file.url, alt, width, width)
+
+    sizes = sizes or f"{width}px"
+    height = round(width * manifest["height"] / manifest["width"])
+
+    def srcset(image_format: str) -> str:
+        return ", ".join(f"{file.storage.url(path)} {variant_width}w" for variant_width, path in variants[image_format])
+
+    # <img> — запасной формат (JPEG, если есть), его src — наименьший вариант не уже width
+    fallback = "jpeg" if variants.get("jpeg") else next(name for name, paths in variants.items() if paths)
+    src = next((path for variant_width, path in variants[fallback] if variant_width >= width), variants[fallback][-1][1])
+    sources = format_html_join(
+        "", '<source type="{}" srcset="{}" sizes="{}">',
+        ((MIME_TYPES[name], srcset(name), sizes) for name in settings.THUMBNAIL_FORMATS
+         if name != fallback and variants.get(name)),
+    )
+    return format_html(
+        '<picture>{}<img src="{}" srcset="{}" sizes="{}" alt="{}" width="{}" height="{}"'
+        ' loading="lazy" decoding="async"></picture>',
+        sources, file.storage.url(src), srcset(fallback), sizes, alt, width, height,
+    )
@@ -1,11 +1,58 @@
-from django.test import TestCase, TransactionTestCase  # Импортируем базовый класс для написания тестов в Django
+import base64
+import csv
+import gzip
+import io
+import json
+import os
+import re
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from pathlib import Path
+from threading import Event
+from unittest.mock import patch
+import shutil
+import tempfile
+
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings  # Импортируем базовый класс для написания тестов в Django
 
 from shopapp.models import Order
 from .utils import add_two_number  # Импортируем тестируемую функцию из текущего пакета (модуль utils)
 from django.conf import settings
-from django.test import Client
-from django.urls import reverse
-from .models import Product, User
+from django.test import Client, RequestFactory
+from django.http import HttpResponse
+from django.contrib.admin.sites import site
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import CommandError, call_command
+from .signals import products_changed
+from .cache_versioning import bump_generation, generation_tag, get_generations
+from . import search, synthetic
+from .order_totals import recalculate_order_totals
+from .rollups import refresh_sales_rollups
+from .importers import OrderJSONImporter, ProductCSVImporter, iter_json_array
+from .admin import mark_archived
+from django.core.cache.backends.filebased import FileBasedCache
+from mysite.cache_backends import TwoTierFileBasedCache
+from mysite.query_budgets import BUDGET_NAMESPACES, BUDGET_SIZES, QUERY_BUDGETS, seed_budget_data
+from mysite.sqlite import pragma_statements, serialized_writes
+from mysite.db_routers import STICKY_COOKIE, ReplicaRouter, ReplicaRoutingMiddleware
+from mysite.warmup import warm_up
+from jobs.models import Job
+from jobs.queue import work
+from jobs.signals import housekeeping
+from django.db import connection, transaction
+from django.db.models.signals import post_save
+from django.test.utils import CaptureQueriesContext
+from django.urls import NoReverseMatch, URLResolver, get_resolver, resolve, reverse
+from django.urls.resolvers import RoutePattern
+from myauth.models import Profile
+from new_blogapp_rss.models import Article
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.template import engines
+from django.utils import timezone, translation
+from .models import Export, Product, User, DailyProductSales, MonthlyProductSales
+from .sitemap import ShopappSitemap
 from string import ascii_letters
 from random import choices
 from faker import Faker
@@ -111,6 +158,7 @@ class ProductDetailViewTestCase(TestCase):
 
 
 
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}})
 class ProductsListViewTestCase(TestCase):
     """
     Класс тестов для проверки CBV (ProductsListView)
@@ -372,3 +420,1682 @@ class OrdersExportTestCase(TransactionTestCase):
 
         print(f"\nданные которые вы сравниваете в тесте, то есть те которые сформировали из модели: {expected_data}")
         print(f"\nданные которые получили из запроса к endpoint'у' {order_data['orders']}")
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}})
+class ProductKeysetPaginationTestCase(TestCase):
+    """
+    Класс тестов для keyset-режима пагинации API товаров (?cursor=)
+    """
+    @classmethod
+    def setUpTestData(cls):
+        # товары с одинаковыми именами и ценами, чтобы проверить разрыв ничьих по pk
+        Product.objects.bulk_create(
+            Product(name=f"Product {i % 3}", price=i % 2, description="")
+            for i in range(25)
+        )
+
+    def setUp(self):
+        # LANGUAGE_CODE='en-us' нет в LANGUAGES, поэтому ссылки i18n_patterns строим для 'en'
+        language = translation.override("en")
+        language.__enter__()
+        self.addCleanup(language.__exit__, None, None, None)
+
+    def test_walk_all_pages(self):
+        """
+        Проход по всем страницам через next-ссылки даёт все товары
+        ровно по одному разу и в порядке Meta.ordering (name, price, pk).
+        """
+        url = reverse("shopapp:product-list") + "?cursor="
+        received = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            data = response.json()
+            self.assertNotIn("count", data)  # keyset-режим не выполняет COUNT(*)
+            received.extend(product["pk"] for product in data["results"])
+            url = data["next"]
+
+        expected = list(Product.objects.order_by("name", "price", "pk").values_list("pk", flat=True))
+        self.assertEqual(received, expected)
+
+    def test_cursor_with_other_ordering_rejected(self):
+        """
+        Курсор, выданный для одной сортировки, не принимается для другой.
+        """
+        response = self.client.get(reverse("shopapp:product-list") + "?cursor=")
+        next_url = response.json()["next"]
+        response = self.client.get(next_url + "&ordering=-price")
+        self.assertEqual(response.status_code, 404)
+
+    def test_forged_cursor_rejected(self):
+        """Курсор с значением не того типа (строка вместо цены) — 404, а не ошибка сервера."""
+        for values in (["Product 1", "abc", 1], ["Product 1", None, 1], ["Product 1", 0, {"pk": 1}]):
+            raw = json.dumps({"o": ["name", "price", "pk"], "v": values}).encode()
+            cursor = base64.urlsafe_b64encode(raw).decode()
+            with self.subTest(values=values):
+                response = self.client.get(reverse("shopapp:product-list"), {"cursor": cursor})
+                self.assertEqual(response.status_code, 404)
+
+    def test_search_ordering_falls_back_to_pages(self):
+        """Поиск сортирует по fts_rank — курсор не построить, поэтому ?cursor= отдаёт обычные страницы."""
+        search.rebuild_index()
+        response = self.client.get(reverse("shopapp:product-list"), {"cursor": "", "search": "Product"})
+        data = response.json()
+        self.assertEqual(data["count"], 25)
+        received = [product["pk"] for product in data["results"]]
+        while data["next"]:
+            response = self.client.get(data["next"])
+            self.assertEqual(response.status_code, 200)
+            data = response.json()
+            received.extend(product["pk"] for product in data["results"])
+        self.assertEqual(sorted(received), sorted(Product.objects.values_list("pk", flat=True)))
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}})
+class ProductFullTextSearchTestCase(TestCase):
+    """
+    Класс тестов для полнотекстового поиска товаров (FTS5)
+    """
+    def setUp(self):
+        language = translation.override("en")
+        language.__enter__()
+        self.addCleanup(language.__exit__, None, None, None)
+        self.phone = Product.objects.create(name="Смартфон Pixel", description="Хорошая камера")
+        self.case = Product.objects.create(name="Чехол", description="Подходит для смартфона Pixel")
+        self.laptop = Product.objects.create(name="Ноутбук", description="Лёгкий")
+
+    def search(self, term):
+        response = self.client.get(reverse("shopapp:product-list"), {"search": term})
+        self.assertEqual(response.status_code, 200)
+        return [product["pk"] for product in response.json()["results"]]
+
+    def test_search_ranks_name_matches_first(self):
+        """
+        Совпадение в названии ранжируется выше совпадения в описании, поиск идёт по префиксу.
+        """
+        self.assertEqual(self.search("смартф"), [self.phone.pk, self.case.pk])
+
+    def test_filter_without_rank(self):
+        """
+        rank=False (поиск в админке) только фильтрует: сортировка и остальные условия queryset сохраняются.
+        """
+        queryset = search.search_queryset(Product.objects.exclude(pk=self.laptop.pk).order_by("-pk"), "pixel", rank=False)
+        self.assertEqual(list(queryset.values_list("pk", flat=True)), [self.case.pk, self.phone.pk])
+
+    def test_index_follows_updates_and_deletes(self):
+        """
+        Индекс обновляется при сохранении и удалении товара.
+        """
+        self.laptop.name = "Ноутбук Pixelbook"
+        self.laptop.save()
+        self.assertIn(self.laptop.pk, self.search("pixelbook"))
+
+        self.laptop.delete()
+        self.assertEqual(self.search("pixelbook"), [])
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class ProductListCacheGenerationTestCase(TestCase):
+    """
+    Класс тестов для инвалидации кеша списка товаров по поколениям модели
+    """
+    def setUp(self):
+        language = translation.override("en")
+        language.__enter__()
+        self.addCleanup(language.__exit__, None, None, None)
+        self.product = Product.objects.create(name="Table", price="100.00")
+        self.url = reverse("shopapp:product-list")
+
+    def get_prices(self):
+        response = self.client.get(self.url)
+        self.assertIn("X-Cache-Generation", response.headers)
+        return [product["price"] for product in response.json()["results"]]
+
+    def test_save_invalidates_cached_list(self):
+        self.assertEqual(self.get_prices(), ["100.00"])
+        # обходим ORM-сигналы: если кеш работает, второй запрос вернёт старую цену
+        Product.objects.filter(pk=self.product.pk).update(price="1.00")
+        self.assertEqual(self.get_prices(), ["100.00"])
+
+        self.product.price = "200.00"
+        with self.captureOnCommitCallbacks(execute=True):  # поколение меняется после фиксации транзакции
+            self.product.save()
+        self.assertEqual(self.get_prices(), ["200.00"])
+
+    def test_generation_bumped_after_commit(self):
+        """До фиксации транзакции поколение прежнее, после отката — тоже; новое значение всегда больше."""
+        before = get_generations(Product)["shopapp.product"]
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.product.save()
+            self.assertEqual(get_generations(Product)["shopapp.product"], before)
+        callbacks[0]()
+        after = get_generations(Product)["shopapp.product"]
+        self.assertGreater(after, before)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                self.product.save()
+                raise RuntimeError("rollback")
+        self.assertEqual(get_generations(Product)["shopapp.product"], after)
+
+    def test_bulk_update_invalidates_cached_list(self):
+        self.assertEqual(self.get_prices(), ["100.00"])
+        request = RequestFactory().post("/")
+        with self.captureOnCommitCallbacks(execute=True):
+            mark_archived(None, request, Product.objects.filter(pk=self.product.pk))
+        response = self.client.get(self.url)
+        self.assertTrue(response.json()["results"][0]["archived"])
+
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class ProductListPageTestCase(TestCase):
+    """Страница списка товаров: пагинация и кеш карточек по версии товара и языку."""
+
+    def setUp(self):
+        cache.clear()
+        self.products = Product.objects.bulk_create(
+            Product(name=f"Product {number:02}", price=number) for number in range(30)
+        )
+
+    def get_page(self, language: str = "en", **params) -> str:
+        with translation.override(language):
+            url = reverse("shopapp:products_list")
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.content.decode()
+
+    def test_pagination(self):
+        """На странице paginate_by товаров, счётчик — по всему каталогу."""
+        first, second = self.get_page(), self.get_page(page=2)
+        self.assertIn("There are 30 products", first)
+        self.assertIn("Product 23", first)
+        self.assertNotIn("Product 24", first)
+        self.assertIn("Product 29", second)
+        self.assertIn("?page=1", second)
+
+    def test_same_name_and_price_split_by_pk(self):
+        """Одинаковые name и price: порядок внутри них — по pk, каждый товар ровно на одной странице."""
+        Product.objects.all().delete()
+        pks = [product.pk for product in Product.objects.bulk_create(Product(name="Same", price=1) for _ in range(30))]
+        with translation.override("en"):
+            url = reverse("shopapp:products_list")
+        pages = [[product.pk for product in self.client.get(url, {"page": page}).context["products"]] for page in (1, 2)]
+        self.assertEqual(pages[0] + pages[1], sorted(pks))
+
+    def test_card_cache_invalidated_by_product_version(self):
+        """Карточка берётся из кеша, пока товар не сохранён; сохранение (новая версия) её обновляет."""
+        product = self.products[0]
+        self.get_page()
+        # в обход сигналов и updated_at: страница строится заново (новое поколение), карточка — из кеша
+        Product.objects.filter(pk=product.pk).update(name="Product 00 stale")
+        with self.captureOnCommitCallbacks(execute=True):
+            bump_generation(Product)
+        self.assertNotIn("stale", self.get_page())
+
+        product.refresh_from_db()
+        product.name = "Product 00 renamed"
+        with self.captureOnCommitCallbacks(execute=True):
+            product.save()
+        self.assertIn("Product 00 renamed", self.get_page())
+
+    def test_card_cache_per_language(self):
+        """Для каждого языка — своя карточка (переводы внутри карточки)."""
+        product = Product.objects.get(pk=self.products[0].pk)
+        self.get_page("en")
+        self.get_page("ru")
+        for language in ("en", "ru"):
+            key = make_template_fragment_key("product-card", [product.pk, product.updated_at, language])
+            self.assertIsNotNone(cache.get(key))
+
+class TwoTierFileBasedCacheTestCase(SimpleTestCase):
+    """
+    Класс тестов для двухуровневого кеш-бэкенда (LRU в памяти + файлы на диске)
+    """
+    def setUp(self):
+        self.location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.location, ignore_errors=True)
+        self.cache = TwoTierFileBasedCache(self.location, {
+            "OPTIONS": {"SHARD_DEPTH": 1, "LOCAL_MAX_ENTRIES": 2, "LOCAL_TIMEOUT": 60,
+                        "LOCAL_SKIP_PREFIXES": ["generation:"]},
+        })
+
+    def test_get_served_from_memory(self):
+        self.cache.set("key", {"price": "10.00"})
+        self.assertEqual(self.cache.get("key"), {"price": "10.00"})
+        self.assertEqual(self.cache.stats()["hits"], 1)
+        # файл лежит в подкаталоге-шарде, а не в корне каталога кеша
+        (shard,) = os.listdir(self.location)
+        self.assertEqual(len(shard), 2)
+
+    def test_lru_eviction_falls_back_to_disk(self):
+        for key in ("a", "b", "c"):
+            self.cache.set(key, key)
+        self.assertEqual(self.cache.stats()["entries"], 2)  # "a" вытеснен из памяти
+        self.assertEqual(self.cache.get("a"), "a")  # но читается с диска
+        self.assertEqual(self.cache.stats()["misses"], 1)
+
+    def test_skip_prefixes_always_read_from_disk(self):
+        """Поколение, записанное другим воркером (только в файл), видно сразу, а не через LOCAL_TIMEOUT."""
+        for key in ("price", "generation:shopapp.product"):
+            self.cache.set(key, 1)
+            FileBasedCache.set(self.cache, key, 2)  # запись другого процесса: файл меняется, память — нет
+        self.assertEqual(self.cache.get("price"), 1)  # обычный ключ — копия из памяти
+        self.assertEqual(self.cache.get("generation:shopapp.product"), 2)
+        self.assertFalse(self.cache.has_key("generation:other"))
+
+    def test_expired_value_not_returned(self):
+        self.cache.set("key", "value", timeout=-1)
+        self.assertIsNone(self.cache.get("key"))
+        self.cache.set("key", "value")
+        self.cache.delete("key")
+        self.assertIsNone(self.cache.get("key"))
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}})
+class ProductsCsvStreamingTestCase(TestCase):
+    """
+    Класс тестов для потоковой выгрузки товаров в CSV
+    """
+    @classmethod
+    def setUpTestData(cls):
+        Product.objects.bulk_create(
+            Product(name=f"Product {i:04}", price=i, description=f"Описание, {i}")
+            for i in range(1200)  # больше ROWS_PER_CHUNK, чтобы ответ состоял из нескольких кусков
+        )
+
+    def setUp(self):
+        language = translation.override("en")
+        language.__enter__()
+        self.addCleanup(language.__exit__, None, None, None)
+
+    def read_csv(self, content: bytes) -> list[list[str]]:
+        return list(csv.reader(io.StringIO(content.decode())))
+
+    def test_download_csv_streams_all_rows(self):
+        """
+        API отдаёт CSV потоком, без gzip, если клиент его не просит.
+        """
+        response = self.client.get(reverse("shopapp:product-download-csv"))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertNotIn("Content-Encoding", response)
+        rows = self.read_csv(b"".join(response.streaming_content))
+        self.assertEqual(rows[0], ["name", "description", "price", "discount"])
+        self.assertEqual(len(rows), 1201)
+        self.assertEqual(rows[1], ["Product 0000", "Описание, 0", "0.00", "0"])
+
+    def test_download_csv_gzip(self):
+        """
+        При Accept-Encoding: gzip ответ сжимается на лету.
+        """
+        response = self.client.get(
+            reverse("shopapp:product-download-csv"),
+            headers={"accept-encoding": "gzip, deflate"},
+        )
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        rows = self.read_csv(gzip.decompress(b"".join(response.streaming_content)))
+        self.assertEqual(len(rows), 1201)
+
+    def test_admin_export_csv(self):
+        """
+        Действие админки выгружает все колонки модели, для ForeignKey — id.
+        """
+        admin_user = User.objects.create_superuser(username="admin_csv", password="qwerty")
+        Product.objects.filter(name="Product 0000").update(created_by=admin_user)
+        request = RequestFactory().get("/")
+        response = site._registry[Product].export_csv(request, Product.objects.order_by("pk"))
+        rows = self.read_csv(b"".join(response.streaming_content))
+        header = [field.name for field in Product._meta.concrete_fields]
+        self.assertEqual(rows[0], header)
+        self.assertEqual(len(rows), 1201)
+        self.assertEqual(rows[1][header.index("created_by")], str(admin_user.pk))
+
+
+class OrdersNdjsonExportTestCase(TestCase):
+    """
+    Класс тестов для потоковой выгрузки заказов в NDJSON (?format=ndjson)
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user(username="warehouse", password="qwerty", is_staff=True)
+        cls.products = Product.objects.bulk_create(Product(name=f"Product {i}") for i in range(3))
+        cls.orders = Order.objects.bulk_create(
+            Order(user=cls.staff, delivery_address=f"Street {i}") for i in range(5)
+        )
+        # старые заказы для проверки ?since=
+        Order.objects.filter(pk__in=[order.pk for order in cls.orders[:2]]).update(
+            created_at=datetime(2020, 1, 1, tzinfo=dt_timezone.utc)
+        )
+        cls.orders[0].products.set(cls.products)
+        cls.orders[4].products.set(cls.products[1:])
+
+    def setUp(self):
+        language = translation.override("en")
+        language.__enter__()
+        self.addCleanup(language.__exit__, None, None, None)
+        self.client.force_login(self.staff)
+
+    def read_ndjson(self, response) -> list[dict]:
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        content = b"".join(response.streaming_content).decode()
+        return [json.loads(line) for line in content.splitlines()]
+
+    def test_stream_all_orders(self):
+        """
+        Все заказы по одному на строку, в порядке pk, со списками товаров.
+        """
+        with patch("shopapp.streaming.CHUNK_SIZE", 2):
+            # маленькие порции, чтобы проверить склейку нескольких keyset-запросов
+            response = self.client.get(reverse("shopapp:orders-export"), {"format": "ndjson"})
+            records = self.read_ndjson(response)
+        self.assertEqual([record["pk"] for record in records], [order.pk for order in self.orders])
+        self.assertEqual(records[0]["products"], sorted(product.pk for product in self.products))
+        self.assertEqual(records[1]["products"], [])
+        self.assertEqual(records[4]["products"], sorted(product.pk for product in self.products[1:]))
+        self.assertEqual(records[2]["user"], self.staff.pk)
+
+    def test_since_filter(self):
+        """
+        ?since= отбирает только заказы, созданные начиная с указанной даты.
+        """
+        response = self.client.get(reverse("shopapp:orders-export"), {"format": "ndjson", "since": "2021-01-01"})
+        records = self.read_ndjson(response)
+        self.assertEqual([record["pk"] for record in records], [order.pk for order in self.orders[2:]])
+
+        response = self.client.get(reverse("shopapp:orders-export"), {"format": "ndjson", "since": "вчера"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_products_ndjson(self):
+        """
+        Выгрузка товаров в NDJSON совпадает по полям с обычной JSON-выгрузкой.
+        """
+        response = self.client.get(reverse("shopapp:products-export"), {"format": "ndjson"})
+        records = self.read_ndjson(response)
+        self.assertEqual(
+            records,
+            [
+                {"pk": product.pk, "name": product.name, "price": "0.00", "archived": False}
+                for product in self.products
+            ],
+        )
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}})
+class ProductCSVImporterTestCase(TestCase):
+    """
+    Класс тестов для потокового импорта товаров из CSV
+    """
+    def setUp(self):
+        language = translation.override("en")
+        language.__enter__()
+        self.addCleanup(language.__exit__, None, None, None)
+
+    def run_import(self, content: str, **kwargs):
+        importer = ProductCSVImporter(batch_size=2, commit_size=3, **kwargs)  # маленькие порции — несколько транзакций
+        return importer.run(io.BytesIO(content.encode()), "utf-8")
+
+    def test_create_and_row_errors(self):
+        """
+        Корректные строки создаются, строки с ошибками типов пропускаются с номером строки.
+        """
+        summary = self.run_import(
+            "name,price,discount\n"
+            "Стол,100.50,5\n"
+            "Стул,дорого,0\n"
+            "Шкаф,,\n"
+            ",10,0\n"
+            "Полка,20\n"
+            "Лампа,30,1\n"
+        )
+        self.assertEqual((summary.rows, summary.created, summary.updated, summary.failed), (6, 3, 0, 3))
+        self.assertEqual([error.line for error in summary.errors], [3, 5, 6])
+        self.assertIn("price", summary.errors[0].errors)
+        shelf = Product.objects.get(name="Шкаф")
+        self.assertEqual((shelf.price, shelf.discount), (0, 0))  # пустые ячейки — значения по умолчанию
+        self.assertEqual(str(Product.objects.get(name="Стол").price), "100.50")
+
+    def test_chunks_written_through_write_queue(self):
+        """
+        Каждая порция (commit_size строк) — своя транзакция в очереди записи SQLite.
+        """
+        with patch("shopapp.importers.serialized_writes", wraps=serialized_writes) as queued:
+            summary = self.run_import("name,price\n" + "".join(f"Товар {number},1\n" for number in range(7)))
+        self.assertEqual(summary.created, 7)
+        self.assertEqual(queued.call_count, 3)
+
+    def test_upsert_by_name(self):
+        """
+        При upsert товар с тем же именем обновляется, а не дублируется.
+        """
+        Product.objects.create(name="Стол", price=1)
+        summary = self.run_import("name,price\nСтол,200\nСтул,50\nСтул,60\n", upsert=True)
+        # второй "Стул" попал в следующую порцию (batch_size=2) и обновил товар, созданный первой
+        self.assertEqual((summary.created, summary.updated, summary.failed), (1, 2, 0))
+        self.assertEqual(Product.objects.filter(name="Стол").get().price, 200)
+        self.assertEqual(Product.objects.filter(name="Стул").get().price, 60)
+
+    def test_header_errors(self):
+        """
+        Неизвестные колонки и несуществующие связанные объекты попадают в ошибки.
+        """
+        summary = self.run_import("name,colour\nСтол,red\n")
+        self.assertEqual(summary.errors[0].line, 1)
+        self.assertFalse(Product.objects.exists())
+
+        summary = self.run_import("name,created_by\nСтол,999999\n")
+        self.assertEqual(summary.failed, 1)
+        self.assertIn("created_by", summary.errors[0].errors)
+
+    @override_settings(JOBS_EAGER=True)
+    def test_api_upload_returns_summary(self):
+        """
+        API возвращает итог импорта вместо списка всех товаров — в результате фоновой задачи.
+        """
+        user = User.objects.create_superuser(username="importer", password="qwerty")
+        self.client.force_login(user)
+        upload = SimpleUploadedFile("products.csv", "name,price\nСтол,10\n".encode(), content_type="text/csv")
+        with override_settings(JOBS_FILES_ROOT=tempfile.mkdtemp()):
+            response = self.client.post(reverse("shopapp:product-upload-csv"), {"file": upload})
+            shutil.rmtree(settings.JOBS_FILES_ROOT)
+        self.assertEqual(response.status_code, 202)
+        result = self.client.get(response["Location"]).json()["result"]
+        self.assertEqual(result["created"], 1)
+        self.assertNotIn("results", result)
+
+
+class OrderJSONImporterTestCase(TestCase):
+    """
+    Класс тестов для потокового импорта заказов из JSON
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="buyer", password="qwerty")
+        cls.products = Product.objects.bulk_create(Product(name=f"Product {i}", price=i + 1) for i in range(3))
+
+    def test_iter_json_array_small_buffer(self):
+        """
+        Элементы и числа, разрезанные границей буфера, разбираются целиком.
+        """
+        data = [12345, {"a": [1, 2, "x, y]"]}, "строка", None, 67890]
+        text = io.StringIO(json.dumps(data, ensure_ascii=False, indent=1))
+        self.assertEqual(list(iter_json_array(text, read_size=3)), data)
+        with self.assertRaises(ValueError):
+            list(iter_json_array(io.StringIO('[1, 2'), read_size=3))
+
+    def test_import_orders(self):
+        """
+        Корректные заказы создаются со связями, некорректные попадают в отчёт;
+        число запросов не зависит от числа заказов.
+        """
+        product_ids = [product.pk for product in self.products]
+        records = [
+            {"delivery_address": f"Street {i}", "promocode": "SALE", "user_id": self.user.pk, "product_ids": product_ids}
+            for i in range(50)
+        ]
+        records += [
+            {"delivery_address": "Nowhere", "promocode": "", "user_id": 999999, "product_ids": []},
+            {"delivery_address": "Street", "promocode": "", "user_id": self.user.pk, "product_ids": [999999]},
+            {"delivery_address": "Street", "promocode": "x" * 50, "user_id": self.user.pk, "product_ids": []},
+            "not an order",
+        ]
+        file = io.BytesIO(json.dumps(records).encode())
+        with self.assertNumQueries(6):  # savepoint, 2 проверки id, вставка заказов и связей, release
+            summary = OrderJSONImporter().run(file, "utf-8")
+
+        self.assertEqual((summary.rows, summary.created, summary.failed), (54, 50, 4))
+        self.assertEqual(sorted(error.line for error in summary.errors), [51, 52, 53, 54])
+        self.assertEqual(Order.objects.count(), 50)
+        self.assertEqual(Order.products.through.objects.count(), 150)
+        self.assertEqual(Order.objects.filter(total=6, product_count=3).count(), 50)  # итоги посчитаны при импорте
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}})
+class OrderTotalsTestCase(TestCase):
+    """
+    Класс тестов для денормализованных итогов заказа (Order.total, Order.product_count)
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser(username="totals", password="qwerty")
+        cls.cheap = Product.objects.create(name="Cheap", price=10)
+        cls.expensive = Product.objects.create(name="Expensive", price=100)
+
+    def setUp(self):
+        language = translation.override("en")
+        language.__enter__()
+        self.addCleanup(language.__exit__, None, None, None)
+        self.order = Order.objects.create(user=self.user)
+
+    def assertTotals(self, total, count, order=None):
+        order = order or self.order
+        order.refresh_from_db(fields=["total", "product_count"])
+        self.assertEqual((order.total, order.product_count), (total, count))
+
+    def test_products_changes(self):
+        """
+        Итоги следуют за add/remove/clear с обеих сторон связи.
+        """
+        self.order.products.add(self.cheap, self.expensive)
+        self.assertTotals(110, 2)
+        self.order.products.add(self.cheap)  # повторное добавление не меняет итоги
+        self.assertTotals(110, 2)
+        self.order.products.remove(self.cheap)
+        self.assertTotals(100, 1)
+        self.cheap.orders.add(self.order)
+        self.assertTotals(110, 2)
+        self.expensive.orders.clear()
+        self.assertTotals(10, 1)
+        self.order.products.clear()
+        self.assertTotals(0, 0)
+
+    def test_price_changes_and_delete(self):
+        """
+        Изменение цены (save и массовое) и удаление товара пересчитывают заказы.
+        """
+        self.order.products.set([self.cheap, self.expensive])
+        self.cheap.price = 15
+        self.cheap.save()
+        self.assertTotals(115, 2)
+
+        Product.objects.filter(pk=self.expensive.pk).update(price=200)
+        products_changed.send(sender=Product, pks=[self.expensive.pk], fields=("price",))
+        self.assertTotals(215, 2)
+
+        self.expensive.delete()
+        self.assertTotals(15, 1)
+
+    def test_backfill_and_api_ordering(self):
+        """
+        Команда backfill_order_totals восстанавливает итоги, API сортирует и фильтрует по ним.
+        """
+        big = Order.objects.create(user=self.user)
+        big.products.set([self.cheap, self.expensive])
+        self.order.products.set([self.cheap])
+        Order.objects.update(total=0, product_count=0)  # итоги "разъехались" после правки в обход ORM
+        call_command("backfill_order_totals", batch_size=1, stdout=io.StringIO())
+        self.assertTotals(110, 2, order=big)
+        self.assertTotals(10, 1)
+
+        self.client.force_login(self.user)
+        response = self.client.get(reverse("shopapp:order-list"), {"ordering": "-total", "total__gte": 5})
+        results = response.json()["results"]
+        self.assertEqual([order["pk"] for order in results], [big.pk, self.order.pk])
+        self.assertEqual(results[0]["total"], "110.00")
+
+
+class SalesRollupsTestCase(TestCase):
+    """
+    Класс тестов для rollup-таблиц продаж и их инкрементального пересчёта
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser(username="analyst", password="qwerty")
+        cls.book = Product.objects.create(name="Book", price=10)
+        cls.pen = Product.objects.create(name="Pen", price=2)
+
+    def setUp(self):
+        language = translation.override("en")
+        language.__enter__()
+        self.addCleanup(language.__exit__, None, None, None)
+
+    def create_order(self, created_at: datetime, *products):
+        order = Order.objects.create(user=self.user)
+        Order.objects.filter(pk=order.pk).update(created_at=created_at)
+        order.products.set(products)
+        return order
+
+    def test_incremental_refresh(self):
+        """
+        Повторный запуск учитывает только новые заказы и прибавляет их к уже посчитанным дням.
+        """
+        jan_1 = datetime(2026, 1, 1, 12, tzinfo=dt_timezone.utc)
+        self.create_order(jan_1, self.book, self.pen)
+        self.create_order(jan_1, self.book)
+        self.assertEqual(refresh_sales_rollups(batch_size=1), 2)
+
+        self.create_order(jan_1, self.book)
+        self.create_order(datetime(2026, 1, 20, tzinfo=dt_timezone.utc), self.pen)
+        self.assertEqual(refresh_sales_rollups(), 2)
+        self.assertEqual(refresh_sales_rollups(), 0)  # новых заказов нет
+
+        book_jan_1 = DailyProductSales.objects.get(product=self.book, day=date(2026, 1, 1))
+        self.assertEqual((book_jan_1.orders_count, book_jan_1.revenue), (3, 30))
+        pen_january = MonthlyProductSales.objects.get(product=self.pen, month=date(2026, 1, 1))
+        self.assertEqual((pen_january.orders_count, pen_january.revenue), (2, 4))
+
+        # полный пересчёт даёт тот же результат
+        refresh_sales_rollups(full=True)
+        book_jan_1 = DailyProductSales.objects.get(product=self.book, day=date(2026, 1, 1))
+        self.assertEqual((book_jan_1.orders_count, book_jan_1.revenue), (3, 30))
+
+    def test_products_added_to_counted_order(self):
+        """
+        Товар, добавленный в уже учтённый недавний заказ, попадает в агрегаты следующим запуском — без удвоения.
+        """
+        order = Order.objects.create(user=self.user)
+        order.products.set([self.book])
+        self.assertEqual(refresh_sales_rollups(), 1)
+        order.products.add(self.pen)  # pk заказа уже ниже водяного знака
+        self.assertEqual(refresh_sales_rollups(), 0)
+        today = timezone.localdate()
+        self.assertEqual(
+            list(DailyProductSales.objects.filter(day=today).order_by("product__name")
+                 .values_list("product__name", "orders_count", "revenue")),
+            [("Book", 1, 10), ("Pen", 1, 2)],
+        )
+        book_month = MonthlyProductSales.objects.get(product=self.book, month=today.replace(day=1))
+        self.assertEqual((book_month.orders_count, book_month.revenue), (1, 10))
+
+    def test_api_read_only(self):
+        """
+        API отдаёт rollup-ы сотрудникам с фильтром по периоду и не принимает записи.
+        """
+        self.create_order(datetime(2026, 2, 1, tzinfo=dt_timezone.utc), self.book)
+        self.create_order(datetime(2026, 3, 1, tzinfo=dt_timezone.utc), self.pen)
+        refresh_sales_rollups()
+
+        url = reverse("shopapp:dailyproductsales-list")
+        self.assertEqual(self.client.get(url).status_code, 403)
+        self.client.force_login(self.user)
+        response = self.client.get(url, {"day__gte": "2026-02-15"})
+        self.assertEqual(
+            response.json()["results"],
+            [{"product": self.pen.pk, "day": "2026-03-01", "orders_count": 1, "revenue": "2.00"}],
+        )
+        self.assertEqual(self.client.post(url, {}).status_code, 405)
+
+
+def iter_url_patterns(patterns, namespace: str = ""):
+    """Обходит дерево URL и отдаёт (полное имя маршрута, URLPattern) для всех именованных маршрутов."""
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            if pattern.namespace in QueryPlanRegressionTestCase.skip_namespaces:
+                continue
+            nested = f"{namespace}{pattern.namespace}:" if pattern.namespace else namespace
+            yield from iter_url_patterns(pattern.url_patterns, nested)
+        elif pattern.name:
+            yield namespace + pattern.name, pattern
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}})
+class QueryPlanRegressionTestCase(TestCase):
+    """
+    Регрессионная проверка планов запросов всех GET-страниц проекта.
+
+    Каждый именованный маршрут (кроме админки и документации API) запрашивается сотрудником,
+    для каждого выполненного SELECT строится EXPLAIN QUERY PLAN (SQLite).
+    Тест падает, если запрос с условием WHERE читает таблицу (или весь её индекс) полным сканом
+    или если для сортировки/группировки понадобилось временное B-дерево (USE TEMP B-TREE).
+    """
+    skip_namespaces = {"admin", "djdt"}  # админка и debug toolbar
+    skip_routes = {
+        "schema", "swagger-ui", "redoc",  # документация API (не ходит в БД магазина)
+        "shopapp:product-download-csv",  # потоковые выгрузки читают весь каталог намеренно
+        "shopapp:orders-export", "shopapp:products-export",
+        # карта сайта отдаётся из файлов; сборка (build_sitemaps) читает весь каталог намеренно
+        "django.contrib.sitemaps.views.sitemap", "sitemap-section",
+    }
+    object_pk = 1  # все тестовые объекты создаются с pk=1 — подставляется во все параметры маршрута
+    allowed_problems = [
+        # товары одного заказа (prefetch/order.products.all()) сортируются по Meta.ordering товара:
+        # набор ограничен размером заказа и выбран по индексу order_id, сортировка в памяти дешёвая
+        re.compile(r'INNER JOIN "shopapp_order_products" .* WHERE "shopapp_order_products"\."order_id" (IN|=)'),
+    ]
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser(pk=cls.object_pk, username="planner", password="qwerty")
+        Profile.objects.create(user=cls.user)
+        product = Product.objects.create(pk=cls.object_pk, name="Product", price=10)
+        order = Order.objects.create(pk=cls.object_pk, user=cls.user)
+        order.products.add(product)
+        Article.objects.create(
+            pk=cls.object_pk, title="Article", body="Text", published_at=datetime(2026, 1, 1, tzinfo=dt_timezone.utc),
+        )
+
+    def setUp(self):
+        language = translation.override("en")
+        language.__enter__()
+        self.addCleanup(language.__exit__, None, None, None)
+        self.client.raise_request_exception = False  # ошибки страниц проверяют другие тесты, здесь важны только планы
+
+    def get_urls(self) -> list[str]:
+        urls = []
+        for name, pattern in iter_url_patterns(get_resolver().url_patterns):
+            if name in self.skip_routes:
+                continue
+            params = (
+                pattern.pattern.converters.keys() if isinstance(pattern.pattern, RoutePattern)
+                else pattern.pattern.regex.groupindex.keys()
+            )
+            if "format" in params:
+                continue  # дубли маршрутов DRF с суффиксом формата (.json)
+            try:
+                urls.append(reverse(name, kwargs={param: self.object_pk for param in params}))
+            except NoReverseMatch:
+                continue
+        return sorted(set(urls))
+
+    def find_plan_problems(self, sql: str) -> list[str]:
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}")
+            details = [row[3] for row in cursor.fetchall()]
+        problems = []
+        for detail in details:
+            if "USE TEMP B-TREE" in detail:
+                problems.append(detail)
+                continue
+            scan = re.fullmatch(r"SCAN (\w+)(?: USING (?:COVERING )?INDEX (\w+))?", detail)
+            if scan and " WHERE " in sql and scan.group(2) not in self.get_partial_indexes():
+                # условие есть, а таблица (или весь её индекс) читается целиком;
+                # скан частичного индекса допустим — в нём только подходящие под условие строки
+                problems.append(detail)
+        return problems
+
+    def get_partial_indexes(self) -> set[str]:
+        if not hasattr(self, "_partial_indexes"):
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND sql LIKE '% WHERE %'")
+                self._partial_indexes = {row[0] for row in cursor.fetchall()}
+        return self._partial_indexes
+
+    def test_query_plans(self):
+        """
+        Ни один запрос страниц проекта не делает полный скан с условием и не сортирует во временном B-дереве.
+        """
+        urls = self.get_urls()
+        self.assertGreater(len(urls), 20)  # маршруты действительно нашлись
+        problems = []
+        for url in urls:
+            self.client.force_login(self.user)  # страница выхода или смены пароля могла разлогинить
+            with CaptureQueriesContext(connection) as queries:
+                self.client.get(url)
+            for query in queries.captured_queries:
+                sql = query["sql"]
+                if not sql.startswith("SELECT") or any(allowed.search(sql) for allowed in self.allowed_problems):
+                    continue
+                for problem in self.find_plan_problems(sql):
+                    problems.append(f"{url}: {problem}\n    {sql}")
+        self.assertEqual(problems, [], "\n".join(problems))
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}})
+class QueryBudgetTestCase(TestCase):
+    """
+    Бюджеты SQL-запросов страниц (mysite.query_budgets).
+
+    Для каждого размера данных из BUDGET_SIZES база заполняется seed_budget_data(n),
+    каждая страница запрашивается сотрудником и число запросов сравнивается с бюджетом маршрута.
+    Число запросов при n=100 должно совпадать с n=1 — иначе на странице N+1.
+    """
+
+    def setUp(self):
+        language = translation.override("en")
+        language.__enter__()
+        self.addCleanup(language.__exit__, None, None, None)
+
+    def get_route_names(self) -> set[str]:
+        return {
+            name for name, _ in iter_url_patterns(get_resolver().url_patterns)
+            if name.split(":")[0] in BUDGET_NAMESPACES and not name.endswith("-format")  # дубли DRF с суффиксом .json
+        }
+
+    def count_queries(self, url: str, user: User) -> int:
+        """Число запросов одного GET (потоковый ответ дочитывается до конца — он читает БД по мере отдачи)."""
+        self.client.force_login(user)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+            if response.streaming:
+                b"".join(response.streaming_content)
+        self.assertLess(response.status_code, 400, url)
+        return len(queries)
+
+    def measure(self, n: int) -> dict[str, int]:
+        """Заполняет базу n объектами каждого вида и возвращает число запросов каждой страницы."""
+        with transaction.atomic():  # точка сохранения: после замера данные откатываются
+            objects = seed_budget_data(n)
+            counts = {
+                name: self.count_queries(
+                    reverse(name, kwargs={param: objects[key].pk for param, key in budget.kwargs.items()}),
+                    objects["staff"],
+                )
+                for name, budget in QUERY_BUDGETS.items()
+                if not budget.skip
+            }
+            transaction.set_rollback(True)
+        return counts
+
+    def test_every_route_has_budget(self):
+        """Каждый именованный маршрут приложений под контролем объявлен в QUERY_BUDGETS."""
+        self.assertEqual(self.get_route_names() - QUERY_BUDGETS.keys(), set())
+        self.assertEqual(QUERY_BUDGETS.keys() - self.get_route_names(), set())  # и нет бюджетов удалённых маршрутов
+
+    def test_query_budgets(self):
+        """Страницы укладываются в бюджет, и число запросов не растёт вместе с данными."""
+        counts = {n: self.measure(n) for n in BUDGET_SIZES}
+        problems = []
+        for name, budget in QUERY_BUDGETS.items():
+            if budget.skip:
+                continue
+            measured = {n: counts[n][name] for n in BUDGET_SIZES}
+            if max(measured.values()) > budget.max_queries or len(set(measured.values())) > 1:
+                problems.append(f"{name}: budget {budget.max_queries}, measured {measured}")
+        self.assertEqual(problems, [], "\n".join(problems))
+
+    def test_admin_inlines(self):
+        """Страницы товара и заказа в админке (inline-связи M2M) не делают запрос на каждый вариант выбора."""
+        counts = []
+        for n in BUDGET_SIZES:
+            with transaction.atomic():
+                objects = seed_budget_data(n)
+                counts.append((
+                    self.count_queries(
+                        reverse("admin:shopapp_product_change", args=[objects["product"].pk]), objects["staff"],
+                    ),
+                    self.count_queries(
+                        reverse("admin:shopapp_order_change", args=[objects["order"].pk]), objects["staff"],
+                    ),
+                ))
+                transaction.set_rollback(True)
+        self.assertEqual(counts[0], counts[-1])
+
+
+class BenchShopCommandTestCase(TestCase):
+    """Команда bench_shop: запись результатов и поиск регрессий между двумя прогонами."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+
+    def write_report(self, name: str, **endpoint) -> str:
+        path = os.path.join(self.directory, name)
+        result = {"p50_ms": 1.0, "p95_ms": 10.0, "p99_ms": 12.0, "queries": 2, "bytes": 1000, "alloc_peak_kb": 50.0}
+        with open(path, "w") as file:
+            json.dump({"meta": {}, "endpoints": {"shopapp:order_list": {**result, **endpoint}}}, file)
+        return path
+
+    def test_run_writes_report(self):
+        """Замер маршрутов записывает перцентили, запросы и байты, а засеянные данные откатываются."""
+        output = os.path.join(self.directory, "bench.json")
+        call_command(
+            "bench_shop", size=3, repeat=2, warmup=0, only="new_blogapp_rss", output=output, stdout=io.StringIO(),
+        )
+        with open(output) as file:
+            endpoints = json.load(file)["endpoints"]
+        self.assertEqual(set(endpoints), {"new_blogapp_rss:articles", "new_blogapp_rss:article",
+                                          "new_blogapp_rss:articles-feed"})
+        articles = endpoints["new_blogapp_rss:articles"]
+        self.assertEqual(articles["status"], 200)
+        self.assertEqual(articles["queries"], QUERY_BUDGETS["new_blogapp_rss:articles"].max_queries)
+        self.assertLessEqual(articles["p50_ms"], articles["p99_ms"])
+        self.assertGreater(articles["bytes"], 0)
+        self.assertFalse(Article.objects.exists())
+
+    def test_compare(self):
+        """Рост числа запросов — регрессия; рост времени в пределах порога — нет."""
+        baseline = self.write_report("baseline.json")
+        self.assertIn("No regressions", self.compare(baseline, self.write_report("noise.json", p95_ms=10.5)))
+        with self.assertRaisesMessage(CommandError, "shopapp:order_list"):
+            self.compare(baseline, self.write_report("n_plus_one.json", queries=3))
+
+    def compare(self, baseline: str, current: str) -> str:
+        stdout = io.StringIO()
+        call_command("bench_shop", compare=[baseline, current], stdout=stdout)
+        return stdout.getvalue()
+
+
+class GenerateCatalogTestCase(TestCase):
+    """Команда generate_catalog: массовая генерация каталога порциями."""
+
+    def test_generate_catalog(self):
+        """Создаются все сущности, итоги заказов совпадают с ценами товаров в строках заказов."""
+        call_command(
+            "generate_catalog", users=5, products=20, orders=30, max_lines=3,
+            chunk_rows=7, batch_size=3, prefix="gen-", stdout=io.StringIO(),
+        )
+        self.assertEqual(User.objects.filter(username__startswith="gen-").count(), 5)
+        self.assertEqual(Profile.objects.filter(user__username__startswith="gen-").count(), 5)
+        self.assertEqual(Product.objects.count(), 20)
+        self.assertEqual(Order.objects.count(), 30)
+        stored = {order.pk: (order.total, order.product_count) for order in Order.objects.all()}
+        recalculate_order_totals()
+        self.assertEqual(stored, {order.pk: (order.total, order.product_count) for order in Order.objects.all()})
+        self.assertTrue(all(1 <= count <= 3 for _, count in stored.values()))
+        # created_at растёт с pk и распределён по --days дням, а не равен времени генерации
+        for model in (Product, Order):
+            dates = list(model.objects.order_by("pk").values_list("created_at", flat=True))
+            self.assertEqual(dates, sorted(dates))
+            self.assertGreater(dates[-1] - dates[0], timedelta(days=300))
+        self.assertTrue(Product._meta.get_field("created_at").auto_now_add)
+
+    def test_existing_prefix(self):
+        """Повторная генерация с тем же префиксом не смешивает данные двух прогонов."""
+        User.objects.create(username="gen-0")
+        with self.assertRaisesMessage(CommandError, "already exist"):
+            call_command("generate_catalog", users=1, products=1, orders=1, prefix="gen-", stdout=io.StringIO())
+
+    @staticmethod
+    def generate_orders(seed: int, workers: int) -> list:
+        specs = synthetic.iter_chunk_specs(50, 7, seed=seed, users=10, products=30, max_lines=4)
+        return list(synthetic.run_chunks(synthetic.generate_orders, specs, workers))
+
+    def test_deterministic(self):
+        """Одинаковый seed даёт одинаковые строки — и в одном процессе, и в пуле процессов."""
+        single = self.generate_orders(seed=1, workers=1)
+        self.assertEqual(single, self.generate_orders(seed=1, workers=2))
+        self.assertNotEqual(single, self.generate_orders(seed=2, workers=1))
+
+
+
+
+class ProfileStartupCommandTestCase(SimpleTestCase):
+    """Команда profile_startup: холодный старт Django в отдельном процессе."""
+
+    def test_report(self):
+        """Отчёт содержит фазы старта, ready() приложений и импорты; выключенные подсистемы не импортируются."""
+        stdout = io.StringIO()
+        with patch.dict(os.environ, {"DJANGO_SENTRY": "0", "DJANGO_DEBUG_TOOLBAR": "0", "DJANGO_API_DOCS": "0"}):
+            call_command("profile_startup", top=1000, stdout=stdout)
+        report = stdout.getvalue()
+        for line in ("Startup phases:", "django.setup", "AppConfig.ready():", "shopapp", "rest_framework"):
+            self.assertIn(line, report)
+        for disabled in ("sentry_sdk", "debug_toolbar", "drf_spectacular.views"):
+            self.assertNotRegex(report, rf"\n  {re.escape(disabled)} ")
+
+class SqliteConnectionTestCase(TestCase):
+    """Профиль соединений SQLite (mysite.sqlite): PRAGMA из settings.SQLITE_PRAGMAS и обслуживание БД."""
+
+    def get_pragma(self, name: str):
+        with connection.cursor() as cursor:
+            cursor.execute(f"PRAGMA {name}")
+            return cursor.fetchone()[0]
+
+    def test_pragmas_applied(self):
+        """Соединение получает PRAGMA из настроек (журнал in-memory тестовой БД остаётся "memory")."""
+        self.assertEqual(self.get_pragma("busy_timeout"), settings.SQLITE_PRAGMAS["busy_timeout"])
+        self.assertEqual(self.get_pragma("cache_size"), settings.SQLITE_PRAGMAS["cache_size"])
+        self.assertEqual(self.get_pragma("synchronous"), 1)  # NORMAL
+        self.assertEqual(self.get_pragma("temp_store"), 2)  # MEMORY
+
+    def test_invalid_pragma(self):
+        """Значение из настроек не подставляется в SQL, если это не одно слово или число."""
+        self.assertEqual(pragma_statements({"cache_size": -2000}), ["PRAGMA cache_size = -2000"])
+        with self.assertRaises(ValueError):
+            pragma_statements({"journal_mode": "wal; DROP TABLE shopapp_order"})
+
+    def test_maintenance_command(self):
+        stdout = io.StringIO()
+        call_command("sqlite_maintenance", stdout=stdout)
+        self.assertIn("SQLite maintenance finished", stdout.getvalue())
+
+
+class WarmUpTestCase(SimpleTestCase):
+    """Прогрев мастера gunicorn перед fork (mysite.warmup)."""
+
+    def test_warm_up(self):
+        """Все шаги выполняются без запросов к БД (SimpleTestCase), шаблоны попадают в кеширующий загрузчик."""
+        loader = engines["django"].engine.template_loaders[0]
+        loader.reset()
+        report = warm_up()
+        self.assertEqual([step.name for step in report], ["urls", "templates", "translations", "models"])
+        self.assertTrue(all(step.items for step in report))
+        self.assertIn("shopapp/base.html", loader.get_template_cache)
+
+
+class SerializedWritesTestCase(TestCase):
+    """Очередь записи (mysite.sqlite.serialized_writes): блокировка файла, транзакция и вложенность."""
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.lock_path = os.path.join(directory, "write-lock")
+        settings_override = override_settings(SQLITE_WRITE_LOCK=self.lock_path)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_rollback(self):
+        """Блок — одна транзакция: при исключении откатываются все записи."""
+        with self.assertRaises(RuntimeError):
+            with serialized_writes():
+                Product.objects.create(name="Queued", price=10)
+                raise RuntimeError
+        self.assertFalse(Product.objects.filter(name="Queued").exists())
+
+    def test_lock_taken_outside_transaction(self):
+        """
+        Вне транзакции блокировка берётся (создаётся файл), вложенный вызов её не берёт повторно.
+        Внутри уже открытой транзакции (как здесь, в TestCase) файл не трогается вовсе.
+        """
+        with patch("mysite.sqlite.fcntl.flock") as flock, patch.object(connection, "in_atomic_block", False):
+            with patch("mysite.sqlite.transaction.atomic"):
+                with serialized_writes():
+                    with serialized_writes():
+                        pass
+        self.assertTrue(os.path.exists(self.lock_path))
+        self.assertEqual(flock.call_count, 2)  # LOCK_EX и LOCK_UN внешнего вызова
+
+        os.remove(self.lock_path)
+        with serialized_writes():
+            Product.objects.create(name="Nested", price=10)
+        self.assertFalse(os.path.exists(self.lock_path))
+
+    def test_order_create_view(self):
+        """
+        Оформление заказа через SerializedWriteMixin создаёт заказ, как и раньше;
+        форма с ошибками показывается без очереди записи.
+        """
+        user = User.objects.create_user(username="queued", password="qwerty")
+        product = Product.objects.create(name="Queued product", price=10, created_by=user)
+        self.client.force_login(user)
+        data = {
+            "user": user.pk,
+            "products": [product.pk],
+            "delivery_address": "Город Москва Улица Пушкина Дом 66А Квартира 17",
+            "promocode": "",
+        }
+        with translation.override("en"), override_settings(
+            CACHES={"default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}},
+        ), patch("mysite.sqlite.serialized_writes", wraps=serialized_writes) as queued:
+            response = self.client.post(reverse("shopapp:order_create"), {**data, "products": []})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(queued.call_count, 0)
+            response = self.client.post(reverse("shopapp:order_create"), data)
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(queued.call_count, 1)
+        self.assertTrue(Order.objects.filter(user=user, products=product).exists())
+
+
+@override_settings(DATABASE_REPLICA="replica", DATABASE_REPLICA_STICKY_SECONDS=60)
+class ReplicaRouterTestCase(SimpleTestCase):
+    """
+    Маршрутизация чтений в реплику (mysite.db_routers). Реплика в тестах не создаётся:
+    проверяется, какую БД выбирает роутер внутри запроса.
+    """
+
+    def route(self, method: str, url: str, cookies: dict | None = None, write: bool = False):
+        """Прогоняет запрос через middleware; возвращает (БД для чтения товаров внутри представления, ответ)."""
+        request = getattr(RequestFactory(), method)(url)
+        request.COOKIES.update(cookies or {})
+        chosen = {}
+
+        def get_response(request):
+            middleware.process_view(request, resolve(request.path).func, (), {})
+            chosen["read"] = ReplicaRouter().db_for_read(Product)
+            if write:
+                ReplicaRouter().db_for_write(Product)
+            return HttpResponse()
+
+        middleware = ReplicaRoutingMiddleware(get_response)
+        with translation.override("en"):
+            response = middleware(request)
+        return chosen["read"], response
+
+    def test_read_only_views(self):
+        """Списки, детали, ленты, выгрузки и list/retrieve API читают из реплики."""
+        with translation.override("en"):
+            urls = [
+                reverse("shopapp:products_details", kwargs={"pk": 1}),
+                reverse("shopapp:product-feed"),
+                reverse("shopapp:products-export"),
+                reverse("shopapp:product-detail", kwargs={"pk": 1}),
+                reverse("shopapp:product-download-csv"),
+            ]
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertEqual(self.route("get", url)[0], "replica")
+
+    def test_primary_views(self):
+        """Запись, формы и страница подтверждения удаления остаются на default."""
+        with translation.override("en"):
+            cases = [
+                ("post", reverse("shopapp:product-list")),
+                ("get", reverse("shopapp:product_create")),
+                ("get", reverse("shopapp:product_update", kwargs={"pk": 1})),
+                ("get", reverse("shopapp:order_delete", kwargs={"pk": 1})),
+                ("get", reverse("shopapp:shop_index")),
+                # списки товаров кешируются по поколению Product (cache_page_versioned)
+                ("get", reverse("shopapp:products_list")),
+                ("get", reverse("shopapp:product-list")),
+            ]
+        for method, url in cases:
+            with self.subTest(method=method, url=url):
+                self.assertIsNone(self.route(method, url)[0])
+
+    def test_generation_cached_response_on_primary(self):
+        """Ответ, кешируемый по поколению (generation_tag), читается из default даже в читающем представлении."""
+        with translation.override("en"):
+            request = RequestFactory().get(reverse("shopapp:products-export"))
+        chosen = []
+
+        def get_response(request):
+            middleware.process_view(request, resolve(request.path).func, (), {})
+            chosen.append(ReplicaRouter().db_for_read(Product))
+            with patch("shopapp.cache_versioning.get_generations", return_value={"shopapp.product": 1}):
+                generation_tag(Product)
+            chosen.append(ReplicaRouter().db_for_read(Product))
+            return HttpResponse()
+
+        middleware = ReplicaRoutingMiddleware(get_response)
+        with translation.override("en"):
+            middleware(request)
+        self.assertEqual(chosen, ["replica", None])
+
+    def test_sticky_primary_after_write(self):
+        """После записи браузер получает cookie и до его истечения читает из default."""
+        with translation.override("en"):
+            url = reverse("shopapp:products_details", kwargs={"pk": 1})
+        _, response = self.route("get", url, write=True)
+        self.assertIn(STICKY_COOKIE, response.cookies)
+        self.assertEqual(response.cookies[STICKY_COOKIE]["max-age"], 60)
+
+        cookies = {STICKY_COOKIE: response.cookies[STICKY_COOKIE].value}
+        self.assertIsNone(self.route("get", url, cookies=cookies)[0])
+        self.assertEqual(self.route("get", url, cookies={STICKY_COOKIE: "0"})[0], "replica")  # истёк
+
+    def test_writes_and_sessions_on_primary(self):
+        """Запись — всегда default (даже для объекта из реплики), сессии и вне запроса — default."""
+        product = Product(pk=1)
+        product._state.db = "replica"
+        self.assertEqual(ReplicaRouter().db_for_write(Product, instance=product), "default")
+        self.assertIsNone(ReplicaRouter().db_for_read(Product))  # вне запроса
+        self.assertFalse(ReplicaRouter().allow_migrate("replica", "shopapp"))
+
+    @override_settings(DATABASE_REPLICA=None)
+    def test_without_replica(self):
+        with translation.override("en"):
+            url = reverse("shopapp:products_list")
+        read, response = self.route("get", url, write=True)
+        self.assertIsNone(read)
+        self.assertNotIn(STICKY_COOKIE, response.cookies)
+        with self.assertRaises(CommandError):
+            call_command("refresh_replica", stdout=io.StringIO())
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class AsyncExportViewsTestCase(TestCase):
+    """Асинхронные JSON-выгрузки под ASGI (AsyncClient): async ORM, async кеш и проверка доступа."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user(username="async-staff", password="qwerty", is_staff=True)
+        cls.customer = User.objects.create_user(username="async-customer", password="qwerty")
+        cls.product = Product.objects.create(name="Async product", price=10)
+        cls.order = Order.objects.create(user=cls.customer, delivery_address="Async street 1")
+        cls.order.products.add(cls.product)
+
+    def setUp(self):
+        language = translation.override("en")
+        language.__enter__()
+        self.addCleanup(language.__exit__, None, None, None)
+
+    async def test_user_orders_export(self):
+        url = reverse("shopapp:users_orders_export", kwargs={"user_id": self.customer.pk})
+        response = await self.async_client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([order["pk"] for order in response.json()["orders"]], [self.order.pk])
+        response = await self.async_client.get(
+            reverse("shopapp:users_orders_export", kwargs={"user_id": 999999})
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_cached_exports_without_queries(self):
+        """Повторные запросы отдаются из кеша (async API кеша в async-представлениях)."""
+        user_orders = reverse("shopapp:users_orders_export", kwargs={"user_id": self.customer.pk})
+        products = reverse("shopapp:products-export")
+        first = [self.client.get(user_orders).json(), self.client.get(products).json()]
+        with self.assertNumQueries(1):  # только проверка пользователя (404), заказы — из кеша
+            cached_orders = self.client.get(user_orders).json()
+        with self.assertNumQueries(0):
+            cached_products = self.client.get(products).json()
+        self.assertEqual([cached_orders, cached_products], first)
+        self.assertEqual(cached_products["products"][0]["name"], "Async product")
+
+    async def test_orders_export_access(self):
+        """Аноним — на вход, не сотрудник — 403, сотрудник получает заказы с товарами."""
+        url = reverse("shopapp:orders-export")
+        response = await self.async_client.get(url)
+        self.assertEqual(response.status_code, 302)
+        self.assertIn(str(settings.LOGIN_URL), response.url)
+
+        await self.async_client.aforce_login(self.customer)
+        response = await self.async_client.get(url)
+        self.assertEqual(response.status_code, 403)
+
+        await self.async_client.aforce_login(self.staff)
+        response = await self.async_client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["orders"][0]["products"], [self.product.pk])
+
+    async def test_ndjson_streams_asynchronously(self):
+        """Под ASGI потоковая выгрузка — асинхронный итератор (без сборки всего ответа в памяти)."""
+        await self.async_client.aforce_login(self.staff)
+        response = await self.async_client.get(reverse("shopapp:orders-export"), {"format": "ndjson"})
+        self.assertTrue(response.is_async)
+        content = b"".join([chunk async for chunk in response.streaming_content]).decode()
+        self.assertEqual([json.loads(line)["pk"] for line in content.splitlines()], [self.order.pk])
+
+
+def make_image(width: int, height: int, image_format: str = "JPEG") -> bytes:
+    """Картинка для загрузки в тестах миниатюр."""
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.new("RGB", (width, height), "teal").save(buffer, image_format)
+    return buffer.getvalue()
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}},
+    JOBS_EAGER=True,  # задача thumbnails.refresh_variants выполняется сразу при сохранении
+)
+class ThumbnailVariantsTestCase(TestCase):
+    """Уменьшенные копии картинок: сборка при загрузке, тег responsive_image и команда generate_thumbnails."""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()  # uploads/ в репозитории не трогаем
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=self.media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.user = User.objects.create_superuser(username="admin", password="password")
+        self.client.force_login(self.user)
+
+    def render(self, instance, field_name: str, width: int) -> str:
+        template = engines["django"].from_string(
+            "{% load thumbnails %}{% responsive_image instance field_name width alt='Photo' %}"
+        )
+        return template.render({"instance": instance, "field_name": field_name, "width": width})
+
+    def test_upload_builds_variants(self):
+        """ProductCreateView: превью и доп. изображения получают WebP/JPEG варианты без увеличения."""
+        with translation.override("en"):
+            create_url, list_url = reverse("shopapp:product_create"), reverse("shopapp:products_list")
+        response = self.client.post(create_url, {
+            "name": "Lamp",
+            "description": "",
+            "price": "100",
+            "discount": "0",
+            "preview": SimpleUploadedFile("lamp.jpg", make_image(400, 200), content_type="image/jpeg"),
+            "images": [SimpleUploadedFile("side.png", make_image(160, 160, "PNG"), content_type="image/png")],
+        })
+        self.assertEqual(response.status_code, 302)
+        product = Product.objects.get(name="Lamp")
+        manifest = product.preview_variants
+        self.assertEqual(manifest["source"], product.preview.name)
+        self.assertEqual((manifest["width"], manifest["height"]), (400, 200))
+        self.assertEqual([width for width, _ in manifest["variants"]["webp"]], [150, 300, 400])
+        self.assertEqual([width for width, _ in manifest["variants"]["jpeg"]], [150, 300, 400])
+        for _, path in manifest["variants"]["webp"] + manifest["variants"]["jpeg"]:
+            self.assertTrue(default_storage.exists(path), path)
+        self.assertTrue(manifest["variants"]["webp"][0][1].startswith(f"{settings.THUMBNAIL_DIR}/"))
+        image = product.images.get()
+        self.assertEqual([width for width, _ in image.image_variants["variants"]["jpeg"]], [150, 160])
+
+        html = self.render(product, "preview", 150)
+        self.assertIn('<source type="image/webp"', html)
+        self.assertIn(f'{default_storage.url(manifest["variants"]["webp"][1][1])} 300w', html)
+        self.assertIn('width="150" height="75"', html)
+        self.assertIn("<picture>", self.client.get(list_url).content.decode())
+
+    def test_same_content_shares_variants(self):
+        """Пути вариантов — по хешу содержимого: одинаковые файлы не кодируются повторно."""
+        content = make_image(320, 240)
+        first = Product.objects.create(name="First", preview=SimpleUploadedFile("a.jpg", content))
+        second = Product.objects.create(name="Second", preview=SimpleUploadedFile("b.jpg", content))
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertNotEqual(first.preview.name, second.preview.name)
+        self.assertEqual(first.preview_variants["variants"], second.preview_variants["variants"])
+
+    def test_stale_variants_fall_back_to_original(self):
+        """Картинку заменили в обход сигналов — тег выводит оригинал, а не чужие варианты."""
+        product = Product.objects.create(name="Lamp", preview=SimpleUploadedFile("lamp.jpg", make_image(300, 300)))
+        default_storage.save("other.jpg", io.BytesIO(make_image(300, 300)))
+        Product.objects.filter(pk=product.pk).update(preview="other.jpg")
+        product.refresh_from_db()
+        html = self.render(product, "preview", 150)
+        self.assertNotIn("<picture>", html)
+        self.assertIn(f'src="{default_storage.url("other.jpg")}"', html)
+
+    def test_variants_saved_without_post_save(self):
+        """Задача пишет варианты через update(): повторного post_save нет, кеш списка сбрасывает products_changed."""
+        saved, changed = [], []
+        post_save.connect(lambda sender, update_fields, **kwargs: saved.append(update_fields), sender=Product,
+                          weak=False, dispatch_uid="test")
+        self.addCleanup(post_save.disconnect, sender=Product, dispatch_uid="test")
+        products_changed.connect(lambda sender, fields, **kwargs: changed.append(fields), weak=False, dispatch_uid="test")
+        self.addCleanup(products_changed.disconnect, dispatch_uid="test")
+        product = Product.objects.create(name="Lamp", preview=SimpleUploadedFile("lamp.jpg", make_image(300, 300)))
+        self.assertEqual(saved, [None])  # только само создание
+        self.assertEqual(changed, [("preview_variants", "updated_at")])
+        self.assertIn("variants", Product.objects.get(pk=product.pk).preview_variants)
+
+    def test_unreadable_file_keeps_original(self):
+        """Файл, который не открывается как картинка, не ломает сохранение и выводится как есть."""
+        product = Product.objects.create(name="Broken", preview=SimpleUploadedFile("broken.jpg", b"not an image"))
+        product.refresh_from_db()
+        self.assertNotIn("variants", product.preview_variants)
+        self.assertIn(product.preview.url, self.render(product, "preview", 150))
+
+    def test_avatar_variants(self):
+        """Аватар профиля (AboutMeView, ProfileUpdateView, админка) — те же варианты."""
+        profile = Profile.objects.create(user=self.user, avatar=SimpleUploadedFile("me.jpg", make_image(200, 300)))
+        profile.refresh_from_db()
+        self.assertEqual([width for width, _ in profile.avatar_variants["variants"]["webp"]], [150, 200])
+        self.assertIn('width="150" height="225"', self.render(profile, "avatar", 150))
+
+    def test_command_backfills_existing_uploads(self):
+        """generate_thumbnails строит варианты уже загруженных файлов в пуле процессов."""
+        names = [default_storage.save(f"old/{number}.jpg", io.BytesIO(make_image(640, 480))) for number in range(2)]
+        products = Product.objects.bulk_create(Product(name=name, preview=name) for name in names)
+        before = Product.objects.get(pk=products[0].pk).updated_at
+        out = io.StringIO()
+        call_command("generate_thumbnails", workers=2, stdout=out)
+        self.assertIn("Built variants for 2 of 2 files", out.getvalue())
+        for product in Product.objects.filter(pk__in=[product.pk for product in products]):
+            self.assertEqual(product.preview_variants["source"], product.preview.name)
+            self.assertEqual([width for width, _ in product.preview_variants["variants"]["jpeg"]], [150, 300, 600])
+            self.assertGreater(product.updated_at, before)  # карточка в кеше списка перерисуется
+
+        out = io.StringIO()
+        call_command("generate_thumbnails", workers=1, stdout=out)  # всё актуально — повторно не строит
+        self.assertIn("Build thumbnails for 0 files", out.getvalue())
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}},
+    JOBS_EAGER=False,
+)
+class BackgroundJobsTestCase(TestCase):
+    """Долгие операции магазина ставятся в очередь задач (jobs), а не выполняются в запросе."""
+
+    def setUp(self):
+        self.files_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.files_root, ignore_errors=True)
+        files = override_settings(JOBS_FILES_ROOT=self.files_root)
+        files.enable()
+        self.addCleanup(files.disable)
+        self.admin = User.objects.create_superuser(username="admin", password="password")
+        self.client.force_login(self.admin)
+
+    def test_upload_csv_is_queued(self):
+        """API импорта отвечает 202 со ссылкой на задачу; итог импорта — в результате задачи."""
+        with translation.override("en"):
+            url = reverse("shopapp:product-upload-csv")
+        upload = SimpleUploadedFile("products.csv", "name,price\nСтол,10\nСтул,x\n".encode(), content_type="text/csv")
+        response = self.client.post(url, {"file": upload})
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response["Location"], reverse("jobs:job-detail", kwargs={"pk": response.json()["pk"]}))
+        self.assertFalse(Product.objects.filter(name="Стол").exists())  # запрос только поставил задачу
+
+        self.assertEqual(work("test", Event(), burst=True), 1)
+        job = Job.objects.get(pk=response.json()["pk"])
+        self.assertEqual((job.status, job.created_by), (Job.SUCCEEDED, self.admin))
+        self.assertEqual((job.result["created"], job.result["failed"]), (1, 1))
+        self.assertTrue(Product.objects.filter(name="Стол").exists())
+        self.assertEqual(os.listdir(self.files_root), [])  # загруженный файл удалён после импорта
+
+    def test_large_archive_action_is_queued(self):
+        """Массовая архивация больше ARCHIVE_INLINE_LIMIT товаров — фоновой задачей порциями."""
+        products = Product.objects.bulk_create(Product(name=f"Product {number}") for number in range(3))
+        with translation.override("en"):
+            url = reverse("admin:shopapp_product_changelist")
+        with patch("shopapp.admin.ARCHIVE_INLINE_LIMIT", 2), patch("shopapp.tasks.ARCHIVE_BATCH_SIZE", 2):
+            response = self.client.post(url, {
+                "action": "mark_archived", "_selected_action": [product.pk for product in products],
+            }, follow=True)
+            self.assertContains(response, "queued as background job")
+            self.assertFalse(Product.objects.filter(archived=True).exists())
+            work("test", Event(), burst=True)
+        self.assertEqual(Product.objects.filter(archived=True).count(), 3)
+        self.assertEqual(Job.objects.get(task="shopapp.set_products_archived").result, {"updated": 3})
+
+
+@override_settings(JOBS_EAGER=False, JOBS_RETRY_DELAY=0, EXPORT_SHARDS=3, EXPORT_SHARD_MIN_ROWS=2)
+class ExportJobsTestCase(TestCase):
+    """Выгрузки в файл фоновыми задачами: части по диапазонам pk, склейка, докачка и срок хранения."""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        # уборка воркеров (housekeeping) ставит и пересборку карты сайта — её файлы тоже во временный каталог
+        media = override_settings(MEDIA_ROOT=self.media_root, SITEMAP_ROOT=os.path.join(self.media_root, "sitemaps"),
+                                  SITEMAP_BASE_URL="http://testserver")
+        media.enable()
+        self.addCleanup(media.disable)
+        self.staff = User.objects.create_user(username="staff", password="password", is_staff=True)
+        self.client.force_login(self.staff)
+        Product.objects.bulk_create(Product(name=f"Product {number}", price=number) for number in range(7))
+        with translation.override("en"):
+            self.list_url = reverse("shopapp:export-list")
+
+    def export(self, **data) -> dict:
+        response = self.client.post(self.list_url, data, content_type="application/json")
+        self.assertEqual(response.status_code, 202, response.content)
+        self.assertEqual(response.json()["status"], Export.QUEUED)
+        work("test", Event(), burst=True)
+        return self.client.get(response["Location"]).json()
+
+    def test_products_csv_gzip_in_shards(self):
+        """Три части (3 задачи) склеиваются в один gzip-файл с одним заголовком и всеми товарами по pk."""
+        data = self.export(dataset="products", format="csv", compress=True)
+        self.assertEqual((data["status"], data["shards"], data["shards_done"], data["rows"]), ("succeeded", 3, 3, 7))
+        self.assertEqual(Job.objects.filter(task="shopapp.export_shard", status=Job.SUCCEEDED).count(), 3)
+
+        response = self.client.get(data["download"])
+        self.assertEqual((response.status_code, response["Content-Type"]), (200, "application/gzip"))
+        content = b"".join(response.streaming_content)
+        self.assertEqual(len(content), data["size"])
+        rows = list(csv.reader(io.StringIO(gzip.decompress(content).decode())))
+        self.assertEqual(rows[0], ["pk", "name", "description", "price", "discount", "archived", "created_at"])
+        self.assertEqual([row[1] for row in rows[1:]], [f"Product {number}" for number in range(7)])
+        # части удалены, в каталоге выгрузки — только готовый файл
+        export = Export.objects.get(pk=data["pk"])
+        self.assertEqual(os.listdir(os.path.dirname(default_storage.path(export.file.name))),
+                         ["products-export.csv.gz"])
+
+    def test_download_range(self):
+        data = self.export(dataset="products", format="ndjson", archived=False)
+        path = default_storage.path(Export.objects.get(pk=data["pk"]).file.name)
+        with open(path, "rb") as file:
+            content = file.read()
+        self.assertEqual(len(content.splitlines()), 7)
+
+        response = self.client.get(data["download"], headers={"Range": "bytes=10-19"})
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response["Content-Range"], f"bytes 10-19/{len(content)}")
+        self.assertEqual(b"".join(response.streaming_content), content[10:20])
+
+        response = self.client.get(data["download"], headers={"Range": "bytes=-5"})
+        self.assertEqual(b"".join(response.streaming_content), content[-5:])
+        etag = response["ETag"]
+        response = self.client.get(data["download"], headers={"Range": "bytes=5-", "If-Range": etag})
+        self.assertEqual(b"".join(response.streaming_content), content[5:])
+        # файл с другим ETag (изменился) — весь файл заново
+        response = self.client.get(data["download"], headers={"Range": "bytes=5-", "If-Range": '"other"'})
+        self.assertEqual((response.status_code, b"".join(response.streaming_content)), (200, content))
+
+        response = self.client.get(data["download"], headers={"Range": f"bytes={len(content)}-"})
+        self.assertEqual((response.status_code, response["Content-Range"]), (416, f"bytes */{len(content)}"))
+
+    def test_orders_ndjson_and_access(self):
+        order = Order.objects.create(user=self.staff, delivery_address="Street 1")
+        order.products.set(Product.objects.all()[:2])
+        data = self.export(dataset="orders", format="ndjson")
+        content = b"".join(self.client.get(data["download"]).streaming_content)
+        record = json.loads(content)
+        self.assertEqual((record["pk"], record["delivery_address"], len(record["products"])), (order.pk, "Street 1", 2))
+
+        user = User.objects.create_user(username="user", password="password")
+        self.client.force_login(user)
+        response = self.client.post(self.list_url, {"dataset": "orders"}, content_type="application/json")
+        self.assertEqual(response.status_code, 400)  # заказы (адреса) выгружают только сотрудники
+        self.assertEqual(self.client.get(data["download"]).status_code, 404)  # чужая выгрузка
+
+    def test_not_ready_failed_and_expired(self):
+        response = self.client.post(self.list_url, {"dataset": "products"}, content_type="application/json")
+        with translation.override("en"):
+            download_url = reverse("shopapp:export-download", kwargs={"pk": response.json()["pk"]})
+        self.assertEqual(self.client.get(download_url).status_code, 409)
+        work("test", Event(), burst=True)
+        self.assertEqual(self.client.get(download_url).status_code, 200)
+
+        export = Export.objects.get(pk=response.json()["pk"])
+        Export.objects.filter(pk=export.pk).update(expires_at=timezone.now() - timedelta(seconds=1))
+        housekeeping.send(sender=Job)
+        self.assertEqual(Export.objects.get(pk=export.pk).status, Export.EXPIRED)
+        self.assertFalse(os.path.exists(default_storage.path(export.file.name)))
+        self.assertEqual(self.client.get(download_url).status_code, 410)
+
+        # задача выгрузки упала после всех попыток — выгрузка failed
+        with patch("shopapp.exports.ProductsDataset.rows", side_effect=RuntimeError("disk full")):
+            data = self.export(dataset="products")
+        self.assertEqual(data["status"], Export.FAILED)
+        self.assertIn("disk full", data["error"])
+
+    def test_large_admin_export_is_queued(self):
+        self.client.force_login(User.objects.create_superuser(username="admin", password="password"))
+        with translation.override("en"):
+            url = reverse("admin:shopapp_product_changelist")
+        pks = list(Product.objects.order_by("pk").values_list("pk", flat=True))
+        with patch("shopapp.admin.ProductAdmin.export_inline_limit", 5):
+            response = self.client.post(url, {"action": "export_csv", "_selected_action": pks[1:]}, follow=True)
+        self.assertContains(response, "Export queued as background job")
+        work("test", Event(), burst=True)
+        export = Export.objects.get(dataset="rows")
+        self.assertEqual((export.status, export.shards, export.rows), (Export.SUCCEEDED, 3, 6))
+        with open(default_storage.path(export.file.name), encoding="utf-8") as file:
+            rows = list(csv.DictReader(file))
+        self.assertEqual([int(row["id"]) for row in rows], pks[1:])
+        self.assertEqual(export.filters["pks"], pks[1:])  # флажки на странице — не больше страницы списка
+
+    def test_admin_export_of_whole_filtered_list(self):
+        """"Выбрать все": в выгрузке запрос списка, а не pk; воркер заново применяет фильтры и поиск админки."""
+        self.client.force_login(User.objects.create_superuser(username="admin", password="password"))
+        Product.objects.filter(price__gte=5).update(archived=True)
+        with translation.override("en"):
+            url = reverse("admin:shopapp_product_changelist")
+        pks = list(Product.objects.filter(archived=False).order_by("pk").values_list("pk", flat=True))
+        with patch("shopapp.admin.ProductAdmin.export_inline_limit", 2):
+            response = self.client.post(f"{url}?archived__exact=0&p=1", {
+                "action": "export_csv", "select_across": "1", "_selected_action": pks[:1],
+            }, follow=True)
+        self.assertContains(response, "Export queued as background job")
+        export = Export.objects.get(dataset="rows")
+        self.assertEqual(export.filters["query"], "archived__exact=0")
+        self.assertNotIn("pks", export.filters)
+        work("test", Event(), burst=True)
+        export.refresh_from_db()
+        self.assertEqual((export.status, export.rows), (Export.SUCCEEDED, len(pks)))
+        with open(default_storage.path(export.file.name), encoding="utf-8") as file:
+            self.assertEqual([int(row["id"]) for row in csv.DictReader(file)], pks)
+
+
+class SitemapFilesTestCase(TestCase):
+    """Карта сайта из файлов: секции по pk, пересборка только изменившихся, отдача без запросов к БД."""
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+        sitemap_settings = override_settings(SITEMAP_ROOT=self.root, SITEMAP_BASE_URL="http://testserver")
+        sitemap_settings.enable()
+        self.addCleanup(sitemap_settings.disable)
+        limit = patch.object(ShopappSitemap, "limit", 2)  # секции по 2 URL вместо 50 000
+        limit.start()
+        self.addCleanup(limit.stop)
+        self.products = Product.objects.bulk_create(Product(name=f"Product {number}") for number in range(5))
+
+    def build(self, **options) -> str:
+        out = io.StringIO()
+        call_command("build_sitemaps", stdout=out, **options)
+        return out.getvalue()
+
+    def section_urls(self, name: str) -> list[str]:
+        content = gzip.decompress((Path(self.root) / name).read_bytes()).decode()
+        return re.findall(r"<loc>(.*?)</loc>", content)
+
+    def test_build_and_serve_without_queries(self):
+        self.assertIn("3 sections, 3 rebuilt, 0 removed, 5 URLs", self.build())
+        self.assertEqual(self.section_urls("sitemap-shop-1.xml.gz"), [
+            f"http://testserver/en/shop/products/{product.pk}/" for product in self.products[:2]
+        ])
+        self.assertEqual(len(self.section_urls("sitemap-shop-3.xml.gz")), 1)
+
+        with self.assertNumQueries(0):
+            response = self.client.get("/sitemap.xml")
+        self.assertEqual((response.status_code, response["Content-Type"]), (200, "application/xml"))
+        last_modified = response["Last-Modified"]
+        self.assertEqual(re.findall(r"<loc>(.*?)</loc>", response.content.decode()), [
+            f"http://testserver/sitemap-shop-{page}.xml.gz" for page in (1, 2, 3)
+        ])
+        with self.assertNumQueries(0):
+            response = self.client.get("/sitemap-shop-2.xml.gz")
+        self.assertEqual((response.status_code, response["Content-Type"]), (200, "application/gzip"))
+        self.assertIn(f"/en/shop/products/{self.products[2].pk}/", gzip.decompress(response.content).decode())
+
+        # краулер с If-Modified-Since получает 304 без тела
+        response = self.client.get("/sitemap.xml", headers={"If-Modified-Since": last_modified})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(self.client.get("/sitemap-shop-9.xml.gz").status_code, 404)
+
+    def test_rebuilds_only_changed_sections(self):
+        self.build()
+        index_mtime = (Path(self.root) / "sitemap.xml").stat().st_mtime_ns
+        self.assertIn("3 sections, 0 rebuilt, 0 removed, 5 URLs", self.build())
+        self.assertEqual((Path(self.root) / "sitemap.xml").stat().st_mtime_ns, index_mtime)  # ничего не изменилось
+
+        # новый товар дописывается в последнюю секцию, первые две не трогаются
+        added = Product.objects.create(name="Product 5")
+        self.assertIn("3 sections, 1 rebuilt, 0 removed, 6 URLs", self.build())
+        self.assertEqual(len(self.section_urls("sitemap-shop-3.xml.gz")), 2)
+        self.assertTrue(self.section_urls("sitemap-shop-3.xml.gz")[-1].endswith(f"/{added.pk}/"))
+
+        # архивированный товар из первой секции: пересобрана только она, остальные секции не сдвинулись
+        Product.objects.filter(pk=self.products[0].pk).update(archived=True)
+        self.assertIn("3 sections, 1 rebuilt, 0 removed, 5 URLs", self.build())
+        self.assertEqual(len(self.section_urls("sitemap-shop-1.xml.gz")), 1)
+        self.assertEqual(len(self.section_urls("sitemap-shop-2.xml.gz")), 2)
+
+        # правка товара двигает его lastmod (updated_at) — пересобрана только его секция
+        product = Product.objects.get(pk=self.products[2].pk)
+        product.price = 10
+        product.save()
+        self.assertIn("3 sections, 1 rebuilt, 0 removed, 5 URLs", self.build())
+
+        # все товары последней секции удалены — её файл удаляется
+        Product.objects.filter(pk__gte=self.products[4].pk).delete()
+        self.assertIn("2 sections, 0 rebuilt, 1 removed, 3 URLs", self.build())
+        self.assertFalse((Path(self.root) / "sitemap-shop-3.xml.gz").exists())
+
+        self.assertIn("2 sections, 2 rebuilt", self.build(force=True))
+
+    def test_rebuild_scheduled_after_product_changes(self):
+        """Изменения товаров ставят одну отложенную задачу пересборки; уборка воркеров — тоже, если её нет."""
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.create(name="Product 5")
+            Product.objects.filter(pk=self.products[0].pk).delete()
+        (job,) = Job.objects.filter(task="shopapp.build_sitemaps")
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertGreater(job.run_after, timezone.now() + timedelta(seconds=60))
+
+        Job.objects.all().delete()
+        housekeeping.send(sender=Job)
+        job = Job.objects.get(task="shopapp.build_sitemaps")
+        work("test", Event(), burst=True)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.result["urls"]), (Job.SUCCEEDED, 5))
+
+    def test_base_url_required(self):
+        """Без SITEMAP_BASE_URL карта с адресами localhost не публикуется — сборка падает."""
+        with override_settings(SITEMAP_BASE_URL=""), self.assertRaises(ImproperlyConfigured):
+            self.build()
+
+    def test_index_is_built_on_first_request(self):
+        """До первого запуска build_sitemaps индекс один раз строит запрос."""
+        response = self.client.get("/sitemap.xml")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue((Path(self.root) / "sitemap-shop-3.xml.gz").exists())
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get("/sitemap.xml").content, response.content)
@@ -21,6 +21,9 @@ from .views import (
     OrdersDataExport,  # Экспорт заказов в JSON
     ProductViewSet,  # ViewSet для работы с товарами через API
     OrderViewSet,  # ViewSet для работы с заказами через API
+    ExportViewSet,  # Выгрузки в файл фоновыми задачами (API)
+    DailyProductSalesViewSet,  # API продаж по дням (rollup, только чтение)
+    MonthlyProductSalesViewSet,  # API продаж по месяцам (rollup, только чтение)
     LatestProductsFeed, # Класс для отображения ленты магазина rss
     UserOrdersListView, # Класс представление для отображения списка заказов конкретного юзера
     OrdersUserDataExport, # Класс представление для экспорта данных заказа конкретного юзера
@@ -31,6 +34,9 @@ app_name = "shopapp"  # Имя приложения для namespace в URL
 routers = DefaultRouter()  # Создаем роутер DRF
 routers.register("products", ProductViewSet)  # Регистрируем ViewSet по адресу /products/
 routers.register("orders", OrderViewSet)  # Регистрируем ViewSet по адресу /orders/
+routers.register("exports", ExportViewSet, basename="export")  # Выгрузки в файл: /exports/, /exports/<id>/download/
+routers.register("sales/daily", DailyProductSalesViewSet)  # Продажи по дням: /sales/daily/
+routers.register("sales/monthly", MonthlyProductSalesViewSet)  # Продажи по месяцам: /sales/monthly/
 
 urlpatterns = [
     # path('', cache_page(60 * 3)(ShopIndexView.as_view()), name='shop_index'),  # Главная страница магазина (пример с декоратором для кеширования)
@@ -4,11 +4,11 @@
 Для интернет-магазина: сущности для CRUD операций над товарами и заказами.
 """
 import logging # импортируем модуль логирования
+import os
 
 from timeit import default_timer
-from csv import DictReader, DictWriter
+from csv import DictReader
 from django.contrib.auth.models import Group, User
-from django.views.decorators.cache import cache_page
 from django.core.cache import cache
 # Декоратор для кеширования результата view (HTTP-ответа) на заданное время
 from django.utils.decorators import method_decorator
@@ -28,8 +28,10 @@ from django.views.generic import (
 )
 from rest_framework.request import Request
 from rest_framework.parsers import MultiPartParser
+from rest_framework.mixins import CreateModelMixin
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
-from rest_framework.viewsets import ModelViewSet  # базовый класс для создания API viewset с CRUD операциями (list, create, retrieve, update, destroy)
+from rest_framework.viewsets import ModelViewSet, ReadOnlyModelViewSet  # базовый класс для создания API viewset с CRUD операциями (list, create, retrieve, update, destroy)
 from rest_framework.filters import SearchFilter, OrderingFilter   # встроенный фильтр DRF для поиска по полям модели через query parameters
 from rest_framework.decorators import action # позволяет подкл. любую view функцию к классу обработчику ViewSet
 from django_filters.rest_framework import DjangoFilterBackend
@@ -37,22 +39,46 @@ from django_filters.rest_framework import DjangoFilterBackend
 # Декоратор для добавления метаданных к API-эндпоинту для генерации схемы
 from drf_spectacular.utils import extend_schema, OpenApiResponse
 
-from .models import Product, Order, ProductImages
+from .models import Product, Order, ProductImages, DailyProductSales, MonthlyProductSales, Export
 from django.http import HttpResponse, HttpRequest, JsonResponse, \
-    HttpResponseRedirect  # Импортируем класс HttpResponse, чтобы возвращать простой HTTP-ответ (текст, HTML и т.д.)
+    HttpResponseRedirect, HttpResponseBadRequest, StreamingHttpResponse  # Импортируем класс HttpResponse, чтобы возвращать простой HTTP-ответ (текст, HTML и т.д.)
 
-from django.shortcuts import render, redirect, reverse, get_object_or_404
+from django.shortcuts import render, redirect, reverse, get_object_or_404, aget_object_or_404
+from django.contrib.auth.views import redirect_to_login
+from django.core.exceptions import PermissionDenied
 # Импортируем функцию render для возвращения HTML-шаблонов с данными (не используется в этом примере)
 
 from .forms import ProductForm, OrderForm, GroupForm  # Импорт HTML-форм
-from .serializers import ProductSerializer, OrderSerializer # Импорт сериализатора для API
-from .common import save_csv_products
+from .serializers import ( # Импорт сериализаторов для API
+    ProductSerializer,
+    OrderSerializer,
+    DailyProductSalesSerializer,
+    MonthlyProductSalesSerializer,
+    ExportSerializer,
+)
+from django.core.files.storage import default_storage
+from jobs.queue import enqueue, stage_file
+from jobs.serializers import JobSerializer
+from .cache_versioning import ageneration_tag, cache_page_versioned
+from .exports import iter_order_records, start_export
+from .pagination import KeysetPagination
+from .search import ProductSearchFilter
+from .streaming import (
+    CHUNK_SIZE,
+    NDJSON_CONTENT_TYPE,
+    iter_keyset_chunks,
+    parse_since,
+    ranged_file_response,
+    streaming_csv_response,
+    streaming_ndjson_response,
+)
 
 from django.contrib.auth.mixins import ( # Миксины для ограничения доступа к класс-представлениям (views).
     LoginRequiredMixin,  # Требует, чтобы пользователь был авторизован (вошёл в систему).
     PermissionRequiredMixin,  # Требует наличия у пользователя определённого разрешения (permission).
     UserPassesTestMixin  # Позволяет задать собственную функцию проверки (test_func),
 )
+from mysite.sqlite import SerializedWriteMixin  # POST пишущих представлений — через очередь записи SQLite
 
 log = logging.getLogger(__name__) # Создаем логгер
 
@@ -65,6 +91,7 @@ class LatestProductsFeed(Feed):
     title = "Products in the store (latest)" # Заголовок для rss-ленты
     description = "Updates on changes and product additions to the store" # Описание ленты
     link = reverse_lazy("shopapp:products_list") # Ссылка на страницу со списком товаров
+    replica_reads = True  # лента только читает: запросы идут в реплику БД (mysite.db_routers)
 
     def items(self):
         """
@@ -95,7 +122,9 @@ class LatestProductsFeed(Feed):
 
 
 
-@method_decorator(cache_page(60 * 1), name="list")
+# Кешируем список на 6 часов: ключ кеша включает поколение Product, поэтому после любой
+# правки товара (в т.ч. массовой) клиенты сразу получают свежие данные
+@method_decorator(cache_page_versioned(60 * 60 * 6, Product), name="list")
 @extend_schema(description=(
         "Набор представлений для действий над Product. "
         "Полный CRUD для сущностей товара."
@@ -114,14 +143,17 @@ class ProductViewSet(ModelViewSet):
     """
     queryset = Product.objects.all()  # Получаем все товары из БД
     serializer_class = ProductSerializer  # Используем наш сериализатор для API
+    pagination_class = KeysetPagination  # ?page=N как раньше, ?cursor= — keyset-режим без OFFSET и COUNT(*)
+    # читающие действия идут в реплику БД; list кешируется по поколению Product — только из default
+    replica_actions = ("retrieve", "download_csv")
 
     filter_backends = [ # указываем какие фильтры используем, здесь по умолчанию DjangoFilterBackend + SearchFilter
-        SearchFilter,
+        ProductSearchFilter, # полнотекстовый поиск (FTS5, ранжирование bm25), без FTS — обычный SearchFilter
         DjangoFilterBackend,
         OrderingFilter, # сортировка
     ]
 
-    search_fields = [ # указываем по каким полям надо выполнять поиск SearchFilter
+    search_fields = [ # указываем по каким полям надо выполнять поиск SearchFilter (запасной вариант без FTS)
         "name", "description"
     ]
 
@@ -177,18 +209,9 @@ class ProductViewSet(ModelViewSet):
 
     def download_csv(self, request: Request):
         # Метод ViewSet, который будет обрабатывать GET-запрос
-
-        response = HttpResponse(content_type="text/csv")
-        # Создаём HTTP-ответ вручную
-        # content_type="text/csv" — говорим браузеру, что это CSV-файл
-
-        filename = "product-export.csv"
-        # Имя файла, которое увидит пользователь при скачивании
-
-        response["Content-Disposition"] = f"attachment; filename={filename}"
-        # HTTP-заголовок Content-Disposition
-        # attachment — говорит браузеру: "это файл для скачивания, а не для отображения"
-        # filename=... — имя файла при сохранении
+        # Ответ потоковый: строки читаются из БД порциями и сразу уходят клиенту,
+        # поэтому память воркера не растёт вместе с размером каталога
+        # Каталог, который не успевает выгрузиться за таймаут воркера, — POST /api/exports/ (shopapp.exports)
 
         # self.get_queryset() возвращает все объекты (базовый queryset) = Product.objects.all()
         # self.filter_queryset(...) применяет фильтры, поиск и сортировку из запроса
@@ -199,18 +222,15 @@ class ProductViewSet(ModelViewSet):
             "price",  # выбираем только поле price
             "discount",  # выбираем только поле discount
         ]
-        # queryset.only(...) → оптимизация: извлекаем только указанные поля в fields из базы
-        # остальные поля будут загружены только при доступе к ним
-        queryset = queryset.only(*fields)
-        # CSV writer: пишет словари в response с колонками, указанными в fields
-        writer = DictWriter(response, fieldnames=fields)
-        writer.writeheader() # записывает первую строку с заголовками колонок
-
-        for product in queryset: # перебираем каждый объект Product в queryset
-            writer.writerow({ # writer.writerow(...) записывает этот словарь как строку в CSV
-                field: getattr(product, field) for field in fields # для каждой строки формируем словарь: ключ = имя поля, значение = атрибут объекта
-            })
-        return response
+        # values_list(...) → из базы читаются только нужные колонки и без создания объектов Product
+        # iterator(chunk_size=...) → строки читаются курсором порциями, без кеша всего queryset в памяти
+        rows = queryset.values_list(*fields).iterator(chunk_size=CHUNK_SIZE)
+        return streaming_csv_response(
+            request,
+            header=fields,  # первая строка с заголовками колонок
+            rows=rows,
+            filename="product-export.csv",  # Имя файла, которое увидит пользователь при скачивании
+        )
 
     @action(
         methods=["post"],  # этот endpoint доступен только по POST
@@ -218,12 +238,80 @@ class ProductViewSet(ModelViewSet):
         parser_classes=[MultiPartParser]  # ожидаем multipart/form-data (для файлов)
     )
     def upload_csv(self, request: Request):
-        products = save_csv_products(
-            file=request.FILES["file"].file,  # берём загруженный CSV файл из запроса
-            encoding=request.encoding,  # используем кодировку запроса
+        # Импорт выполняет фоновая задача (shopapp.tasks.import_products_csv): большой CSV
+        # импортируется минутами, дольше таймаута воркера gunicorn. Ответ — 202 и статус задачи,
+        # клиент опрашивает Location, пока status не станет succeeded (итог импорта — в result) или failed.
+        job = enqueue("shopapp.import_products_csv", {
+            "path": stage_file(request.FILES["file"]),  # загруженный CSV файл из запроса
+            "encoding": request.encoding,  # кодировка запроса
+            # ?upsert=1 — товары с уже существующим именем обновляются, а не создаются повторно
+            "upsert": request.query_params.get("upsert") in ("1", "true"),
+        }, user=request.user)
+        location = reverse("jobs:job-detail", kwargs={"pk": job.pk})
+        return Response(JobSerializer(job).data, status=202, headers={"Location": location})
+
+
+@extend_schema(tags=["exports"])
+class ExportViewSet(CreateModelMixin, ReadOnlyModelViewSet):
+    """
+    Выгрузки товаров и заказов в файл фоновыми задачами (shopapp.exports) — для объёмов,
+    которые не успевают выгрузиться потоком за время запроса.
+
+        POST /api/exports/ {"dataset": "products", "format": "csv", "compress": true} → 202, Location — статус
+        GET /api/exports/<id>/ → статус: status, shards_done из shards, rows, size, ссылка download
+        GET /api/exports/<id>/download/ → файл, с докачкой (Range); 409 — ещё не готов, 410 — срок хранения истёк
+
+    Пользователь видит свои выгрузки, сотрудники — все.
+    """
+    serializer_class = ExportSerializer
+    permission_classes = [IsAuthenticated]
+    filterset_fields = ["dataset", "status"]
+    replica_actions = ()  # статус меняют воркеры — реплика показывала бы его с опозданием
+
+    CONTENT_TYPES = {Export.CSV: "text/csv", Export.NDJSON: NDJSON_CONTENT_TYPE}
+
+    def get_queryset(self):
+        queryset = Export.objects.all()
+        if not self.request.user.is_staff:
+            queryset = queryset.filter(created_by=self.request.user)
+        return queryset
+
+    def create(self, request: Request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        filters = {}
+        if data.get("since"):
+            filters["since"] = data["since"].isoformat()
+        if data["dataset"] == "products" and data.get("archived") is not None:
+            filters["archived"] = data["archived"]
+        export = start_export(
+            data["dataset"], format=data.get("format", Export.CSV), compress=data.get("compress", False),
+            filters=filters, user=request.user,
+        )
+        export.refresh_from_db()  # с JOBS_EAGER выгрузка уже выполнена
+        location = reverse("shopapp:export-detail", kwargs={"pk": export.pk})
+        return Response(self.get_serializer(export).data, status=202, headers={"Location": location})
+
+    @extend_schema(responses={
+        (200, "application/octet-stream"): OpenApiResponse(description="Файл выгрузки"),
+        (206, "application/octet-stream"): OpenApiResponse(description="Запрошенный заголовком Range кусок файла"),
+        409: OpenApiResponse(description="Выгрузка ещё не готова или завершилась ошибкой"),
+        410: OpenApiResponse(description="Файл удалён по истечении срока хранения"),
+    })
+    @action(methods=["get"], detail=True)
+    def download(self, request: Request, pk=None):
+        export = self.get_object()
+        if export.status == Export.EXPIRED:
+            return Response({"detail": "Export file has expired."}, status=410)
+        if export.status != Export.SUCCEEDED:
+            return Response({"detail": f"Export is {export.status}."}, status=409)
+        return ranged_file_response(
+            request._request,  # HttpRequest Django: под ASGI файл отдаётся асинхронным итератором
+            default_storage.path(export.file.name),
+            content_type="application/gzip" if export.compress else self.CONTENT_TYPES[export.format],
+            filename=os.path.basename(export.file.name),
         )
-        serializer = self.get_serializer(products, many=True)  # сериализуем созданные объекты Product
-        return Response(serializer.data)  # возвращаем данные в виде JSON
 
 
 # @method_decorator(cache_page(60), name="get") # Декоратор для кеширования представления (метода get)
@@ -330,20 +418,23 @@ class OrdersUserDataExport(View):
     """
     Возвращает заказы выбранного пользователя в JSON формате.
     Кеширует результат на 60 секунд, чтобы повторные запросы не обращались к базе.
+
+    Асинхронное представление (async ORM и async API кеша): под ASGI ожидание БД и кеша
+    не занимает воркер целиком, он в это время обслуживает другие запросы.
     """
+    replica_reads = True  # выгрузка только читает: запросы идут в реплику БД
 
-    def get(self, request: HttpRequest, user_id: int) -> JsonResponse:
-        user = get_object_or_404(User, id=user_id)  # Получаем пользователя или 404
+    async def get(self, request: HttpRequest, user_id: int) -> JsonResponse:
+        user = await aget_object_or_404(User, id=user_id)  # Получаем пользователя или 404
 
-        cache_key = f"user_orders_{user_id}"  # Генерируем уникальный ключ для кеша
-        cache_data = cache.get(cache_key)  # Пытаемся взять данные из кеша
+        # Генерируем уникальный ключ для кеша; поколение заказов в ключе сбрасывает кеш после правок
+        cache_key = f"user_orders_{user_id}:{await ageneration_tag(Order)}"
+        cache_data = await cache.aget(cache_key)  # Пытаемся взять данные из кеша
 
         if cache_data is None:   # Если кеш пуст
             queryset = (  # Загружаем заказы пользователя
                 Order.objects
-                .select_related("user")  # Оптимизация для FK user
-                .prefetch_related("products")  # Оптимизация для M2M products
-                .filter(user_id=user.pk)   # Только заказы выбранного пользователя
+                .filter(user_id=user.pk)   # Только заказы выбранного пользователя (индекс user_id, created_at)
                 .order_by("id")   # Сортировка по PK
             )
             log.info(queryset.query) # Логируем SQL-запрос для отладки
@@ -355,15 +446,16 @@ class OrdersUserDataExport(View):
                     "created_at": order.created_at,
                     "user_id": order.user_id,
                 }
-                for order in queryset
+                async for order in queryset  # async-итерация: запрос выполняется без блокировки event loop
             ]
-            cache.set(cache_key, orders_data, 60)  # Сохраняем результат в кеш на 60 секунд
+            await cache.aset(cache_key, orders_data, 60)  # Сохраняем результат в кеш на 60 секунд
             return JsonResponse({"orders": orders_data})  # Возвращаем JSON
         log.info("Загрузка из кеша")
         return JsonResponse({"orders": cache_data})  # Если данные в кеше — возвращаем их
 
 
 
+@method_decorator(cache_page_versioned(60 * 60 * 6, Product), name="dispatch") # HTML кешируется до изменения товаров
 class ProductsListView(ListView):
     """
     Класс-представление для отображения списка товаров.
@@ -373,7 +465,17 @@ class ProductsListView(ListView):
     template_name = 'shopapp/products-list.html'  # Указываем путь к HTML-шаблону, который будет рендериться при обращении к этому представлению.
     # model = Product  # Задаем модель, с которой будет работать представление. Django автоматически сделает запрос Product.objects.all().
     context_object_name = "products"  # Имя переменной, под которым список объектов будет доступен в шаблоне.
-    queryset = Product.objects.filter(archived = False) # Получаем только те объекты (продуктов) что не архивированные
+    # Получаем только те объекты (продуктов) что не архивированные, и только поля карточки
+    # (описание может быть большим, а на странице списка не выводится).
+    # pk в конце сортировки: name + price не уникальны, без него товары с одинаковыми именем и ценой
+    # могут повториться или пропасть на соседних страницах (?page=N)
+    queryset = Product.objects.filter(archived = False).order_by("name", "price", "pk").only(
+        "pk", "name", "price", "discount", "preview", "preview_variants", "updated_at",
+    )
+    paginate_by = 24  # товаров на странице (?page=N): размер страницы не растёт вместе с каталогом
+    replica_reads = False  # страница кешируется по поколению Product: отстающая реплика закешировала бы старые данные
+    # карточки товаров кешируются фрагментами ({% cache %}) по версии товара — долгий TTL безопасен
+    extra_context = {"card_cache_timeout": 60 * 60 * 24}
 
 
 class ProductDetailsView(DetailView):
@@ -389,6 +491,7 @@ class ProductDetailsView(DetailView):
 
 class ProductCreateView(
     PermissionRequiredMixin,
+    SerializedWriteMixin,  # запись товара и картинок — через очередь записи SQLite
     # UserPassesTestMixin, # временно отключили кастомную проверку прав в группе
     CreateView
 ):
@@ -505,13 +608,23 @@ class ProductsDataExportView(View):
     """
     Объявляем класс представления, наследуем от базового View Django
     Класс чисто тестовый
+
+    ?format=ndjson — потоковая выгрузка (по товару на строку), без кеша и без списка в памяти;
+    ?since=2026-01-01T00:00 — только товары, созданные не раньше указанного момента.
+
+    Асинхронное представление (async ORM и async API кеша), как OrdersUserDataExport.
     """
-    def get(self, request: HttpRequest) -> JsonResponse:
+    replica_reads = True  # выгрузка только читает: запросы идут в реплику БД
+
+    async def get(self, request: HttpRequest) -> JsonResponse | StreamingHttpResponse:
         # Метод для обработки GET-запроса
         # request: объект HttpRequest, который содержит данные запроса
         # -> JsonResponse: указываем, что метод вернёт JSON-ответ
-        cache_key = "products_data_export" # Создаем ключ кеша
-        cache_data = cache.get(cache_key) # Получаем данные из кэша по ключу "products_data_export"
+        if request.GET.get("format") == "ndjson":
+            return self.stream_ndjson(request)
+
+        cache_key = f"products_data_export:{await ageneration_tag(Product)}" # Создаем ключ кеша (с поколением товаров)
+        cache_data = await cache.aget(cache_key) # Получаем данные из кэша по ключу "products_data_export"
         if cache_data is None:
             # Получаем все объекты Product из базы, отсортированные по первичному ключу (pk)
             # .all() здесь можно опустить, но так читается явно
@@ -526,9 +639,9 @@ class ProductsDataExportView(View):
                     "price": str(product.price),    # цена продукта
                     "archived": product.archived # статус архивированности
                 }
-                for product in products  # перебираем все продукты из QuerySet
+                async for product in products  # перебираем все продукты из QuerySet (async ORM)
             ]
-            cache.set(cache_key, product_data, 60) # Добавляем в кэш: ключ кэша, данные товаров, время жизни кэша
+            await cache.aset(cache_key, product_data, 60) # Добавляем в кэш: ключ кэша, данные товаров, время жизни кэша
             # Вносим намеренную ошибку для (Sentry)
             elem = product_data[0]
             # name = elem["neme"] # Намеренная ошибка
@@ -542,6 +655,29 @@ class ProductsDataExportView(View):
         # если кэш не пуст, возвращаем данные товаров из него!
         return JsonResponse({"products": cache_data})
 
+    def stream_ndjson(self, request: HttpRequest) -> HttpResponse:
+        """Потоковая выгрузка товаров в NDJSON порциями по pk."""
+        try:
+            since = parse_since(request.GET.get("since"))
+        except ValueError as error:
+            return HttpResponseBadRequest(str(error))
+
+        queryset = Product.objects.values("pk", "name", "price", "archived")  # только нужные колонки, без объектов
+        if since is not None:
+            queryset = queryset.filter(created_at__gte=since)
+
+        records = (
+            {
+                "pk": product["pk"],
+                "name": product["name"],
+                "price": str(product["price"]),  # цена строкой, как в обычном JSON-ответе
+                "archived": product["archived"],
+            }
+            for chunk in iter_keyset_chunks(queryset)  # порции "pk > последний pk LIMIT n"
+            for product in chunk
+        )
+        return streaming_ndjson_response(request, records)
+
 
 class OrderViewSet(ModelViewSet):
     """
@@ -559,6 +695,7 @@ class OrderViewSet(ModelViewSet):
         .all()
     )
     serializer_class = OrderSerializer  # Используем сериализатор OrderSerializer для преобразования данных в JSON и обратно
+    pagination_class = KeysetPagination  # ?page=N как раньше, ?cursor= — keyset-режим по (created_at, pk)
 
     filter_backends = [  # Определяем фильтры, которые будут применяться к запросам API
         DjangoFilterBackend,  # Фильтрация по точным значениям полей через django-filters
@@ -566,13 +703,15 @@ class OrderViewSet(ModelViewSet):
         OrderingFilter,  # Сортировка по указанным полям
     ]
 
-    filterset_fields = [  # Поля, по которым можно фильтровать через GET параметры ?field=value
-        "delivery_address",  # Фильтрация по адресу доставки
-        "promocode",  # Фильтрация по использованному промокоду
-        "created_at",  # Фильтрация по дате и времени создания заказа
-        "user__username",  # Фильтрация по пользователю, создавшему заказ
-        "products__name",  # Фильтрация по товарам, входящим в заказ (ManyToMany)
-    ]
+    filterset_fields = {  # Поля, по которым можно фильтровать через GET параметры ?field=value
+        "delivery_address": ["exact"],  # Фильтрация по адресу доставки
+        "promocode": ["exact"],  # Фильтрация по использованному промокоду
+        "created_at": ["exact"],  # Фильтрация по дате и времени создания заказа
+        "user__username": ["exact"],  # Фильтрация по пользователю, создавшему заказ
+        "products__name": ["exact"],  # Фильтрация по товарам, входящим в заказ (ManyToMany)
+        "total": ["exact", "gte", "lte"],  # Фильтрация по сумме заказа (?total__gte=1000)
+        "product_count": ["exact", "gte", "lte"],  # Фильтрация по количеству товаров
+    }
 
     search_fields = [  # Поля для текстового поиска через GET параметр ?search=...
         "delivery_address",  # Поиск по адресу доставки
@@ -582,6 +721,8 @@ class OrderViewSet(ModelViewSet):
     ordering_fields = [  # Поля, по которым можно сортировать через GET параметр ?ordering=...
         "created_at",  # Сортировка по дате создания (новые или старые заказы)
         "user_username",  # Сортировка по пользователю (по алфавиту или по id)
+        "total",  # Сортировка по сумме заказа (хранится в колонке, без агрегата по M2M)
+        "product_count",  # Сортировка по количеству товаров
     ]
 
 class OrderListView(LoginRequiredMixin, ListView):
@@ -604,6 +745,41 @@ class OrderListView(LoginRequiredMixin, ListView):
     context_object_name = 'orders' # Имя переменной, под которым список объектов будет доступен в шаблоне.
 
 
+class DailyProductSalesViewSet(ReadOnlyModelViewSet):
+    """
+    Только чтение rollup-таблицы продаж по дням (для дашбордов):
+        GET /api/sales/daily/?product=5&day__gte=2026-01-01&day__lte=2026-01-31
+    Данные предрассчитаны командой refresh_sales_rollups — запросы не трогают таблицы заказов.
+    """
+    queryset = DailyProductSales.objects.all()
+    serializer_class = DailyProductSalesSerializer
+    permission_classes = [IsAdminUser]  # выручка — данные только для сотрудников
+    filter_backends = [DjangoFilterBackend, OrderingFilter]
+    filterset_fields = {
+        "product": ["exact", "in"],  # один или несколько товаров (?product__in=1,2)
+        "day": ["exact", "gte", "lte"],  # период
+    }
+    ordering_fields = ["day", "revenue", "orders_count"]
+    ordering = ["day", "product"]  # сортировка по умолчанию совпадает с индексом (day, product)
+
+
+class MonthlyProductSalesViewSet(ReadOnlyModelViewSet):
+    """
+    Только чтение rollup-таблицы продаж по месяцам:
+        GET /api/sales/monthly/?month__gte=2026-01-01
+    """
+    queryset = MonthlyProductSales.objects.all()
+    serializer_class = MonthlyProductSalesSerializer
+    permission_classes = [IsAdminUser]
+    filter_backends = [DjangoFilterBackend, OrderingFilter]
+    filterset_fields = {
+        "product": ["exact", "in"],
+        "month": ["exact", "gte", "lte"],
+    }
+    ordering_fields = ["month", "revenue", "orders_count"]
+    ordering = ["month", "product"]
+
+
 class OrderDetailView(PermissionRequiredMixin, DetailView):
     """
     Класс-представление для отображения деталей конкретного заказа.
@@ -632,7 +808,7 @@ class OrderDetailView(PermissionRequiredMixin, DetailView):
 
 
 
-class OrderCreateView(CreateView):
+class OrderCreateView(SerializedWriteMixin, CreateView):
     """
     Клас на основе представления,
     для создания нового заказа с возможностью выбора пользователя и продуктов
@@ -658,6 +834,12 @@ class OrderUpdateView(UpdateView):
     model = Order # модель с которой будем работать
     fields = ["delivery_address", "user" ,"promocode", "products"] # Указываем поля для обновления
 
+    def get_form(self, form_class=None):
+        """Товары для чекбоксов загружаются вместе с автором (его показывает __str__ товара)."""
+        form = super().get_form(form_class)
+        form.fields["products"].queryset = Product.objects.select_related("created_by")
+        return form
+
     def get_success_url(self):
         """
         переопределение метода для редиректа на
@@ -680,27 +862,38 @@ class OrderDeleteView(DeleteView):
 
 
 
-class OrdersDataExport(UserPassesTestMixin, View):
+class OrdersDataExport(View):
     """
     Объявляем класс представления, наследуем от View
 
     Класс чисто тестовый (должен отдать список заказов)
 
-    UserPassesTestMixin:
-    - Позволяет определить свою проверку доступа через метод test_func.
-    - Если test_func возвращает True — пользователь может создать продукт.
-    - Если False — доступ запрещён (по умолчанию PermissionDenied).
+    Доступ только сотрудникам, как раньше с UserPassesTestMixin:
+    - анонимного пользователя перенаправляем на страницу входа;
+    - вошедшему пользователю без is_staff — 403 (PermissionDenied).
 
+    Асинхронное представление: проверка доступа — в async dispatch (синхронный UserPassesTestMixin
+    загружал бы пользователя из БД прямо в event loop), заказы читаются через async ORM.
     """
-    def test_func(self):
+    replica_reads = True  # выгрузка только читает: запросы идут в реплику БД
+
+    async def dispatch(self, request: HttpRequest, *args, **kwargs) -> HttpResponse:
+        user = await request.auser()  # пользователь из сессии через async ORM
         # проверяем, что user - это сотрудник(имеет доступ к административной панели)
-        # если user.is_staff == True - доступ к View разрешен, иначе 403
-        return self.request.user.is_staff
+        if not user.is_staff:
+            if not user.is_authenticated:
+                return redirect_to_login(request.get_full_path())
+            raise PermissionDenied
+        return await super().dispatch(request, *args, **kwargs)
 
-    def get(self, request: HttpRequest) -> JsonResponse:
+    async def get(self, request: HttpRequest) -> JsonResponse | StreamingHttpResponse:
         # Метод для обработки GET-запроса
         # request: объект HttpRequest, который содержит данные запроса
         # -> JsonResponse: указываем, что метод вернёт JSON-ответ
+        if request.GET.get("format") == "ndjson":
+            # потоковый режим для синхронизации склада: ?format=ndjson[&since=...]
+            return self.stream_ndjson(request)
+
         qs_order = (
             Order.objects # Менеджер модели Order — используется для формирования запросов к таблице заказов.
             .select_related("user") # Выполняет JOIN с таблицей пользователей (OneToMany), чтобы загрузить данные владельца заказа.
@@ -716,8 +909,25 @@ class OrdersDataExport(UserPassesTestMixin, View):
                 "user": order.user.id, # pk юзера сделавшего заказ
                 "products": [product.pk for product in order.products.all()] # список pk - продуктов
             }
-            for order in qs_order
+            async for order in qs_order  # async ORM: select_related и prefetch_related выполняются без блокировки
         ]
         # Возвращаем JSON-ответ, словарь превращается в JSON автоматически
         # В ключе "products" лежит список словарей, описанных выше
         return JsonResponse({"orders": orders_data})
+
+    def stream_ndjson(self, request: HttpRequest) -> HttpResponse:
+        """
+        Потоковая выгрузка заказов в NDJSON (по заказу на строку).
+
+        Заказы читаются порциями по pk, а товары заказов — одним запросом на порцию (exports.iter_order_records).
+        Для очень больших выгрузок — POST /api/exports/ {"dataset": "orders"}: файл пишут фоновые задачи.
+        """
+        try:
+            since = parse_since(request.GET.get("since"))
+        except ValueError as error:
+            return HttpResponseBadRequest(str(error))
+
+        queryset = Order.objects.values("pk", "delivery_address", "promocode", "created_at", "user_id")
+        if since is not None:
+            queryset = queryset.filter(created_at__gte=since)  # только заказы, созданные с момента since
+        return streaming_ndjson_response(request, iter_order_records(queryset))